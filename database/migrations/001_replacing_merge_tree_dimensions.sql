@@ -0,0 +1,39 @@
+-- Optional: switch the dimension tables to ReplacingMergeTree.
+--
+-- The ETL already writes one row per dimension key (see etl/dimensions.py).
+-- With ReplacingMergeTree a changed member is inserted as a new version and
+-- merged in, without a DELETE on plain MergeTree. Copying the rows also
+-- removes the duplicates that earlier blind inserts left behind.
+-- Safe to run more than once.
+
+CREATE TABLE IF NOT EXISTS dwh.dim_date_replacing AS dwh.dim_date
+ENGINE = ReplacingMergeTree()
+ORDER BY date_id;
+INSERT INTO dwh.dim_date_replacing SELECT * FROM dwh.dim_date;
+EXCHANGE TABLES dwh.dim_date AND dwh.dim_date_replacing;
+DROP TABLE dwh.dim_date_replacing;
+OPTIMIZE TABLE dwh.dim_date FINAL;
+
+CREATE TABLE IF NOT EXISTS dwh.dim_mine_replacing AS dwh.dim_mine
+ENGINE = ReplacingMergeTree()
+ORDER BY mine_id;
+INSERT INTO dwh.dim_mine_replacing SELECT * FROM dwh.dim_mine;
+EXCHANGE TABLES dwh.dim_mine AND dwh.dim_mine_replacing;
+DROP TABLE dwh.dim_mine_replacing;
+OPTIMIZE TABLE dwh.dim_mine FINAL;
+
+CREATE TABLE IF NOT EXISTS dwh.dim_equipment_replacing AS dwh.dim_equipment
+ENGINE = ReplacingMergeTree()
+ORDER BY equipment_id;
+INSERT INTO dwh.dim_equipment_replacing SELECT * FROM dwh.dim_equipment;
+EXCHANGE TABLES dwh.dim_equipment AND dwh.dim_equipment_replacing;
+DROP TABLE dwh.dim_equipment_replacing;
+OPTIMIZE TABLE dwh.dim_equipment FINAL;
+
+CREATE TABLE IF NOT EXISTS dwh.dim_location_replacing AS dwh.dim_location
+ENGINE = ReplacingMergeTree()
+ORDER BY location_id;
+INSERT INTO dwh.dim_location_replacing SELECT * FROM dwh.dim_location;
+EXCHANGE TABLES dwh.dim_location AND dwh.dim_location_replacing;
+DROP TABLE dwh.dim_location_replacing;
+OPTIMIZE TABLE dwh.dim_location FINAL;
@@ -0,0 +1,21 @@
+-- Partition the fact tables by month for the ETL's partition-replace loads.
+--
+-- Rebuilds each fact table with PARTITION BY toYYYYMM(date_id) and copies the
+-- existing rows, dropping exact duplicates left by earlier reruns. Stop the
+-- ETL while this runs.
+
+CREATE TABLE IF NOT EXISTS dwh.fact_daily_production_partitioned AS dwh.fact_daily_production
+ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (date_id, mine_id);
+INSERT INTO dwh.fact_daily_production_partitioned SELECT DISTINCT * FROM dwh.fact_daily_production;
+EXCHANGE TABLES dwh.fact_daily_production AND dwh.fact_daily_production_partitioned;
+DROP TABLE dwh.fact_daily_production_partitioned;
+
+CREATE TABLE IF NOT EXISTS dwh.fact_equipment_metrics_partitioned AS dwh.fact_equipment_metrics
+ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (date_id, equipment_id);
+INSERT INTO dwh.fact_equipment_metrics_partitioned SELECT DISTINCT * FROM dwh.fact_equipment_metrics;
+EXCHANGE TABLES dwh.fact_equipment_metrics AND dwh.fact_equipment_metrics_partitioned;
+DROP TABLE dwh.fact_equipment_metrics_partitioned;
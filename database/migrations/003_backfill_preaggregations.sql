@@ -0,0 +1,36 @@
+-- Backfill the dashboard aggregates on an existing DWH.
+--
+-- Run after database/views/preaggregations.sql and analytical_views.sql, with
+-- the ETL stopped. Rebuilds both aggregate tables from the whole fact table,
+-- so it is also the way to reset them. The ETL keeps them current afterwards.
+
+TRUNCATE TABLE dwh.daily_production_agg;
+INSERT INTO dwh.daily_production_agg
+SELECT
+    date_id,
+    sumState(total_production_daily) AS total_production,
+    avgState(average_quality_grade) AS quality_grade,
+    avgState(equipment_utilization) AS equipment_utilization,
+    avgState(fuel_efficiency) AS fuel_efficiency,
+    maxState(rainfall_mm) AS rainfall_mm
+FROM dwh.fact_daily_production
+GROUP BY date_id
+SETTINGS max_partitions_per_insert_block = 0;
+
+TRUNCATE TABLE dwh.weather_impact_monthly;
+INSERT INTO dwh.weather_impact_monthly
+SELECT
+    toYYYYMM(date_id) AS month,
+    if(rainfall_mm_per_day > 1.0, 'Rainy Day', 'Non-Rainy Day') AS day_type,
+    avgState(total_production_per_day) AS daily_production,
+    corrState(rainfall_mm_per_day, total_production_per_day) AS rainfall_production
+FROM (
+    SELECT
+        date_id,
+        sumMerge(total_production) AS total_production_per_day,
+        maxMerge(rainfall_mm) AS rainfall_mm_per_day
+    FROM dwh.daily_production_agg
+    GROUP BY date_id
+)
+GROUP BY month, day_type
+SETTINGS max_partitions_per_insert_block = 0;
@@ -0,0 +1,127 @@
+-- Move the staging and fact tables to the storage-optimized layout.
+--
+-- Rebuilds each table with the definition now in staging_schema.sql and
+-- star_schema.sql (monthly partitions, LowCardinality keys, column codecs,
+-- equipment-first sort key and daily projection on the sensor table), copies
+-- the existing rows and swaps the tables. Stop the ETL while this runs. The
+-- copies are not limited in how many months one insert may span.
+-- The dashboard materialized view is detached from the fact table during the
+-- copy and recreated afterwards; the aggregate tables are left as they are.
+
+DROP VIEW IF EXISTS dwh.daily_production_agg_mv;
+
+-- Staging
+CREATE TABLE staging.mines_optimized (
+    mine_id UInt32,
+    mine_code String,
+    mine_name String,
+    location LowCardinality(String),
+    operational_status LowCardinality(String)
+) ENGINE = MergeTree()
+ORDER BY mine_id;
+INSERT INTO staging.mines_optimized SELECT * FROM staging.mines
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES staging.mines AND staging.mines_optimized;
+DROP TABLE staging.mines_optimized;
+
+CREATE TABLE staging.production_logs_optimized (
+    log_id UInt32 CODEC(Delta, ZSTD(1)),
+    date Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id UInt32,
+    shift LowCardinality(String),
+    tons_extracted Decimal64(2) CODEC(ZSTD(1)),
+    quality_grade Decimal32(1) CODEC(ZSTD(1))
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date)
+ORDER BY (date, mine_id);
+INSERT INTO staging.production_logs_optimized SELECT * FROM staging.production_logs
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES staging.production_logs AND staging.production_logs_optimized;
+DROP TABLE staging.production_logs_optimized;
+
+CREATE TABLE staging.equipment_sensors_optimized (
+    timestamp DateTime CODEC(DoubleDelta, ZSTD(1)),
+    equipment_id LowCardinality(String),
+    status LowCardinality(String),
+    fuel_consumption Float64 CODEC(ZSTD(1)),
+    maintenance_alert Boolean,
+    PROJECTION daily_equipment (
+        SELECT
+            toDate(timestamp),
+            equipment_id,
+            countIf(status = 'active'),
+            countIf(status = 'maintenance'),
+            sum(fuel_consumption),
+            countIf(maintenance_alert)
+        GROUP BY toDate(timestamp), equipment_id
+    )
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(timestamp)
+ORDER BY (equipment_id, timestamp);
+INSERT INTO staging.equipment_sensors_optimized SELECT * FROM staging.equipment_sensors
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES staging.equipment_sensors AND staging.equipment_sensors_optimized;
+DROP TABLE staging.equipment_sensors_optimized;
+
+-- DWH facts
+CREATE TABLE dwh.fact_daily_production_optimized (
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    total_production_daily Float64 CODEC(ZSTD(1)),
+    average_quality_grade Float32 CODEC(ZSTD(1)),
+    equipment_utilization Float32 CODEC(ZSTD(1)),
+    fuel_efficiency Float32 CODEC(ZSTD(1)),
+    temperature_2m_mean Float32 CODEC(ZSTD(1)),
+    rainfall_mm Float32 CODEC(ZSTD(1))
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (date_id, mine_id);
+INSERT INTO dwh.fact_daily_production_optimized SELECT * FROM dwh.fact_daily_production
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES dwh.fact_daily_production AND dwh.fact_daily_production_optimized;
+DROP TABLE dwh.fact_daily_production_optimized;
+
+CREATE TABLE dwh.fact_equipment_metrics_optimized (
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    equipment_id LowCardinality(String),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    total_operational_hours UInt8 CODEC(T64, ZSTD(1)),
+    total_maintenance_hours UInt8 CODEC(T64, ZSTD(1)),
+    total_fuel_consumption Float64 CODEC(ZSTD(1)),
+    maintenance_alerts UInt8 CODEC(T64, ZSTD(1))
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (date_id, equipment_id);
+INSERT INTO dwh.fact_equipment_metrics_optimized SELECT * FROM dwh.fact_equipment_metrics
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES dwh.fact_equipment_metrics AND dwh.fact_equipment_metrics_optimized;
+DROP TABLE dwh.fact_equipment_metrics_optimized;
+
+CREATE TABLE dwh.validation_errors_optimized (
+    run_id String,
+    rule LowCardinality(String),
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    value Nullable(Float64) CODEC(ZSTD(1))
+) ENGINE = MergeTree()
+ORDER BY (run_id, rule, date_id);
+INSERT INTO dwh.validation_errors_optimized SELECT * FROM dwh.validation_errors
+SETTINGS max_partitions_per_insert_block = 0;
+EXCHANGE TABLES dwh.validation_errors AND dwh.validation_errors_optimized;
+DROP TABLE dwh.validation_errors_optimized;
+
+-- Same definition as in database/views/preaggregations.sql
+CREATE MATERIALIZED VIEW IF NOT EXISTS dwh.daily_production_agg_mv
+TO dwh.daily_production_agg AS
+SELECT
+    date_id,
+    sumState(total_production_daily) AS total_production,
+    avgState(average_quality_grade) AS quality_grade,
+    avgState(equipment_utilization) AS equipment_utilization,
+    avgState(fuel_efficiency) AS fuel_efficiency,
+    maxState(rainfall_mm) AS rainfall_mm
+FROM dwh.fact_daily_production
+GROUP BY date_id;
@@ -0,0 +1,18 @@
+-- Add the run metrics table that etl.py --metrics-table writes to.
+--
+-- Same definition as in star_schema.sql; new deployments get it from there.
+
+CREATE TABLE IF NOT EXISTS dwh.etl_runs (
+    run_id String,
+    stage LowCardinality(String),
+    status LowCardinality(String),
+    started_at DateTime64(3) CODEC(DoubleDelta, ZSTD(1)),
+    wall_seconds Float64 CODEC(ZSTD(1)),
+    cpu_seconds Nullable(Float64) CODEC(ZSTD(1)),
+    rows_in Nullable(UInt64) CODEC(ZSTD(1)),
+    rows_out Nullable(UInt64) CODEC(ZSTD(1)),
+    bytes Nullable(UInt64) CODEC(ZSTD(1)),
+    peak_rss_mb Nullable(Float64) CODEC(ZSTD(1))
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(started_at)
+ORDER BY (run_id, stage, started_at);
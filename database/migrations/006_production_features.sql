@@ -0,0 +1,33 @@
+-- Add the forecasting feature store that the ETL refreshes after each load.
+--
+-- Same definition as in star_schema.sql; new deployments get it from there.
+-- Fill it once from the existing facts with: python forecast/feature_store.py
+
+CREATE TABLE IF NOT EXISTS dwh.production_features (
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    total_production_daily Float64 CODEC(ZSTD(1)),
+    average_quality_grade Float64 CODEC(ZSTD(1)),
+    equipment_utilization Float64 CODEC(ZSTD(1)),
+    fuel_efficiency Float64 CODEC(ZSTD(1)),
+    temperature_2m_mean Float64 CODEC(ZSTD(1)),
+    rainfall_mm Float64 CODEC(ZSTD(1)),
+    production_lag_1 Float64 CODEC(ZSTD(1)),
+    production_lag_2 Float64 CODEC(ZSTD(1)),
+    production_lag_3 Float64 CODEC(ZSTD(1)),
+    production_lag_7 Float64 CODEC(ZSTD(1)),
+    production_lag_14 Float64 CODEC(ZSTD(1)),
+    production_ma_3 Float64 CODEC(ZSTD(1)),
+    production_std_3 Float64 CODEC(ZSTD(1)),
+    production_ma_7 Float64 CODEC(ZSTD(1)),
+    production_std_7 Float64 CODEC(ZSTD(1)),
+    production_ma_14 Float64 CODEC(ZSTD(1)),
+    production_std_14 Float64 CODEC(ZSTD(1)),
+    production_ma_30 Float64 CODEC(ZSTD(1)),
+    production_std_30 Float64 CODEC(ZSTD(1)),
+    rainfall_temp_interaction Float64 CODEC(ZSTD(1)),
+    equipment_efficiency Float64 CODEC(ZSTD(1)),
+    updated_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (mine_id, date_id);
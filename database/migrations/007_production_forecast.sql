@@ -0,0 +1,18 @@
+-- Add the forecast fact table that the ETL writes after each load.
+--
+-- Same definition as in star_schema.sql; new deployments get it from there.
+-- Then recreate the analytical views (views/analytical_views.sql) for
+-- dwh.production_forecast_vs_actual.
+
+CREATE TABLE IF NOT EXISTS dwh.fact_production_forecast (
+    origin_date Date CODEC(DoubleDelta, ZSTD(1)),
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    horizon UInt8 CODEC(T64, ZSTD(1)),
+    predicted_production Float64 CODEC(ZSTD(1)),
+    model LowCardinality(String),
+    model_version LowCardinality(String),
+    created_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(created_at)
+PARTITION BY toYYYYMM(origin_date)
+ORDER BY (mine_id, date_id, origin_date, model);
@@ -2,30 +2,52 @@
 CREATE DATABASE IF NOT EXISTS staging;
 
 -- Create staging tables
+-- Storage layout (see database/migrations/004_storage_optimized_schema.sql):
+-- the log tables are partitioned by month, so the ETL's watermark filters
+-- prune whole partitions; repetitive strings are LowCardinality and date and
+-- time columns carry codecs suited to their shape (DoubleDelta for steadily
+-- increasing times, Delta for ids, ZSTD on top). Float metrics use plain ZSTD:
+-- readings rounded to two decimals compress worse with Gorilla.
 CREATE TABLE IF NOT EXISTS staging.mines (
     mine_id UInt32,
     mine_code String,
     mine_name String,
-    location String,
-    operational_status String
+    location LowCardinality(String),
+    operational_status LowCardinality(String)
 ) ENGINE = MergeTree()
 ORDER BY mine_id;
 
 CREATE TABLE IF NOT EXISTS staging.production_logs (
-    log_id UInt32,
-    date Date,
+    log_id UInt32 CODEC(Delta, ZSTD(1)),
+    date Date CODEC(DoubleDelta, ZSTD(1)),
     mine_id UInt32,
-    shift String,
-    tons_extracted Decimal64(2),
-    quality_grade Decimal32(1)
+    shift LowCardinality(String),
+    tons_extracted Decimal64(2) CODEC(ZSTD(1)),
+    quality_grade Decimal32(1) CODEC(ZSTD(1))
 ) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date)
 ORDER BY (date, mine_id);
 
+-- Sorted by equipment first: one machine's readings are contiguous (and its
+-- timestamps delta-encode well), so per-equipment scans read a single key
+-- range. The projection keeps the daily per-equipment rollup the ETL computes
+-- (see EQUIPMENT_AGGREGATE_QUERY in etl/aggregation.py) pre-aggregated.
 CREATE TABLE IF NOT EXISTS staging.equipment_sensors (
-    timestamp DateTime,
-    equipment_id String,
-    status String,
-    fuel_consumption Float64,
-    maintenance_alert Boolean
+    timestamp DateTime CODEC(DoubleDelta, ZSTD(1)),
+    equipment_id LowCardinality(String),
+    status LowCardinality(String),
+    fuel_consumption Float64 CODEC(ZSTD(1)),
+    maintenance_alert Boolean,
+    PROJECTION daily_equipment (
+        SELECT
+            toDate(timestamp),
+            equipment_id,
+            countIf(status = 'active'),
+            countIf(status = 'maintenance'),
+            sum(fuel_consumption),
+            countIf(maintenance_alert)
+        GROUP BY toDate(timestamp), equipment_id
+    )
 ) ENGINE = MergeTree()
-ORDER BY (timestamp, equipment_id);
\ No newline at end of file
+PARTITION BY toYYYYMM(timestamp)
+ORDER BY (equipment_id, timestamp);
@@ -43,27 +43,105 @@ CREATE TABLE IF NOT EXISTS dwh.dim_location (
 PRIMARY KEY location_id;
 
 -- Fact Tables
+-- Partitioned by month: the ETL rebuilds the months it touches and swaps them
+-- in with REPLACE PARTITION (see etl/partitions.py). Keys repeated on every
+-- row are LowCardinality; the sorted dates and the metrics carry codecs
+-- (database/migrations/004_storage_optimized_schema.sql converts older tables).
 CREATE TABLE IF NOT EXISTS dwh.fact_daily_production (
-    date_id Date,
-    mine_id String,
-    location_id UInt64,
-    total_production_daily Float64,
-    average_quality_grade Float32,
-    equipment_utilization Float32,
-    fuel_efficiency Float32,
-    temperature_2m_mean Float32,
-    rainfall_mm Float32
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    total_production_daily Float64 CODEC(ZSTD(1)),
+    average_quality_grade Float32 CODEC(ZSTD(1)),
+    equipment_utilization Float32 CODEC(ZSTD(1)),
+    fuel_efficiency Float32 CODEC(ZSTD(1)),
+    temperature_2m_mean Float32 CODEC(ZSTD(1)),
+    rainfall_mm Float32 CODEC(ZSTD(1))
 ) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
 ORDER BY (date_id, mine_id);
 
 CREATE TABLE IF NOT EXISTS dwh.fact_equipment_metrics (
-    date_id Date,
-    equipment_id String,
-    mine_id String,
-    location_id UInt64,
-    total_operational_hours UInt8,
-    total_maintenance_hours UInt8,
-    total_fuel_consumption Float64,
-    maintenance_alerts UInt8
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    equipment_id LowCardinality(String),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    total_operational_hours UInt8 CODEC(T64, ZSTD(1)),
+    total_maintenance_hours UInt8 CODEC(T64, ZSTD(1)),
+    total_fuel_consumption Float64 CODEC(ZSTD(1)),
+    maintenance_alerts UInt8 CODEC(T64, ZSTD(1))
+) ENGINE = MergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (date_id, equipment_id);
+
+-- Data Quality
+-- One row per record that failed a validation rule during an ETL run.
+CREATE TABLE IF NOT EXISTS dwh.validation_errors (
+    run_id String,
+    rule LowCardinality(String),
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    location_id UInt64 CODEC(T64, ZSTD(1)),
+    value Nullable(Float64) CODEC(ZSTD(1))
+) ENGINE = MergeTree()
+ORDER BY (run_id, rule, date_id);
+-- Run Metrics
+-- One row per measured stage of an ETL run (etl.py --metrics-table, see etl/metrics.py).
+CREATE TABLE IF NOT EXISTS dwh.etl_runs (
+    run_id String,
+    stage LowCardinality(String),
+    status LowCardinality(String),
+    started_at DateTime64(3) CODEC(DoubleDelta, ZSTD(1)),
+    wall_seconds Float64 CODEC(ZSTD(1)),
+    cpu_seconds Nullable(Float64) CODEC(ZSTD(1)),
+    rows_in Nullable(UInt64) CODEC(ZSTD(1)),
+    rows_out Nullable(UInt64) CODEC(ZSTD(1)),
+    bytes Nullable(UInt64) CODEC(ZSTD(1)),
+    peak_rss_mb Nullable(Float64) CODEC(ZSTD(1))
 ) ENGINE = MergeTree()
-ORDER BY (date_id, equipment_id);
\ No newline at end of file
+PARTITION BY toYYYYMM(started_at)
+ORDER BY (run_id, stage, started_at);
+-- Forecast Features
+-- Target, lags and rolling windows of each daily fact row (forecast/feature_store.py), refreshed after each load.
+CREATE TABLE IF NOT EXISTS dwh.production_features (
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    total_production_daily Float64 CODEC(ZSTD(1)),
+    average_quality_grade Float64 CODEC(ZSTD(1)),
+    equipment_utilization Float64 CODEC(ZSTD(1)),
+    fuel_efficiency Float64 CODEC(ZSTD(1)),
+    temperature_2m_mean Float64 CODEC(ZSTD(1)),
+    rainfall_mm Float64 CODEC(ZSTD(1)),
+    production_lag_1 Float64 CODEC(ZSTD(1)),
+    production_lag_2 Float64 CODEC(ZSTD(1)),
+    production_lag_3 Float64 CODEC(ZSTD(1)),
+    production_lag_7 Float64 CODEC(ZSTD(1)),
+    production_lag_14 Float64 CODEC(ZSTD(1)),
+    production_ma_3 Float64 CODEC(ZSTD(1)),
+    production_std_3 Float64 CODEC(ZSTD(1)),
+    production_ma_7 Float64 CODEC(ZSTD(1)),
+    production_std_7 Float64 CODEC(ZSTD(1)),
+    production_ma_14 Float64 CODEC(ZSTD(1)),
+    production_std_14 Float64 CODEC(ZSTD(1)),
+    production_ma_30 Float64 CODEC(ZSTD(1)),
+    production_std_30 Float64 CODEC(ZSTD(1)),
+    rainfall_temp_interaction Float64 CODEC(ZSTD(1)),
+    equipment_efficiency Float64 CODEC(ZSTD(1)),
+    updated_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(updated_at)
+PARTITION BY toYYYYMM(date_id)
+ORDER BY (mine_id, date_id);
+-- Production Forecasts
+-- 1-30 day forecasts of every mine from each last loaded day (origin_date), written by forecast/batch_forecast.py.
+CREATE TABLE IF NOT EXISTS dwh.fact_production_forecast (
+    origin_date Date CODEC(DoubleDelta, ZSTD(1)),
+    date_id Date CODEC(DoubleDelta, ZSTD(1)),
+    mine_id LowCardinality(String),
+    horizon UInt8 CODEC(T64, ZSTD(1)),
+    predicted_production Float64 CODEC(ZSTD(1)),
+    model LowCardinality(String),
+    model_version LowCardinality(String),
+    created_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(created_at)
+PARTITION BY toYYYYMM(origin_date)
+ORDER BY (mine_id, date_id, origin_date, model);
@@ -1,5 +1,8 @@
 -- This file creates analytical views on top of the DWH tables
 -- to generate the specific metrics required for the project dashboard.
+-- The summary and weather views read the pre-aggregated tables in
+-- preaggregations.sql, so a dashboard refresh merges a few states per day
+-- or month instead of re-aggregating the whole fact table.
 
 -- View 1: Daily Summary Metrics
 -- This view aggregates key performance indicators on a daily basis,
@@ -7,34 +10,49 @@
 CREATE OR REPLACE VIEW dwh.daily_summary_metrics AS
 SELECT
     date_id,
-    sum(total_production_daily) AS total_production_daily,
-    avg(average_quality_grade) AS average_quality_grade_daily,
-    avg(equipment_utilization) AS average_equipment_utilization,
-    avg(fuel_efficiency) AS average_fuel_efficiency
-FROM dwh.fact_daily_production
+    sumMerge(total_production) AS total_production_daily,
+    avgMerge(quality_grade) AS average_quality_grade_daily,
+    avgMerge(equipment_utilization) AS average_equipment_utilization,
+    avgMerge(fuel_efficiency) AS average_fuel_efficiency
+FROM dwh.daily_production_agg
 GROUP BY date_id
 ORDER BY date_id;
 
 
--- View 2: Weather Impact Analysis
+-- View 2: Forecast vs Actual
+-- Total forecast production per day of every nightly forecast run (origin_date,
+-- 1-30 days ahead) and model next to the actual total of daily_summary_metrics, NULL for
+-- days not loaded yet. Filter on origin_date = max(origin_date) for the latest
+-- forecast, on model to chart one model, or on horizon to chart the accuracy of
+-- one lead time.
+CREATE OR REPLACE VIEW dwh.production_forecast_vs_actual AS
+SELECT
+    forecast.origin_date,
+    forecast.date_id,
+    forecast.horizon,
+    forecast.model,
+    forecast.forecast_production_daily,
+    actual.total_production_daily AS actual_production_daily,
+    forecast.forecast_production_daily - actual.total_production_daily AS forecast_error
+FROM (
+    SELECT origin_date, date_id, horizon, model, sum(predicted_production) AS forecast_production_daily
+    FROM dwh.fact_production_forecast FINAL
+    GROUP BY origin_date, date_id, horizon, model
+) AS forecast
+LEFT JOIN dwh.daily_summary_metrics AS actual ON actual.date_id = forecast.date_id
+ORDER BY origin_date, date_id, model
+SETTINGS join_use_nulls = 1;
+
+
+-- View 3: Weather Impact Analysis
 -- This view is designed to analyze the relationship between rainfall and production.
 -- It categorizes days into 'Rainy' and 'Non-Rainy' to compare production levels
 -- and also calculates the Pearson correlation coefficient between daily rainfall and production.
+-- The monthly states merge into the same result as aggregating every day of history.
 CREATE OR REPLACE VIEW dwh.weather_impact_analysis AS
-WITH daily_aggregated_data AS (
-    SELECT
-        date_id,
-        sum(total_production_daily) AS total_production_per_day,
-        max(rainfall_mm) AS rainfall_mm_per_day
-    FROM dwh.fact_daily_production
-    GROUP BY date_id
-)
 SELECT
-    CASE
-        WHEN rainfall_mm_per_day > 1.0 THEN 'Rainy Day'
-        ELSE 'Non-Rainy Day'
-    END AS day_type,
-    avg(total_production_per_day) AS average_daily_production,
-    corr(rainfall_mm_per_day, total_production_per_day) AS rainfall_production_correlation
-FROM daily_aggregated_data
-GROUP BY day_type; 
\ No newline at end of file
+    day_type,
+    avgMerge(daily_production) AS average_daily_production,
+    corrMerge(rainfall_production) AS rainfall_production_correlation
+FROM dwh.weather_impact_monthly
+GROUP BY day_type;
@@ -0,0 +1,44 @@
+-- Incrementally maintained aggregates behind the dashboard views.
+--
+-- The views in analytical_views.sql read these tables instead of scanning
+-- fact_daily_production. Both are partitioned by month like the fact table:
+-- after each load the ETL rebuilds the months it touched (see
+-- etl/preaggregates.py), because REPLACE PARTITION does not fire
+-- materialized views. The materialized view keeps daily_production_agg
+-- current for plain inserts into the fact table in between.
+
+-- One row of aggregate states per day (several per day until parts merge)
+CREATE TABLE IF NOT EXISTS dwh.daily_production_agg (
+    date_id Date,
+    total_production AggregateFunction(sum, Float64),
+    quality_grade AggregateFunction(avg, Float32),
+    equipment_utilization AggregateFunction(avg, Float32),
+    fuel_efficiency AggregateFunction(avg, Float32),
+    rainfall_mm AggregateFunction(max, Float32)
+) ENGINE = AggregatingMergeTree()
+PARTITION BY toYYYYMM(date_id)
+ORDER BY date_id;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS dwh.daily_production_agg_mv
+TO dwh.daily_production_agg AS
+SELECT
+    date_id,
+    sumState(total_production_daily) AS total_production,
+    avgState(average_quality_grade) AS quality_grade,
+    avgState(equipment_utilization) AS equipment_utilization,
+    avgState(fuel_efficiency) AS fuel_efficiency,
+    maxState(rainfall_mm) AS rainfall_mm
+FROM dwh.fact_daily_production
+GROUP BY date_id;
+
+-- Per month and day type: running moments of daily production and of its
+-- correlation with daily rainfall. A day's type depends on its complete
+-- rainfall, so this table is only rebuilt per month from daily_production_agg.
+CREATE TABLE IF NOT EXISTS dwh.weather_impact_monthly (
+    month UInt32,
+    day_type String,
+    daily_production AggregateFunction(avg, Float64),
+    rainfall_production AggregateFunction(corr, Float32, Float64)
+) ENGINE = AggregatingMergeTree()
+PARTITION BY month
+ORDER BY (month, day_type);
@@ -0,0 +1,133 @@
+import pandas as pd
+
+# Engines that can produce the daily aggregates:
+# - pandas: aggregates the raw staging frames returned by extract_data on the client
+# - clickhouse: pushes the same aggregation down to ClickHouse and only fetches daily rows
+# - streaming: streams sensor rows in fixed-size blocks into running aggregates (see streaming.py)
+AGGREGATION_ENGINES = ('pandas', 'clickhouse', 'streaming')
+
+PRODUCTION_AGGREGATE_QUERY = """
+    SELECT
+        date AS date_id,
+        mine_id,
+        toFloat64(sum(tons_extracted)) AS total_production_daily,
+        avg(toFloat64(quality_grade)) AS average_quality_grade
+    FROM staging.production_logs
+    {where}
+    GROUP BY date, mine_id
+    ORDER BY date, mine_id
+"""
+
+EQUIPMENT_AGGREGATE_QUERY = """
+    SELECT
+        toDate(timestamp) AS date_id,
+        equipment_id,
+        countIf(status = 'active') AS total_operational_hours,
+        countIf(status = 'maintenance') AS total_maintenance_hours,
+        sum(fuel_consumption) AS total_fuel_consumption,
+        countIf(maintenance_alert) AS maintenance_alerts
+    FROM staging.equipment_sensors
+    {where}
+    GROUP BY date_id, equipment_id
+    ORDER BY date_id, equipment_id
+"""
+
+# Machines in the whole sensor history: the utilization denominator, whatever window a run extracts
+FLEET_SIZE_QUERY = "SELECT uniqExact(equipment_id) FROM staging.equipment_sensors"
+
+def count_fleet(client):
+    """Number of distinct machines that ever reported, independent of the rows a run extracts."""
+    return int(client.query(FLEET_SIZE_QUERY).first_row[0])
+
+def aggregate_production(production_data):
+    """Aggregate production logs by day and mine."""
+    # Rename 'date' column to 'date_id' for consistency
+    production_data = production_data.rename(columns={'date': 'date_id'})
+    production_data['date_id'] = pd.to_datetime(production_data['date_id']).dt.date
+
+    daily_production_data = production_data.groupby(['date_id', 'mine_id']).agg(
+        total_production_daily=('tons_extracted', 'sum'),
+        average_quality_grade=('quality_grade', 'mean')
+    ).reset_index()
+
+    # Cast decimal types to float for calculations
+    daily_production_data['total_production_daily'] = daily_production_data['total_production_daily'].astype(float)
+    daily_production_data['average_quality_grade'] = daily_production_data['average_quality_grade'].astype(float)
+    return daily_production_data
+
+def aggregate_equipment_metrics(equipment_data):
+    """Aggregate sensor readings by day and equipment in a single vectorized groupby.
+
+    ``status`` is categorized once so the active/maintenance flags are code
+    comparisons, and every metric becomes a plain column sum instead of a
+    per-group Python lambda.
+    """
+    status = equipment_data['status'].astype('category')
+    readings = pd.DataFrame({
+        'date_id': pd.to_datetime(equipment_data['timestamp']).dt.normalize(),
+        'equipment_id': equipment_data['equipment_id'],
+        'total_operational_hours': status == 'active',
+        'total_maintenance_hours': status == 'maintenance',
+        'total_fuel_consumption': equipment_data['fuel_consumption'],
+        'maintenance_alerts': equipment_data['maintenance_alert'].astype(bool)
+    })
+    equipment_metrics = readings.groupby(['date_id', 'equipment_id'], observed=True).sum().reset_index()
+    equipment_metrics['date_id'] = equipment_metrics['date_id'].dt.date
+    return equipment_metrics
+
+def aggregate_equipment(equipment_data):
+    """Aggregate sensor readings by day and equipment, and by day across all equipment.
+
+    Raw readings are scanned once; per-day totals and the equipment count are
+    rolled up from the per-equipment result. Returns the per-equipment metrics,
+    the per-day totals and the number of distinct equipment pieces seen.
+    """
+    equipment_metrics = aggregate_equipment_metrics(equipment_data)
+    daily_equipment_data, total_equipment = summarize_equipment(equipment_metrics)
+    return equipment_metrics, daily_equipment_data, total_equipment
+
+def summarize_equipment(equipment_metrics):
+    """Roll per-equipment daily metrics up to per-day totals and the equipment count.
+
+    Shared by every engine so the per-day totals never need another pass over
+    raw sensor data. The count covers these rows only; run_etl measures
+    utilization against the whole fleet (count_fleet) instead.
+    """
+    daily_equipment_data = equipment_metrics.groupby(['date_id']).agg(
+        operational_hours=('total_operational_hours', 'sum'),
+        fuel_consumption=('total_fuel_consumption', 'sum')
+    ).reset_index()
+    return daily_equipment_data, equipment_metrics['equipment_id'].nunique()
+
+def aggregate_data(production_data, equipment_data):
+    """Aggregate raw staging frames with pandas (the client-side engine)."""
+    equipment_metrics, daily_equipment_data, total_equipment = aggregate_equipment(equipment_data)
+    return {
+        'daily_production': aggregate_production(production_data),
+        'daily_equipment': daily_equipment_data,
+        'equipment_metrics': equipment_metrics,
+        'total_equipment': total_equipment
+    }
+
+def query_aggregates(client, filters=None):
+    """Aggregate staging data inside ClickHouse (the pushdown engine).
+
+    ``filters`` maps a staging table name to a ``(where_clause, parameters)``
+    pair used to bound its scan. Only daily rows cross the network.
+    """
+    filters = filters or {}
+    where, parameters = filters.get('production_logs', ('', {}))
+    daily_production_data = client.query_df(PRODUCTION_AGGREGATE_QUERY.format(where=where), parameters=parameters)
+    daily_production_data['date_id'] = pd.to_datetime(daily_production_data['date_id']).dt.date
+
+    where, parameters = filters.get('equipment_sensors', ('', {}))
+    equipment_metrics = client.query_df(EQUIPMENT_AGGREGATE_QUERY.format(where=where), parameters=parameters)
+    equipment_metrics['date_id'] = pd.to_datetime(equipment_metrics['date_id']).dt.date
+
+    daily_equipment_data, total_equipment = summarize_equipment(equipment_metrics)
+    return {
+        'daily_production': daily_production_data,
+        'daily_equipment': daily_equipment_data,
+        'equipment_metrics': equipment_metrics,
+        'total_equipment': total_equipment
+    }
@@ -0,0 +1,329 @@
+"""Date-sharded parallel backfill of the DWH from staging.
+
+Splits a date range into week, month, quarter or year shards and runs the
+ETL (extract, transform, validate, load) on each shard in a process pool.
+Every shard has its own ClickHouse clients, validator and logs under
+etl/logs/run_<id>/shards/<shard>/. Finished shards are checkpointed in
+run_<id>/checkpoint.json, so `--resume <id>` continues a failed backfill
+with the shards that did not complete, and the validation summaries of all
+shards are merged into run_<id>/backfill_report.json.
+
+Before the shards start, the mine, location and equipment dimension members
+of the whole range are loaded and the weather cache is filled once, so
+shards neither race on shared dimension rows nor call the weather API. The
+fleet size is counted once too and kept in the checkpoint: every shard
+measures utilization against it, as a single full run would.
+Shards of the same month partition run one after another (REPLACE PARTITION
+rebuilds the whole month); shards of different months run in parallel.
+Shards neither refresh the forecasting features nor forecast: neighbouring
+shards would rewrite each other's overlapping feature rows in whatever order
+they finish. The features of the whole range are rebuilt once after all
+shards (forecast/feature_store.py), then the batch forecasts
+(forecast/batch_forecast.py) run once.
+
+Usage (from the repository root):
+    python etl/backfill.py --start 2020-01-01 --end 2024-12-31 --shard month --workers 8
+    python etl/backfill.py --resume 20250101_120000
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from aggregation import AGGREGATION_ENGINES, count_fleet
+from dimensions import (DimensionCache, build_equipment_dimension, build_location_dimension,
+                        build_mine_dimension, upsert_dimension)
+from etl import (INCREMENTAL_SOURCES, TRANSFORM_ENGINES, connect, extract_mines, fetch_weather_data,
+                 forecast_production, run_etl, setup_logging, transform_engine_available, watermark_filter)
+from feature_store import rebuild_feature_store  # forecast/, put on sys.path by etl
+from loader import DEFAULT_BATCH_ROWS, ClientPool, ParallelLoader
+from locations import resolve_mine_locations
+from metrics import RunMetrics
+from partitions import LOAD_MODES
+from streaming import DEFAULT_BLOCK_SIZE
+from validation import DataValidator
+
+# Shard sizes, as pandas period frequencies; weeks end on Sunday
+SHARD_SIZES = {'week': 'W-SUN', 'month': 'M', 'quarter': 'Q', 'year': 'Y'}
+
+# Shards running at once, one process each
+BACKFILL_WORKERS = os.cpu_count() or 4
+
+# Load tasks (and ClickHouse clients) per shard
+SHARD_LOAD_WORKERS = 2
+
+CHECKPOINT_FILE = 'checkpoint.json'
+REPORT_FILE = 'backfill_report.json'
+
+def date_shards(start, end, size='month'):
+    """Consecutive (first day, last day) shards covering start..end; week shards are cut at month ends."""
+    shards = []
+    first = start
+    while first <= end:
+        last = pd.Period(first, SHARD_SIZES[size]).end_time.date()
+        if size == 'week':
+            last = min(last, pd.Period(first, 'M').end_time.date())
+        last = min(last, end)
+        shards.append((first, last))
+        first = last + timedelta(days=1)
+    return shards
+
+def shard_id(first, last):
+    return f"{first:%Y%m%d}_{last:%Y%m%d}"
+
+def shard_lanes(shards):
+    """Group the shards by the month partition they start in; a lane's shards must run in order."""
+    lanes = {}
+    for first, last in shards:
+        lanes.setdefault(first.strftime('%Y%m'), []).append((first, last))
+    return list(lanes.values())
+
+def shard_logger(shard_dir):
+    """Logger writing the shard's etl.log; the handler of the previous shard run by this process is closed."""
+    logger = logging.getLogger('etl.backfill.shard')
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    handler = logging.FileHandler(shard_dir / 'etl.log')
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    return logger
+
+def run_shard(backfill_id, first, last, options):
+    """Run the ETL over the staging rows of first..last in this process and return the shard's checkpoint entry."""
+    shard = shard_id(first, last)
+    shard_dir = Path(f'etl/logs/run_{backfill_id}/shards/{shard}')
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    logger = shard_logger(shard_dir)
+    metrics = RunMetrics(backfill_id, shard_dir)
+    validator = DataValidator(backfill_id, metrics=metrics, log_dir=shard_dir)
+    # The day before the shard acts as the watermark of every source
+    watermarks = {source: first - timedelta(days=1) for source in INCREMENTAL_SOURCES}
+    logger.info(f"Starting backfill shard {shard} (backfill {backfill_id}, process {os.getpid()})")
+
+    started = time.perf_counter()
+    status = 'failed'
+    client = connect()
+    pool = ClientPool(connect, size=options['load_workers'])
+    try:
+        loader = ParallelLoader(pool, batch_rows=options['batch_rows'])
+        loaded = run_etl(client, loader, validator, logger, watermarks, last, options['engine'],
+                         options['block_size'], options['load_mode'], metrics=metrics, cache=DimensionCache(),
+                         transform_engine=options.get('transform_engine', 'pandas'), features=False, forecast=False,
+                         total_equipment=options.get('total_equipment'))
+        status = 'success'
+        logger.info(f"Backfill shard {shard} completed successfully")
+    except Exception as e:
+        logger.error(f"Backfill shard {shard} failed: {e}")
+        raise
+    finally:
+        metrics.write(status)
+        validator.close()
+        client.close()
+        pool.close()
+    return {
+        'first': first.isoformat(),
+        'last': last.isoformat(),
+        'seconds': time.perf_counter() - started,
+        'rows': loaded or {'daily_rows': 0, 'equipment_rows': 0},
+        'validation': validator.get_validation_summary(),
+    }
+
+def prepare_shared_dimensions(client, start, end, logger):
+    """Load the mine, location and equipment members of start..end and fill the weather cache, once for all shards.
+
+    Returns the fleet size the shards measure equipment utilization against.
+    """
+    mines_data = extract_mines(client)
+    _, locations = resolve_mine_locations(mines_data, logger)
+    _, location_data = fetch_weather_data(start, end, logger, locations)
+    where, parameters = watermark_filter('equipment_sensors', {'equipment_sensors': start - timedelta(days=1)}, end)
+    equipment_ids = client.query_df(
+        f"SELECT DISTINCT equipment_id FROM staging.equipment_sensors {where}", parameters=parameters
+    )['equipment_id']
+
+    dimensions = {}
+    if location_data:
+        dimensions['dwh.dim_location'] = build_location_dimension(location_data)
+    if not mines_data.empty:
+        dimensions['dwh.dim_mine'] = build_mine_dimension(mines_data)
+    if not equipment_ids.empty:
+        dimensions['dwh.dim_equipment'] = build_equipment_dimension(equipment_ids)
+    cache = DimensionCache()
+    for table, rows in dimensions.items():
+        upsert_dimension(client, table, rows, logger, cache)
+    return count_fleet(client)
+
+def merge_validation(summaries):
+    """One validation summary with the error counts of every shard added up."""
+    error_counts = {}
+    for summary in summaries:
+        for rule, count in summary['error_counts'].items():
+            error_counts[rule] = error_counts.get(rule, 0) + count
+    total_errors = sum(summary['total_errors'] for summary in summaries)
+    return {
+        'validation_status': 'FAILED' if total_errors > 0 else 'PASSED',
+        'total_errors': total_errors,
+        'error_counts': error_counts,
+    }
+
+def write_json(path, content):
+    """Replace `path` atomically, so an interrupted write never leaves a truncated checkpoint."""
+    temporary = path.with_suffix('.tmp')
+    temporary.write_text(json.dumps(content, indent=2, default=str) + '\n')
+    temporary.replace(path)
+
+def run_backfill(backfill_id, checkpoint, checkpoint_path, executor, logger, run=run_shard):
+    """Run the shards of `checkpoint` not completed yet on `executor`, checkpointing each as it finishes.
+
+    A lane's next shard is submitted when the previous one completes; a
+    failed shard stops its lane only. Returns the ids of the failed shards.
+    """
+    options = checkpoint['options']
+    shards = date_shards(date.fromisoformat(options['start']), date.fromisoformat(options['end']), options['shard'])
+    lanes = [[shard for shard in lane if shard_id(*shard) not in checkpoint['completed']]
+             for lane in shard_lanes(shards)]
+    lanes = [lane for lane in lanes if lane]
+    skipped = len(shards) - sum(len(lane) for lane in lanes)
+    logger.info(f"Backfill {backfill_id}: {len(shards)} {options['shard']} shards, {skipped} already completed")
+
+    running = {executor.submit(run, backfill_id, *lane[0], options): (lane, 0) for lane in lanes}
+    checkpoint['failed'] = {}
+    while running:
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            lane, position = running.pop(future)
+            shard = shard_id(*lane[position])
+            try:
+                checkpoint['completed'][shard] = future.result()
+                logger.info(f"Shard {shard} completed in {checkpoint['completed'][shard]['seconds']:.1f}s")
+            except Exception as e:
+                checkpoint['failed'][shard] = str(e)
+                logger.error(f"Shard {shard} failed, its month's later shards are not started: {e}")
+            else:
+                if position + 1 < len(lane):
+                    running[executor.submit(run, backfill_id, *lane[position + 1], options)] = (lane, position + 1)
+            write_json(checkpoint_path, checkpoint)
+    return list(checkpoint['failed'])
+
+def backfill_report(checkpoint):
+    """Totals over the completed shards and their merged validation summary."""
+    completed = checkpoint['completed'].values()
+    return {
+        'backfill_id': checkpoint['backfill_id'],
+        'options': checkpoint['options'],
+        'shards_completed': len(completed),
+        'shards_failed': checkpoint.get('failed', {}),
+        'daily_rows': sum(shard['rows']['daily_rows'] for shard in completed),
+        'equipment_rows': sum(shard['rows']['equipment_rows'] for shard in completed),
+        'shard_seconds': sum(shard['seconds'] for shard in completed),
+        'validation': merge_validation([shard['validation'] for shard in completed]),
+    }
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Backfill the DWH from staging in date shards across a process pool.')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day to backfill (YYYY-MM-DD).')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day to backfill (YYYY-MM-DD).')
+    parser.add_argument('--shard', choices=SHARD_SIZES, default='month', help='Date range per shard.')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS, help='Shards run at once, one process each.')
+    parser.add_argument('--engine', choices=AGGREGATION_ENGINES, default='pandas')
+    parser.add_argument('--transform-engine', choices=TRANSFORM_ENGINES, default='pandas')
+    parser.add_argument('--block-size', type=int, default=DEFAULT_BLOCK_SIZE)
+    parser.add_argument('--load-mode', choices=LOAD_MODES, default='replace')
+    parser.add_argument('--load-workers', type=int, default=SHARD_LOAD_WORKERS, help='Concurrent load tasks per shard.')
+    parser.add_argument('--batch-rows', type=int, default=DEFAULT_BATCH_ROWS)
+    parser.add_argument('--resume', metavar='BACKFILL_ID',
+                        help='Continue a backfill with the shards its checkpoint does not list as completed.')
+    args = parser.parse_args(argv)
+    if not args.resume and not (args.start and args.end):
+        parser.error('--start and --end are required unless --resume is given')
+    if not transform_engine_available(args.transform_engine):
+        parser.error(f"--transform-engine {args.transform_engine} needs the {args.transform_engine} package")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    backfill_id = args.resume or datetime.now().strftime('%Y%m%d_%H%M%S')
+    run_dir = Path(f'etl/logs/run_{backfill_id}')
+    checkpoint_path = run_dir / CHECKPOINT_FILE
+    if args.resume:
+        if not checkpoint_path.exists():
+            sys.exit(f"No checkpoint for backfill {backfill_id} at {checkpoint_path}")
+        checkpoint = json.loads(checkpoint_path.read_text())
+    else:
+        checkpoint = {
+            'backfill_id': backfill_id,
+            'options': {
+                'start': args.start.isoformat(), 'end': args.end.isoformat(), 'shard': args.shard,
+                'engine': args.engine, 'transform_engine': args.transform_engine,
+                'block_size': args.block_size, 'load_mode': args.load_mode,
+                'load_workers': args.load_workers, 'batch_rows': args.batch_rows,
+            },
+            'completed': {},
+        }
+    logger = setup_logging(backfill_id)
+    metrics = RunMetrics(backfill_id, run_dir)
+    options = checkpoint['options']
+    logger.info(f"Starting backfill {backfill_id} of {options['start']} to {options['end']} "
+                f"({'resumed' if args.resume else 'new'}, {args.workers} workers, options {options})")
+    write_json(checkpoint_path, checkpoint)
+
+    status = 'failed'
+    try:
+        client = connect()
+        try:
+            with metrics.stage('prepare_shared_dimensions'):
+                total_equipment = prepare_shared_dimensions(client, date.fromisoformat(options['start']),
+                                                            date.fromisoformat(options['end']), logger)
+        finally:
+            client.close()
+        # A resumed backfill keeps the count its first shards used
+        options.setdefault('total_equipment', total_equipment)
+        write_json(checkpoint_path, checkpoint)
+
+        # Fresh interpreters: no ClickHouse connections or threads are inherited from this process
+        with metrics.stage('backfill') as stage, ProcessPoolExecutor(
+            max_workers=args.workers, mp_context=multiprocessing.get_context('spawn')
+        ) as executor:
+            failed = run_backfill(backfill_id, checkpoint, checkpoint_path, executor, logger)
+            stage['rows_out'] = sum(shard['rows']['daily_rows'] + shard['rows']['equipment_rows']
+                                    for shard in checkpoint['completed'].values())
+        for shard, result in checkpoint['completed'].items():
+            metrics.record(f'shard:{shard}', result['seconds'],
+                           rows_out=result['rows']['daily_rows'] + result['rows']['equipment_rows'])
+
+        report = backfill_report(checkpoint)
+        write_json(run_dir / REPORT_FILE, report)
+        logger.info(f"Backfill report written to {run_dir / REPORT_FILE}: {report['shards_completed']} shards, "
+                    f"{report['daily_rows']} daily rows, validation {report['validation']['validation_status']} "
+                    f"({report['validation']['total_errors']} errors)")
+        if failed:
+            logger.error(f"Backfill {backfill_id} incomplete, {len(failed)} shard(s) failed; "
+                         f"rerun with --resume {backfill_id}")
+            sys.exit(1)
+
+        # Shards leave the features and forecasts alone: both are computed once over the loaded range
+        client = connect()
+        try:
+            with metrics.stage('rebuild_features') as stage:
+                stage['rows_out'] = rebuild_feature_store(client, logger, date.fromisoformat(options['start']),
+                                                          date.fromisoformat(options['end']))
+            forecast_production(client, logger, metrics)
+        finally:
+            client.close()
+        status = 'success'
+        logger.info("Backfill completed successfully")
+    finally:
+        metrics.write(status)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Benchmark bulk staging ingestion against row-by-row INSERT statements.
+
+Writes a year of hourly sensor readings as CSV, then on a running ClickHouse
+loads it into a scratch copy of staging.equipment_sensors with bulk_load's
+typed Arrow batches, and inserts a sample of the same rows one INSERT
+statement at a time (as database/production_logs.sql does) to extrapolate
+the row-by-row time. Reports wall time and active parts; the scratch
+database is dropped afterwards.
+
+Usage (from the repository root, with the staging schema created):
+    CLICKHOUSE_HOST=localhost CLICKHOUSE_USER=admin CLICKHOUSE_PASSWORD=admin \\
+        python etl/benchmarks/bench_bulk_load.py --equipment 500 --row-sample 1000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import clickhouse_connect
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bulk_load import BULK_BATCH_ROWS, read_staging_file  # noqa: E402
+from loader import ClientPool, ParallelLoader  # noqa: E402
+
+def sensor_year(equipment, seed=0):
+    """A year of hourly readings for `equipment` machines, in file order (by time)."""
+    rng = np.random.default_rng(seed)
+    hours = 24 * 365
+    rows = hours * equipment
+    return pd.DataFrame({
+        'timestamp': np.repeat(pd.date_range('2024-01-01', periods=hours, freq='h'), equipment),
+        'equipment_id': np.tile([f'EQ-{index:04d}' for index in range(equipment)], hours),
+        'status': rng.choice(['active', 'idle', 'maintenance'], rows, p=[0.85, 0.1, 0.05]),
+        'fuel_consumption': (20 + rng.random(rows) * 10).round(2),
+        'maintenance_alert': rng.random(rows) < 0.01,
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--equipment', type=int, default=500, help='Machines reporting hourly.')
+    parser.add_argument('--row-sample', type=int, default=1000, help='Rows inserted one statement at a time.')
+    parser.add_argument('--database', default='bulk_load_bench')
+    args = parser.parse_args()
+
+    def connect():
+        return clickhouse_connect.get_client(
+            host=os.environ.get('CLICKHOUSE_HOST', 'localhost'),
+            port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+            username=os.environ.get('CLICKHOUSE_USER', 'default'),
+            password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+        )
+
+    db = args.database
+    pool = ClientPool(connect, size=1)
+    with tempfile.TemporaryDirectory() as directory, pool.client() as client:
+        path = Path(directory) / 'equipment_sensors.csv'
+        sensor_year(args.equipment).to_csv(path, index=False)
+        print(f"{path.stat().st_size / 2**20:.0f} MB of CSV, {args.equipment * 24 * 365} rows")
+        try:
+            client.command(f"DROP DATABASE IF EXISTS {db}")
+            client.command(f"CREATE DATABASE {db}")
+            for table in ('bulk', 'row_by_row'):
+                client.command(f"CREATE TABLE {db}.{table} AS staging.equipment_sensors")
+
+            started = time.perf_counter()
+            sensors = read_staging_file(path)['staging.equipment_sensors']
+            parsed = time.perf_counter()
+            ParallelLoader(pool, batch_rows=BULK_BATCH_ROWS).insert_arrow(client, f'{db}.bulk', sensors)
+            loaded = time.perf_counter()
+            print(f"bulk:       parse {parsed - started:.2f}s + insert {loaded - parsed:.2f}s")
+
+            sample = sensors.slice(0, args.row_sample).to_pylist()
+            started = time.perf_counter()
+            for row in sample:
+                client.command(
+                    f"INSERT INTO {db}.row_by_row VALUES "
+                    "({timestamp:DateTime}, {equipment_id:String}, {status:String}, "
+                    "{fuel_consumption:Float64}, {maintenance_alert:Bool})",
+                    parameters=row
+                )
+            per_row = (time.perf_counter() - started) / len(sample)
+            print(f"row-by-row: {per_row * 1000:.1f} ms per INSERT, "
+                  f"~{per_row * sensors.num_rows / 3600:.1f} h for the whole year")
+
+            parts = dict(client.query(
+                f"SELECT table, count() FROM system.parts WHERE database = '{db}' AND active GROUP BY table"
+            ).result_rows)
+            print(f"active parts: bulk {parts.get('bulk')} for {sensors.num_rows} rows, "
+                  f"row-by-row {parts.get('row_by_row')} for {len(sample)} rows (one per INSERT until merged)")
+        finally:
+            client.command(f"DROP DATABASE IF EXISTS {db}")
+    pool.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Benchmark the dashboard views: plain views over the fact table vs pre-aggregated tables.
+
+Builds a scratch database on a running ClickHouse with the fact table, the
+pre-aggregations (database/views/preaggregations.sql) and the views
+(database/views/analytical_views.sql), fills it with synthetic daily
+production for a growing number of years, and times the legacy view queries
+against the current views. The scratch database is dropped afterwards.
+
+Usage (from the repository root):
+    CLICKHOUSE_HOST=localhost CLICKHOUSE_USER=admin CLICKHOUSE_PASSWORD=admin \\
+        python etl/benchmarks/bench_dashboard_views.py --years 1,10,50 --mines 200
+"""
+import argparse
+import os
+import re
+import statistics
+import time
+from pathlib import Path
+
+import clickhouse_connect
+
+DATABASE_DIR = Path(__file__).resolve().parents[2] / 'database'
+
+# The views as they were before pre-aggregation, scanning the whole fact table
+LEGACY_QUERIES = {
+    'daily_summary_metrics': """
+        SELECT
+            date_id,
+            sum(total_production_daily) AS total_production_daily,
+            avg(average_quality_grade) AS average_quality_grade_daily,
+            avg(equipment_utilization) AS average_equipment_utilization,
+            avg(fuel_efficiency) AS average_fuel_efficiency
+        FROM {db}.fact_daily_production
+        GROUP BY date_id
+        ORDER BY date_id
+    """,
+    'weather_impact_analysis': """
+        WITH daily_aggregated_data AS (
+            SELECT
+                date_id,
+                sum(total_production_daily) AS total_production_per_day,
+                max(rainfall_mm) AS rainfall_mm_per_day
+            FROM {db}.fact_daily_production
+            GROUP BY date_id
+        )
+        SELECT
+            CASE WHEN rainfall_mm_per_day > 1.0 THEN 'Rainy Day' ELSE 'Non-Rainy Day' END AS day_type,
+            avg(total_production_per_day) AS average_daily_production,
+            corr(rainfall_mm_per_day, total_production_per_day) AS rainfall_production_correlation
+        FROM daily_aggregated_data
+        GROUP BY day_type
+    """,
+}
+
+SYNTHETIC_ROWS = """
+    INSERT INTO {db}.fact_daily_production
+    SELECT
+        toDate('1970-01-01') + {start_day} + intDiv(number, {mines}) AS date_id,
+        toString(number % {mines} + 1) AS mine_id,
+        1 AS location_id,
+        200 + (cityHash64(number) % 10000) / 20 AS total_production_daily,
+        3 + (cityHash64(number, 1) % 30) / 10 AS average_quality_grade,
+        cityHash64(number, 2) % 100 AS equipment_utilization,
+        (cityHash64(number, 3) % 500) / 100 AS fuel_efficiency,
+        24 + (cityHash64(intDiv(number, {mines}), 4) % 80) / 10 AS temperature_2m_mean,
+        (cityHash64(intDiv(number, {mines}), 5) % 400) / 10 AS rainfall_mm
+    FROM numbers({rows})
+    SETTINGS max_partitions_per_insert_block = 0
+"""
+
+def sql_statements(path, db, databases=('dwh',)):
+    """Statements of a repository SQL file, moved from the `databases` it names to `db`."""
+    sql = re.sub(r'--[^\n]*', '', path.read_text())
+    for database in databases:
+        sql = sql.replace(f'{database}.', f'{db}.')
+    return [statement for statement in sql.split(';') if statement.strip()]
+
+def time_query(client, query, repeats):
+    timings = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        client.query(query)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--years', default='1,10,50', help='Comma-separated history lengths, ascending.')
+    parser.add_argument('--mines', type=int, default=200, help='Fact rows per day.')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per query; the median is reported.')
+    parser.add_argument('--database', default='dashboard_bench')
+    args = parser.parse_args()
+
+    client = clickhouse_connect.get_client(
+        host=os.environ.get('CLICKHOUSE_HOST', 'localhost'),
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+    db = args.database
+    try:
+        client.command(f"DROP DATABASE IF EXISTS {db}")
+        client.command(f"CREATE DATABASE {db}")
+        for statement in sql_statements(DATABASE_DIR / 'star_schema.sql', db):
+            if 'CREATE DATABASE' not in statement:
+                client.command(statement)
+        for statement in sql_statements(DATABASE_DIR / 'views' / 'preaggregations.sql', db):
+            client.command(statement)
+        for statement in sql_statements(DATABASE_DIR / 'views' / 'analytical_views.sql', db):
+            client.command(statement)
+
+        print(f"{'years':>6} {'fact rows':>11} {'view':<24} {'legacy (ms)':>12} {'pre-agg (ms)':>13}")
+        loaded_days = 0
+        for years in (int(value) for value in args.years.split(',')):
+            days = years * 365 - loaded_days
+            # Inserting fires the materialized view; the backfill rebuilds the monthly correlation moments
+            client.command(SYNTHETIC_ROWS.format(db=db, start_day=18000 + loaded_days, mines=args.mines,
+                                                 rows=days * args.mines))
+            loaded_days += days
+            for statement in sql_statements(DATABASE_DIR / 'migrations' / '003_backfill_preaggregations.sql', db):
+                client.command(statement)
+            for table in ('daily_production_agg', 'weather_impact_monthly'):
+                client.command(f"OPTIMIZE TABLE {db}.{table} FINAL")
+
+            fact_rows = client.query(f"SELECT count() FROM {db}.fact_daily_production").first_row[0]
+            for view, legacy_query in LEGACY_QUERIES.items():
+                legacy = time_query(client, legacy_query.format(db=db), args.repeats)
+                current = time_query(client, f"SELECT * FROM {db}.{view}", args.repeats)
+                print(f"{years:>6} {fact_rows:>11} {view:<24} {legacy * 1000:>12.1f} {current * 1000:>13.1f}")
+    finally:
+        client.command(f"DROP DATABASE IF EXISTS {db}")
+        client.close()
+
+if __name__ == '__main__':
+    main()
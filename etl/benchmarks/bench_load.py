@@ -0,0 +1,113 @@
+"""Benchmark load-phase wall time, sequential vs concurrent over a client pool.
+
+ClickHouse is simulated by clients that sleep for a fixed round trip plus a
+per-row cost on every statement, so the numbers show how the load phase is
+scheduled rather than server throughput. Frame preparation and Arrow
+conversion run for real. The `largest` column is the time the biggest table
+takes on its own, the lower bound for a concurrent load.
+
+Usage (from the repository root):
+    python etl/benchmarks/bench_load.py --days 365,3650 --workers 1,4
+"""
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from dimensions import DimensionCache  # noqa: E402
+from etl import load_to_dwh  # noqa: E402
+from loader import ClientPool, ParallelLoader  # noqa: E402
+
+class SimulatedClient:
+    """Sleeps `round_trip` plus `row_cost` per inserted row for every statement."""
+
+    def __init__(self, round_trip, row_cost, timings):
+        self.round_trip = round_trip
+        self.row_cost = row_cost
+        self.timings = timings
+
+    def _statement(self, table, rows=0):
+        seconds = self.round_trip + rows * self.row_cost
+        time.sleep(seconds)
+        table = table.split('__load_')[0]  # temp tables of partition-replace loads count for their target
+        self.timings[table] = self.timings.get(table, 0) + seconds
+
+    def query_df(self, query, parameters=None):
+        if 'system.tables' in query:
+            return pd.DataFrame({'engine': ['MergeTree']})
+        key = query.split(' WHERE ')[1].split()[0]
+        return pd.DataFrame(columns=[key])
+
+    def command(self, command, parameters=None):
+        self._statement(next(token for token in command.split() if token.startswith('dwh.')))
+
+    def insert_df(self, table, df):
+        self._statement(table, len(df))
+
+    def insert_arrow(self, table, arrow_table, settings=None):
+        self._statement(table, arrow_table.num_rows)
+
+    def close(self):
+        pass
+
+def make_run(days, mines=10, equipment=200):
+    dates = pd.date_range('2015-01-01', periods=days).date
+    transformed = pd.DataFrame({
+        'date_id': np.repeat(dates, mines),
+        'mine_id': np.tile(np.arange(1, mines + 1), days),
+        'location_id': 1,
+        'total_production_daily': 100.0,
+        'average_quality_grade': 5.0,
+        'equipment_utilization': 50.0,
+        'fuel_efficiency': 2.0,
+        'temperature_2m_mean': 27.0,
+        'rainfall_mm': 1.0
+    })
+    aggregates = {
+        'daily_production': transformed[['date_id', 'mine_id', 'location_id']],
+        'equipment_metrics': pd.DataFrame({
+            'date_id': np.repeat(dates, equipment),
+            'equipment_id': np.tile([f'EQ{n:04d}' for n in range(equipment)], days),
+            'total_operational_hours': 20,
+            'total_maintenance_hours': 2,
+            'total_fuel_consumption': 80.0,
+            'maintenance_alerts': 0
+        })
+    }
+    mines_data = pd.DataFrame({'mine_id': range(1, mines + 1), 'location': 'Berau, Kalimantan'})
+    return transformed, aggregates, mines_data
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--days', default='365,3650', help='Comma-separated numbers of days loaded.')
+    parser.add_argument('--workers', default='1,4', help='Comma-separated client pool sizes.')
+    parser.add_argument('--batch-rows', type=int, default=250_000)
+    parser.add_argument('--load-mode', choices=('replace', 'append'), default='replace')
+    parser.add_argument('--round-trip-ms', type=float, default=20.0)
+    parser.add_argument('--row-cost-us', type=float, default=1.0)
+    args = parser.parse_args()
+    logger = logging.getLogger('bench_load')
+
+    print(f"{'days':>6} {'fact rows':>10} {'workers':>8} {'wall (s)':>9} {'sum (s)':>8} {'largest (s)':>12}")
+    for days in (int(value) for value in args.days.split(',')):
+        transformed, aggregates, mines_data = make_run(days)
+        fact_rows = len(transformed) + len(aggregates['equipment_metrics'])
+        for workers in (int(value) for value in args.workers.split(',')):
+            timings = {}
+            pool = ClientPool(
+                lambda: SimulatedClient(args.round_trip_ms / 1000, args.row_cost_us / 1e6, timings), size=workers
+            )
+            started = time.perf_counter()
+            load_to_dwh(None, transformed, aggregates, mines_data, {}, logger, args.load_mode,
+                        ParallelLoader(pool, batch_rows=args.batch_rows), DimensionCache())
+            wall = time.perf_counter() - started
+            print(f"{days:>6} {fact_rows:>10} {workers:>8} {wall:>9.2f} {sum(timings.values()):>8.2f} "
+                  f"{max(timings.values()):>12.2f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,223 @@
+"""End-to-end ETL benchmark at several data scales, with regression checks against a stored baseline.
+
+For each scale, deterministic synthetic staging data (synthetic.py) runs
+through the ETL stages as etl.main() chains them: extract_data, aggregation,
+transform_data, the validator's rules (timed separately inside
+transform_data) and load_to_dwh. Every stage records wall time, rows
+processed, rows/sec and the peak RSS of the process while it ran.
+
+By default the ETL talks to an in-process client that serves the generated
+staging tables and accepts every load statement, so the numbers are the
+client-side cost of each stage. With --clickhouse the data is bulk loaded
+into a real server first (CLICKHOUSE_HOST/USER/PASSWORD). That mode
+TRUNCATEs the staging and DWH tables, so only use it on a disposable instance.
+
+Results are compared with the baseline file when it exists; a stage more
+than --tolerance slower (or larger in memory) is flagged and the script
+exits with status 1. --save-baseline stores this run as the new baseline.
+
+Usage (from the repository root):
+    python etl/benchmarks/bench_scale.py --scales small,medium
+    python etl/benchmarks/bench_scale.py --scales small,medium --save-baseline
+"""
+import argparse
+import functools
+import json
+import logging
+import os
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import clickhouse_connect
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from aggregation import aggregate_data  # noqa: E402
+from dimensions import DimensionCache  # noqa: E402
+from etl import INCREMENTAL_SOURCES, extract_data, load_to_dwh, transform_data  # noqa: E402
+from loader import ClientPool, ParallelLoader  # noqa: E402
+from locations import assign_locations, resolve_mine_locations  # noqa: E402
+from metrics import RssSampler  # noqa: E402
+from synthetic import generate_staging, generate_weather, staging_scale  # noqa: E402
+from validation import DataValidator  # noqa: E402
+
+SCALES = {
+    'small': staging_scale(mines=3, equipment=10, years=1),
+    'medium': staging_scale(mines=20, equipment=200, years=2),
+    'large': staging_scale(mines=50, equipment=500, years=3),
+}
+
+STAGES = ('extract', 'aggregate', 'transform', 'validate', 'load')
+
+BASELINE_PATH = Path(__file__).resolve().parent / 'bench_scale_baseline.json'
+
+# Stages faster than this are too noisy to flag on time
+MIN_FLAGGED_SECONDS = 0.05
+
+class InProcessClient:
+    """Answers the ETL's staging reads from generated tables and accepts every load statement."""
+
+    def __init__(self, staging):
+        self.staging = staging
+
+    def query_df(self, query, parameters=None):
+        if match := re.search(r'FROM (staging\.\w+)', query):
+            return self.staging[match[1]].to_pandas(date_as_object=False)
+        if 'system.tables' in query:
+            return pd.DataFrame({'engine': ['MergeTree']})
+        # No dimension member exists yet
+        return pd.DataFrame(columns=[re.search(r'WHERE (\w+) IN', query)[1]])
+
+    def query_arrow(self, query, parameters=None, settings=None, use_strings=None):
+        # The generated tables, typed like the staging schema; the ETL casts them to its frame types
+        return self.staging[re.search(r'FROM (staging\.\w+)', query)[1]]
+
+    def command(self, command, parameters=None):
+        pass
+
+    def insert_df(self, table, df):
+        pass
+
+    def insert_arrow(self, table, arrow_table, settings=None):
+        pass
+
+    def close(self):
+        pass
+
+def connect():
+    return clickhouse_connect.get_client(
+        host=os.environ.get('CLICKHOUSE_HOST', 'localhost'),
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+
+def prepare_clickhouse(client, staging, loader):
+    """Reset the staging and fact tables of a disposable server and bulk load the generated staging data."""
+    for table in staging:
+        client.command(f"TRUNCATE TABLE {table}")
+    for fact_table, _ in INCREMENTAL_SOURCES.values():
+        client.command(f"TRUNCATE TABLE {fact_table}")
+    for table, arrow_table in staging.items():
+        loader.insert_arrow(client, table, arrow_table)
+
+def run_scale(scale, logger, live=False, workers=4):
+    """Run every stage once on `scale` and return {stage: measurements}."""
+    staging = generate_staging(scale)
+    results = {}
+
+    def measure(stage, rows, function):
+        with RssSampler() as sampler:
+            started = time.perf_counter()
+            output = function()
+            seconds = time.perf_counter() - started
+        results[stage] = {'rows': rows, 'seconds': seconds, 'peak_mb': sampler.peak}
+        return output
+
+    pool = ClientPool(connect if live else lambda: InProcessClient(staging), size=workers)
+    loader = ParallelLoader(pool)
+    try:
+        with pool.client() as client:
+            if live:
+                prepare_clickhouse(client, staging, loader)
+            staging_rows = sum(table.num_rows for table in staging.values())
+            production_data, equipment_data, mines_data = measure(
+                'extract', staging_rows, lambda: extract_data(client, logger)
+            )
+            aggregates = measure(
+                'aggregate', len(production_data) + len(equipment_data),
+                functools.partial(aggregate_data, production_data, equipment_data)
+            )
+            del production_data, equipment_data
+
+            mine_locations, locations = resolve_mine_locations(mines_data, logger)
+            aggregates['daily_production'] = assign_locations(aggregates['daily_production'], mine_locations)
+            weather_data = generate_weather(scale, [location['location_id'] for location in locations])
+            location_data = {
+                location['location_id']: {'location': location['name'], 'latitude': location['latitude'],
+                                          'longitude': location['longitude'], 'timezone': location['timezone']}
+                for location in locations
+            }
+            daily_rows = len(aggregates['daily_production'])
+            validator = DataValidator('bench_scale')
+            transformed = measure(
+                'transform', daily_rows,
+                lambda: transform_data(aggregates, weather_data, validator, logger, mines_data)
+            )
+            validated = next(stage for stage in validator.metrics.stages if stage['stage'] == 'validate')
+            results['validate'] = {'rows': daily_rows, 'seconds': validated['wall_seconds'], 'peak_mb': validated['peak_rss_mb']}
+            results['transform']['seconds'] -= validated['wall_seconds']
+
+            measure(
+                'load', len(transformed) + len(aggregates['equipment_metrics']),
+                lambda: load_to_dwh(client, transformed, aggregates, mines_data, location_data, logger,
+                                    loader=loader, cache=DimensionCache())
+            )
+    finally:
+        pool.close()
+    for measurements in results.values():
+        measurements['rows_per_second'] = measurements['rows'] / measurements['seconds'] if measurements['seconds'] else 0.0
+    return results
+
+def regressions(results, baseline, tolerance):
+    """(scale, stage, metric, baseline, current) for every measurement worse than the baseline by more than `tolerance`."""
+    flagged = []
+    for scale, stages in results.items():
+        for stage, current in stages.items():
+            previous = baseline.get(scale, {}).get(stage)
+            if previous is None:
+                continue
+            if (current['seconds'] > previous['seconds'] * (1 + tolerance)
+                    and current['seconds'] - previous['seconds'] > MIN_FLAGGED_SECONDS):
+                flagged.append((scale, stage, 'seconds', previous['seconds'], current['seconds']))
+            if current['peak_mb'] > previous['peak_mb'] * (1 + tolerance):
+                flagged.append((scale, stage, 'peak_mb', previous['peak_mb'], current['peak_mb']))
+    return flagged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scales', default='small,medium', help=f"Comma-separated, from {', '.join(SCALES)}.")
+    parser.add_argument('--clickhouse', action='store_true',
+                        help='Run against a real (disposable!) ClickHouse instead of the in-process client.')
+    parser.add_argument('--baseline', type=Path, default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='Store this run as the baseline.')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed slowdown or memory growth (0.25 = 25%%).')
+    args = parser.parse_args()
+
+    logger = logging.getLogger('etl.bench')
+    os.chdir(tempfile.mkdtemp(prefix='bench_scale_'))  # validator run logs
+    backend = 'clickhouse' if args.clickhouse else 'in-process'
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    if baseline and baseline.get('backend') != backend:
+        print(f"Baseline {args.baseline} was recorded with the {baseline.get('backend')} backend, not comparing")
+        baseline = {}
+
+    results = {}
+    print(f"{'scale':<8} {'stage':<10} {'rows':>11} {'seconds':>9} {'rows/s':>12} {'peak MB':>9} {'vs baseline':>12}")
+    for name in args.scales.split(','):
+        results[name] = run_scale(SCALES[name], logger, live=args.clickhouse)
+        for stage in STAGES:
+            measured = results[name][stage]
+            previous = baseline.get('scales', {}).get(name, {}).get(stage)
+            change = f"{measured['seconds'] / previous['seconds'] - 1:+.0%}" if previous and previous['seconds'] else ''
+            print(f"{name:<8} {stage:<10} {measured['rows']:>11} {measured['seconds']:>9.3f} "
+                  f"{measured['rows_per_second']:>12,.0f} {measured['peak_mb']:>9.0f} {change:>12}")
+
+    flagged = regressions(results, baseline.get('scales', {}), args.tolerance)
+    for scale, stage, metric, previous, current in flagged:
+        print(f"REGRESSION {scale}/{stage}: {metric} {previous:.3f} -> {current:.3f}")
+    if args.save_baseline:
+        saved = json.loads(args.baseline.read_text()) if args.baseline.exists() and baseline else {}
+        saved = {'backend': backend, 'scales': {**saved.get('scales', {}), **results}}
+        args.baseline.write_text(json.dumps(saved, indent=2) + '\n')
+        print(f"Baseline saved to {args.baseline}")
+    elif not baseline:
+        print(f"No baseline to compare with at {args.baseline}; run with --save-baseline to record one")
+    if flagged:
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
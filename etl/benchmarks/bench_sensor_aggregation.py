@@ -0,0 +1,81 @@
+"""Benchmark the legacy and single-pass equipment sensor aggregation paths.
+
+The legacy path reproduces the pre-refactor code: `transform_data` and
+`load_equipment_metrics` each re-derived `date_id` and ran their own groupby
+with per-group lambdas. The new path is `aggregation.aggregate_equipment`.
+
+Usage (from the repository root):
+    python etl/benchmarks/bench_sensor_aggregation.py --rows 1000000,50000000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from aggregation import aggregate_equipment  # noqa: E402
+
+def make_sensor_frame(rows, equipment=100, seed=42):
+    """Build a sensor frame shaped like `staging.equipment_sensors` (one reading per minute per equipment)."""
+    rng = np.random.default_rng(seed)
+    equipment_ids = np.array([f'EQ{i:04d}' for i in range(equipment)], dtype=object)
+    statuses = np.array(['active', 'idle', 'maintenance'], dtype=object)
+    minutes = np.arange(rows) // equipment
+    return pd.DataFrame({
+        'timestamp': pd.Timestamp('2024-01-01') + pd.to_timedelta(minutes, unit='min'),
+        'equipment_id': equipment_ids[np.arange(rows) % equipment],
+        'status': statuses[rng.choice(3, size=rows, p=[0.7, 0.2, 0.1])],
+        'fuel_consumption': rng.uniform(0, 20, size=rows),
+        'maintenance_alert': rng.random(rows) < 0.05
+    })
+
+def legacy_aggregate_equipment(equipment_data):
+    """The two independent groupbys the ETL ran before the shared aggregation stage."""
+    # transform_data
+    equipment_data['date_id'] = pd.to_datetime(equipment_data['timestamp']).dt.date
+    total_equipment = equipment_data['equipment_id'].nunique()
+    daily_equipment_data = equipment_data.groupby(['date_id']).agg(
+        operational_hours=('status', lambda s: (s == 'active').sum()),
+        fuel_consumption=('fuel_consumption', 'sum')
+    ).reset_index()
+
+    # load_equipment_metrics
+    equipment_data['date_id'] = pd.to_datetime(equipment_data['timestamp']).dt.date
+    equipment_metrics = equipment_data.groupby(['date_id', 'equipment_id']).agg(
+        total_operational_hours=('status', lambda s: (s == 'active').sum()),
+        total_maintenance_hours=('status', lambda s: (s == 'maintenance').sum()),
+        total_fuel_consumption=('fuel_consumption', 'sum'),
+        maintenance_alerts=('maintenance_alert', 'sum')
+    ).reset_index()
+    return equipment_metrics, daily_equipment_data, total_equipment
+
+def time_call(func, frame):
+    started = time.perf_counter()
+    result = func(frame)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='1000000,50000000',
+                        help='Comma-separated sensor row counts to benchmark.')
+    parser.add_argument('--equipment', type=int, default=100, help='Distinct equipment IDs.')
+    args = parser.parse_args()
+
+    print(f"{'rows':>12} {'legacy (s)':>12} {'single-pass (s)':>16} {'speedup':>9}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        frame = make_sensor_frame(rows, args.equipment)
+        legacy_seconds, legacy = time_call(legacy_aggregate_equipment, frame.copy())
+        new_seconds, new = time_call(aggregate_equipment, frame)
+        del frame
+
+        # Both paths must agree before their timings mean anything
+        assert legacy[2] == new[2]
+        pd.testing.assert_frame_equal(legacy[0], new[0], check_dtype=False, rtol=1e-9)
+        pd.testing.assert_frame_equal(legacy[1], new[1], check_dtype=False, rtol=1e-9)
+        print(f"{rows:>12} {legacy_seconds:>12.2f} {new_seconds:>16.2f} {legacy_seconds / new_seconds:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
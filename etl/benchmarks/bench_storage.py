@@ -0,0 +1,189 @@
+"""Benchmark on-disk size and scan latency of the storage-optimized schema.
+
+Creates two scratch databases on a running ClickHouse: one with the sensor,
+production log and fact tables as they were defined before the storage
+revision (plain String keys, no codecs, sensors sorted by timestamp) and one
+with the current definitions from database/staging_schema.sql and
+database/star_schema.sql. Both get the same synthetic rows; the script then
+reports compressed size per table and the median latency of typical scans.
+The scratch databases are dropped afterwards.
+
+Usage (from the repository root):
+    CLICKHOUSE_HOST=localhost CLICKHOUSE_USER=admin CLICKHOUSE_PASSWORD=admin \\
+        python etl/benchmarks/bench_storage.py --equipment 500 --days 365
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+from pathlib import Path
+
+import clickhouse_connect
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from aggregation import EQUIPMENT_AGGREGATE_QUERY  # noqa: E402
+from bench_dashboard_views import DATABASE_DIR, sql_statements, time_query  # noqa: E402
+
+START = date(2024, 1, 1)
+
+# Long histories span more than the default 100 month partitions per insert
+UNLIMITED_PARTITIONS = 'SETTINGS max_partitions_per_insert_block = 0'
+
+# The tables as they were defined before the storage revision
+LEGACY_TABLES = """
+    CREATE TABLE {db}.production_logs (
+        log_id UInt32,
+        date Date,
+        mine_id UInt32,
+        shift String,
+        tons_extracted Decimal64(2),
+        quality_grade Decimal32(1)
+    ) ENGINE = MergeTree()
+    ORDER BY (date, mine_id);
+
+    CREATE TABLE {db}.equipment_sensors (
+        timestamp DateTime,
+        equipment_id String,
+        status String,
+        fuel_consumption Float64,
+        maintenance_alert Boolean
+    ) ENGINE = MergeTree()
+    ORDER BY (timestamp, equipment_id);
+
+    CREATE TABLE {db}.fact_daily_production (
+        date_id Date,
+        mine_id String,
+        location_id UInt64,
+        total_production_daily Float64,
+        average_quality_grade Float32,
+        equipment_utilization Float32,
+        fuel_efficiency Float32,
+        temperature_2m_mean Float32,
+        rainfall_mm Float32
+    ) ENGINE = MergeTree()
+    PARTITION BY toYYYYMM(date_id)
+    ORDER BY (date_id, mine_id)
+"""
+
+# Hourly readings per machine, mostly active, around a per-machine fuel burn
+SYNTHETIC_ROWS = {
+    'equipment_sensors': """
+        SELECT
+            toDateTime('{start}') + intDiv(number, {equipment}) * 3600 AS timestamp,
+            concat('EQ-', leftPad(toString(number % {equipment}), 4, '0')) AS equipment_id,
+            multiIf(cityHash64(number) % 20 = 0, 'maintenance', cityHash64(number) % 10 = 1, 'idle', 'active') AS status,
+            round(20 + (number % {equipment}) % 15 + (cityHash64(number, 1) % 100) / 25, 2) AS fuel_consumption,
+            cityHash64(number, 2) % 97 = 0 AS maintenance_alert
+        FROM numbers({equipment} * 24 * {days})
+    """,
+    'production_logs': """
+        SELECT
+            number AS log_id,
+            toDate('{start}') + intDiv(number, {mines} * 3) AS date,
+            intDiv(number, 3) % {mines} + 1 AS mine_id,
+            ['morning', 'afternoon', 'night'][number % 3 + 1] AS shift,
+            toDecimal64(300 + (cityHash64(number) % 40000) / 100, 2) AS tons_extracted,
+            toDecimal32(3 + (cityHash64(number, 1) % 50) / 10, 1) AS quality_grade
+        FROM numbers({mines} * 3 * {days})
+    """,
+    'fact_daily_production': """
+        SELECT
+            toDate('{start}') + intDiv(number, {mines}) AS date_id,
+            toString(number % {mines} + 1) AS mine_id,
+            number % {mines} % 8 + 1 AS location_id,
+            1000 + (cityHash64(number) % 100000) / 100 AS total_production_daily,
+            3 + (cityHash64(number, 1) % 50) / 10 AS average_quality_grade,
+            cityHash64(number, 2) % 100 AS equipment_utilization,
+            (cityHash64(number, 3) % 500) / 100 AS fuel_efficiency,
+            24 + (cityHash64(intDiv(number, {mines}), 4) % 80) / 10 AS temperature_2m_mean,
+            (cityHash64(intDiv(number, {mines}), 5) % 400) / 10 AS rainfall_mm
+        FROM numbers({mines} * {days})
+    """,
+}
+
+SCANS = {
+    'one machine, full history': """
+        SELECT count(), sum(fuel_consumption) FROM {db}.equipment_sensors WHERE equipment_id = 'EQ-0042'
+    """,
+    'daily equipment rollup, last month': None,  # EQUIPMENT_AGGREGATE_QUERY, see main()
+    'production logs, one month': """
+        SELECT mine_id, sum(tons_extracted) FROM {db}.production_logs
+        WHERE date >= '{last_month}' GROUP BY mine_id
+    """,
+    'facts, one month by mine': """
+        SELECT mine_id, sum(total_production_daily) FROM {db}.fact_daily_production
+        WHERE date_id >= '{last_month}' GROUP BY mine_id
+    """,
+}
+
+def table_sizes(client, db):
+    """Compressed on-disk bytes and row count of the active parts, per table."""
+    result = client.query(f"""
+        SELECT table, sum(bytes_on_disk), sum(rows)
+        FROM system.parts
+        WHERE database = '{db}' AND active
+        GROUP BY table
+    """)
+    return {table: (size, rows) for table, size, rows in result.result_rows}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--equipment', type=int, default=500, help='Machines reporting hourly.')
+    parser.add_argument('--mines', type=int, default=200)
+    parser.add_argument('--days', type=int, default=365, help='Days of history.')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per scan; the median is reported.')
+    parser.add_argument('--database', default='storage_bench')
+    args = parser.parse_args()
+
+    client = clickhouse_connect.get_client(
+        host=os.environ.get('CLICKHOUSE_HOST', 'localhost'),
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+    legacy, current = f'{args.database}_legacy', args.database
+    last_month = START + timedelta(days=args.days - 30)
+    scans = dict(SCANS)
+    scans['daily equipment rollup, last month'] = EQUIPMENT_AGGREGATE_QUERY.replace('staging.', '{db}.').format(
+        db='{db}', where=f"WHERE toDate(timestamp) > '{last_month}'"
+    )
+    try:
+        for db in (legacy, current):
+            client.command(f"DROP DATABASE IF EXISTS {db}")
+            client.command(f"CREATE DATABASE {db}")
+        for statement in LEGACY_TABLES.format(db=legacy).split(';'):
+            if statement.strip():
+                client.command(statement)
+        for path in (DATABASE_DIR / 'staging_schema.sql', DATABASE_DIR / 'star_schema.sql'):
+            for statement in sql_statements(path, current, databases=('staging', 'dwh')):
+                if 'CREATE DATABASE' not in statement:
+                    client.command(statement)
+
+        for table, query in SYNTHETIC_ROWS.items():
+            rows = query.format(start=START, days=args.days, equipment=args.equipment, mines=args.mines)
+            client.command(f"INSERT INTO {legacy}.{table} {rows} {UNLIMITED_PARTITIONS}")
+            client.command(f"INSERT INTO {current}.{table} SELECT * FROM {legacy}.{table} {UNLIMITED_PARTITIONS}")
+            for db in (legacy, current):
+                client.command(f"OPTIMIZE TABLE {db}.{table} FINAL")
+
+        before, after = table_sizes(client, legacy), table_sizes(client, current)
+        print(f"{'table':<24} {'rows':>11} {'legacy (MB)':>12} {'optimized (MB)':>15} {'ratio':>6}")
+        for table in SYNTHETIC_ROWS:
+            (old_size, rows), (new_size, _) = before[table], after[table]
+            print(f"{table:<24} {rows:>11} {old_size / 2**20:>12.1f} {new_size / 2**20:>15.1f} "
+                  f"{old_size / new_size:>6.1f}")
+
+        print(f"\n{'scan':<36} {'legacy (ms)':>12} {'optimized (ms)':>15}")
+        for name, query in scans.items():
+            timings = [
+                time_query(client, query.format(db=db, last_month=last_month), args.repeats)
+                for db in (legacy, current)
+            ]
+            print(f"{name:<36} {timings[0] * 1000:>12.1f} {timings[1] * 1000:>15.1f}")
+    finally:
+        for db in (legacy, current):
+            client.command(f"DROP DATABASE IF EXISTS {db}")
+        client.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Benchmark the pandas and Polars transform engines on daily aggregates of growing size.
+
+Both engines merge daily production, equipment and weather rows and derive
+equipment_utilization and fuel_efficiency (etl.derive_daily_metrics and
+polars_transform.derive_daily_metrics). Their frames must be identical before
+the timings are reported. Polars uses every core it finds (POLARS_MAX_THREADS
+limits it), so the speedup depends on the host.
+
+Usage (from the repository root, with polars installed):
+    python etl/benchmarks/bench_transform.py --mines 100,1000,5000 --days 1095
+"""
+import argparse
+import sys
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import polars as pl
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from etl import derive_daily_metrics  # noqa: E402
+from polars_transform import derive_daily_metrics as derive_daily_metrics_polars  # noqa: E402
+
+def make_daily_inputs(mines, days, locations=20, equipment=500, seed=42):
+    """Daily production per mine, equipment totals per day and weather per location, as transform_data gets them."""
+    rng = np.random.default_rng(seed)
+    dates = np.array([date(2020, 1, 1) + timedelta(days=day) for day in range(days)], dtype=object)
+    daily_production = pd.DataFrame({
+        'date_id': np.repeat(dates, mines),
+        'mine_id': np.tile(np.arange(1, mines + 1, dtype='uint32'), days),
+        'total_production_daily': rng.uniform(0, 2000, mines * days).round(2),
+        'average_quality_grade': rng.uniform(3, 6, mines * days),
+        'location_id': np.tile(np.arange(mines) % locations + 1, days).astype('int64'),
+    })
+    # A few days without sensor readings leave gaps in the equipment join
+    equipment_days = dates[rng.random(days) > 0.02]
+    daily_equipment = pd.DataFrame({
+        'date_id': equipment_days,
+        'operational_hours': rng.integers(0, equipment * 24, len(equipment_days)),
+        'fuel_consumption': rng.uniform(0, 50_000, len(equipment_days)),
+    })
+    weather = pd.DataFrame({
+        'date_id': np.tile(dates, locations),
+        'temperature_2m_mean': rng.normal(27, 1.5, days * locations).round(1),
+        'rainfall_mm': rng.gamma(1.5, 8, days * locations).round(1),
+        'location_id': np.repeat(np.arange(1, locations + 1), days),
+    })
+    return daily_production, daily_equipment, weather, equipment
+
+def time_call(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mines', default='100,1000,5000', help='Comma-separated mine counts to benchmark.')
+    parser.add_argument('--days', type=int, default=1095, help='Days of history per mine.')
+    args = parser.parse_args()
+
+    print(f"Polars threads: {pl.thread_pool_size()}")
+    print(f"{'daily rows':>12} {'pandas (s)':>12} {'polars (s)':>12} {'speedup':>9}")
+    for mines in (int(value) for value in args.mines.split(',')):
+        inputs = make_daily_inputs(mines, args.days)
+        pandas_seconds, expected = time_call(derive_daily_metrics, *inputs)
+        polars_seconds, result = time_call(derive_daily_metrics_polars, *inputs)
+
+        # Both engines must agree exactly before their timings mean anything
+        pd.testing.assert_frame_equal(expected, result, check_exact=True)
+        print(f"{len(expected):>12} {pandas_seconds:>12.3f} {polars_seconds:>12.3f} "
+              f"{pandas_seconds / polars_seconds:>8.1f}x")
+
+if __name__ == '__main__':
+    main()
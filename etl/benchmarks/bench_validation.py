@@ -0,0 +1,119 @@
+"""Benchmark DataValidator throughput on frames where most rows violate a rule.
+
+Compares the vectorized validator against the legacy `iterrows()` loop, which
+built one dict and one log line per bad row. The legacy path is only run up to
+`--legacy-max-rows` because it grows linearly at a few microseconds per row.
+A second table shows how the cost of one rule-set evaluation grows with the
+number of rules.
+
+Usage (from the repository root):
+    python etl/benchmarks/bench_validation.py --rows 100000,1000000,5000000
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from rules import RuleSet  # noqa: E402
+from validation import DataValidator  # noqa: E402
+
+def make_transformed_frame(rows, violating_share=0.9, seed=42):
+    """Build a transformed fact frame where `violating_share` of rows break each rule."""
+    rng = np.random.default_rng(seed)
+    bad = rng.random(rows) < violating_share
+    dates = np.array([date(2020, 1, 1) + timedelta(days=n) for n in range(3650)], dtype=object)
+    return pd.DataFrame({
+        'date_id': dates[np.arange(rows) % len(dates)],
+        'mine_id': np.arange(rows) // len(dates) + 1,
+        'location_id': 1,
+        'total_production_daily': np.where(bad, -rng.uniform(1, 100, rows), rng.uniform(0, 500, rows)),
+        'equipment_utilization': np.where(bad, rng.uniform(100.5, 150, rows), rng.uniform(0, 100, rows))
+    })
+
+def legacy_validate(validator, df):
+    """The per-row checks DataValidator ran before vectorization."""
+    details = []
+    negative_prod = df[df['total_production_daily'] < 0]
+    for _, row in negative_prod.iterrows():
+        error_msg = f"Negative production found: {row['total_production_daily']} tons on date {row['date_id']} at mine {row['mine_id']}"
+        validator.validation_logger.error(error_msg)
+        details.append({'type': 'negative_production', 'message': error_msg, 'date': row['date_id'],
+                        'mine_id': row['mine_id'], 'value': row['total_production_daily']})
+    df.loc[df['total_production_daily'] < 0, 'total_production_daily'] = 0
+
+    invalid_util = df[(df['equipment_utilization'] < 0) | (df['equipment_utilization'] > 100)]
+    for _, row in invalid_util.iterrows():
+        error_msg = f"Invalid equipment utilization: {row['equipment_utilization']}% on date {row['date_id']} at mine {row['mine_id']}"
+        validator.validation_logger.error(error_msg)
+        details.append({'type': 'invalid_utilization', 'message': error_msg, 'date': row['date_id'],
+                        'mine_id': row['mine_id'], 'value': row['equipment_utilization']})
+    df['equipment_utilization'] = df['equipment_utilization'].clip(0, 100)
+    return details
+
+def vectorized_validate(validator, df):
+    df = validator.validate_production_data(df)
+    df = validator.validate_equipment_utilization(df)
+    validator.write_violations()
+    return validator.get_violations()
+
+def make_rule_set(count):
+    """`count` range rules spread over the numeric columns, alternating clip and flag actions."""
+    columns = ['total_production_daily', 'equipment_utilization']
+    return RuleSet([
+        {'name': f'rule_{n}', 'type': 'range', 'column': columns[n % 2], 'min': 0, 'max': 100 + n,
+         'action': 'clip' if n % 2 else 'flag'}
+        for n in range(count)
+    ])
+
+def run(func, frame, run_id):
+    validator = DataValidator(run_id)
+    started = time.perf_counter()
+    result = func(validator, frame)
+    elapsed = time.perf_counter() - started
+    for handler in list(validator.validation_logger.handlers):
+        validator.validation_logger.removeHandler(handler)
+        handler.close()
+    return elapsed, len(result)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default='100000,1000000,5000000', help='Comma-separated frame sizes.')
+    parser.add_argument('--rule-counts', default='1,5,20,50', help='Comma-separated rule-set sizes.')
+    parser.add_argument('--rule-rows', type=int, default=1000000, help='Frame size for the rule-count table.')
+    parser.add_argument('--legacy-max-rows', type=int, default=100000,
+                        help='Largest frame the legacy iterrows() path is run on.')
+    args = parser.parse_args()
+
+    # DataValidator writes under ./etl/logs, keep that out of the working tree
+    os.chdir(tempfile.mkdtemp(prefix='bench_validation_'))
+    logging.getLogger('validation').propagate = False
+
+    print(f"{'rows':>10} {'violations':>11} {'legacy (s)':>11} {'vectorized (s)':>15} {'violations/s':>13}")
+    for rows in (int(value) for value in args.rows.split(',')):
+        frame = make_transformed_frame(rows)
+        legacy = '-'
+        if rows <= args.legacy_max_rows:
+            legacy_seconds, _ = run(legacy_validate, frame.copy(), f'legacy_{rows}')
+            legacy = f'{legacy_seconds:.2f}'
+        seconds, violations = run(vectorized_validate, frame, f'vectorized_{rows}')
+        print(f"{rows:>10} {violations:>11} {legacy:>11} {seconds:>15.2f} {violations / seconds:>13.0f}")
+
+    frame = make_transformed_frame(args.rule_rows)
+    print(f"\n{'rules':>6} {'evaluate (s)':>13} {'per rule (ms)':>14}")
+    for count in (int(value) for value in args.rule_counts.split(',')):
+        rules = make_rule_set(count)
+        started = time.perf_counter()
+        rules.evaluate(frame)
+        seconds = time.perf_counter() - started
+        print(f"{count:>6} {seconds:>13.3f} {seconds / count * 1000:>14.1f}")
+
+if __name__ == '__main__':
+    main()
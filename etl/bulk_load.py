@@ -0,0 +1,204 @@
+"""Bulk ingestion of staging data from CSV, Parquet or SQL INSERT dumps.
+
+Every file is parsed into typed Arrow columns matching database/staging_schema.sql
+and inserted in large batches, files in parallel, so a load creates a few
+parts per table instead of one per INSERT statement.
+
+Usage (from the repository root):
+    python etl/bulk_load.py database/production_logs.sql data/equipment_sensors.csv
+"""
+import argparse
+import logging
+import re
+import time
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+
+from etl import connect
+from loader import LOAD_WORKERS, ClientPool, ParallelLoader
+
+# Arrow types of the staging columns (database/staging_schema.sql). Decimals keep
+# their exact scale; timestamps are naive and read by ClickHouse as UTC.
+STAGING_TYPES = {
+    'staging.mines': {
+        'mine_id': pa.uint32(),
+        'mine_code': pa.string(),
+        'mine_name': pa.string(),
+        'location': pa.string(),
+        'operational_status': pa.string(),
+    },
+    'staging.production_logs': {
+        'log_id': pa.uint32(),
+        'date': pa.date32(),
+        'mine_id': pa.uint32(),
+        'shift': pa.string(),
+        'tons_extracted': pa.decimal128(18, 2),
+        'quality_grade': pa.decimal128(9, 1),
+    },
+    'staging.equipment_sensors': {
+        'timestamp': pa.timestamp('s'),
+        'equipment_id': pa.string(),
+        'status': pa.string(),
+        'fuel_consumption': pa.float64(),
+        'maintenance_alert': pa.bool_(),
+    },
+}
+
+# Rows are sorted by the partition column before inserting, so each batch
+# covers one or two months and becomes one or two parts
+PARTITION_COLUMNS = {
+    'staging.production_logs': 'date',
+    'staging.equipment_sensors': 'timestamp',
+}
+
+# ClickHouse's max_insert_block_size: larger batches are split by the server anyway
+BULK_BATCH_ROWS = 1_048_576
+
+# String literals (with '' or \' escapes), comments, punctuation and bare words
+SQL_TOKEN = re.compile(r"--[^\n]*|'(?:[^'\\]|\\.|'')*'|[(),;]|[^\s(),;']+")
+
+def typed_table(table, arrow_table):
+    """Cast the columns of `arrow_table` to the staging types of `table`, sorted by its partition column."""
+    if table not in STAGING_TYPES:
+        raise ValueError(f"Unknown staging table {table}")
+    types = STAGING_TYPES[table]
+    unknown = [column for column in arrow_table.column_names if column not in types]
+    if unknown:
+        raise ValueError(f"Columns {unknown} are not in {table}")
+    arrow_table = pa.table({
+        column: arrow_table[column].cast(types[column]) for column in arrow_table.column_names
+    })
+    if PARTITION_COLUMNS.get(table) in arrow_table.column_names:
+        arrow_table = arrow_table.sort_by(PARTITION_COLUMNS[table])
+    return arrow_table
+
+def sql_literal(token):
+    """The value of one SQL literal as a string (None for NULL)."""
+    if token.startswith("'"):
+        return token[1:-1].replace("''", "'").replace("\\'", "'")
+    return None if token.upper() == 'NULL' else token
+
+def parse_sql_dump(text):
+    """Parse `INSERT INTO table (columns) VALUES (...), (...);` statements.
+
+    Returns the literals as strings, grouped by table and column list:
+    {(table, columns): [row, ...]}.
+    """
+    tokens = [token for token in SQL_TOKEN.findall(text) if not token.startswith('--')]
+    rows = {}
+    position = 0
+    while position < len(tokens):
+        if [token.upper() for token in tokens[position:position + 2]] != ['INSERT', 'INTO']:
+            raise ValueError(f"Expected INSERT INTO, got {' '.join(tokens[position:position + 5])}")
+        table = tokens[position + 2]
+        end = tokens.index(')', position)
+        columns = tuple(token for token in tokens[position + 4:end] if token != ',')
+        if tokens[end + 1].upper() != 'VALUES':
+            raise ValueError(f"Only INSERT ... VALUES statements are supported ({table})")
+        target = rows.setdefault((table, columns), [])
+        position = end + 2
+        while tokens[position] == '(':
+            end = tokens.index(')', position)
+            target.append([sql_literal(token) for token in tokens[position + 1:end] if token != ','])
+            position = end + 1
+            if tokens[position] == ',':
+                position += 1
+        if tokens[position] != ';':
+            raise ValueError(f"Unterminated INSERT into {table}")
+        position += 1
+    return rows
+
+def read_sql_dump(path):
+    """Read a SQL INSERT dump into one typed Arrow table per staging table."""
+    tables = {}
+    for (table, columns), rows in parse_sql_dump(Path(path).read_text()).items():
+        tables.setdefault(table, []).append(pa.table({
+            column: pa.array([row[index] for row in rows], type=pa.string())
+            for index, column in enumerate(columns)
+        }))
+    return {
+        table: typed_table(table, pa.concat_tables(parts, promote_options='default'))
+        for table, parts in tables.items()
+    }
+
+def read_csv(path, table):
+    """Read a CSV file with a header row, parsing each column straight into its staging type."""
+    convert_options = pacsv.ConvertOptions(column_types=STAGING_TYPES.get(table, {}))
+    return {table: typed_table(table, pacsv.read_csv(path, convert_options=convert_options))}
+
+def read_parquet(path, table):
+    return {table: typed_table(table, pq.read_table(path))}
+
+def read_staging_file(path, table=None):
+    """Read one file into {staging table: typed Arrow table}.
+
+    SQL dumps name their tables; CSV and Parquet files go to `table`, or by
+    default to the staging table named like the file (equipment_sensors.csv).
+    """
+    path = Path(path)
+    if path.suffix == '.sql':
+        return read_sql_dump(path)
+    table = table or f'staging.{path.stem}'
+    if path.suffix == '.csv':
+        return read_csv(path, table)
+    if path.suffix == '.parquet':
+        return read_parquet(path, table)
+    raise ValueError(f"Unsupported file type {path.suffix} ({path})")
+
+def bulk_load(paths, loader, logger, table=None):
+    """Read and insert every file concurrently; returns the rows inserted per staging table."""
+    started = time.perf_counter()
+
+    def load_file(path):
+        def task(client):
+            inserted = {}
+            for target, arrow_table in read_staging_file(path, table).items():
+                inserted[target] = loader.insert_arrow(client, target, arrow_table)
+                logger.info(f"{path}: {inserted[target]} rows into {target}")
+            return inserted
+        return task
+
+    results = loader.run({str(path): load_file(path) for path in paths}, logger)
+    totals = {}
+    for inserted in results.values():
+        for target, rows in inserted.items():
+            totals[target] = totals.get(target, 0) + rows
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Bulk loaded {sum(totals.values())} rows from {len(paths)} files in {elapsed:.2f}s: "
+        + ', '.join(f'{target}={rows}' for target, rows in sorted(totals.items()))
+    )
+    return totals
+
+def active_parts(client, tables):
+    """Number of active data parts of each staging table."""
+    result = client.query(
+        "SELECT concat(database, '.', table), count() FROM system.parts "
+        "WHERE active AND concat(database, '.', table) IN {tables:Array(String)} GROUP BY database, table",
+        parameters={'tables': list(tables)}
+    )
+    return dict(result.result_rows)
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk load staging tables from CSV, Parquet or SQL INSERT dumps.')
+    parser.add_argument('paths', nargs='+', help='.csv, .parquet or .sql files')
+    parser.add_argument('--table', help='Target table for CSV/Parquet files (default: staging.<file name>)')
+    parser.add_argument('--workers', type=int, default=LOAD_WORKERS, help='Files ingested concurrently.')
+    parser.add_argument('--batch-rows', type=int, default=BULK_BATCH_ROWS, help='Rows per Arrow insert.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('etl.bulk_load')
+    pool = ClientPool(connect, size=args.workers)
+    try:
+        totals = bulk_load(args.paths, ParallelLoader(pool, batch_rows=args.batch_rows), logger, table=args.table)
+        with pool.client() as client:
+            logger.info(f"Active parts: {active_parts(client, totals)}")
+    finally:
+        pool.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,29 @@
+"""Small daily fact frames and references shared by the validation rule tests."""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+@pytest.fixture
+def transformed_frame():
+    """Six fact rows; rows 0, 1, 3 and 5 each break one of the default rules."""
+    return pd.DataFrame({
+        'date_id': [date(2024, 7, 1), date(2024, 7, 1), date(2024, 7, 2), date(2024, 7, 2), date(2024, 7, 3), date(2024, 7, 3)],
+        'mine_id': [1, 2, 1, 2, 1, 1],
+        'location_id': [1, 1, 1, 9, 1, 1],
+        'total_production_daily': [-50.0, 120.0, 80.0, 60.0, 90.0, 95.0],
+        'equipment_utilization': [40.0, 130.0, 50.0, 55.0, 60.0, 65.0],
+    })
+
+@pytest.fixture
+def weather():
+    """Weather for location 1 on each day of transformed_frame; location 9 has none."""
+    return pd.DataFrame({
+        'date_id': [date(2024, 7, 1), date(2024, 7, 2), date(2024, 7, 3)],
+        'location_id': [1, 1, 1],
+        'temperature_2m_mean': [27.0, 28.0, 26.5]
+    })
+
+@pytest.fixture
+def mines():
+    return pd.DataFrame({'mine_id': [1, 2]})
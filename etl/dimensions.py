@@ -0,0 +1,167 @@
+import pandas as pd
+
+from weather import DEFAULT_LOCATION, DEFAULT_TIMEZONE
+
+# Key column and its ClickHouse type for each dimension table
+DIMENSION_KEYS = {
+    'dwh.dim_date': ('date_id', 'Date'),
+    'dwh.dim_mine': ('mine_id', 'String'),
+    'dwh.dim_equipment': ('equipment_id', 'String'),
+    'dwh.dim_location': ('location_id', 'UInt64'),
+}
+
+# ClickHouse Date columns, which query_df returns as datetimes but are loaded as dates
+DATE_COLUMNS = ('date_id', 'opened_date')
+
+# Attributes not available from staging yet
+DEFAULT_MINE_TYPE = 'coal'
+DEFAULT_OPENED_DATE = pd.Timestamp('2020-01-01').date()
+DEFAULT_EQUIPMENT_TYPE = 'mining_equipment'
+DEFAULT_MAINTENANCE_DATE = pd.Timestamp('2024-01-01')
+DEFAULT_ELEVATION = 44.0
+DEFAULT_UTC_OFFSET_SECONDS = 25200
+
+def build_date_dimension(dates):
+    """dim_date rows for the distinct `dates`."""
+    dates = pd.Series(pd.to_datetime(pd.Series(dates)).dt.normalize().unique())
+    day_of_week = dates.dt.dayofweek
+    return pd.DataFrame({
+        'date_id': dates.dt.date,
+        'year': dates.dt.year.astype('uint16'),
+        'month': dates.dt.month.astype('uint8'),
+        'day': dates.dt.day.astype('uint8'),
+        'day_of_week': (day_of_week + 1).astype('uint8'),  # 1-7 for Monday-Sunday
+        'quarter': dates.dt.quarter.astype('uint8'),
+        'is_weekend': (day_of_week >= 5).astype('uint8')
+    })
+
+def build_mine_dimension(mines_data):
+    """dim_mine rows for the mines in `staging.mines`."""
+    mines = mines_data.drop_duplicates('mine_id', keep='last')
+    return pd.DataFrame({
+        'mine_id': mines['mine_id'].astype(str).to_numpy(),
+        'location': mines['location'].to_numpy(),
+        'type': DEFAULT_MINE_TYPE,
+        'opened_date': DEFAULT_OPENED_DATE
+    })
+
+def build_equipment_dimension(equipment_ids):
+    """dim_equipment rows for the distinct `equipment_ids`."""
+    return pd.DataFrame({
+        'equipment_id': pd.Series(equipment_ids).astype(str).unique(),
+        'equipment_type': DEFAULT_EQUIPMENT_TYPE,
+        'last_maintenance_date': DEFAULT_MAINTENANCE_DATE
+    })
+
+def build_location_dimension(location_data):
+    """dim_location rows from the weather API locations, or the default location if there are none."""
+    if not location_data:
+        location_data = {DEFAULT_LOCATION['location_id']: {'location': DEFAULT_LOCATION['name']}}
+    locations = pd.DataFrame.from_dict(location_data, orient='index')
+    defaults = {
+        'location': DEFAULT_LOCATION['name'],
+        'latitude': DEFAULT_LOCATION['latitude'],
+        'longitude': DEFAULT_LOCATION['longitude'],
+        'elevation': DEFAULT_ELEVATION,
+        'timezone': DEFAULT_TIMEZONE,
+        'utc_offset_seconds': DEFAULT_UTC_OFFSET_SECONDS
+    }
+    locations = locations.reindex(columns=list(defaults)).fillna(defaults)
+    return locations.astype({
+        'latitude': 'float64', 'longitude': 'float64', 'elevation': 'float64', 'utc_offset_seconds': 'int32'
+    }).rename_axis('location_id').reset_index().astype({'location_id': 'uint64'})
+
+class DimensionCache:
+    """Dimension members already in the DWH, fetched once per key and reused for the rest of the process.
+
+    Only keys not seen before are looked up, so a run that brings no new
+    dates, mines, equipment or locations does not read the dimension tables.
+    """
+
+    def __init__(self):
+        self.members = {}
+        self.checked = {}
+        self.engines = {}
+
+    def known(self, client, table, keys):
+        """Existing rows of `table` for `keys`, indexed by the key column."""
+        key, key_type = DIMENSION_KEYS[table]
+        checked = self.checked.setdefault(table, set())
+        unchecked = [value for value in keys if value not in checked]
+        if unchecked:
+            fetched = client.query_df(
+                f"SELECT * FROM {table} WHERE {key} IN {{keys:Array({key_type})}}",
+                parameters={'keys': unchecked}
+            )
+            for column in DATE_COLUMNS:
+                if column in fetched and pd.api.types.is_datetime64_any_dtype(fetched[column]):
+                    fetched[column] = fetched[column].dt.date
+            # Plain MergeTree tables may still hold duplicates from before diff-based loading
+            fetched = fetched.drop_duplicates(key, keep='last').set_index(key)
+            self.remember(table, fetched)
+            checked.update(unchecked)
+        members = self.members.get(table)
+        if members is None:
+            return pd.DataFrame()
+        return members[members.index.isin(keys)]
+
+    def remember(self, table, rows):
+        """Record rows (indexed by key) as present in `table`."""
+        if rows.empty:
+            return
+        members = self.members.get(table)
+        if members is not None:
+            rows = pd.concat([members[~members.index.isin(rows.index)], rows])
+        self.members[table] = rows
+
+    def engine(self, client, table):
+        """Table engine of `table`, e.g. MergeTree or ReplacingMergeTree."""
+        if table not in self.engines:
+            database, name = table.split('.')
+            engines = client.query_df(
+                "SELECT engine FROM system.tables WHERE database = {database:String} AND name = {name:String}",
+                parameters={'database': database, 'name': name}
+            )
+            self.engines[table] = engines['engine'].iloc[0] if not engines.empty else 'MergeTree'
+        return self.engines[table]
+
+# Shared by every load in this process, so repeated loads only look up keys they have not seen
+DIMENSION_CACHE = DimensionCache()
+
+def diff_members(incoming, existing):
+    """Split `incoming` rows (indexed by key) into members that are new and members whose attributes changed."""
+    if existing.empty:
+        return incoming, incoming.iloc[:0]
+    is_new = ~incoming.index.isin(existing.index)
+    current = incoming[~is_new]
+    previous = existing.reindex(index=current.index, columns=current.columns)
+    differs = current.ne(previous) & ~(current.isna() & previous.isna())
+    return incoming[is_new], current[differs.any(axis=1).to_numpy()]
+
+def upsert_dimension(client, table, rows, logger, cache=DIMENSION_CACHE):
+    """Insert the new and changed members of a dimension table and return how many rows were written.
+
+    Changed members replace their previous row: on ReplacingMergeTree tables
+    the new version is inserted and the table merged, on plain MergeTree the
+    old row is deleted first. Either way there is one row per key.
+    """
+    key, key_type = DIMENSION_KEYS[table]
+    incoming = rows.drop_duplicates(key, keep='last').set_index(key)
+    new, changed = diff_members(incoming, cache.known(client, table, incoming.index.tolist()))
+    if new.empty and changed.empty:
+        logger.info(f"{table}: no new or changed members")
+        return 0
+
+    replacing = cache.engine(client, table).startswith('Replacing')
+    if not changed.empty and not replacing:
+        client.command(
+            f"DELETE FROM {table} WHERE {key} IN {{keys:Array({key_type})}}",
+            parameters={'keys': changed.index.tolist()}
+        )
+    members = pd.concat([new, changed])
+    client.insert_df(table, members.reset_index()[rows.columns])
+    if not changed.empty and replacing:
+        client.command(f"OPTIMIZE TABLE {table} FINAL")
+    cache.remember(table, members)
+    logger.info(f"{table}: inserted {len(new)} new and {len(changed)} changed members")
+    return len(members)
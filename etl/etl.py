@@ -1,11 +1,72 @@
 import pandas as pd
 import clickhouse_connect
+import argparse
+import importlib.util
 import logging
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
 from pathlib import Path
 import os
-import requests
+import sys
 from validation import DataValidator
+from frames import fact_measure_types, query_staging
+from metrics import PROFILERS, RunMetrics, frame_bytes, profiler_available
+from aggregation import (AGGREGATION_ENGINES, aggregate_data, aggregate_production, count_fleet, query_aggregates,
+                         summarize_equipment)
+from streaming import DEFAULT_BLOCK_SIZE, stream_equipment_metrics
+from weather import ARCHIVE_URL, DEFAULT_LOCATION, DEFAULT_TIMEZONE, WeatherCache, create_session, request_weather
+from locations import assign_locations, resolve_mine_locations
+from partitions import LOAD_MODES, partition_ids, write_facts
+from preaggregates import PREAGGREGATES, refresh_preaggregates
+from loader import DEFAULT_BATCH_ROWS, LOAD_WORKERS, ClientPool, ParallelLoader
+from dimensions import (DIMENSION_CACHE, build_date_dimension, build_equipment_dimension,
+                        build_location_dimension, build_mine_dimension, upsert_dimension)
+
+# The forecasting feature store and batch forecasts (forecast/) are refreshed after each load
+sys.path.append(str(Path(__file__).resolve().parent.parent / 'forecast'))
+from feature_store import FEATURE_TABLE, update_feature_store  # noqa: E402
+from batch_forecast import write_forecasts  # noqa: E402
+
+# Staging sources loaded incrementally, with the DWH fact table that holds
+# their high-watermark and the staging column it is compared against.
+INCREMENTAL_SOURCES = {
+    'production_logs': ('dwh.fact_daily_production', 'date'),
+    'equipment_sensors': ('dwh.fact_equipment_metrics', 'toDate(timestamp)'),
+}
+
+# Days before the last loaded day that incremental runs extract again, so staging
+# rows arriving late for a day already loaded are picked up (replace loads are idempotent)
+WATERMARK_LOOKBACK_DAYS = 1
+
+# Concurrent weather API requests (one per location/date gap)
+WEATHER_WORKERS = 8
+
+# Engines that can merge the daily aggregates and derive the metrics in transform_data:
+# - pandas: eager merges and column arithmetic
+# - polars: the same steps as one lazy, multi-threaded Polars plan (see polars_transform.py);
+#   polars is optional and only imported when this engine is chosen
+TRANSFORM_ENGINES = ('pandas', 'polars')
+
+def transform_engine_available(engine):
+    """Whether the transform engine can run here; polars is not in requirements.txt."""
+    return engine != 'polars' or importlib.util.find_spec('polars') is not None
+
+# Columns of dwh.fact_daily_production; measures after the first three
+FACT_PRODUCTION_COLUMNS = [
+    'date_id', 'mine_id', 'location_id', 'total_production_daily',
+    'equipment_utilization', 'fuel_efficiency',
+    'average_quality_grade', 'temperature_2m_mean',
+    'rainfall_mm'
+]
+
+def connect():
+    """Open a ClickHouse client for the DWH."""
+    return clickhouse_connect.get_client(
+        host='clickhouse',
+        port=8123,
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
 
 def setup_logging(run_id):
     """Set up logging for the ETL process."""
@@ -21,133 +82,272 @@ def setup_logging(run_id):
     
     return logger
 
-def extract_data(client, logger):
-    """Extract data from staging tables."""
+def get_watermarks(client, logger, lookback_days=WATERMARK_LOOKBACK_DAYS):
+    """Return the day after which each incremental source is extracted.
+
+    The watermark is read back from the fact table the source feeds, so it is
+    persisted by the load itself and can never run ahead of committed data.
+    It is moved `lookback_days` before the last loaded day so late staging
+    rows of those days are loaded again. A source whose fact table is empty
+    gets ``None`` and is extracted in full.
+    """
+    watermarks = {}
+    for source, (fact_table, _) in INCREMENTAL_SOURCES.items():
+        last_loaded = client.query(
+            f"SELECT maxOrNull(date_id) FROM {fact_table}"
+        ).first_row[0]
+        watermarks[source] = last_loaded - timedelta(days=lookback_days) if last_loaded is not None else None
+        logger.info(f"Watermark for staging.{source}: {watermarks[source] or 'none (full load)'}")
+    return watermarks
+
+def start_watermarks(client, logger, full_refresh=False, recompute_from=None, lookback_days=WATERMARK_LOOKBACK_DAYS):
+    """The watermarks a run starts from: none for a full refresh, else the DWH's, rewound to `recompute_from`."""
+    if full_refresh:
+        return None
+    watermarks = get_watermarks(client, logger, lookback_days)
+    if recompute_from:
+        watermarks = rewind_watermarks(watermarks, recompute_from, logger)
+    return watermarks
+
+def rewind_watermarks(watermarks, recompute_from, logger):
+    """Move watermarks back so every day from `recompute_from` on is extracted again."""
+    since = recompute_from - timedelta(days=1)
+    rewound = {
+        source: min(watermark, since) if watermark is not None else None
+        for source, watermark in watermarks.items()
+    }
+    logger.info(f"Recomputing from {recompute_from}: watermarks rewound to {rewound}")
+    return rewound
+
+def watermark_filter(source, watermarks, until=None):
+    """Build the WHERE clause and query parameters bounding a staging source by its watermark and, optionally, a last day."""
+    since = (watermarks or {}).get(source)
+    date_column = INCREMENTAL_SOURCES[source][1]
+    conditions, parameters = [], {}
+    if since is not None:
+        conditions.append(f"{date_column} > {{{source}_since:Date}}")
+        parameters[f'{source}_since'] = since
+    if until is not None:
+        conditions.append(f"{date_column} <= {{{source}_until:Date}}")
+        parameters[f'{source}_until'] = until
+    if not conditions:
+        return '', {}
+    return f"WHERE {' AND '.join(conditions)}", parameters
+
+def extract_data(client, logger, watermarks=None, until=None):
+    """Extract data from staging tables.
+
+    When ``watermarks`` is given, only rows dated after the watermark of each
+    incremental source are read, and with ``until`` only rows up to that day;
+    ``staging.mines`` is always read in full. Frames are typed at read time
+    (see frames.py): floats instead of Decimals, categoricals for IDs and status.
+    """
     logger.info("Starting data extraction from staging tables...")
     
     try:
-        production_data = client.query_df("""
-            SELECT * FROM staging.production_logs
-        """)
-        equipment_data = client.query_df("""
-            SELECT * FROM staging.equipment_sensors
-        """)
-        mines_data = client.query_df("""
-            SELECT * FROM staging.mines
-        """)
-        logger.info("Data extraction completed successfully")
+        production_data = extract_production(client, watermarks, until)
+        where, parameters = watermark_filter('equipment_sensors', watermarks, until)
+        equipment_data = query_staging(client, 'staging.equipment_sensors', where, parameters)
+        mines_data = extract_mines(client)
+        logger.info(
+            f"Data extraction completed successfully: {len(production_data)} production rows, "
+            f"{len(equipment_data)} sensor rows"
+        )
         return production_data, equipment_data, mines_data
     except Exception as e:
         logger.error(f"Error during data extraction: {str(e)}")
         raise
 
-def fetch_weather_data(start_date, end_date, logger):
-    """Fetch historical weather data from Open-Meteo API."""
-    logger.info(f'Fetching historical weather data from {start_date} to {end_date}')
-    base_url = "https://archive-api.open-meteo.com/v1/archive"
+def extract_production(client, watermarks=None, until=None):
+    """Extract production logs newer than the watermark (and up to `until`)."""
+    where, parameters = watermark_filter('production_logs', watermarks, until)
+    return query_staging(client, 'staging.production_logs', where, parameters)
+
+def extract_mines(client):
+    """Extract the (small) mines table, which is always read in full."""
+    return query_staging(client, 'staging.mines')
+
+def extract_aggregates(client, logger, watermarks=None, until=None):
+    """Extract daily aggregates computed inside ClickHouse instead of raw staging rows."""
+    logger.info("Starting aggregate extraction from staging tables (ClickHouse engine)...")
     
-    params = {
-        'latitude': 2.0167,
-        'longitude': 117.3000,
-        'daily': 'temperature_2m_mean,precipitation_sum',
-        'timezone': 'Asia/Jakarta',
-        'start_date': start_date.strftime('%Y-%m-%d'),
-        'end_date': end_date.strftime('%Y-%m-%d')
-    }
+    try:
+        aggregates = query_aggregates(client, {
+            source: watermark_filter(source, watermarks, until) for source in INCREMENTAL_SOURCES
+        })
+        mines_data = extract_mines(client)
+        logger.info(
+            f"Aggregate extraction completed successfully: {len(aggregates['daily_production'])} daily production rows, "
+            f"{len(aggregates['equipment_metrics'])} daily equipment rows"
+        )
+        return aggregates, mines_data
+    except Exception as e:
+        logger.error(f"Error during aggregate extraction: {str(e)}")
+        raise
+
+def extract_streaming(client, logger, watermarks=None, block_size=DEFAULT_BLOCK_SIZE, until=None):
+    """Extract production logs and stream equipment sensors into daily aggregates.
+
+    Sensor rows never exist as one DataFrame: they are read in blocks of
+    ``block_size`` rows and folded into per-(date, equipment) accumulators.
+    """
+    logger.info(f"Starting streaming extraction from staging tables (block size {block_size})...")
     
     try:
-        resp = requests.get(base_url, params=params)
-        if resp.status_code == 200:
-            logger.info("Successfully fetched weather data.")
-            weather_response = resp.json()
-            weather_data = weather_response['daily']
-            weather_df = pd.DataFrame(weather_data)
-            weather_df = weather_df.rename(columns={
-                'time': 'date_id',
-                'precipitation_sum': 'rainfall_mm'  # Rename for clarity
-            })
-            weather_df['date_id'] = pd.to_datetime(weather_df['date_id']).dt.date
-            
-            # Extract location data from API response
-            location_data = {
-                'latitude': weather_response.get('latitude', 2.0167),
-                'longitude': weather_response.get('longitude', 117.3000),
-                'elevation': weather_response.get('elevation', 44.0),
-                'timezone': weather_response.get('timezone', 'Asia/Jakarta'),
-                'utc_offset_seconds': weather_response.get('utc_offset_seconds', 25200)
-            }
-            
-            return weather_df, location_data
-        else:
-            logger.error(f"Failed to fetch weather data: HTTP {resp.status_code} - {resp.text}")
-            return pd.DataFrame(), {}
+        production_data = extract_production(client, watermarks, until)
+        where, parameters = watermark_filter('equipment_sensors', watermarks, until)
+        equipment_metrics = stream_equipment_metrics(client, logger, where, parameters, block_size)
+        daily_equipment_data, total_equipment = summarize_equipment(equipment_metrics)
+        aggregates = {
+            'daily_production': aggregate_production(production_data),
+            'daily_equipment': daily_equipment_data,
+            'equipment_metrics': equipment_metrics,
+            'total_equipment': total_equipment
+        }
+        mines_data = extract_mines(client)
+        logger.info("Streaming extraction completed successfully")
+        return aggregates, mines_data
     except Exception as e:
-        logger.error(f"An exception occurred while fetching weather data: {e}")
-        return pd.DataFrame(), {}
+        logger.error(f"Error during streaming extraction: {str(e)}")
+        raise
+
+def fetch_weather_data(start_date, end_date, logger, locations=None, cache=None, session=None,
+                       base_url=ARCHIVE_URL, max_workers=WEATHER_WORKERS):
+    """Fetch historical weather data for every location, using the local cache and the API only for missing dates.
+
+    Missing dates are coalesced into a few range requests per location, which
+    are sent concurrently from a bounded thread pool sharing one pooled
+    session. When the cache already covers the range no request is made, so
+    the ETL also works offline.
 
-def transform_data(production_data, equipment_data, weather_data, validator, logger):
-    """Transform and validate the extracted data."""
-    logger.info("Starting data transformation and validation...")
+    Returns daily weather keyed by (date_id, location_id) and a dict of
+    location metadata keyed by location_id.
+    """
+    start_date, end_date = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+    locations = locations or [DEFAULT_LOCATION]
+    logger.info(f'Fetching historical weather data from {start_date} to {end_date} for {len(locations)} location(s)')
+    own_cache, own_session = cache is None, session is None
+    cache = cache or WeatherCache()
     
     try:
-        # Rename 'date' column to 'date_id' for consistency
-        production_data = production_data.rename(columns={'date': 'date_id'})
-        production_data['date_id'] = pd.to_datetime(production_data['date_id']).dt.date
-
-        # Aggregate production data by day and mine
-        daily_production_data = production_data.groupby(['date_id', 'mine_id']).agg(
-            total_production_daily=('tons_extracted', 'sum'),
-            average_quality_grade=('quality_grade', 'mean')
-        ).reset_index()
-
-        # Cast decimal types to float for calculations
-        daily_production_data['total_production_daily'] = daily_production_data['total_production_daily'].astype(float)
-        daily_production_data['average_quality_grade'] = daily_production_data['average_quality_grade'].astype(float)
-
-        # Aggregate sensor data by day (since it has no mine_id)
-        equipment_data['date_id'] = pd.to_datetime(equipment_data['timestamp']).dt.date
-        
-        # Count total equipment pieces for proper utilization calculation
-        total_equipment = equipment_data['equipment_id'].nunique()
+        gaps = [
+            (location, gap_start, gap_end)
+            for location in locations
+            for gap_start, gap_end in cache.missing_ranges(
+                location['latitude'], location['longitude'], start_date, end_date
+            )
+        ]
+        if gaps:
+            session = session or create_session(max_workers)
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(gaps))) as pool:
+                futures = {
+                    pool.submit(
+                        request_weather, session, location['latitude'], location['longitude'],
+                        gap_start, gap_end, location.get('timezone', DEFAULT_TIMEZONE), base_url
+                    ): (location, gap_start, gap_end)
+                    for location, gap_start, gap_end in gaps
+                }
+                # Only the HTTP round-trips run in the pool; the cache is written from this thread
+                for future in as_completed(futures):
+                    location, gap_start, gap_end = futures[future]
+                    try:
+                        weather_df, api_location = future.result()
+                        cache.put(location['latitude'], location['longitude'], weather_df, api_location)
+                    except Exception as e:
+                        logger.error(f"Failed to fetch weather data for {location['name']} from {gap_start} to {gap_end}: {e}")
+            logger.info(f"Requested {len(gaps)} missing weather date range(s) from the API")
+        else:
+            logger.info("Weather data served entirely from the local cache")
         
-        daily_equipment_data = equipment_data.groupby(['date_id']).agg(
-            operational_hours=('status', lambda s: (s == 'active').sum()),
-            fuel_consumption=('fuel_consumption', 'sum')
-        ).reset_index()
+        weather_frames = []
+        location_data = {}
+        for location in locations:
+            weather_df = cache.get(location['latitude'], location['longitude'], start_date, end_date)
+            weather_df['location_id'] = location['location_id']
+            weather_frames.append(weather_df)
+            location_data[location['location_id']] = {
+                'location': location['name'],
+                'latitude': location['latitude'],
+                'longitude': location['longitude'],
+                'timezone': location.get('timezone', DEFAULT_TIMEZONE),
+                **cache.get_location(location['latitude'], location['longitude'])
+            }
+            logger.info(
+                f"Weather data available for {len(weather_df)} of {(end_date - start_date).days + 1} days "
+                f"at {location['name']}"
+            )
+        return pd.concat(weather_frames, ignore_index=True), location_data
+    except Exception as e:
+        logger.error(f"An exception occurred while fetching weather data: {e}")
+        return pd.DataFrame(), {}
+    finally:
+        if own_cache:
+            cache.close()
+        if own_session and session is not None:
+            session.close()
 
-        # Merge production, equipment, and weather data
+def derive_daily_metrics(daily_production_data, daily_equipment_data, weather_data, total_equipment):
+    """Merge production, equipment and weather per day and derive the daily metrics (the pandas engine)."""
+    # Merge production, equipment, and weather data
+    merged_data = pd.merge(
+        daily_production_data,
+        daily_equipment_data,
+        on=['date_id'],
+        how='left'
+    )
+    
+    if not weather_data.empty:
+        # Each mine gets the weather of its own location
         merged_data = pd.merge(
-            daily_production_data,
-            daily_equipment_data,
-            on=['date_id'],
+            merged_data,
+            weather_data,
+            on=['date_id', 'location_id'],
             how='left'
         )
-        
-        if not weather_data.empty:
-            merged_data = pd.merge(
-                merged_data,
-                weather_data,
-                on=['date_id'],
-                how='left'
-            )
-        
-        # Calculate metrics
-        transformed_data = merged_data.copy()
-        # Calculate equipment utilization as percentage of total possible operational hours
-        # Total possible hours = number of equipment × 24 hours per day
-        total_possible_hours = total_equipment * 24
-        transformed_data['equipment_utilization'] = (
-            transformed_data['operational_hours'].fillna(0) / total_possible_hours * 100
-        )
-        transformed_data['fuel_efficiency'] = (
-            transformed_data['total_production_daily'] / 
-            transformed_data['fuel_consumption'].replace(0, 1).fillna(1)
+    
+    # Calculate metrics; the merges already returned a new frame, so columns are added in place
+    transformed_data = merged_data
+    # Calculate equipment utilization as percentage of total possible operational hours
+    # Total possible hours = number of equipment × 24 hours per day
+    total_possible_hours = total_equipment * 24
+    transformed_data['equipment_utilization'] = (
+        transformed_data['operational_hours'].fillna(0) / total_possible_hours * 100
+    )
+    transformed_data['fuel_efficiency'] = (
+        transformed_data['total_production_daily'] / 
+        transformed_data['fuel_consumption'].replace(0, 1).fillna(1)
+    )
+    return transformed_data
+
+def transform_data(aggregates, weather_data, validator, logger, mines_data=None, engine='pandas'):
+    """Transform and validate the daily aggregates.
+
+    `engine` computes the merges and derived metrics: 'pandas', or 'polars'
+    for the lazy Polars plan of polars_transform.py, which returns the same frame.
+    Referential rules check rows against `weather_data` and, when given, `mines_data`.
+    """
+    logger.info(f"Starting data transformation and validation ({engine} engine)...")
+    
+    try:
+        daily_production_data = aggregates['daily_production']
+        if 'location_id' not in daily_production_data:
+            daily_production_data = daily_production_data.assign(location_id=DEFAULT_LOCATION['location_id'])
+        if engine == 'polars':
+            # Polars is only needed by this engine
+            from polars_transform import derive_daily_metrics as derive
+        else:
+            derive = derive_daily_metrics
+        transformed_data = derive(
+            daily_production_data, aggregates['daily_equipment'], weather_data, aggregates['total_equipment']
         )
         
-        # Validate the transformed data
-        transformed_data = validator.validate_production_data(transformed_data)
-        transformed_data = validator.validate_equipment_utilization(transformed_data)
-        validator.validate_weather_data(transformed_data, weather_data)
+        # Validate the transformed data, all rules in one pass
+        if weather_data.empty:
+            logger.warning("No weather data available for validation")
+        transformed_data = validator.validate(
+            transformed_data,
+            {'weather': weather_data, 'mines': mines_data}
+        )
         
         # Log validation summary
         validator.log_validation_summary()
@@ -158,93 +358,31 @@ def transform_data(production_data, equipment_data, weather_data, validator, log
         logger.error(f"Error during data transformation: {str(e)}")
         raise
 
-def load_dimensions(client, production_data, equipment_data, mines_data, location_data, logger):
-    """Load dimension tables with data."""
+def dimension_frames(aggregates, mines_data, location_data):
+    """Build the dimension rows implied by this run, keyed by dimension table."""
+    daily_production_data = aggregates['daily_production']
+    equipment_metrics = aggregates['equipment_metrics']
+
+    dimensions = {'dwh.dim_location': build_location_dimension(location_data)}
+    if not daily_production_data.empty:
+        dimensions['dwh.dim_date'] = build_date_dimension(daily_production_data['date_id'])
+    if not mines_data.empty:
+        dimensions['dwh.dim_mine'] = build_mine_dimension(mines_data)
+    if not equipment_metrics.empty:
+        dimensions['dwh.dim_equipment'] = build_equipment_dimension(equipment_metrics['equipment_id'])
+    return dimensions
+
+def load_dimensions(client, aggregates, mines_data, location_data, logger, cache=DIMENSION_CACHE):
+    """Load the new and changed members of the dimension tables.
+
+    Existing keys are looked up once per process in `cache`, so reruns and
+    incremental loads only write members that are not in the DWH yet.
+    """
     logger.info("Loading dimension tables...")
     
     try:
-        # Load dim_date
-        if not production_data.empty:
-            dates = pd.to_datetime(production_data['date']).dt.date.unique()
-            date_dim_data = []
-            for date in dates:
-                date_obj = pd.to_datetime(date)
-                date_dim_data.append({
-                    'date_id': date,
-                    'year': date_obj.year,
-                    'month': date_obj.month,
-                    'day': date_obj.day,
-                    'day_of_week': date_obj.dayofweek + 1,  # 1-7 for Monday-Sunday
-                    'quarter': date_obj.quarter,
-                    'is_weekend': 1 if date_obj.dayofweek >= 5 else 0
-                })
-            
-            if date_dim_data:
-                date_df = pd.DataFrame(date_dim_data)
-                client.insert_df('dwh.dim_date', date_df)
-                logger.info(f"Loaded {len(date_dim_data)} records into dim_date")
-        
-        # Load dim_mine
-        if not mines_data.empty:
-            mine_dim_data = []
-            for _, row in mines_data.iterrows():
-                mine_dim_data.append({
-                    'mine_id': str(row['mine_id']),
-                    'location': row['location'],
-                    'type': 'coal',  # Default type since not in staging
-                    'opened_date': pd.to_datetime('2020-01-01').date()  # Default date
-                })
-            
-            if mine_dim_data:
-                mine_df = pd.DataFrame(mine_dim_data)
-                client.insert_df('dwh.dim_mine', mine_df)
-                logger.info(f"Loaded {len(mine_dim_data)} records into dim_mine")
-        
-        # Load dim_equipment
-        if not equipment_data.empty:
-            equipment_ids = equipment_data['equipment_id'].unique()
-            equipment_dim_data = []
-            for equipment_id in equipment_ids:
-                equipment_dim_data.append({
-                    'equipment_id': equipment_id,
-                    'equipment_type': 'mining_equipment',  # Default type
-                    'last_maintenance_date': pd.to_datetime('2024-01-01')  # Default date
-                })
-            
-            if equipment_dim_data:
-                equipment_df = pd.DataFrame(equipment_dim_data)
-                client.insert_df('dwh.dim_equipment', equipment_df)
-                logger.info(f"Loaded {len(equipment_dim_data)} records into dim_equipment")
-        
-        # Load dim_location using data from weather API
-        if location_data:
-            location_dim_data = [{
-                'location_id': 1,  # Primary location from weather API
-                'location': 'Berau, Kalimantan, Indonesia',  # Location name
-                'latitude': location_data.get('latitude', 2.0167),
-                'longitude': location_data.get('longitude', 117.3000),
-                'elevation': location_data.get('elevation', 44.0),
-                'timezone': location_data.get('timezone', 'Asia/Jakarta'),
-                'utc_offset_seconds': location_data.get('utc_offset_seconds', 25200)
-            }]
-            
-            location_df = pd.DataFrame(location_dim_data)
-            client.insert_df('dwh.dim_location', location_df)
-            logger.info(f"Loaded {len(location_dim_data)} records into dim_location from weather API")
-        else:
-            # Fallback: create default location if no weather API data
-            location_dim_data = [{
-                'location_id': 1,
-                'location': 'Berau, Kalimantan, Indonesia',  # Location name
-                'latitude': 2.0167,
-                'longitude': 117.3000,
-                'elevation': 44.0,
-                'timezone': 'Asia/Jakarta',
-                'utc_offset_seconds': 25200
-            }]
-            location_df = pd.DataFrame(location_dim_data)
-            client.insert_df('dwh.dim_location', location_df)
-            logger.info("Loaded 1 default record into dim_location")
+        for table, rows in dimension_frames(aggregates, mines_data, location_data).items():
+            upsert_dimension(client, table, rows, logger, cache)
         
         logger.info("Dimension tables loaded successfully")
         
@@ -252,44 +390,53 @@ def load_dimensions(client, production_data, equipment_data, mines_data, locatio
         logger.error(f"Error loading dimension tables: {str(e)}")
         raise
 
-def load_equipment_metrics(client, equipment_data, production_data, logger):
+def prepare_equipment_metrics(aggregates):
+    """Shape the equipment metrics as fact_equipment_metrics rows, typed in one pass."""
+    equipment_metrics = aggregates['equipment_metrics']
+    daily_production_data = aggregates['daily_production']
+    # Add mine_id and location_id (assuming all equipment belongs to the same mine for simplicity)
+    # In a real scenario, you'd have equipment-mine mapping
+    if not daily_production_data.empty:
+        mine_id = str(daily_production_data['mine_id'].iloc[0])
+        # Equipment sits at the location of the mine it is attributed to
+        location_id = (
+            int(daily_production_data['location_id'].iloc[0])
+            if 'location_id' in daily_production_data else DEFAULT_LOCATION['location_id']
+        )
+    else:
+        mine_id = '1'  # Default mine_id
+        location_id = DEFAULT_LOCATION['location_id']
+    
+    return pd.DataFrame({
+        'date_id': pd.to_datetime(equipment_metrics['date_id']).dt.date,
+        'equipment_id': equipment_metrics['equipment_id'].astype(str),
+        'mine_id': mine_id,
+        'location_id': location_id,
+        'total_operational_hours': equipment_metrics['total_operational_hours'].astype('uint8'),
+        'total_maintenance_hours': equipment_metrics['total_maintenance_hours'].astype('uint8'),
+        'total_fuel_consumption': equipment_metrics['total_fuel_consumption'].astype('float64'),
+        'maintenance_alerts': equipment_metrics['maintenance_alerts'].astype('uint8')
+    })
+
+def prepare_daily_production(transformed_data):
+    """Shape the transformed data as fact_daily_production rows, missing measures set to 0.
+
+    Measures are typed once, as the table's Float64/Float32 columns.
+    """
+    load_data = transformed_data.reindex(columns=FACT_PRODUCTION_COLUMNS, fill_value=0.0)
+    load_data['date_id'] = pd.to_datetime(load_data['date_id']).dt.date
+    load_data['mine_id'] = load_data['mine_id'].astype(str)
+    return load_data.astype(fact_measure_types('dwh.fact_daily_production', FACT_PRODUCTION_COLUMNS[3:]))
+
+def load_equipment_metrics(client, aggregates, logger, load_mode='replace', insert=None):
     """Load equipment metrics into fact_equipment_metrics table."""
     logger.info("Loading equipment metrics...")
     
     try:
-        if not equipment_data.empty:
-            # Aggregate equipment data by date and equipment_id
-            equipment_data['date_id'] = pd.to_datetime(equipment_data['timestamp']).dt.date
-            equipment_metrics = equipment_data.groupby(['date_id', 'equipment_id']).agg(
-                total_operational_hours=('status', lambda s: (s == 'active').sum()),
-                total_maintenance_hours=('status', lambda s: (s == 'maintenance').sum()),
-                total_fuel_consumption=('fuel_consumption', 'sum'),
-                maintenance_alerts=('maintenance_alert', 'sum')
-            ).reset_index()
-            
-            # Add mine_id and location_id (assuming all equipment belongs to the same mine for simplicity)
-            # In a real scenario, you'd have equipment-mine mapping
-            if not production_data.empty:
-                mine_id = str(production_data['mine_id'].iloc[0])
-                equipment_metrics['mine_id'] = mine_id
-            else:
-                equipment_metrics['mine_id'] = '1'  # Default mine_id
-            
-            # Add location_id (all equipment is in Berau location)
-            equipment_metrics['location_id'] = 1
-            
-            # Ensure proper data types
-            equipment_metrics['date_id'] = pd.to_datetime(equipment_metrics['date_id']).dt.date
-            equipment_metrics['equipment_id'] = equipment_metrics['equipment_id'].astype(str)
-            equipment_metrics['mine_id'] = equipment_metrics['mine_id'].astype(str)
-            
-            numeric_cols = ['total_operational_hours', 'total_maintenance_hours', 
-                           'total_fuel_consumption', 'maintenance_alerts']
-            for col in numeric_cols:
-                equipment_metrics[col] = equipment_metrics[col].astype(float)
-            
-            # Insert into fact_equipment_metrics
-            client.insert_df('dwh.fact_equipment_metrics', equipment_metrics)
+        if not aggregates['equipment_metrics'].empty:
+            equipment_metrics = prepare_equipment_metrics(aggregates)
+            # Write into fact_equipment_metrics, replacing the days this run covers
+            write_facts(client, 'dwh.fact_equipment_metrics', equipment_metrics, logger, load_mode, insert)
             logger.info(f"Loaded {len(equipment_metrics)} records into fact_equipment_metrics")
         
         logger.info("Equipment metrics loaded successfully")
@@ -298,104 +445,308 @@ def load_equipment_metrics(client, equipment_data, production_data, logger):
         logger.error(f"Error loading equipment metrics: {str(e)}")
         raise
 
-def load_to_dwh(client, transformed_data, production_data, equipment_data, mines_data, location_data, logger):
-    """Load transformed data into the data warehouse."""
+def load_daily_production(client, transformed_data, logger, load_mode='replace', insert=None):
+    """Load the transformed daily rows into fact_daily_production and return the month partitions written."""
+    load_data = prepare_daily_production(transformed_data)
+    write_facts(client, 'dwh.fact_daily_production', load_data, logger, load_mode, insert)
+    logger.info(f"Loaded {len(load_data)} records into fact_daily_production")
+    return partition_ids(load_data['date_id']) if not load_data.empty else []
+
+def timed_task(metrics, stage, task, rows):
+    """Wrap a load task so it is measured as `stage` of `metrics`, with `rows` as its input."""
+    def run(task_client):
+        with metrics.stage(stage, rows_in=len(rows)) as record:
+            record['bytes'] = frame_bytes(rows)
+            result = task(task_client)
+            # upsert_dimension returns the members written; the fact loads write every row
+            record['rows_out'] = result if isinstance(result, int) else len(rows)
+        return result
+    return run
+
+def load_to_dwh(client, transformed_data, aggregates, mines_data, location_data, logger, load_mode='replace', loader=None,
+                cache=DIMENSION_CACHE, metrics=None):
+    """Load transformed data into the data warehouse.
+
+    With ``load_mode='replace'`` the fact rows of every day in this run
+    replace what the DWH holds for that day, so reruns are safe. The
+    dashboard aggregates of the months loaded are rebuilt afterwards. Each
+    dimension and fact table is an independent task: with a `loader` over a
+    pool of clients they run concurrently, otherwise one after another on `client`.
+    Every task is measured as a stage of `metrics`.
+    """
     logger.info("Starting data load to DWH...")
+    loader = loader or ParallelLoader(ClientPool(lambda: client, size=1))
+    metrics = metrics or RunMetrics()
     
     try:
-        # Load dimension tables first
-        load_dimensions(client, production_data, equipment_data, mines_data, location_data, logger)
-        
-        # Load equipment metrics
-        load_equipment_metrics(client, equipment_data, production_data, logger)
-        
-        # Load daily production metrics
-        columns_to_load = [
-            'date_id', 'mine_id', 'location_id', 'total_production_daily',
-            'equipment_utilization', 'fuel_efficiency',
-            'average_quality_grade', 'temperature_2m_mean', 
-            'rainfall_mm'
-        ]
-
-        # Add location_id to the data (all records use location_id = 1 for Berau)
-        transformed_data['location_id'] = 1
-        
-        # Ensure all columns exist, fill missing with 0
-        for col in columns_to_load:
-            if col not in transformed_data:
-                transformed_data[col] = 0.0
-
-        # Cast columns to appropriate types before insertion
-        load_data = transformed_data[columns_to_load].copy()
-        load_data['date_id'] = pd.to_datetime(load_data['date_id']).dt.date
-        load_data['mine_id'] = load_data['mine_id'].astype(str)
-        numeric_columns = [
-            'total_production_daily', 'equipment_utilization', 
-            'fuel_efficiency', 'average_quality_grade',
-            'temperature_2m_mean', 'rainfall_mm'
-        ]
-        for col in numeric_columns:
-            load_data[col] = load_data[col].astype(float)
-
-        # Insert into fact table
-        client.insert_df(
-            'dwh.fact_daily_production',
-            load_data
+        tasks = {
+            table: timed_task(
+                metrics, f'load_dimensions:{table}',
+                lambda task_client, table=table, rows=rows: upsert_dimension(task_client, table, rows, logger, cache),
+                rows
+            )
+            for table, rows in dimension_frames(aggregates, mines_data, location_data).items()
+        }
+        tasks['dwh.fact_equipment_metrics'] = timed_task(
+            metrics, 'load_equipment_metrics',
+            lambda task_client: load_equipment_metrics(task_client, aggregates, logger, load_mode, loader.insert),
+            aggregates['equipment_metrics']
+        )
+        tasks['dwh.fact_daily_production'] = timed_task(
+            metrics, 'load_daily_production',
+            lambda task_client: load_daily_production(task_client, transformed_data, logger, load_mode, loader.insert),
+            transformed_data
         )
+        results = loader.run(tasks, logger)
+        
+        # Rebuild the dashboard aggregates for the months just loaded
+        partitions = results['dwh.fact_daily_production']
+        with metrics.stage('refresh_preaggregates'):
+            loader.run({
+                'preaggregates': lambda task_client: refresh_preaggregates(task_client, partitions, logger, load_mode)
+            }, logger)
         
         logger.info("Data successfully loaded to DWH")
     except Exception as e:
         logger.error(f"Error during data load: {str(e)}")
         raise
 
-def main():
-    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
-    logger = setup_logging(run_id)
-    validator = DataValidator(run_id)
-    
-    logger.info(f"Starting ETL process (Run ID: {run_id})")
-    
+def truncate_facts(client, logger):
+    """Empty the fact tables and the tables derived from them ahead of a full refresh so history is not loaded twice."""
+    for fact_table, _ in INCREMENTAL_SOURCES.values():
+        client.command(f"TRUNCATE TABLE IF EXISTS {fact_table}")
+        logger.info(f"Truncated {fact_table} for full refresh")
+    # Appends reach daily_production_agg through its materialized view, so it would double too
+    for table in [*PREAGGREGATES, FEATURE_TABLE]:
+        client.command(f"TRUNCATE TABLE IF EXISTS {table}")
+        logger.info(f"Truncated {table} for full refresh")
+
+def forecast_production(client, logger, metrics):
+    """Write the batch forecasts from the last loaded day; a failure is logged and recorded, never raised.
+
+    The facts and features are committed by then, and the forecasts can be
+    rerun on their own with `python forecast/batch_forecast.py`.
+    """
     try:
-        # Connect to Clickhouse
-        client = clickhouse_connect.get_client(
-            host='clickhouse',
-            port=8123,
-            username=os.environ.get('CLICKHOUSE_USER', 'default'),
-            password=os.environ.get('CLICKHOUSE_PASSWORD', '')
-        )
-        
-        # Extract
-        production_data, equipment_data, mines_data = extract_data(client, logger)
-        
-        # Fetch weather data for the date range in production data
-        if not production_data.empty:
-            start_date = pd.to_datetime(production_data['date']).min()
-            end_date = pd.to_datetime(production_data['date']).max()
-            weather_data, location_data = fetch_weather_data(start_date, end_date, logger)
-        else:
-            weather_data = pd.DataFrame()
-            location_data = {}
+        with metrics.stage('forecast_production') as stage:
+            stage['rows_out'] = write_forecasts(client, logger)
+    except Exception as e:
+        logger.error(f"Batch forecasts failed, the loaded data is unaffected: {e}")
+
+def run_etl(client, loader, validator, logger, watermarks=None, until=None, engine='pandas',
+            block_size=DEFAULT_BLOCK_SIZE, load_mode='replace', full_refresh=False, metrics=None,
+            cache=DIMENSION_CACHE, transform_engine='pandas', features=True, forecast=True, total_equipment=None):
+    """Extract, transform, validate and load the staging rows after `watermarks` and up to the day `until`.
+
+    Equipment utilization is measured against `total_equipment` machines, by
+    default the whole fleet in staging, so a day gets the same value however
+    wide the extracted window is.
+
+    With `features`, the forecasting features reading the loaded days are
+    refreshed last, then, with `forecast`, every mine is forecast from the
+    last loaded day.
+    Every stage is measured in `metrics`. Returns the number of daily and
+    equipment fact rows loaded, or None when there was nothing to load.
+    """
+    metrics = metrics or RunMetrics()
+
+    # Check the staging rules in ClickHouse over the rows about to be extracted
+    validator.check_in_database(client, {
+        f'staging.{source}': watermark_filter(source, watermarks, until) for source in INCREMENTAL_SOURCES
+    })
+
+    if engine == 'clickhouse':
+        with metrics.stage('extract_aggregates') as stage:
+            aggregates, mines_data = extract_aggregates(client, logger, watermarks, until)
+            stage['rows_out'] = len(aggregates['daily_production']) + len(aggregates['equipment_metrics'])
+            stage['bytes'] = frame_bytes(aggregates['daily_production'], aggregates['equipment_metrics'], mines_data)
+    elif engine == 'streaming':
+        with metrics.stage('extract_streaming') as stage:
+            aggregates, mines_data = extract_streaming(client, logger, watermarks, block_size, until)
+            stage['rows_out'] = len(aggregates['daily_production']) + len(aggregates['equipment_metrics'])
+            stage['bytes'] = frame_bytes(aggregates['daily_production'], aggregates['equipment_metrics'], mines_data)
+    else:
+        with metrics.stage('extract_data') as stage:
+            production_data, equipment_data, mines_data = extract_data(client, logger, watermarks, until)
+            stage['rows_out'] = len(production_data) + len(equipment_data) + len(mines_data)
+            stage['bytes'] = frame_bytes(production_data, equipment_data, mines_data)
+        with metrics.stage('aggregate_data', rows_in=len(production_data) + len(equipment_data)) as stage:
+            aggregates = aggregate_data(production_data, equipment_data)
+            stage['rows_out'] = len(aggregates['daily_production']) + len(aggregates['equipment_metrics'])
+        del production_data, equipment_data
+    aggregates['total_equipment'] = count_fleet(client) if total_equipment is None else total_equipment
 
-        # Transform and Validate
+    # Attach each mine's location so weather is joined per site
+    mine_locations, locations = resolve_mine_locations(mines_data, logger)
+    aggregates['daily_production'] = assign_locations(aggregates['daily_production'], mine_locations)
+    daily_production_data = aggregates['daily_production']
+
+    if daily_production_data.empty and aggregates['equipment_metrics'].empty:
+        logger.info("No new staging data since the last load, nothing to do")
+        return None
+
+    # Fetch weather data for the date range in production data
+    if not daily_production_data.empty:
+        start_date = pd.to_datetime(daily_production_data['date_id']).min()
+        end_date = pd.to_datetime(daily_production_data['date_id']).max()
+        with metrics.stage('fetch_weather_data') as stage:
+            weather_data, location_data = fetch_weather_data(start_date, end_date, logger, locations)
+            stage['rows_out'] = len(weather_data)
+            stage['bytes'] = frame_bytes(weather_data)
+    else:
+        weather_data = pd.DataFrame()
+        location_data = {}
+
+    # Transform and Validate
+    with metrics.stage('transform_data', rows_in=len(daily_production_data)) as stage:
         transformed_data = transform_data(
-            production_data, 
-            equipment_data, 
+            aggregates,
             weather_data,
             validator,
-            logger
+            logger,
+            mines_data,
+            transform_engine
         )
+        stage['rows_out'] = len(transformed_data)
+    validator.write_violations(client)
+
+    # Load
+    if full_refresh:
+        truncate_facts(client, logger)
+    with metrics.stage('load_to_dwh', rows_in=len(transformed_data) + len(aggregates['equipment_metrics'])):
+        load_to_dwh(client, transformed_data, aggregates, mines_data, location_data, logger, load_mode, loader,
+                    cache, metrics)
+
+    # Recompute the forecasting features that read the days just loaded
+    if features and not transformed_data.empty:
+        dates = pd.to_datetime(transformed_data['date_id'])
+        with metrics.stage('update_features', rows_in=len(transformed_data)) as stage:
+            stage['rows_out'] = update_feature_store(client, dates.min().date(), dates.max().date(), logger)
+        if forecast:
+            forecast_production(client, logger, metrics)
+
+    return {'daily_rows': len(transformed_data), 'equipment_rows': len(aggregates['equipment_metrics'])}
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Run the staging -> DWH ETL pipeline.')
+    parser.add_argument(
+        '--engine',
+        choices=AGGREGATION_ENGINES,
+        default='pandas',
+        help='Where daily aggregates are computed: client-side with pandas, pushed down to ClickHouse, '
+             'or streamed from sensor blocks with bounded memory.'
+    )
+    parser.add_argument(
+        '--transform-engine',
+        choices=TRANSFORM_ENGINES,
+        default='pandas',
+        help='How the daily aggregates are merged and the metrics derived: eager pandas, or a lazy '
+             'multi-threaded Polars plan (same output; needs `pip install polars`).'
+    )
+    parser.add_argument(
+        '--block-size',
+        type=int,
+        default=DEFAULT_BLOCK_SIZE,
+        help='Rows per streamed sensor block for --engine streaming (caps peak memory).'
+    )
+    parser.add_argument(
+        '--full-refresh',
+        action='store_true',
+        help='Ignore watermarks, re-extract all staging data and rebuild the fact tables.'
+    )
+    parser.add_argument(
+        '--load-mode',
+        choices=LOAD_MODES,
+        default='replace',
+        help='replace: swap in the month partitions touched by this run (idempotent); append: plain inserts.'
+    )
+    parser.add_argument(
+        '--load-workers',
+        type=int,
+        default=LOAD_WORKERS,
+        help='Dimension and fact tables loaded concurrently, each over its own ClickHouse client.'
+    )
+    parser.add_argument(
+        '--batch-rows',
+        type=int,
+        default=DEFAULT_BATCH_ROWS,
+        help='Rows per Arrow insert when loading fact tables.'
+    )
+    parser.add_argument(
+        '--async-insert',
+        action='store_true',
+        help='Insert with ClickHouse async_insert (waiting for the flush, so loads stay consistent).'
+    )
+    parser.add_argument(
+        '--recompute-from',
+        type=date.fromisoformat,
+        help='Re-extract and reload every day from this date (YYYY-MM-DD) on, e.g. after late-arriving staging rows.'
+    )
+    parser.add_argument(
+        '--lookback-days',
+        type=int,
+        default=WATERMARK_LOOKBACK_DAYS,
+        help='Days before the last loaded day extracted again by incremental runs to pick up late staging rows '
+             '(replace load mode only: appending them again would duplicate rows).'
+    )
+    parser.add_argument(
+        '--profile',
+        choices=PROFILERS,
+        help='Dump a profile of every stage to the run directory (cProfile .prof files, or py-spy speedscope files).'
+    )
+    parser.add_argument(
+        '--metrics-table',
+        action='store_true',
+        help='Also insert the per-stage metrics of this run into dwh.etl_runs.'
+    )
+    args = parser.parse_args(argv)
+    if not transform_engine_available(args.transform_engine):
+        parser.error(f"--transform-engine {args.transform_engine} needs the {args.transform_engine} package")
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    run_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+    logger = setup_logging(run_id)
+    metrics = RunMetrics(run_id, Path(f'etl/logs/run_{run_id}'), args.profile)
+    validator = DataValidator(run_id, metrics=metrics)
+    status = 'failed'
+    
+    logger.info(f"Starting ETL process (Run ID: {run_id}, mode: {'full refresh' if args.full_refresh else 'incremental'}, engine: {args.engine}, transform: {args.transform_engine}, load: {args.load_mode})")
+    if args.profile and not profiler_available(args.profile):
+        logger.warning(f"{args.profile} is not installed, stages will not be profiled")
+    
+    try:
+        # Connect to Clickhouse; the load phase borrows extra clients from a pool
+        client = connect()
+        pool = ClientPool(connect, size=args.load_workers)
+        loader = ParallelLoader(pool, batch_rows=args.batch_rows, async_insert=args.async_insert)
         
-        # Load
-        load_to_dwh(client, transformed_data, production_data, equipment_data, mines_data, location_data, logger)
+        # Extract only what is newer than the DWH, less the look-back, unless a full refresh is requested
+        lookback_days = args.lookback_days if args.load_mode == 'replace' else 0
+        watermarks = start_watermarks(client, logger, args.full_refresh, args.recompute_from, lookback_days)
         
-        logger.info("ETL process completed successfully")
+        loaded = run_etl(client, loader, validator, logger, watermarks, engine=args.engine, block_size=args.block_size,
+                         load_mode=args.load_mode, full_refresh=args.full_refresh, metrics=metrics,
+                         transform_engine=args.transform_engine)
+        status = 'success'
+        if loaded is not None:
+            logger.info("ETL process completed successfully")
         
     except Exception as e:
         logger.error(f"ETL process failed: {str(e)}")
         raise
     finally:
+        logger.info(f"Stage metrics written to {metrics.write(status)}")
+        if args.metrics_table and 'client' in locals():
+            try:
+                metrics.write_to_clickhouse(client)
+            except Exception as e:
+                logger.warning(f"Could not load run metrics into dwh.etl_runs: {e}")
         if 'client' in locals():
             client.close()
+        if 'pool' in locals():
+            pool.close()
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
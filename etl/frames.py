@@ -0,0 +1,97 @@
+"""Typed, memory-lean frames for the ETL.
+
+Staging tables are read through Arrow with the column types the ETL works
+with: Decimal columns are cast to floats in the query, LowCardinality
+columns arrive as dictionaries and become pandas categoricals, and DateTime
+is read as a timestamp, so no Python object is created per row. Fact
+measures are typed once, as the columns of database/star_schema.sql.
+"""
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# LowCardinality(String) as read: a dictionary-encoded Arrow column, a categorical in pandas
+CATEGORY = pa.dictionary(pa.int32(), pa.string())
+
+# Arrow types of the staging columns as the ETL reads them
+STAGING_FRAME_TYPES = {
+    'staging.mines': {
+        'mine_id': pa.uint32(),
+        'mine_code': pa.string(),
+        'mine_name': pa.string(),
+        'location': CATEGORY,
+        'operational_status': CATEGORY,
+    },
+    'staging.production_logs': {
+        'log_id': pa.uint32(),
+        'date': pa.date32(),
+        'mine_id': pa.uint32(),
+        'shift': CATEGORY,
+        'tons_extracted': pa.float64(),
+        'quality_grade': pa.float64(),
+    },
+    'staging.equipment_sensors': {
+        'timestamp': pa.timestamp('s'),
+        'equipment_id': CATEGORY,
+        'status': CATEGORY,
+        'fuel_consumption': pa.float64(),
+        'maintenance_alert': pa.bool_(),
+    },
+}
+
+# Columns selected through a cast: Decimals as floats, and DateTime as DateTime64, which Arrow
+# output turns into a timestamp instead of the raw UInt32 seconds
+READ_EXPRESSIONS = {
+    'tons_extracted': 'toFloat64(tons_extracted)',
+    'quality_grade': 'toFloat64(quality_grade)',
+    'timestamp': 'toDateTime64(timestamp, 0)',
+}
+
+# Send LowCardinality columns as Arrow dictionaries instead of expanded strings
+ARROW_READ_SETTINGS = {'output_format_arrow_low_cardinality_as_dictionary': 1}
+
+# Fact measures stored as Float32 in star_schema.sql; the remaining floats are Float64
+FACT_FLOAT32_COLUMNS = {
+    'dwh.fact_daily_production': [
+        'average_quality_grade', 'equipment_utilization', 'fuel_efficiency',
+        'temperature_2m_mean', 'rainfall_mm'
+    ],
+}
+
+def staging_query(table, where=''):
+    """SELECT of the typed staging columns of `table`, bounded by `where`."""
+    columns = ',\n        '.join(
+        f"{READ_EXPRESSIONS[column]} AS {column}" if column in READ_EXPRESSIONS else column
+        for column in STAGING_FRAME_TYPES[table]
+    )
+    return f"SELECT\n        {columns}\n    FROM {table}\n    {where}"
+
+def typed_arrow(table, arrow_table):
+    """Cast an Arrow result to the staging frame types of `table`.
+
+    Zoned timestamps keep their wall time, as query_df returns them. A
+    result that already has the frame types (a server read) is returned as is.
+    """
+    types = STAGING_FRAME_TYPES[table]
+    columns = {}
+    for name in arrow_table.column_names:
+        column = arrow_table[name]
+        if pa.types.is_timestamp(column.type) and column.type.tz is not None:
+            column = pc.local_timestamp(column)
+        columns[name] = column.cast(types[name]) if name in types and column.type != types[name] else column
+    return pa.table(columns)
+
+def arrow_to_frame(arrow_table):
+    """Convert Arrow to pandas: dictionaries become categoricals, dates stay datetime64."""
+    return arrow_table.to_pandas(date_as_object=False)
+
+def query_staging(client, table, where='', parameters=None):
+    """Read the typed staging columns of `table` into a DataFrame."""
+    arrow_table = client.query_arrow(
+        staging_query(table, where), parameters=parameters or {}, settings=ARROW_READ_SETTINGS, use_strings=True
+    )
+    return arrow_to_frame(typed_arrow(table, arrow_table))
+
+def fact_measure_types(table, columns):
+    """pandas dtypes of the measure `columns` of a fact table: float32 for its Float32 columns, else float64."""
+    float32 = FACT_FLOAT32_COLUMNS.get(table, ())
+    return {column: 'float32' if column in float32 else 'float64' for column in columns}
@@ -0,0 +1,101 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
+import pyarrow as pa
+
+# Concurrent inserts during the load phase (one ClickHouse client each)
+LOAD_WORKERS = 4
+
+# Rows per Arrow insert when streaming large fact frames
+DEFAULT_BATCH_ROWS = 250_000
+
+# Server-side buffering of small inserts; waiting keeps a returned insert visible to the next statement
+ASYNC_INSERT_SETTINGS = {'async_insert': 1, 'wait_for_async_insert': 1}
+
+def to_arrow(df):
+    """Convert a frame to an Arrow table column by column.
+
+    NaN in float columns stays a float value, as with insert_df, instead of
+    becoming NULL (which non-Nullable columns would turn into 0).
+    """
+    return pa.table({column: pa.array(df[column].to_numpy(), from_pandas=False) for column in df.columns})
+
+class ClientPool:
+    """A fixed number of ClickHouse clients, created lazily by `factory` and lent out one per task.
+
+    clickhouse_connect clients hold one HTTP session and must not run two
+    statements at once, so concurrent loads each borrow their own client.
+    """
+
+    def __init__(self, factory, size=LOAD_WORKERS):
+        self.factory = factory
+        self.size = size
+        self.idle = queue.LifoQueue()
+        self.created = []
+        self.slots = queue.Queue()
+        for _ in range(size):
+            self.slots.put(None)
+
+    @contextmanager
+    def client(self):
+        self.slots.get()
+        try:
+            try:
+                client = self.idle.get_nowait()
+            except queue.Empty:
+                client = self.factory()
+                self.created.append(client)
+            yield client
+            self.idle.put(client)
+        finally:
+            self.slots.put(None)
+
+    def close(self):
+        for client in self.created:
+            client.close()
+        self.created.clear()
+
+class ParallelLoader:
+    """Runs independent loads concurrently over a ClientPool and streams frames as batched Arrow inserts."""
+
+    def __init__(self, pool, batch_rows=DEFAULT_BATCH_ROWS, async_insert=False):
+        self.pool = pool
+        self.batch_rows = batch_rows
+        self.settings = dict(ASYNC_INSERT_SETTINGS) if async_insert else None
+
+    def insert(self, client, table, df):
+        """Insert `df` into `table` in batches of `batch_rows`, converting it to Arrow once."""
+        if df.empty:
+            return 0
+        return self.insert_arrow(client, table, to_arrow(df))
+
+    def insert_arrow(self, client, table, arrow_table):
+        """Insert an Arrow table into `table` in batches of `batch_rows`."""
+        for offset in range(0, arrow_table.num_rows, self.batch_rows):
+            client.insert_arrow(table, arrow_table.slice(offset, self.batch_rows), settings=self.settings)
+        return arrow_table.num_rows
+
+    def run(self, tasks, logger):
+        """Run `tasks` (name -> callable taking a client) concurrently and return their results by name.
+
+        Every task is allowed to finish; the first failure is raised afterwards.
+        """
+        results, errors = {}, {}
+
+        def run_task(task):
+            with self.pool.client() as client:
+                return task(client)
+
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            futures = {executor.submit(run_task, task): name for name, task in tasks.items()}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    logger.error(f"Load of {name} failed: {e}")
+                    errors[name] = e
+        if errors:
+            raise next(iter(errors.values()))
+        return results
@@ -0,0 +1,45 @@
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+# Maps the free-text `staging.mines.location` values to coordinates and a stable location_id
+LOCATIONS_PATH = Path(os.environ.get(
+    'MINE_LOCATIONS_PATH', Path(__file__).resolve().parent / 'mine_locations.json'
+))
+
+def load_locations(path=LOCATIONS_PATH):
+    """Load the location catalogue and return it with the name of the default location."""
+    with open(path) as f:
+        config = json.load(f)
+    return config['locations'], config['default']
+
+def resolve_mine_locations(mines_data, logger, path=LOCATIONS_PATH):
+    """Map each mine to a catalogued location.
+
+    Returns a frame of (mine_id, location_id) and the list of distinct
+    locations used, each a dict with location_id, name, latitude, longitude
+    and timezone. Mines whose location is not catalogued fall back to the
+    default location with a warning.
+    """
+    locations, default = load_locations(path)
+    mine_locations = []
+    for mine_id, location in zip(mines_data['mine_id'], mines_data['location']):
+        if location not in locations:
+            logger.warning(f"No coordinates configured for location '{location}' of mine {mine_id}, using '{default}'")
+            location = default
+        mine_locations.append((mine_id, location))
+
+    used = sorted({location for _, location in mine_locations} or {default})
+    mine_location_df = pd.DataFrame(
+        [(mine_id, locations[location]['location_id']) for mine_id, location in mine_locations],
+        columns=['mine_id', 'location_id']
+    )
+    return mine_location_df, [locations[location] for location in used]
+
+def assign_locations(daily_production_data, mine_locations, default_location_id=1):
+    """Add the location_id of each mine to the daily production rows."""
+    located = daily_production_data.merge(mine_locations, on='mine_id', how='left')
+    located['location_id'] = located['location_id'].fillna(default_location_id).astype('int64')
+    return located
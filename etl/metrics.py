@@ -0,0 +1,196 @@
+import cProfile
+import json
+import os
+import re
+import shutil
+import signal
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+
+from streaming import peak_rss_mb
+
+# Opt-in per-stage profilers: cProfile writes <stage>.prof (pstats, e.g. snakeviz),
+# py-spy samples every thread of this process into <stage>.speedscope.json
+PROFILERS = ('cprofile', 'py-spy')
+
+# Columns of dwh.etl_runs, one row per stage record
+ETL_RUNS_COLUMNS = [
+    'run_id', 'stage', 'status', 'started_at', 'wall_seconds', 'cpu_seconds',
+    'rows_in', 'rows_out', 'bytes', 'peak_rss_mb'
+]
+
+class RssSampler:
+    """Tracks the peak resident set size of the process by polling /proc/self/statm from a thread.
+
+    Falls back to the process-lifetime peak where /proc is not available.
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.page_mb = os.sysconf('SC_PAGE_SIZE') / 2**20 if hasattr(os, 'sysconf') else None
+        self.peak = 0.0
+        self.running = False
+
+    def rss_mb(self):
+        try:
+            with open('/proc/self/statm') as statm:
+                return int(statm.read().split()[1]) * self.page_mb
+        except (OSError, TypeError):
+            return peak_rss_mb()
+
+    def _poll(self):
+        while self.running:
+            self.peak = max(self.peak, self.rss_mb())
+            time.sleep(self.interval)
+
+    def start(self):
+        self.peak, self.running = self.rss_mb(), True
+        self.thread = threading.Thread(target=self._poll, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        self.thread.join()
+        self.peak = max(self.peak, self.rss_mb())
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+def profiler_available(profiler):
+    """Whether the profiler can run here; py-spy is an external executable that must be on PATH."""
+    return profiler != 'py-spy' or shutil.which('py-spy') is not None
+
+def frame_bytes(*frames):
+    """In-memory size of the frames' columns (object columns count their pointers only)."""
+    return int(sum(frame.memory_usage(index=False).sum() for frame in frames if frame is not None))
+
+class RunMetrics:
+    """Per-stage measurements of one ETL run.
+
+    Each `stage()` block records wall time, process CPU time, rows in and
+    out, bytes and the peak RSS while it ran. Stages may run concurrently
+    (the load tasks do); their CPU times then overlap. `write()` stores the
+    records as metrics.json in `log_dir`.
+    """
+
+    def __init__(self, run_id=None, log_dir=None, profiler=None):
+        if profiler is not None and profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler {profiler}, expected one of {PROFILERS}")
+        self.run_id = run_id
+        self.log_dir = Path(log_dir) if log_dir is not None else None
+        self.profiler = profiler
+        self.started_at = datetime.now()
+        self.stages = []
+        self.lock = threading.Lock()
+        # cProfile hooks are per thread and do not nest: a stage inside a profiled stage is not profiled separately
+        self.profiling = threading.local()
+
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """Measure the enclosed block. Set 'rows_out' and 'bytes' on the yielded record."""
+        record = {'stage': name, 'status': 'ok', 'started_at': datetime.now().isoformat(timespec='milliseconds'),
+                  'rows_in': rows_in, 'rows_out': None, 'bytes': None}
+        profile = self._start_profile(name)
+        sampler = RssSampler().start()
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        except BaseException:
+            record['status'] = 'failed'
+            raise
+        finally:
+            record['wall_seconds'] = time.perf_counter() - wall
+            record['cpu_seconds'] = time.process_time() - cpu
+            sampler.stop()
+            record['peak_rss_mb'] = round(sampler.peak, 1)
+            self._stop_profile(profile)
+            with self.lock:
+                self.stages.append(record)
+
+    def record(self, name, wall_seconds, rows_in=None, rows_out=None):
+        """Add a measurement taken elsewhere, e.g. one validation rule inside a validation pass."""
+        with self.lock:
+            self.stages.append({
+                'stage': name, 'status': 'ok', 'started_at': datetime.now().isoformat(timespec='milliseconds'),
+                'rows_in': rows_in, 'rows_out': rows_out, 'bytes': None,
+                'wall_seconds': wall_seconds, 'cpu_seconds': None, 'peak_rss_mb': None
+            })
+
+    def _profile_path(self, name, suffix):
+        directory = (self.log_dir or Path('.')) / 'profiles'
+        directory.mkdir(parents=True, exist_ok=True)
+        return directory / f"{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}{suffix}"
+
+    def _start_profile(self, name):
+        if self.profiler == 'cprofile':
+            # Profiles the calling thread, so concurrent load tasks each get their own
+            if getattr(self.profiling, 'active', False):
+                return None
+            profile = cProfile.Profile()
+            profile.enable()
+            self.profiling.active = True
+            return 'cprofile', profile, self._profile_path(name, '.prof')
+        if self.profiler == 'py-spy':
+            if not profiler_available('py-spy'):
+                return None
+            path = self._profile_path(name, '.speedscope.json')
+            process = subprocess.Popen(
+                ['py-spy', 'record', '--pid', str(os.getpid()), '--format', 'speedscope', '--output', str(path)],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+            return 'py-spy', process, path
+        return None
+
+    def _stop_profile(self, profile):
+        if profile is None:
+            return
+        kind, handle, path = profile
+        if kind == 'cprofile':
+            handle.disable()
+            self.profiling.active = False
+            handle.dump_stats(path)
+        else:
+            # py-spy writes its output when interrupted
+            handle.send_signal(signal.SIGINT)
+            handle.wait(timeout=30)
+
+    def summary(self, status='success'):
+        return {
+            'run_id': self.run_id,
+            'status': status,
+            'started_at': self.started_at.isoformat(timespec='seconds'),
+            'finished_at': datetime.now().isoformat(timespec='seconds'),
+            'profiler': self.profiler,
+            'stages': self.stages,
+        }
+
+    def write(self, status='success'):
+        """Write metrics.json to the run directory and return its path."""
+        path = (self.log_dir or Path('.')) / 'metrics.json'
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.summary(status), indent=2, default=str) + '\n')
+        return path
+
+    def to_frame(self):
+        """The stage records as dwh.etl_runs rows."""
+        frame = pd.DataFrame(self.stages, columns=ETL_RUNS_COLUMNS[1:])
+        frame.insert(0, 'run_id', str(self.run_id))
+        frame['started_at'] = pd.to_datetime(frame['started_at'])
+        for column in ('rows_in', 'rows_out', 'bytes'):
+            frame[column] = frame[column].astype('UInt64')
+        for column in ('wall_seconds', 'cpu_seconds', 'peak_rss_mb'):
+            frame[column] = frame[column].astype('float64')
+        return frame
+
+    def write_to_clickhouse(self, client, table='dwh.etl_runs'):
+        client.insert_df(table, self.to_frame())
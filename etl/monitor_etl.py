@@ -1,69 +1,389 @@
+"""Explore ETL run logs: a run index, filtered log streams and trends across runs.
+
+Works on the per-run directories written by setup_logging() and DataValidator
+(etl/logs/run_<id>/ with etl.log, validation.log and metrics.json). A small
+runs_index.json in the logs directory keeps one summary per run (status,
+duration, row and error counts, stage times) and is refreshed only for runs
+whose files changed, so listing and trends over hundreds of runs stay fast.
+Log files are streamed line by line or tailed from the end, never read whole.
+
+Usage (from the repository root):
+    python etl/monitor_etl.py runs --last 20 --status failed
+    python etl/monitor_etl.py show latest
+    python etl/monitor_etl.py logs latest --level WARNING --stage load
+    python etl/monitor_etl.py logs latest --file validation --tail 50 --follow
+    python etl/monitor_etl.py trends --last 200
+"""
+import argparse
+import json
 import os
+import re
+import sys
+import time
+from collections import deque
+from pathlib import Path
 
-def list_runs(logs_base_dir):
-    runs = [d for d in os.listdir(logs_base_dir) if d.startswith('run_') and os.path.isdir(os.path.join(logs_base_dir, d))]
-    runs.sort()
-    return runs
+import pandas as pd
+
+LOGS_DIR = Path(__file__).resolve().parent / 'logs'
+INDEX_FILE = 'runs_index.json'
+# Bump when the summary fields change so existing index entries are rebuilt
+INDEX_VERSION = 1
+
+LOG_FILES = {'etl': 'etl.log', 'validation': 'validation.log'}
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+
+# '%(asctime)s - %(levelname)s - %(message)s', as set up by setup_logging() and DataValidator;
+# lines that do not match (tracebacks) continue the previous record
+LOG_LINE = re.compile(r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) - ([A-Z]+) - (.*)$')
+
+# etl.log messages that open a stage; every later line belongs to it until the next one
+STAGE_MARKERS = (
+    ('Starting ETL process', 'setup'),
+    ('Starting data extraction', 'extract'),
+    ('Starting aggregate extraction', 'extract'),
+    ('Starting streaming extraction', 'extract'),
+    ('Fetching historical weather data', 'weather'),
+    ('Starting data transformation', 'transform'),
+    ('Starting data load', 'load'),
+)
+
+# Last matching etl.log message decides the status of runs without metrics.json
+STATUS_MARKERS = (
+    ('ETL process completed successfully', 'success'),
+    ('ETL process failed', 'failed'),
+    ('nothing to do', 'no data'),
+)
+
+LOADED_ROWS = re.compile(r'Loaded (\d+) records into fact_')
+EXTRACTED_ROWS = re.compile(r'extraction completed successfully: (\d+) production rows, (\d+) sensor rows')
+TOTAL_ERRORS = re.compile(r'Total Errors: (\d+)')
+
+def list_runs(logs_dir=LOGS_DIR):
+    """Run ids (directory names without 'run_') under `logs_dir`, oldest first."""
+    logs_dir = Path(logs_dir)
+    if not logs_dir.is_dir():
+        return []
+    return sorted(entry.name[len('run_'):] for entry in os.scandir(logs_dir)
+                  if entry.name.startswith('run_') and entry.is_dir())
+
+def resolve_run(logs_dir, run):
+    """The run id for 'latest', 'run_<id>' or '<id>'."""
+    runs = list_runs(logs_dir)
+    if run == 'latest':
+        if not runs:
+            raise ValueError(f"No ETL runs in {logs_dir}")
+        return runs[-1]
+    run = run[len('run_'):] if run.startswith('run_') else run
+    if run not in runs:
+        raise ValueError(f"No run {run} in {logs_dir}")
+    return run
+
+def run_signature(run_dir):
+    """Size and modification time of the files a run summary is built from."""
+    signature = {}
+    for name in (*LOG_FILES.values(), 'metrics.json'):
+        try:
+            stat = (run_dir / name).stat()
+        except FileNotFoundError:
+            continue
+        signature[name] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+def parse_records(lines, state=None):
+    """Yield one record dict per log line: time, level, stage, message, continued.
+
+    Continuation lines (continued=True) take the time, level and stage of
+    the record they follow. `state` carries the current record between
+    calls, e.g. when following a growing file.
+    """
+    state = state if state is not None else {'time': None, 'level': None, 'stage': None}
+    for line in lines:
+        line = line.rstrip('\n')
+        match = LOG_LINE.match(line)
+        if match:
+            state['time'], state['level'], message = match[1], match[2], match[3]
+            for marker, stage in STAGE_MARKERS:
+                if message.startswith(marker):
+                    state['stage'] = stage
+                    break
+        else:
+            message = line
+        yield {**state, 'message': message, 'continued': match is None}
+
+def record_filter(level=None, stage=None, pattern=None):
+    """Predicate for records at or above `level`, in `stage` and containing `pattern`."""
+    minimum = LEVELS.index(level) if level else 0
+    return lambda record: (
+        (record['level'] is None or record['level'] not in LEVELS or LEVELS.index(record['level']) >= minimum)
+        and (stage is None or record['stage'] == stage)
+        and (pattern is None or pattern in record['message'])
+    )
+
+def read_records(path, level=None, stage=None, pattern=None):
+    """Stream the records of a log file that pass the filters."""
+    keep = record_filter(level, stage, pattern)
+    with open(path, errors='replace') as f:
+        yield from filter(keep, parse_records(f))
+
+def tail_lines(path, count, block_size=64 * 1024):
+    """The last `count` lines of a file, read backwards in blocks from its end."""
+    with open(path, 'rb') as f:
+        end = f.seek(0, os.SEEK_END)
+        data = b''
+        while end > 0 and data.count(b'\n') <= count:
+            start = max(0, end - block_size)
+            f.seek(start)
+            data = f.read(end - start) + data
+            end = start
+    return [line.decode(errors='replace') for line in data.splitlines()[-count:]] if count else []
+
+def follow_lines(f, interval=1.0):
+    """Yield complete lines appended to the open file `f`, polling every `interval` seconds."""
+    pending = ''
+    while True:
+        chunk = f.readline()
+        if not chunk:
+            time.sleep(interval)
+            continue
+        pending += chunk
+        if pending.endswith('\n'):
+            yield pending
+            pending = ''
+
+def first_log_time(path):
+    with open(path, errors='replace') as f:
+        for line in f:
+            if match := LOG_LINE.match(line):
+                return match[1]
+    return None
+
+def last_log_time(path, lines=50):
+    for line in reversed(tail_lines(path, lines)):
+        if match := LOG_LINE.match(line):
+            return match[1]
+    return None
+
+def summarize_run(run_dir):
+    """Status, timing, row and error counts of one run directory, streaming etl.log once."""
+    run_dir = Path(run_dir)
+    summary = {
+        'run_id': run_dir.name[len('run_'):], 'status': 'incomplete', 'started_at': None, 'finished_at': None,
+        'duration_seconds': None, 'rows_extracted': None, 'rows_loaded': None, 'validation_errors': None,
+        'log_errors': 0, 'log_warnings': 0, 'stages': {},
+    }
 
-def list_processes():
-    return [
-        ('extraction.log', 'Extraction'),
-        ('transformation.log', 'Transformation'),
-        ('validation_errors.log', 'Validation'),
-        ('loading.log', 'Loading'),
-    ]
-
-def print_log_section(log_path, section_name):
-    print(f"\n{'='*10} {section_name} {'='*10}")
-    if os.path.exists(log_path):
-        with open(log_path, 'r') as f:
-            content = f.read()
-            if content.strip():
-                print(content)
-            else:
-                print("(No logs)")
-    else:
-        print("(Log file not found)")
-
-def main():
-    base_dir = os.path.dirname(__file__)
-    logs_base_dir = os.path.join(base_dir, 'logs')
-    runs = list_runs(logs_base_dir)
-    if not runs:
-        print("No ETL runs found.")
-        return
-    print("Available ETL runs:")
-    for idx, run in enumerate(runs):
-        print(f"  {idx+1}. {run}")
-    run_choice = input(f"Select a run (1-{len(runs)}): ")
+    etl_log = run_dir / LOG_FILES['etl']
+    if etl_log.exists():
+        extracted, loaded = None, None
+        # Plain substring tests before any regex keep this pass cheap on multi-million line logs
+        with open(etl_log, errors='replace') as f:
+            for line in f:
+                if ' - ERROR - ' in line or ' - CRITICAL - ' in line:
+                    summary['log_errors'] += 1
+                elif ' - WARNING - ' in line:
+                    summary['log_warnings'] += 1
+                if 'ETL process' in line or 'nothing to do' in line:
+                    for marker, status in STATUS_MARKERS:
+                        if marker in line:
+                            summary['status'] = status
+                elif 'extraction completed' in line and (match := EXTRACTED_ROWS.search(line)):
+                    extracted = int(match[1]) + int(match[2])
+                elif 'Loaded ' in line and (match := LOADED_ROWS.search(line)):
+                    loaded = (loaded or 0) + int(match[1])
+        summary['rows_extracted'], summary['rows_loaded'] = extracted, loaded
+        summary['started_at'], summary['finished_at'] = first_log_time(etl_log), last_log_time(etl_log)
+
+    validation_log = run_dir / LOG_FILES['validation']
+    if validation_log.exists():
+        # The summary is logged last; only the end of the file is read
+        for line in tail_lines(validation_log, 200):
+            if match := TOTAL_ERRORS.search(line):
+                summary['validation_errors'] = int(match[1])
+
+    metrics_path = run_dir / 'metrics.json'
+    if metrics_path.exists():
+        metrics = json.loads(metrics_path.read_text())
+        summary['started_at'] = metrics['started_at']
+        summary['finished_at'] = metrics['finished_at']
+        if summary['status'] == 'incomplete':
+            summary['status'] = metrics['status']
+        stages = metrics['stages']
+        summary['rows_extracted'] = sum(stage['rows_out'] or 0 for stage in stages
+                                        if stage['stage'].startswith('extract')) or summary['rows_extracted']
+        summary['rows_loaded'] = sum(stage['rows_out'] or 0 for stage in stages
+                                     if stage['stage'] in ('load_daily_production', 'load_equipment_metrics')
+                                     ) or summary['rows_loaded']
+        # Top-level stages only; 'validate:<rule>' and 'load_dimensions:<table>' are their parts
+        for stage in stages:
+            if ':' not in stage['stage']:
+                summary['stages'][stage['stage']] = summary['stages'].get(stage['stage'], 0) + stage['wall_seconds']
+
+    if summary['started_at'] and summary['finished_at']:
+        started, finished = (pd.Timestamp(summary[field].replace(',', '.')) for field in ('started_at', 'finished_at'))
+        summary['duration_seconds'] = (finished - started).total_seconds()
+    return summary
+
+def load_index(logs_dir=LOGS_DIR, save=True):
+    """Summaries of every run by run id, re-summarizing only the runs whose files changed since the last call."""
+    logs_dir = Path(logs_dir)
+    index_path = logs_dir / INDEX_FILE
     try:
-        run_idx = int(run_choice) - 1
-        if run_idx < 0 or run_idx >= len(runs):
-            raise ValueError
-    except ValueError:
-        print("Invalid selection.")
-        return
-    run_dir = os.path.join(logs_base_dir, runs[run_idx])
-    processes = list_processes()
-    print("\nAvailable processes:")
-    for idx, (_, name) in enumerate(processes):
-        print(f"  {idx+1}. {name}")
-    print(f"  {len(processes)+1}. All")
-    proc_choice = input(f"Select a process (1-{len(processes)+1}): ")
+        index = json.loads(index_path.read_text())
+        if index.get('version') != INDEX_VERSION:
+            index = {}
+    except (FileNotFoundError, json.JSONDecodeError):
+        index = {}
+    cached = index.get('runs', {})
+
+    runs, changed = {}, False
+    for run_id in list_runs(logs_dir):
+        run_dir = logs_dir / f'run_{run_id}'
+        signature = run_signature(run_dir)
+        entry = cached.get(run_id)
+        if entry is None or entry['signature'] != signature:
+            entry = {**summarize_run(run_dir), 'signature': signature}
+            changed = True
+        runs[run_id] = entry
+    changed = changed or len(runs) != len(cached)
+
+    if save and changed and logs_dir.is_dir():
+        # Write then rename so a concurrent reader never sees half an index
+        temporary = index_path.with_suffix('.tmp')
+        temporary.write_text(json.dumps({'version': INDEX_VERSION, 'runs': runs}))
+        temporary.replace(index_path)
+    return runs
+
+def runs_frame(runs, last=None, status=None):
+    """The indexed runs as a frame, oldest first, optionally the `last` ones or those with `status`."""
+    frame = pd.DataFrame(list(runs.values()), columns=[
+        'run_id', 'status', 'started_at', 'duration_seconds', 'rows_extracted', 'rows_loaded',
+        'validation_errors', 'log_errors', 'log_warnings'
+    ])
+    if status:
+        frame = frame[frame['status'] == status]
+    return frame.tail(last) if last else frame
+
+def trends(runs, last=None):
+    """Per-day run counts, failures, duration percentiles, rows loaded and errors over the indexed runs."""
+    frame = runs_frame(runs, last)
+    if frame.empty:
+        return frame
+    frame['day'] = pd.to_datetime(frame['started_at'].str.replace(',', '.'), format='mixed').dt.date
+    return frame.groupby('day').agg(
+        runs=('run_id', 'size'),
+        failed=('status', lambda status: int((status == 'failed').sum())),
+        median_seconds=('duration_seconds', 'median'),
+        p95_seconds=('duration_seconds', lambda seconds: seconds.quantile(0.95)),
+        rows_loaded=('rows_loaded', 'sum'),
+        validation_errors=('validation_errors', 'sum'),
+    )
+
+def stage_trends(runs, last=None):
+    """Median, p95 and latest wall seconds per stage over the runs that have metrics."""
+    selected = list(runs.values())[-last:] if last else list(runs.values())
+    stages = pd.DataFrame([run['stages'] for run in selected if run['stages']])
+    if stages.empty:
+        return stages
+    return pd.DataFrame({
+        'runs': stages.count(),
+        'median_seconds': stages.median(),
+        'p95_seconds': stages.quantile(0.95),
+        'latest_seconds': stages.ffill().iloc[-1],
+    })
+
+def print_frame(frame, empty_message, index=True):
+    print(frame.to_string(index=index) if not frame.empty else empty_message)
+
+def show_run(logs_dir, run_id, runs):
+    summary = runs[run_id]
+    for field, value in summary.items():
+        if field not in ('signature', 'stages'):
+            print(f"{field:<18} {value}")
+    for stage, seconds in summary['stages'].items():
+        print(f"  {stage:<24} {seconds:.3f}s")
+    run_dir = Path(logs_dir) / f'run_{run_id}'
+    print("files:")
+    for path in sorted(run_dir.rglob('*')):
+        if path.is_file():
+            print(f"  {path.relative_to(run_dir)} ({path.stat().st_size} bytes)")
+
+def print_logs(path, args):
+    keep = record_filter(args.level, args.stage, args.grep)
+    filtered = args.level or args.stage or args.grep
+    with open(path, errors='replace') as f:
+        if args.tail is not None and not filtered:
+            # Unfiltered tail: read backwards from the end, then continue from there
+            for line in tail_lines(path, args.tail):
+                print(line)
+            f.seek(0, os.SEEK_END)
+            state = None
+        else:
+            state = {'time': None, 'level': None, 'stage': None}
+            records = filter(keep, parse_records(f, state))
+            # A filtered tail still streams the file once, keeping only the last matches
+            for record in deque(records, maxlen=args.tail) if args.tail is not None else records:
+                print(format_record(record))
+        if args.follow:
+            try:
+                for record in filter(keep, parse_records(follow_lines(f), state)):
+                    print(format_record(record), flush=True)
+            except KeyboardInterrupt:
+                pass
+
+def format_record(record):
+    if record['continued']:
+        return record['message']
+    return f"{record['time']} {record['level']:<8} [{record['stage'] or '-'}] {record['message']}"
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logs-dir', type=Path, default=LOGS_DIR, help='Directory holding the run_<id> directories.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    runs = commands.add_parser('runs', help='List the indexed runs.')
+    runs.add_argument('--last', type=int, help='Only the most recent runs.')
+    runs.add_argument('--status', choices=('success', 'failed', 'no data', 'incomplete'))
+
+    show = commands.add_parser('show', help='Summary and files of one run.')
+    show.add_argument('run', help="Run id or 'latest'.")
+
+    logs = commands.add_parser('logs', help='Stream one log of a run, filtered.')
+    logs.add_argument('run', help="Run id or 'latest'.")
+    logs.add_argument('--file', choices=LOG_FILES, default='etl')
+    logs.add_argument('--level', choices=LEVELS, help='Minimum level.')
+    logs.add_argument('--stage', choices=sorted({stage for _, stage in STAGE_MARKERS}),
+                      help='Only lines logged during this stage of etl.log.')
+    logs.add_argument('--grep', help='Only lines containing this text.')
+    logs.add_argument('--tail', type=int, help='Only the last N matching lines.')
+    logs.add_argument('--follow', action='store_true', help='Keep printing lines as they are appended.')
+
+    trend = commands.add_parser('trends', help='Per-day and per-stage trends across runs.')
+    trend.add_argument('--last', type=int, help='Only the most recent runs.')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
     try:
-        proc_idx = int(proc_choice) - 1
-        if proc_idx < 0 or proc_idx > len(processes):
-            raise ValueError
-    except ValueError:
-        print("Invalid selection.")
-        return
-    if proc_idx == len(processes):
-        # All
-        for log_file, name in processes:
-            print_log_section(os.path.join(run_dir, log_file), name)
-    else:
-        log_file, name = processes[proc_idx]
-        print_log_section(os.path.join(run_dir, log_file), name)
+        if args.command == 'logs':
+            run_id = resolve_run(args.logs_dir, args.run)
+            path = args.logs_dir / f'run_{run_id}' / LOG_FILES[args.file]
+            if not path.exists():
+                raise ValueError(f"Run {run_id} has no {path.name}")
+            print_logs(path, args)
+            return
+        runs = load_index(args.logs_dir)
+        if args.command == 'runs':
+            print_frame(runs_frame(runs, args.last, args.status), "No ETL runs found.", index=False)
+        elif args.command == 'show':
+            show_run(args.logs_dir, resolve_run(args.logs_dir, args.run), runs)
+        else:
+            print_frame(trends(runs, args.last), "No ETL runs found.")
+            print()
+            print_frame(stage_trends(runs, args.last), "No run has stage metrics yet.")
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
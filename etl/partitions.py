@@ -0,0 +1,69 @@
+import uuid
+
+import pandas as pd
+
+# How fact rows are written:
+# - replace: rebuild each affected month partition in a temp table and swap it in with
+#   REPLACE PARTITION, so reruns, retries and recomputed days never duplicate rows
+# - append: plain INSERT, as before partitioned loading
+LOAD_MODES = ('replace', 'append')
+
+def partition_ids(dates):
+    """Month partition IDs (toYYYYMM) covering `dates`."""
+    dates = pd.to_datetime(pd.Series(dates).drop_duplicates())
+    return sorted(str(month) for month in (dates.dt.year * 100 + dates.dt.month).unique())
+
+def insert_df(client, table, rows):
+    """Insert `rows` with a single insert_df call."""
+    client.insert_df(table, rows)
+
+def swap_partitions(client, table, partitions, fill):
+    """Rebuild `partitions` of `table` in a temp table filled by `fill(temp_table)` and swap each one in.
+
+    Each REPLACE PARTITION is atomic, so readers see a month either before or
+    after the rebuild, never half-loaded. The temp table is always dropped.
+    """
+    temp_table = f"{table}__load_{uuid.uuid4().hex[:8]}"
+    client.command(f"CREATE TABLE {temp_table} AS {table}")
+    try:
+        fill(temp_table)
+        for partition in partitions:
+            client.command(f"ALTER TABLE {table} REPLACE PARTITION ID '{partition}' FROM {temp_table}")
+    finally:
+        client.command(f"DROP TABLE IF EXISTS {temp_table}")
+
+def replace_partitions(client, table, rows, logger, insert=insert_df):
+    """Make `rows` the only content of `table` for the days they cover, atomically per month partition.
+
+    A temp table with the structure of `table` receives the days of the
+    affected months that are not being reloaded plus the new rows, then each
+    month is swapped in with ALTER TABLE ... REPLACE PARTITION. Running the
+    same load twice leaves the table unchanged.
+    """
+    if rows.empty:
+        return []
+    partitions = partition_ids(rows['date_id'])
+    days = sorted(set(pd.to_datetime(rows['date_id']).dt.date))
+
+    def fill(temp_table):
+        client.command(
+            f"INSERT INTO {temp_table} SELECT * FROM {table} "
+            f"WHERE toYYYYMM(date_id) IN {{partitions:Array(UInt32)}} AND date_id NOT IN {{days:Array(Date)}}",
+            parameters={'partitions': [int(partition) for partition in partitions], 'days': days}
+        )
+        insert(client, temp_table, rows)
+
+    swap_partitions(client, table, partitions, fill)
+    logger.info(f"Replaced {len(days)} days in partitions {', '.join(partitions)} of {table}")
+    return partitions
+
+def write_facts(client, table, rows, logger, load_mode='replace', insert=None):
+    """Write fact rows with the given load mode and return the partitions replaced (empty when appending).
+
+    `insert(client, table, rows)` performs the actual inserts, by default a single insert_df.
+    """
+    insert = insert or insert_df
+    if load_mode == 'append':
+        insert(client, table, rows)
+        return []
+    return replace_partitions(client, table, rows, logger, insert)
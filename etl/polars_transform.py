@@ -0,0 +1,47 @@
+"""The Polars transform engine: the daily merges and derived metrics of
+transform_data() as one lazy, multi-threaded Polars plan.
+
+The aggregates enter through Arrow (numeric columns without copying) and
+the result leaves through Arrow with the dtypes the pandas engine produces:
+dates as objects, integer columns with missing values as float64 NaN. Every
+derived metric is the same IEEE operation in the same order as in pandas,
+so both engines give identical frames (see test_polars_transform.py).
+"""
+import numpy as np
+import polars as pl
+
+def lazy_frame(frame):
+    """A lazy Polars frame over a pandas frame; NaN becomes null, as pandas treats it.
+
+    The date_id join key is typed explicitly, since an empty object column has no inferable type.
+    """
+    overrides = {'date_id': pl.Date} if 'date_id' in frame else None
+    return pl.from_pandas(frame, schema_overrides=overrides, nan_to_null=True).lazy()
+
+def daily_metrics_plan(daily_production, daily_equipment, weather, total_possible_hours):
+    """Join production, equipment and weather per day and derive utilization and fuel efficiency.
+
+    `total_possible_hours` is a column of the production rows: Polars divides
+    by a scalar through its reciprocal, which rounds differently than pandas.
+    """
+    plan = daily_production.join(daily_equipment, on='date_id', how='left', maintain_order='left')
+    if weather is not None:
+        # Each mine gets the weather of its own location
+        plan = plan.join(weather, on=['date_id', 'location_id'], how='left', maintain_order='left')
+    fuel_consumption = pl.col('fuel_consumption')
+    return plan.with_columns(
+        equipment_utilization=pl.col('operational_hours').fill_null(0) / pl.col(total_possible_hours) * 100,
+        fuel_efficiency=pl.col('total_production_daily') / (
+            pl.when(fuel_consumption == 0).then(1.0).otherwise(fuel_consumption).fill_null(1)
+        ),
+    ).drop(total_possible_hours)
+
+def derive_daily_metrics(daily_production_data, daily_equipment_data, weather_data, total_equipment):
+    """Run the daily metrics plan on pandas inputs and return the pandas frame the pandas engine returns."""
+    # Total possible hours = number of equipment × 24 hours per day
+    daily_production = lazy_frame(daily_production_data).with_columns(
+        pl.Series('_total_possible_hours', np.full(len(daily_production_data), total_equipment * 24))
+    )
+    weather = lazy_frame(weather_data) if not weather_data.empty else None
+    plan = daily_metrics_plan(daily_production, lazy_frame(daily_equipment_data), weather, '_total_possible_hours')
+    return plan.collect().to_arrow().to_pandas()
@@ -0,0 +1,60 @@
+from partitions import swap_partitions
+
+# Aggregate tables behind the dashboard views (database/views/preaggregations.sql),
+# each with the query rebuilding a set of its month partitions from the layer below.
+# Order matters: weather_impact_monthly is computed from daily_production_agg.
+PREAGGREGATES = {
+    'dwh.daily_production_agg': """
+        SELECT
+            date_id,
+            sumState(total_production_daily) AS total_production,
+            avgState(average_quality_grade) AS quality_grade,
+            avgState(equipment_utilization) AS equipment_utilization,
+            avgState(fuel_efficiency) AS fuel_efficiency,
+            maxState(rainfall_mm) AS rainfall_mm
+        FROM dwh.fact_daily_production
+        WHERE toYYYYMM(date_id) IN {partitions:Array(UInt32)}
+        GROUP BY date_id
+    """,
+    'dwh.weather_impact_monthly': """
+        SELECT
+            toYYYYMM(date_id) AS month,
+            if(rainfall_mm_per_day > 1.0, 'Rainy Day', 'Non-Rainy Day') AS day_type,
+            avgState(total_production_per_day) AS daily_production,
+            corrState(rainfall_mm_per_day, total_production_per_day) AS rainfall_production
+        FROM (
+            SELECT
+                date_id,
+                sumMerge(total_production) AS total_production_per_day,
+                maxMerge(rainfall_mm) AS rainfall_mm_per_day
+            FROM dwh.daily_production_agg
+            WHERE toYYYYMM(date_id) IN {partitions:Array(UInt32)}
+            GROUP BY date_id
+        )
+        GROUP BY month, day_type
+    """,
+}
+
+# Aggregates a materialized view keeps current on plain inserts into the fact table
+MATERIALIZED_PREAGGREGATES = {'dwh.daily_production_agg'}
+
+def refresh_preaggregates(client, partitions, logger, load_mode='replace'):
+    """Rebuild the month `partitions` (toYYYYMM IDs) of every dashboard aggregate from the fact table.
+
+    Called after each fact load: partition-replace loads bypass the
+    materialized view, and rebuilding whole months keeps the monthly
+    correlation moments exact. Appended rows already reached the aggregates
+    fed by a materialized view, so only the others are rebuilt. Untouched
+    months are not read.
+    """
+    if not partitions:
+        return
+    parameters = {'partitions': [int(partition) for partition in partitions]}
+    for table, query in PREAGGREGATES.items():
+        if load_mode == 'append' and table in MATERIALIZED_PREAGGREGATES:
+            continue
+        swap_partitions(
+            client, table, partitions,
+            lambda temp_table, query=query: client.command(f"INSERT INTO {temp_table} {query}", parameters=parameters)
+        )
+        logger.info(f"Refreshed partitions {', '.join(partitions)} of {table}")
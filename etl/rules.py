@@ -0,0 +1,279 @@
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import yaml
+
+# Declarative data quality rules, keyed by target (see validation_rules.yaml)
+RULES_PATH = Path(os.environ.get(
+    'VALIDATION_RULES_PATH', Path(__file__).resolve().parent / 'validation_rules.yaml'
+))
+
+# What happens to the rows that break a rule once every rule has been evaluated:
+# - flag: only recorded as violations
+# - clip: the value is clipped into the rule's range
+# - zero: the value is replaced with 0
+# - drop: the row is removed
+# - quarantine: the row is removed and handed back so it can be kept aside
+ACTIONS = ('flag', 'clip', 'zero', 'drop', 'quarantine')
+ROW_ACTIONS = ('drop', 'quarantine')
+
+class Rule:
+    """A named check over one or more columns, evaluated on a frame or in ClickHouse."""
+    actions = ('flag', 'drop', 'quarantine')
+    # Column whose value is reported with each violation, if any
+    value_column = None
+
+    def __init__(self, name, columns, action='flag'):
+        if action not in self.actions:
+            raise ValueError(f"Rule '{name}': action '{action}' is not one of {self.actions}")
+        self.name = name
+        self.columns = list(columns)
+        self.action = action
+
+    def mask(self, df, references):
+        """Boolean array marking the rows of `df` that break the rule."""
+        raise NotImplementedError
+
+    def fix(self, values):
+        """Repaired values for the violating rows (clip and zero actions)."""
+        return values
+
+    def sql_predicate(self):
+        """ClickHouse boolean expression that is true for violating rows."""
+        raise NotImplementedError(f"Rule '{self.name}' has no row-level SQL predicate")
+
+    def sql_count(self):
+        """ClickHouse aggregate expression counting the violating rows of a table."""
+        return f"countIf({self.sql_predicate()})"
+
+class RangeRule(Rule):
+    actions = ACTIONS
+
+    def __init__(self, name, column, min=None, max=None, action='flag'):
+        if min is None and max is None:
+            raise ValueError(f"Rule '{name}': a range needs min, max or both")
+        super().__init__(name, [column], action)
+        self.value_column = column
+        self.min = min
+        self.max = max
+
+    def mask(self, df, references):
+        values = df[self.value_column].to_numpy(dtype='float64', na_value=np.nan)
+        broken = np.zeros(len(values), dtype=bool)
+        if self.min is not None:
+            broken |= values < self.min
+        if self.max is not None:
+            broken |= values > self.max
+        return broken
+
+    def fix(self, values):
+        if self.action == 'zero':
+            return values * 0
+        return values.clip(self.min, self.max)
+
+    def sql_predicate(self):
+        bounds = []
+        if self.min is not None:
+            bounds.append(f"{self.value_column} < {self.min}")
+        if self.max is not None:
+            bounds.append(f"{self.value_column} > {self.max}")
+        return ' OR '.join(bounds)
+
+class NotNullRule(Rule):
+    actions = ('flag', 'zero', 'drop', 'quarantine')
+
+    def __init__(self, name, column, action='flag'):
+        super().__init__(name, [column], action)
+        self.value_column = column
+
+    def mask(self, df, references):
+        return df[self.value_column].isna().to_numpy()
+
+    def fix(self, values):
+        return values.fillna(0)
+
+    def sql_predicate(self):
+        return f"isNull({self.value_column})"
+
+class ReferentialRule(Rule):
+    """The key columns must exist in a reference frame (or, in SQL, a reference subquery)."""
+
+    def __init__(self, name, columns, reference=None, sql_reference=None, action='flag'):
+        super().__init__(name, columns, action)
+        self.reference = reference
+        self.sql_reference = sql_reference
+
+    def checkable(self, references):
+        """Whether `references` holds a non-empty reference frame with the key columns.
+
+        An empty or keyless reference says nothing about the rows: checking
+        against it would mark all of them, and a quarantine rule would drop them.
+        """
+        reference = references.get(self.reference)
+        return reference is not None and not reference.empty and set(self.columns) <= set(reference.columns)
+
+    def mask(self, df, references):
+        reference = references[self.reference]
+        if len(self.columns) == 1:
+            column = self.columns[0]
+            return ~df[column].isin(reference[column].unique()).to_numpy()
+        known = pd.MultiIndex.from_frame(reference[self.columns].drop_duplicates())
+        return ~pd.MultiIndex.from_frame(df[self.columns]).isin(known)
+
+    def sql_predicate(self):
+        if self.sql_reference is None:
+            raise NotImplementedError(f"Rule '{self.name}' has no sql_reference to check against")
+        keys = self.columns[0] if len(self.columns) == 1 else f"({', '.join(self.columns)})"
+        return f"{keys} NOT IN ({self.sql_reference})"
+
+class UniqueRule(Rule):
+    """No two rows may share the key columns; every repeat after the first is a violation."""
+
+    def mask(self, df, references):
+        return df.duplicated(self.columns, keep='first').to_numpy()
+
+    def sql_count(self):
+        return f"count() - uniqExact({', '.join(self.columns)})"
+
+class MonotonicRule(Rule):
+    """Within each group, the column must not decrease (or must increase if strict) along `order_by`."""
+
+    def __init__(self, name, column, order_by, group_by=(), strict=False, action='flag'):
+        super().__init__(name, [column], action)
+        self.value_column = column
+        self.order_by = order_by
+        self.group_by = list(group_by)
+        self.strict = strict
+
+    def mask(self, df, references):
+        ordered = df[self.group_by + [self.order_by, self.value_column]].reset_index(drop=True)
+        ordered = ordered.sort_values(self.group_by + [self.order_by], kind='stable')
+        column = ordered[self.value_column]
+        previous = ordered.groupby(self.group_by)[self.value_column].shift() if self.group_by else column.shift()
+        broken = column <= previous if self.strict else column < previous
+        return broken.sort_index().to_numpy()
+
+    def sql_count(self):
+        raise NotImplementedError(f"Rule '{self.name}' compares rows with their predecessor, use sql_query()")
+
+    def sql_query(self, table, where=''):
+        """Stand-alone ClickHouse query counting violations, via a window over the previous row."""
+        window = f"ORDER BY {self.order_by} ROWS BETWEEN UNBOUNDED PRECEDING AND CURRENT ROW"
+        if self.group_by:
+            window = f"PARTITION BY {', '.join(self.group_by)} {window}"
+        comparison = '<=' if self.strict else '<'
+        return (
+            f"SELECT countIf(_position > 1 AND {self.value_column} {comparison} _previous) FROM ("
+            f"SELECT {self.value_column}, lagInFrame({self.value_column}) OVER ({window}) AS _previous, "
+            f"row_number() OVER ({window}) AS _position FROM {table} {where})"
+        )
+
+RULE_TYPES = {
+    'range': RangeRule,
+    'not_null': NotNullRule,
+    'referential': ReferentialRule,
+    'unique': UniqueRule,
+    'monotonic': MonotonicRule,
+}
+
+def build_rule(spec):
+    """Build a rule from its declarative spec, e.g. {'name': ..., 'type': 'range', 'column': ..., 'min': 0}."""
+    spec = dict(spec)
+    rule_type = spec.pop('type')
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Rule '{spec.get('name')}': unknown type '{rule_type}'")
+    return RULE_TYPES[rule_type](**spec)
+
+class RuleSet:
+    """Rules compiled into one evaluation pass: every mask is computed on the
+    incoming values, then all repairs and row removals are applied at once."""
+
+    def __init__(self, rules):
+        self.rules = [rule if isinstance(rule, Rule) else build_rule(rule) for rule in rules]
+
+    def __iter__(self):
+        return iter(self.rules)
+
+    def __len__(self):
+        return len(self.rules)
+
+    def select(self, names):
+        """A rule set with only the named rules."""
+        return RuleSet([rule for rule in self.rules if rule.name in names])
+
+    def evaluate(self, df, references=None, timings=None):
+        """Evaluate every rule against `df`.
+
+        Returns the repaired frame (rows dropped or quarantined removed), a
+        dict of rule name to violation mask over the input rows, and the
+        quarantined rows. Referential rules whose reference frame is not
+        given, is empty or lacks the key columns are skipped and left out of
+        the masks. When a `timings` dict
+        is given, the seconds spent on each rule's mask are stored in it.
+        """
+        references = references or {}
+        rules = [rule for rule in self.rules
+                 if not isinstance(rule, ReferentialRule) or rule.checkable(references)]
+        masks = {}
+        for rule in rules:
+            started = time.perf_counter()
+            masks[rule.name] = rule.mask(df, references)
+            if timings is not None:
+                timings[rule.name] = time.perf_counter() - started
+
+        # Copied only when a value is repaired; the caller's frame is never modified
+        result = df
+        removed = np.zeros(len(df), dtype=bool)
+        quarantined = np.zeros(len(df), dtype=bool)
+        for rule in rules:
+            broken = masks[rule.name]
+            if not broken.any():
+                continue
+            if rule.action in ('clip', 'zero'):
+                if result is df:
+                    result = df.copy()
+                column = result.columns.get_loc(rule.value_column)
+                result.iloc[broken, column] = rule.fix(result.iloc[broken, column]).to_numpy()
+            elif rule.action in ROW_ACTIONS:
+                removed |= broken
+                if rule.action == 'quarantine':
+                    quarantined |= broken
+
+        if removed.any():
+            result = result[~removed]
+        return result, masks, df[quarantined]
+
+    def to_sql(self, table, where=''):
+        """ClickHouse queries counting each rule's violations in `table`.
+
+        Row-level and uniqueness rules share one aggregate scan; monotonic
+        rules need a window over the previous row and get a query each.
+        Returns a list of (rule names, query) pairs whose single result row
+        holds one count per rule name.
+        """
+        queries = []
+        scan = [rule for rule in self.rules if not isinstance(rule, MonotonicRule)]
+        if scan:
+            counts = ',\n    '.join(rule.sql_count() for rule in scan)
+            queries.append(([rule.name for rule in scan], f"SELECT\n    {counts}\nFROM {table}\n{where}"))
+        for rule in self.rules:
+            if isinstance(rule, MonotonicRule):
+                queries.append(([rule.name], rule.sql_query(table, where)))
+        return queries
+
+    def check_in_database(self, client, table, where='', parameters=None):
+        """Count each rule's violations in a ClickHouse table without extracting it."""
+        counts = {}
+        for names, query in self.to_sql(table, where):
+            row = client.query(query, parameters=parameters or {}).first_row
+            counts.update(zip(names, (int(value) for value in row)))
+        return counts
+
+def load_rules(path=RULES_PATH):
+    """Load the rule file into a dict of target name to RuleSet."""
+    with open(path) as f:
+        config = yaml.safe_load(f)
+    return {target: RuleSet(specs) for target, specs in config.items()}
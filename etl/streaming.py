@@ -0,0 +1,64 @@
+import resource
+import time
+
+import pandas as pd
+
+from aggregation import aggregate_equipment_metrics
+from frames import ARROW_READ_SETTINGS, arrow_to_frame, staging_query, typed_arrow
+
+# Rows per ClickHouse block (and therefore per Arrow batch held in memory at once)
+DEFAULT_BLOCK_SIZE = 100_000
+
+def peak_rss_mb():
+    """Return the peak resident set size of this process in MB (Linux reports KB)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def fold_equipment_metrics(running, block_metrics):
+    """Merge per-(date, equipment) partial aggregates into the running totals.
+
+    Every metric is a count or a sum, so partials combine by addition and the
+    running frame never grows beyond one row per (date, equipment) pair.
+    """
+    if running is None:
+        return block_metrics
+    return pd.concat([running, block_metrics]).groupby(
+        ['date_id', 'equipment_id'], as_index=False
+    ).sum()
+
+def stream_equipment_metrics(client, logger, where='', parameters=None, block_size=DEFAULT_BLOCK_SIZE):
+    """Aggregate staging.equipment_sensors per (date, equipment) in fixed-size blocks.
+
+    Sensor rows are streamed as Arrow batches of at most ``block_size`` rows and
+    folded into running accumulators, so memory is bounded by the block size
+    instead of the table size. Produces the same rows as the pandas engine.
+    """
+    rows = 0
+    blocks = 0
+    running = None
+    started = time.perf_counter()
+    with client.query_arrow_stream(
+        staging_query('staging.equipment_sensors', where),
+        parameters=parameters or {},
+        settings={**ARROW_READ_SETTINGS, 'max_block_size': block_size},
+        use_strings=True
+    ) as stream:
+        for batch in stream:
+            block = arrow_to_frame(typed_arrow('staging.equipment_sensors', batch))
+            if block.empty:
+                continue
+            running = fold_equipment_metrics(running, aggregate_equipment_metrics(block))
+            rows += len(block)
+            blocks += 1
+            del block, batch
+
+    elapsed = time.perf_counter() - started
+    logger.info(
+        f"Streamed {rows} sensor rows in {blocks} blocks of <= {block_size} rows: "
+        f"{elapsed:.2f}s, {rows / elapsed if elapsed else 0:.0f} rows/sec, peak RSS {peak_rss_mb():.1f} MB"
+    )
+    if running is None:
+        return pd.DataFrame(columns=[
+            'date_id', 'equipment_id', 'total_operational_hours', 'total_maintenance_hours',
+            'total_fuel_consumption', 'maintenance_alerts'
+        ])
+    return running
@@ -0,0 +1,132 @@
+"""Deterministic synthetic staging data at configurable scale.
+
+Generates staging.mines, staging.production_logs and staging.equipment_sensors
+as Arrow tables typed like database/staging_schema.sql, so they can be written
+to Parquet for bulk_load.py, inserted directly, or served by an in-process
+client. The same parameters and seed always give the same rows.
+
+Usage (from the repository root):
+    python etl/synthetic.py --mines 20 --equipment 200 --years 2 --out data/synthetic
+    python etl/bulk_load.py data/synthetic/*.parquet
+"""
+import argparse
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from bulk_load import typed_table
+from locations import load_locations
+
+DEFAULT_START = date(2020, 1, 1)
+
+SHIFTS = ('Day', 'Night')
+STATUSES = ('active', 'idle', 'maintenance')
+STATUS_WEIGHTS = (0.8, 0.15, 0.05)
+
+def staging_scale(mines=3, equipment=10, sensor_interval_minutes=60, years=1, start=DEFAULT_START, seed=0):
+    """The parameters of one synthetic data set."""
+    return {
+        'mines': mines,
+        'equipment': equipment,
+        'sensor_interval_minutes': sensor_interval_minutes,
+        'years': years,
+        'start': start,
+        'seed': seed,
+    }
+
+def scale_days(scale):
+    return int(round(365 * scale['years']))
+
+def generate_mines(scale):
+    """One row per mine, spread over the catalogued locations (mine_locations.json)."""
+    locations = sorted(load_locations()[0])
+    mine_ids = np.arange(1, scale['mines'] + 1)
+    rng = np.random.default_rng([scale['seed'], 0])
+    return typed_table('staging.mines', pa.table({
+        'mine_id': mine_ids,
+        'mine_code': [f'MINE{mine_id:03d}' for mine_id in mine_ids],
+        'mine_name': [f'Synthetic Mine {mine_id}' for mine_id in mine_ids],
+        'location': [locations[index % len(locations)] for index in range(scale['mines'])],
+        'operational_status': np.where(rng.random(scale['mines']) < 0.9, 'Active', 'Maintenance'),
+    }))
+
+def generate_production_logs(scale):
+    """One log per mine, day and shift. About 1% of the tonnages are negative, as in the seed data."""
+    days, mines = scale_days(scale), scale['mines']
+    rows = days * mines * len(SHIFTS)
+    rng = np.random.default_rng([scale['seed'], 1])
+    day_offsets = np.repeat(np.arange(days), mines * len(SHIFTS))
+    tons = rng.normal(300, 90, rows)
+    tons[rng.random(rows) < 0.01] *= -1
+    return typed_table('staging.production_logs', pa.table({
+        'log_id': np.arange(1, rows + 1, dtype=np.uint32),
+        'date': pa.array(np.datetime64(scale['start']) + day_offsets.astype('timedelta64[D]')),
+        'mine_id': np.tile(np.repeat(np.arange(1, mines + 1, dtype=np.uint32), len(SHIFTS)), days),
+        'shift': np.tile(SHIFTS, days * mines),
+        'tons_extracted': tons.round(2),
+        'quality_grade': rng.uniform(3, 6, rows).round(1),
+    }))
+
+def generate_equipment_sensors(scale):
+    """One reading per machine every `sensor_interval_minutes`, in time order."""
+    readings_per_day = 24 * 60 // scale['sensor_interval_minutes']
+    steps, equipment = scale_days(scale) * readings_per_day, scale['equipment']
+    rows = steps * equipment
+    rng = np.random.default_rng([scale['seed'], 2])
+    offsets = np.repeat(np.arange(steps) * scale['sensor_interval_minutes'] * 60, equipment)
+    # Each machine burns fuel around its own base rate
+    base_fuel = rng.uniform(5, 25, equipment)
+    return typed_table('staging.equipment_sensors', pa.table({
+        'timestamp': pa.array(np.datetime64(scale['start'], 's') + offsets.astype('timedelta64[s]')),
+        'equipment_id': np.tile([f'EQ{index:04d}' for index in range(1, equipment + 1)], steps),
+        'status': np.array(STATUSES)[rng.choice(len(STATUSES), rows, p=STATUS_WEIGHTS)],
+        'fuel_consumption': (np.tile(base_fuel, steps) + rng.normal(0, 2, rows)).clip(0).round(2),
+        'maintenance_alert': rng.random(rows) < 0.02,
+    }))
+
+def generate_staging(scale):
+    """All three staging tables for `scale`, keyed by table name."""
+    return {
+        'staging.mines': generate_mines(scale),
+        'staging.production_logs': generate_production_logs(scale),
+        'staging.equipment_sensors': generate_equipment_sensors(scale),
+    }
+
+def generate_weather(scale, location_ids):
+    """Daily weather per location over the scale's date range, shaped like fetch_weather_data's frame."""
+    days = scale_days(scale)
+    rng = np.random.default_rng([scale['seed'], 3])
+    dates = [scale['start'] + timedelta(days=day) for day in range(days)]
+    return pd.DataFrame({
+        'date_id': np.tile(dates, len(location_ids)),
+        'temperature_2m_mean': rng.normal(27, 1.5, days * len(location_ids)).round(1),
+        # Dry on about half of the days
+        'rainfall_mm': np.where(rng.random(days * len(location_ids)) < 0.5, 0.0,
+                                rng.gamma(1.5, 8, days * len(location_ids)).round(1)),
+        'location_id': np.repeat(location_ids, days),
+    })
+
+def main():
+    parser = argparse.ArgumentParser(description='Write deterministic synthetic staging data as Parquet files.')
+    parser.add_argument('--mines', type=int, default=3)
+    parser.add_argument('--equipment', type=int, default=10)
+    parser.add_argument('--sensor-interval-minutes', type=int, default=60, help='Minutes between readings of a machine.')
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', type=Path, required=True, help='Directory for <table>.parquet files.')
+    args = parser.parse_args()
+
+    scale = staging_scale(args.mines, args.equipment, args.sensor_interval_minutes, args.years, args.start, args.seed)
+    args.out.mkdir(parents=True, exist_ok=True)
+    for table, arrow_table in generate_staging(scale).items():
+        path = args.out / f"{table.split('.')[1]}.parquet"
+        pq.write_table(arrow_table, path)
+        print(f"{path}: {arrow_table.num_rows} rows")
+
+if __name__ == "__main__":
+    main()
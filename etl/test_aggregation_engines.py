@@ -0,0 +1,274 @@
+"""Parity checks between the pandas and ClickHouse aggregation engines.
+
+The offline tests run anywhere; one of them answers the pushdown queries with
+a client double that evaluates their GROUP BY row by row. The live parity test
+compares both engines on the staging data of a running ClickHouse (read-only)
+and only runs when CLICKHOUSE_HOST is set, e.g.:
+
+    CLICKHOUSE_HOST=localhost CLICKHOUSE_USER=admin CLICKHOUSE_PASSWORD=admin pytest etl/
+"""
+import contextlib
+import logging
+import os
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import etl
+from aggregation import FLEET_SIZE_QUERY, aggregate_data, query_aggregates, summarize_equipment
+from etl import watermark_filter
+from streaming import stream_equipment_metrics
+from validation import DataValidator
+
+FACT_COLUMNS = [
+    'date_id', 'mine_id', 'total_production_daily', 'average_quality_grade',
+    'equipment_utilization', 'fuel_efficiency'
+]
+EQUIPMENT_COLUMNS = [
+    'date_id', 'equipment_id', 'total_operational_hours', 'total_maintenance_hours',
+    'total_fuel_consumption', 'maintenance_alerts'
+]
+
+def make_staging_frames(days=5, mines=3, equipment=4, seed=7):
+    """Build small staging frames shaped like the clickhouse_connect results."""
+    rng = np.random.default_rng(seed)
+    start = datetime(2024, 7, 1)
+    production = pd.DataFrame([
+        {
+            'date': start + timedelta(days=day),
+            'mine_id': mine,
+            'shift': shift,
+            'tons_extracted': Decimal(str(round(rng.uniform(-50, 500), 2))),
+            'quality_grade': Decimal(str(round(rng.uniform(3, 6), 1)))
+        }
+        for day in range(days) for mine in range(1, mines + 1) for shift in ('Day', 'Night')
+    ])
+    timestamps = [start + timedelta(hours=hour) for hour in range(days * 24)]
+    sensors = pd.DataFrame([
+        {
+            'timestamp': ts,
+            'equipment_id': f'EQ{eq:03d}',
+            'status': rng.choice(['active', 'idle', 'maintenance']),
+            'fuel_consumption': float(rng.uniform(0, 20)),
+            'maintenance_alert': bool(rng.random() < 0.1)
+        }
+        for ts in timestamps for eq in range(1, equipment + 1)
+    ])
+    return production, sensors
+
+def transform(aggregates, tmp_path, monkeypatch):
+    from etl import transform_data
+    monkeypatch.chdir(tmp_path)
+    logger = logging.getLogger('etl.test')
+    return transform_data(aggregates, pd.DataFrame(), DataValidator('parity'), logger)
+
+def assert_same_rows(left, right, columns, keys):
+    left, right = (
+        frame[columns].astype({keys[-1]: str}).sort_values(keys).reset_index(drop=True)
+        for frame in (left, right)
+    )
+    pd.testing.assert_frame_equal(left, right, check_dtype=False, rtol=1e-9)
+
+def test_single_pass_aggregation_matches_raw_groupbys():
+    production, sensors = make_staging_frames()
+    aggregates = aggregate_data(production, sensors)
+
+    readings = sensors.assign(
+        date_id=pd.to_datetime(sensors['timestamp']).dt.date,
+        active=sensors['status'] == 'active',
+        maintenance=sensors['status'] == 'maintenance'
+    )
+    expected_metrics = readings.groupby(['date_id', 'equipment_id']).agg(
+        total_operational_hours=('active', 'sum'),
+        total_maintenance_hours=('maintenance', 'sum'),
+        total_fuel_consumption=('fuel_consumption', 'sum'),
+        maintenance_alerts=('maintenance_alert', 'sum')
+    ).reset_index()
+    expected_daily = readings.groupby(['date_id']).agg(
+        operational_hours=('active', 'sum'),
+        fuel_consumption=('fuel_consumption', 'sum')
+    ).reset_index()
+
+    assert 'date_id' not in sensors
+    assert aggregates['total_equipment'] == sensors['equipment_id'].nunique()
+    assert_same_rows(
+        expected_metrics, aggregates['equipment_metrics'], EQUIPMENT_COLUMNS, ['date_id', 'equipment_id']
+    )
+    pd.testing.assert_frame_equal(
+        expected_daily, aggregates['daily_equipment'], check_dtype=False, rtol=1e-9
+    )
+
+class ArrowStreamClient:
+    """Client double serving a frame through query_arrow_stream in fixed-size batches."""
+
+    def __init__(self, frame):
+        self.frame = frame
+
+    def query_arrow_stream(self, query, parameters=None, settings=None, use_strings=None):
+        pa = pytest.importorskip('pyarrow')
+        batches = pa.Table.from_pandas(self.frame, preserve_index=False).to_batches(
+            max_chunksize=settings['max_block_size']
+        )
+        return contextlib.nullcontext(iter(batches))
+
+def test_streamed_blocks_match_single_frame_aggregation():
+    production, sensors = make_staging_frames()
+    aggregates = aggregate_data(production, sensors.copy())
+    logger = logging.getLogger('etl.test')
+
+    # A block size that does not divide the day boundary splits groups across blocks
+    equipment_metrics = stream_equipment_metrics(ArrowStreamClient(sensors), logger, block_size=37)
+
+    assert_same_rows(
+        aggregates['equipment_metrics'], equipment_metrics, EQUIPMENT_COLUMNS, ['date_id', 'equipment_id']
+    )
+    daily_equipment_data, total_equipment = summarize_equipment(equipment_metrics)
+    assert total_equipment == aggregates['total_equipment']
+    pd.testing.assert_frame_equal(
+        daily_equipment_data, aggregates['daily_equipment'], check_dtype=False, rtol=1e-9
+    )
+
+class PushdownClient:
+    """Client double answering the pushdown aggregate queries from staging frames.
+
+    Each query is evaluated row by row, the way ClickHouse would: its WHERE
+    bounds come from the watermark parameters, its GROUP BY keys and
+    aggregates from PRODUCTION_AGGREGATE_QUERY and EQUIPMENT_AGGREGATE_QUERY.
+    """
+
+    def __init__(self, production, sensors):
+        self.production = production
+        self.sensors = sensors
+        self.queries = []
+
+    @staticmethod
+    def in_bounds(day, source, parameters):
+        since, until = parameters.get(f'{source}_since'), parameters.get(f'{source}_until')
+        return (since is None or day > since) and (until is None or day <= until)
+
+    def query(self, query, parameters=None):
+        if query != FLEET_SIZE_QUERY:
+            raise NotImplementedError(query)
+        return type('Result', (), {'first_row': (self.sensors['equipment_id'].nunique(),)})
+
+    def query_df(self, query, parameters=None):
+        self.queries.append((query, parameters))
+        groups = {}
+        if 'FROM staging.production_logs' in query:
+            for row in self.production.itertuples(index=False):
+                if self.in_bounds(row.date.date(), 'production_logs', parameters):
+                    groups.setdefault((row.date.date(), row.mine_id), []).append(row)
+            rows = [{
+                'date_id': day, 'mine_id': mine,
+                'total_production_daily': float(sum(row.tons_extracted for row in readings)),
+                'average_quality_grade': sum(float(row.quality_grade) for row in readings) / len(readings),
+            } for (day, mine), readings in sorted(groups.items())]
+        else:
+            for row in self.sensors.itertuples(index=False):
+                if self.in_bounds(row.timestamp.date(), 'equipment_sensors', parameters):
+                    groups.setdefault((row.timestamp.date(), row.equipment_id), []).append(row)
+            rows = [{
+                'date_id': day, 'equipment_id': equipment,
+                'total_operational_hours': sum(row.status == 'active' for row in readings),
+                'total_maintenance_hours': sum(row.status == 'maintenance' for row in readings),
+                'total_fuel_consumption': sum(row.fuel_consumption for row in readings),
+                'maintenance_alerts': sum(bool(row.maintenance_alert) for row in readings),
+            } for (day, equipment), readings in sorted(groups.items())]
+        return pd.DataFrame(rows)
+
+def test_pushdown_queries_match_pandas_aggregation_offline(tmp_path, monkeypatch):
+    production, sensors = make_staging_frames()
+    client = PushdownClient(production, sensors)
+    watermarks = {'production_logs': date(2024, 7, 1), 'equipment_sensors': date(2024, 7, 1)}
+    until = date(2024, 7, 4)
+
+    clickhouse_aggregates = query_aggregates(client, {
+        source: watermark_filter(source, watermarks, until) for source in ('production_logs', 'equipment_sensors')
+    })
+
+    # The bounds go into the WHERE of each aggregate scan, as named query parameters
+    (production_query, production_parameters), (equipment_query, equipment_parameters) = client.queries
+    assert 'WHERE date > {production_logs_since:Date} AND date <= {production_logs_until:Date}' in production_query
+    assert 'GROUP BY date, mine_id' in production_query
+    assert 'WHERE toDate(timestamp) > {equipment_sensors_since:Date}' in equipment_query
+    assert 'GROUP BY date_id, equipment_id' in equipment_query
+    assert production_parameters == {'production_logs_since': watermarks['production_logs'],
+                                     'production_logs_until': until}
+    assert set(equipment_parameters) == {'equipment_sensors_since', 'equipment_sensors_until'}
+
+    in_range = lambda dates: (dates.dt.date > watermarks['production_logs']) & (dates.dt.date <= until)
+    pandas_aggregates = aggregate_data(production[in_range(production['date'])],
+                                       sensors[in_range(sensors['timestamp'])])
+    assert list(clickhouse_aggregates['daily_production']) == list(pandas_aggregates['daily_production'])
+    assert clickhouse_aggregates['total_equipment'] == pandas_aggregates['total_equipment']
+    assert_same_rows(
+        pandas_aggregates['equipment_metrics'], clickhouse_aggregates['equipment_metrics'],
+        EQUIPMENT_COLUMNS, ['date_id', 'equipment_id']
+    )
+    pd.testing.assert_frame_equal(
+        pandas_aggregates['daily_equipment'], clickhouse_aggregates['daily_equipment'], check_dtype=False, rtol=1e-9
+    )
+    assert_same_rows(
+        transform(pandas_aggregates, tmp_path, monkeypatch),
+        transform(clickhouse_aggregates, tmp_path, monkeypatch),
+        FACT_COLUMNS, ['date_id', 'mine_id']
+    )
+
+def test_incremental_and_full_refresh_loads_give_the_same_facts(tmp_path, monkeypatch):
+    production, sensors = make_staging_frames()
+    # EQ004 stops reporting after two days: an incremental window from the fourth day only sees three machines
+    sensors = sensors[(sensors['equipment_id'] != 'EQ004') | (sensors['timestamp'] < datetime(2024, 7, 3))]
+    client = PushdownClient(production, sensors)
+    loaded = []
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(etl, 'extract_mines',
+                        lambda client: pd.DataFrame({'mine_id': [1, 2, 3], 'location': 'Berau, Kalimantan'}))
+    monkeypatch.setattr(etl, 'fetch_weather_data', lambda *args, **kwargs: (pd.DataFrame(), {}))
+    monkeypatch.setattr(etl, 'load_to_dwh', lambda client, transformed_data, *args, **kwargs: loaded.append(transformed_data))
+    logger = logging.getLogger('etl.test')
+
+    watermark = date(2024, 7, 3)
+    for watermarks in (None, {'production_logs': watermark, 'equipment_sensors': watermark}):
+        validator = DataValidator('fleet')
+        etl.run_etl(client, None, validator, logger, watermarks, engine='clickhouse', features=False, forecast=False)
+        validator.close()
+
+    full_refresh, incremental = loaded
+    assert len(incremental) == 2 * 3
+    assert_same_rows(
+        full_refresh[pd.to_datetime(full_refresh['date_id']).dt.date > watermark], incremental,
+        FACT_COLUMNS, ['date_id', 'mine_id']
+    )
+
+@pytest.mark.skipif(not os.environ.get('CLICKHOUSE_HOST'), reason='CLICKHOUSE_HOST not set')
+def test_pandas_and_clickhouse_engines_produce_identical_fact_rows(tmp_path, monkeypatch):
+    clickhouse_connect = pytest.importorskip('clickhouse_connect')
+    from etl import extract_aggregates, extract_data
+
+    client = clickhouse_connect.get_client(
+        host=os.environ['CLICKHOUSE_HOST'],
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+    logger = logging.getLogger('etl.test')
+    try:
+        production_data, equipment_data, _ = extract_data(client, logger)
+        pandas_aggregates = aggregate_data(production_data, equipment_data)
+        clickhouse_aggregates, _ = extract_aggregates(client, logger)
+    finally:
+        client.close()
+
+    assert pandas_aggregates['total_equipment'] == clickhouse_aggregates['total_equipment']
+    assert_same_rows(
+        pandas_aggregates['equipment_metrics'], clickhouse_aggregates['equipment_metrics'],
+        EQUIPMENT_COLUMNS, ['date_id', 'equipment_id']
+    )
+    assert_same_rows(
+        transform(pandas_aggregates, tmp_path, monkeypatch),
+        transform(clickhouse_aggregates, tmp_path, monkeypatch),
+        FACT_COLUMNS, ['date_id', 'mine_id']
+    )
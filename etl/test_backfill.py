@@ -0,0 +1,88 @@
+"""Tests for date sharding, checkpointed resumption and report merging of the parallel backfill."""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import backfill
+from backfill import backfill_report, date_shards, run_backfill, run_shard, shard_id, shard_lanes
+from etl import watermark_filter
+
+logger = logging.getLogger('etl.test')
+
+def test_shards_cover_the_range_and_weeks_stop_at_month_ends():
+    months = date_shards(date(2024, 1, 15), date(2024, 4, 10), 'month')
+    weeks = date_shards(date(2024, 1, 22), date(2024, 2, 11), 'week')
+
+    assert months == [(date(2024, 1, 15), date(2024, 1, 31)), (date(2024, 2, 1), date(2024, 2, 29)),
+                      (date(2024, 3, 1), date(2024, 3, 31)), (date(2024, 4, 1), date(2024, 4, 10))]
+    assert weeks == [(date(2024, 1, 22), date(2024, 1, 28)), (date(2024, 1, 29), date(2024, 1, 31)),
+                     (date(2024, 2, 1), date(2024, 2, 4)), (date(2024, 2, 5), date(2024, 2, 11))]
+    assert [len(lane) for lane in shard_lanes(weeks)] == [2, 2]
+    assert date_shards(date(2020, 1, 1), date(2024, 12, 31), 'year')[-1] == (date(2024, 1, 1), date(2024, 12, 31))
+
+def test_shard_bounds_filter_both_ends():
+    where, parameters = watermark_filter('equipment_sensors', {'equipment_sensors': date(2024, 1, 31)}, date(2024, 2, 29))
+
+    assert where == "WHERE toDate(timestamp) > {equipment_sensors_since:Date} AND toDate(timestamp) <= {equipment_sensors_until:Date}"
+    assert parameters == {'equipment_sensors_since': date(2024, 1, 31), 'equipment_sensors_until': date(2024, 2, 29)}
+
+def make_checkpoint():
+    return {
+        'backfill_id': 'test',
+        'options': {'start': '2024-01-22', 'end': '2024-03-31', 'shard': 'week'},
+        'completed': {},
+    }
+
+def test_failed_backfill_resumes_from_the_completed_shards(tmp_path):
+    calls = []
+
+    def run(backfill_id, first, last, options, fail_on=date(2024, 2, 5)):
+        calls.append(first)
+        if first == fail_on:
+            raise RuntimeError('ClickHouse went away')
+        return {'first': first.isoformat(), 'last': last.isoformat(), 'seconds': 1.0,
+                'rows': {'daily_rows': (last - first).days + 1, 'equipment_rows': 0},
+                'validation': {'validation_status': 'FAILED', 'total_errors': 1, 'error_counts': {'negative_production': 1}}}
+
+    checkpoint_path = tmp_path / 'checkpoint.json'
+    checkpoint = make_checkpoint()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        failed = run_backfill('test', checkpoint, checkpoint_path, executor, logger, run)
+
+    # The failed week stops the rest of February; January and March complete
+    assert failed == [shard_id(date(2024, 2, 5), date(2024, 2, 11))]
+    assert date(2024, 2, 12) not in calls and date(2024, 3, 25) in calls
+    saved = json.loads(checkpoint_path.read_text())
+    assert len(saved['completed']) == len(checkpoint['completed']) == 2 + 1 + 5
+
+    calls.clear()
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        failed = run_backfill('test', saved, checkpoint_path, executor, logger,
+                              lambda *shard: run(*shard, fail_on=None))
+
+    assert failed == []
+    assert calls == [date(2024, 2, 5), date(2024, 2, 12), date(2024, 2, 19), date(2024, 2, 26)]
+    report = backfill_report(saved)
+    assert report['shards_completed'] == len(date_shards(date(2024, 1, 22), date(2024, 3, 31), 'week'))
+    assert report['daily_rows'] == 70
+    assert report['validation']['error_counts'] == {'negative_production': report['shards_completed']}
+
+def test_shards_leave_features_and_forecasts_to_the_end_of_the_backfill(tmp_path, monkeypatch):
+    runs = []
+
+    class Client:
+        def close(self):
+            pass
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(backfill, 'connect', Client)
+    monkeypatch.setattr(backfill, 'run_etl', lambda *args, **kwargs: runs.append(kwargs))
+    options = {'engine': 'pandas', 'block_size': 1000, 'load_mode': 'replace', 'load_workers': 1, 'batch_rows': 1000,
+               'total_equipment': 40}
+
+    run_shard('test', date(2024, 2, 1), date(2024, 2, 29), options)
+
+    assert runs[0]['features'] is False and runs[0]['forecast'] is False
+    # Utilization is measured against the fleet counted once for the backfill, not the shard's machines
+    assert runs[0]['total_equipment'] == 40
@@ -0,0 +1,85 @@
+"""Tests for bulk staging ingestion: parsing into typed Arrow columns and batched, parallel inserts."""
+import logging
+import threading
+from decimal import Decimal
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+from bulk_load import bulk_load, parse_sql_dump, read_staging_file
+from loader import ClientPool, ParallelLoader
+
+logger = logging.getLogger('etl.test')
+
+SEED_DUMP = Path(__file__).resolve().parent.parent / 'database' / 'production_logs.sql'
+
+class RecordingClient:
+    """Keeps every Arrow batch it is sent, per table."""
+
+    def __init__(self, batches):
+        self.batches = batches
+
+    def insert_arrow(self, table, arrow_table, settings=None):
+        with self.batches['lock']:
+            self.batches.setdefault(table, []).append(arrow_table)
+
+    def close(self):
+        pass
+
+def test_seed_dump_parses_into_staging_types():
+    tables = read_staging_file(SEED_DUMP)
+
+    mines, logs = tables['staging.mines'], tables['staging.production_logs']
+    assert mines.num_rows == 3
+    assert logs.num_rows == 2190
+    assert logs.schema.field('tons_extracted').type == pa.decimal128(18, 2)
+    assert logs.schema.field('quality_grade').type == pa.decimal128(9, 1)
+    assert logs.schema.field('date').type == pa.date32()
+    assert logs['tons_extracted'][0].as_py() == Decimal('-195.47')
+    dates = logs['date'].to_pylist()
+    assert dates == sorted(dates)
+
+def test_sql_dump_literals_and_multi_row_statements():
+    rows = parse_sql_dump("""
+        -- comment; with a semicolon
+        INSERT INTO staging.mines (mine_id, mine_name) VALUES (1, 'O''Brien; pit'), (2, NULL);
+        INSERT INTO staging.mines (mine_id, mine_name) VALUES (3, 'It\\'s');
+    """)
+
+    assert rows == {('staging.mines', ('mine_id', 'mine_name')): [['1', "O'Brien; pit"], ['2', None], ['3', "It's"]]}
+    with pytest.raises(ValueError):
+        parse_sql_dump("INSERT INTO staging.mines (mine_id) SELECT 1;")
+
+def test_files_load_in_parallel_as_sorted_typed_batches(tmp_path):
+    (tmp_path / 'august').mkdir()
+    sensors_csv = tmp_path / 'equipment_sensors.csv'
+    sensors_csv.write_text(
+        'timestamp,equipment_id,status,fuel_consumption,maintenance_alert\n'
+        + ''.join(f'2024-0{7 + hour % 2}-01 {hour:02d}:00:00,EQ-{hour % 3},active,{hour * 0.5},'
+                  f'{"True" if hour % 5 == 0 else "False"}\n' for hour in range(10))
+    )
+    sensors_parquet = tmp_path / 'august' / 'equipment_sensors.parquet'
+    pq.write_table(pa.table({
+        'timestamp': ['2024-08-02 00:00:00', '2024-08-02 01:00:00'],
+        'equipment_id': ['EQ-9', 'EQ-9'],
+        'status': ['maintenance', 'active'],
+        'fuel_consumption': [1.0, 2.0],
+        'maintenance_alert': [True, False],
+    }), sensors_parquet)
+    batches = {'lock': threading.Lock()}
+    pool = ClientPool(lambda: RecordingClient(batches), size=2)
+
+    totals = bulk_load([sensors_csv, sensors_parquet, SEED_DUMP], ParallelLoader(pool, batch_rows=4), logger)
+
+    assert totals == {'staging.equipment_sensors': 12, 'staging.mines': 3, 'staging.production_logs': 2190}
+    sensor_batches = batches['staging.equipment_sensors']
+    assert sorted(batch.num_rows for batch in sensor_batches) == [2, 2, 4, 4]
+    assert all(batch.schema.field('timestamp').type == pa.timestamp('s') for batch in sensor_batches)
+    assert all(batch.schema.field('maintenance_alert').type == pa.bool_() for batch in sensor_batches)
+    from_csv = [value for batch in sensor_batches if 'EQ-9' not in batch['equipment_id'].to_pylist()
+                for value in batch['timestamp'].to_pylist()]
+    assert len(from_csv) == 10 and from_csv == sorted(from_csv)
+    assert len(batches['staging.production_logs']) == 548
+    assert len(pool.created) <= 2
@@ -0,0 +1,122 @@
+"""Tests for diff-based dimension loading against an in-memory stand-in for ClickHouse."""
+import logging
+import re
+from datetime import date
+
+import pandas as pd
+
+from dimensions import DimensionCache, build_date_dimension, upsert_dimension
+from etl import load_dimensions
+
+logger = logging.getLogger('etl.test')
+
+class DimensionClient:
+    """Holds dimension tables as frames and answers the queries dimensions.py sends."""
+
+    def __init__(self, engine='MergeTree'):
+        self.engine = engine
+        self.tables = {}
+        self.queries = []
+        self.commands = []
+
+    def query_df(self, query, parameters=None):
+        self.queries.append(query)
+        if 'system.tables' in query:
+            return pd.DataFrame({'engine': [self.engine]})
+        table, key = re.search(r'FROM (\S+) WHERE (\w+) IN', query).groups()
+        rows = self.tables.get(table, pd.DataFrame(columns=[key]))
+        rows = rows[rows[key].isin(parameters['keys'])].copy()
+        # Date columns come back as datetimes, like clickhouse_connect
+        for column in ('date_id', 'opened_date'):
+            if column in rows:
+                rows[column] = pd.to_datetime(rows[column])
+        return rows.reset_index(drop=True)
+
+    def command(self, command, parameters=None):
+        self.commands.append(command)
+        match = re.search(r'DELETE FROM (\S+) WHERE (\w+) IN', command)
+        if match:
+            table, key = match.groups()
+            self.tables[table] = self.tables[table][~self.tables[table][key].isin(parameters['keys'])]
+        elif command.startswith('OPTIMIZE'):
+            table = command.split()[2]
+            key = self.tables[table].columns[0]
+            self.tables[table] = self.tables[table].drop_duplicates(key, keep='last')
+
+    def insert_df(self, table, df):
+        self.tables[table] = pd.concat([self.tables.get(table), df], ignore_index=True)
+
+def make_inputs(days=10, mines=3, equipment=5):
+    dates = pd.date_range('2024-07-01', periods=days).date
+    aggregates = {
+        'daily_production': pd.DataFrame({'date_id': dates, 'mine_id': 1}),
+        'equipment_metrics': pd.DataFrame({'equipment_id': [f'EQ{n % equipment}' for n in range(days)]})
+    }
+    mines_data = pd.DataFrame({
+        'mine_id': range(1, mines + 1), 'location': 'Berau, Kalimantan'
+    })
+    location_data = {1: {'location': 'Berau, Kalimantan, Indonesia', 'latitude': 2.0, 'longitude': 117.5,
+                         'timezone': 'Asia/Jakarta', 'elevation': 44.0, 'utc_offset_seconds': 28800}}
+    return aggregates, mines_data, location_data
+
+def cardinality(client):
+    return {table: len(rows) for table, rows in client.tables.items()}
+
+def test_reruns_keep_exact_cardinality_and_only_look_up_unseen_keys():
+    client = DimensionClient()
+    cache = DimensionCache()
+    load_dimensions(client, *make_inputs(), logger, cache)
+    expected = {'dwh.dim_location': 1, 'dwh.dim_date': 10, 'dwh.dim_mine': 3, 'dwh.dim_equipment': 5}
+    assert cardinality(client) == expected
+
+    queries = len(client.queries)
+    load_dimensions(client, *make_inputs(), logger, cache)
+    assert cardinality(client) == expected
+    assert len(client.queries) == queries
+
+    # A fresh process looks the keys up again and still writes nothing
+    load_dimensions(client, *make_inputs(), logger, DimensionCache())
+    assert cardinality(client) == expected
+
+def test_only_new_keys_are_inserted():
+    client = DimensionClient()
+    cache = DimensionCache()
+    load_dimensions(client, *make_inputs(days=10), logger, cache)
+
+    assert upsert_dimension(client, 'dwh.dim_date', build_date_dimension(
+        pd.date_range('2024-07-05', periods=10)
+    ), logger, cache) == 4
+    assert client.tables['dwh.dim_date']['date_id'].is_unique
+    assert len(client.tables['dwh.dim_date']) == 14
+
+def test_changed_member_replaces_previous_row_on_merge_tree():
+    client = DimensionClient()
+    aggregates, mines_data, location_data = make_inputs()
+    load_dimensions(client, aggregates, mines_data, location_data, logger, DimensionCache())
+
+    mines_data.loc[1, 'location'] = 'Kutai, Kalimantan'
+    load_dimensions(client, aggregates, mines_data, location_data, logger, DimensionCache())
+
+    mines = client.tables['dwh.dim_mine'].set_index('mine_id')
+    assert len(mines) == 3
+    assert mines.loc['2', 'location'] == 'Kutai, Kalimantan'
+    assert any(command.startswith('DELETE FROM dwh.dim_mine') for command in client.commands)
+
+def test_changed_member_is_merged_on_replacing_merge_tree():
+    client = DimensionClient(engine='ReplacingMergeTree')
+    aggregates, mines_data, location_data = make_inputs()
+    load_dimensions(client, aggregates, mines_data, location_data, logger, DimensionCache())
+
+    location_data[1]['elevation'] = 52.0
+    load_dimensions(client, aggregates, mines_data, location_data, logger, DimensionCache())
+
+    assert client.tables['dwh.dim_location']['elevation'].tolist() == [52.0]
+    assert client.commands == ['OPTIMIZE TABLE dwh.dim_location FINAL']
+
+def test_date_dimension_attributes():
+    dates = build_date_dimension([date(2024, 7, 6), date(2024, 7, 8), date(2024, 7, 6)])
+
+    assert dates['date_id'].tolist() == [date(2024, 7, 6), date(2024, 7, 8)]
+    assert dates['day_of_week'].tolist() == [6, 1]
+    assert dates['is_weekend'].tolist() == [1, 0]
+    assert dates['quarter'].tolist() == [3, 3]
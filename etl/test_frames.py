@@ -0,0 +1,71 @@
+"""Tests for the typed staging reads and fact measure types."""
+from decimal import Decimal
+
+import pandas as pd
+import pyarrow as pa
+
+from frames import ARROW_READ_SETTINGS, fact_measure_types, query_staging, staging_query
+
+class ArrowClient:
+    """Client double answering query_arrow with a fixed Arrow table."""
+
+    def __init__(self, table):
+        self.table = table
+        self.queries = []
+
+    def query_arrow(self, query, parameters=None, settings=None, use_strings=None):
+        self.queries.append((query, parameters, settings))
+        return self.table
+
+def test_staging_reads_cast_decimals_and_timestamps_in_the_query():
+    query = staging_query('staging.production_logs', 'WHERE date > {production_logs_after:Date}')
+
+    assert 'toFloat64(tons_extracted) AS tons_extracted' in query
+    assert 'toFloat64(quality_grade) AS quality_grade' in query
+    assert query.rstrip().endswith('WHERE date > {production_logs_after:Date}')
+    assert 'toDateTime64(timestamp, 0) AS timestamp' in staging_query('staging.equipment_sensors')
+
+def test_server_arrow_output_becomes_typed_categorical_frame():
+    # As the server sends it: zoned DateTime64, LowCardinality as dictionaries
+    sensors = pa.table({
+        'timestamp': pa.array([1_600_000_000, 1_600_003_600], pa.timestamp('s', tz='Asia/Makassar')),
+        'equipment_id': pa.array(['EX-1', 'EX-2']).dictionary_encode(),
+        'status': pa.array(['active', 'maintenance']).dictionary_encode(),
+        'fuel_consumption': pa.array([1.5, 2.0]),
+        'maintenance_alert': pa.array([False, True]),
+    })
+    client = ArrowClient(sensors)
+
+    frame = query_staging(client, 'staging.equipment_sensors', 'WHERE 1', {'p': 1})
+
+    assert client.queries[0][1] == {'p': 1} and client.queries[0][2] == ARROW_READ_SETTINGS
+    assert isinstance(frame['equipment_id'].dtype, pd.CategoricalDtype)
+    assert isinstance(frame['status'].dtype, pd.CategoricalDtype)
+    # Wall time of the server's time zone, as query_df returned it
+    assert frame['timestamp'].dt.tz is None
+    assert frame['timestamp'].iloc[0] == pd.Timestamp('2020-09-13 20:26:40')
+
+def test_decimal_and_plain_string_columns_are_cast_to_frame_types():
+    production = pa.table({
+        'log_id': pa.array([1, 2], pa.uint32()),
+        'date': pa.array([pd.Timestamp('2024-01-01').date()] * 2, pa.date32()),
+        'mine_id': pa.array([1, 2], pa.uint32()),
+        'shift': pa.array(['Day', 'Night']),
+        'tons_extracted': pa.array([Decimal('10.25'), Decimal('3.50')], pa.decimal128(18, 2)),
+        'quality_grade': pa.array([Decimal('4.5'), Decimal('3.0')], pa.decimal128(9, 1)),
+    })
+
+    frame = query_staging(ArrowClient(production), 'staging.production_logs')
+
+    assert frame['tons_extracted'].dtype == 'float64' and frame['tons_extracted'].tolist() == [10.25, 3.5]
+    assert frame['quality_grade'].dtype == 'float64'
+    assert isinstance(frame['shift'].dtype, pd.CategoricalDtype)
+    assert frame['date'].dtype.kind == 'M'
+
+def test_fact_measures_follow_the_star_schema_column_types():
+    types = fact_measure_types('dwh.fact_daily_production', ['total_production_daily', 'average_quality_grade'])
+
+    assert types == {'total_production_daily': 'float64', 'average_quality_grade': 'float32'}
+    assert fact_measure_types('dwh.fact_equipment_metrics', ['total_fuel_consumption']) == {
+        'total_fuel_consumption': 'float64'
+    }
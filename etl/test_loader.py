@@ -0,0 +1,151 @@
+"""Tests for the concurrent, batched load phase against clients that only simulate latency."""
+import logging
+import re
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from dimensions import DimensionCache
+from etl import load_to_dwh
+from loader import ClientPool, ParallelLoader
+from metrics import RunMetrics
+
+logger = logging.getLogger('etl.test')
+
+class SlowClient:
+    """Accepts every statement after a fixed delay and records what it was sent."""
+
+    def __init__(self, tracker, latency):
+        self.tracker = tracker
+        self.latency = latency
+        self.arrow_batches = []
+
+    def _statement(self):
+        with self.tracker['lock']:
+            self.tracker['in_flight'] += 1
+            self.tracker['max_in_flight'] = max(self.tracker['max_in_flight'], self.tracker['in_flight'])
+        time.sleep(self.latency)
+        with self.tracker['lock']:
+            self.tracker['in_flight'] -= 1
+
+    def query_df(self, query, parameters=None):
+        if 'system.tables' in query:
+            return pd.DataFrame({'engine': ['MergeTree']})
+        # No dimension member exists yet
+        return pd.DataFrame(columns=[re.search(r'WHERE (\w+) IN', query)[1]])
+
+    def command(self, command, parameters=None):
+        self.tracker['commands'].append(command)
+        self._statement()
+
+    def insert_df(self, table, df):
+        self._statement()
+
+    def insert_arrow(self, table, arrow_table, settings=None):
+        self.arrow_batches.append((table, arrow_table.num_rows, settings))
+        self._statement()
+
+    def close(self):
+        pass
+
+def make_pool(size, latency=0.0):
+    tracker = {'lock': threading.Lock(), 'in_flight': 0, 'max_in_flight': 0, 'commands': []}
+    return ClientPool(lambda: SlowClient(tracker, latency), size=size), tracker
+
+def make_run(days=60, mines=3, equipment=8):
+    dates = pd.date_range('2024-07-01', periods=days).date
+    transformed = pd.DataFrame({
+        'date_id': np.repeat(dates, mines),
+        'mine_id': np.tile(np.arange(1, mines + 1), days),
+        'location_id': 1,
+        'total_production_daily': 100.0,
+        'average_quality_grade': 5.0,
+        'equipment_utilization': 50.0,
+        'fuel_efficiency': 2.0
+    })
+    aggregates = {
+        'daily_production': transformed[['date_id', 'mine_id', 'location_id']],
+        'equipment_metrics': pd.DataFrame({
+            'date_id': np.repeat(dates, equipment),
+            'equipment_id': np.tile([f'EQ{n}' for n in range(equipment)], days),
+            'total_operational_hours': 20,
+            'total_maintenance_hours': 2,
+            'total_fuel_consumption': 80.0,
+            'maintenance_alerts': 0
+        })
+    }
+    mines_data = pd.DataFrame({'mine_id': range(1, mines + 1), 'location': 'Berau, Kalimantan'})
+    return transformed, aggregates, mines_data
+
+def test_insert_streams_arrow_batches_with_async_insert():
+    pool, _ = make_pool(1)
+    loader = ParallelLoader(pool, batch_rows=3, async_insert=True)
+    with pool.client() as client:
+        rows = loader.insert(client, 'dwh.fact_daily_production', pd.DataFrame({
+            'date_id': [date(2024, 7, day) for day in range(1, 11)], 'temperature_2m_mean': np.nan
+        }))
+
+    assert rows == 10
+    assert [batch[1] for batch in client.arrow_batches] == [3, 3, 3, 1]
+    assert client.arrow_batches[0][2] == {'async_insert': 1, 'wait_for_async_insert': 1}
+
+def test_tables_load_concurrently_over_the_pool():
+    transformed, aggregates, mines_data = make_run(days=20)
+    latency = 0.1
+
+    timings = {}
+    for size in (1, 4):
+        pool, tracker = make_pool(size, latency)
+        started = time.perf_counter()
+        load_to_dwh(None, transformed, aggregates, mines_data, {}, logger, 'append',
+                    ParallelLoader(pool), DimensionCache())
+        timings[size] = time.perf_counter() - started
+        assert tracker['max_in_flight'] <= size
+        assert len(pool.created) <= size
+
+    # Six single-statement tables take two rounds instead of six; the aggregate refresh afterwards is sequential
+    assert timings[1] - timings[4] > 3 * latency
+
+def test_failed_table_is_raised_after_the_others_finish():
+    pool, _ = make_pool(2)
+    finished = []
+
+    def ok(client):
+        time.sleep(0.05)
+        finished.append('ok')
+
+    def broken(client):
+        raise RuntimeError('insert rejected')
+
+    with pytest.raises(RuntimeError, match='insert rejected'):
+        ParallelLoader(pool).run({'dwh.dim_date': ok, 'dwh.fact_daily_production': broken}, logger)
+    assert finished == ['ok']
+
+def test_every_load_task_is_measured():
+    transformed, aggregates, mines_data = make_run(days=5)
+    pool, _ = make_pool(2)
+    metrics = RunMetrics()
+
+    load_to_dwh(None, transformed, aggregates, mines_data, {}, logger, 'append',
+                ParallelLoader(pool), DimensionCache(), metrics)
+
+    stages = {stage['stage']: stage for stage in metrics.stages}
+    assert stages['load_daily_production']['rows_in'] == stages['load_daily_production']['rows_out'] == 15
+    assert stages['load_equipment_metrics']['rows_out'] == 40
+    assert stages['load_dimensions:dwh.dim_date']['rows_out'] == 5
+    assert stages['load_dimensions:dwh.dim_mine']['bytes'] > 0
+    assert 'refresh_preaggregates' in stages
+
+def test_appends_rebuild_the_monthly_weather_aggregate():
+    transformed, aggregates, mines_data = make_run(days=40)
+    pool, tracker = make_pool(1)
+
+    load_to_dwh(None, transformed, aggregates, mines_data, {}, logger, 'append', ParallelLoader(pool), DimensionCache())
+
+    # The materialized view feeds daily_production_agg; July and August of the weather aggregate are rebuilt
+    replaced = [command.split()[2] for command in tracker['commands'] if 'REPLACE PARTITION' in command]
+    assert replaced == ['dwh.weather_impact_monthly'] * 2
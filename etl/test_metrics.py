@@ -0,0 +1,75 @@
+"""Tests for the per-stage run metrics and the profiling hook."""
+import json
+import logging
+import pstats
+
+import pandas as pd
+import pytest
+
+import etl
+from metrics import ETL_RUNS_COLUMNS, RunMetrics, frame_bytes
+from validation import DataValidator
+
+def test_stages_record_time_rows_and_memory_into_metrics_json(tmp_path):
+    metrics = RunMetrics('run1', tmp_path)
+    frame = pd.DataFrame({'value': range(1000)})
+
+    with metrics.stage('extract_data') as stage:
+        stage['rows_out'] = len(frame)
+        stage['bytes'] = frame_bytes(frame)
+    with pytest.raises(RuntimeError):
+        with metrics.stage('transform_data', rows_in=1000):
+            raise RuntimeError('boom')
+
+    written = json.loads(metrics.write('failed').read_text())
+    extract, transform = written['stages']
+    assert written['run_id'] == 'run1' and written['status'] == 'failed'
+    assert extract['rows_out'] == 1000 and extract['bytes'] == 8000 and extract['status'] == 'ok'
+    assert extract['wall_seconds'] >= 0 and extract['cpu_seconds'] >= 0 and extract['peak_rss_mb'] > 0
+    assert transform['rows_in'] == 1000 and transform['status'] == 'failed'
+
+    rows = metrics.to_frame()
+    assert list(rows.columns) == ETL_RUNS_COLUMNS
+    assert rows['rows_out'].tolist() == [1000, pd.NA]
+
+def test_cprofile_hook_dumps_one_profile_per_stage(tmp_path):
+    metrics = RunMetrics('run1', tmp_path, profiler='cprofile')
+
+    with metrics.stage('load_dimensions:dwh.dim_date'):
+        with metrics.stage('nested'):
+            sorted(range(10000), key=lambda value: -value)
+
+    profile = tmp_path / 'profiles' / 'load_dimensions_dwh.dim_date.prof'
+    assert profile.exists() and not (tmp_path / 'profiles' / 'nested.prof').exists()
+    assert pstats.Stats(str(profile)).total_calls > 0
+
+def test_validator_times_each_rule_and_in_database_check(tmp_path, monkeypatch, transformed_frame, weather, mines):
+    monkeypatch.chdir(tmp_path)
+    validator = DataValidator('metrics_test')
+
+    class NoViolationsClient:
+        first_row = [0] * 20
+
+        def query(self, query, parameters=None):
+            return self
+
+    validator.validate(transformed_frame, {'weather': weather, 'mines': mines})
+    validator.check_in_database(NoViolationsClient())
+
+    stages = {stage['stage']: stage for stage in validator.metrics.stages}
+    assert stages['validate']['rows_in'] == 6
+    assert stages['validate:negative_production']['rows_out'] == 1
+    assert stages['validate:invalid_utilization']['rows_out'] == 1
+    assert all(f'validate:{rule.name}' in stages for rule in validator.rules)
+    assert 'check_in_database:staging.production_logs' in stages
+
+def test_failed_forecast_is_recorded_without_failing_the_run(monkeypatch):
+    metrics = RunMetrics('run1')
+
+    def write_forecasts(client, logger):
+        raise RuntimeError('registry unavailable')
+
+    monkeypatch.setattr(etl, 'write_forecasts', write_forecasts)
+    etl.forecast_production(None, logging.getLogger('etl.test'), metrics)
+
+    assert [(stage['stage'], stage['status']) for stage in metrics.stages] == [('forecast_production', 'failed')]
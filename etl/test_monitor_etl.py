@@ -0,0 +1,94 @@
+"""Tests for the run log index, filtered log streams and trends of monitor_etl."""
+import json
+
+from monitor_etl import load_index, main, read_records, stage_trends, tail_lines, trends
+
+ETL_LOG = """\
+2024-07-01 00:00:00,000 - INFO - Starting ETL process (Run ID: {run_id}, mode: incremental, engine: pandas, load: replace)
+2024-07-01 00:00:01,000 - INFO - Starting data extraction from staging tables...
+2024-07-01 00:00:02,000 - INFO - Data extraction completed successfully: 10 production rows, 200 sensor rows
+2024-07-01 00:00:03,000 - WARNING - No weather data available for validation
+2024-07-01 00:00:03,500 - INFO - Starting data transformation and validation...
+2024-07-01 00:00:04,000 - INFO - Starting data load to DWH...
+2024-07-01 00:00:05,000 - INFO - Loaded 10 records into fact_daily_production
+2024-07-01 00:00:05,000 - INFO - Loaded 8 records into fact_equipment_metrics
+"""
+
+def write_run(logs_dir, run_id, failed=False, metrics=None, day='2024-07-01'):
+    run_dir = logs_dir / f'run_{run_id}'
+    run_dir.mkdir(parents=True)
+    log = ETL_LOG.format(run_id=run_id)
+    if failed:
+        log += ("2024-07-01 00:00:06,000 - ERROR - Load of dwh.dim_mine failed: boom\n"
+                "Traceback (most recent call last):\n  File \"etl.py\", line 1\n"
+                "2024-07-01 00:00:06,500 - ERROR - ETL process failed: boom\n")
+    else:
+        log += "2024-07-01 00:00:07,000 - INFO - ETL process completed successfully\n"
+    (run_dir / 'etl.log').write_text(log.replace('2024-07-01', day))
+    (run_dir / 'validation.log').write_text(
+        "2024-07-01 00:00:03,600 - INFO - === Validation Summary ===\n"
+        "2024-07-01 00:00:03,600 - INFO - Total Errors: 3\n"
+    )
+    if metrics:
+        (run_dir / 'metrics.json').write_text(json.dumps(metrics))
+    return run_dir
+
+def test_index_summarizes_runs_and_refreshes_only_changed_ones(tmp_path):
+    write_run(tmp_path, '20240701_000000')
+    failed = write_run(tmp_path, '20240702_000000', failed=True)
+
+    runs = load_index(tmp_path)
+
+    assert runs['20240701_000000']['status'] == 'success'
+    assert runs['20240701_000000']['duration_seconds'] == 7.0
+    assert runs['20240701_000000']['rows_extracted'] == 210 and runs['20240701_000000']['rows_loaded'] == 18
+    assert runs['20240701_000000']['validation_errors'] == 3
+    # The traceback lines belong to the first error record
+    assert runs['20240702_000000']['status'] == 'failed' and runs['20240702_000000']['log_errors'] == 2
+
+    (failed / 'etl.log').write_text('')
+    refreshed = load_index(tmp_path)
+    assert refreshed['20240701_000000'] == runs['20240701_000000']
+    assert refreshed['20240702_000000']['status'] == 'incomplete'
+
+def test_metrics_json_provides_stage_times(tmp_path):
+    write_run(tmp_path, '20240701_000000', metrics={
+        'run_id': '20240701_000000', 'status': 'success',
+        'started_at': '2024-07-01T00:00:00', 'finished_at': '2024-07-01T00:00:09',
+        'stages': [
+            {'stage': 'extract_data', 'rows_out': 210, 'wall_seconds': 1.5},
+            {'stage': 'validate:negative_production', 'rows_out': 1, 'wall_seconds': 0.1},
+            {'stage': 'load_daily_production', 'rows_out': 10, 'wall_seconds': 0.5},
+        ]
+    })
+
+    run = load_index(tmp_path)['20240701_000000']
+
+    assert run['duration_seconds'] == 9.0 and run['rows_loaded'] == 10
+    assert run['stages'] == {'extract_data': 1.5, 'load_daily_production': 0.5}
+    assert stage_trends({'a': run})['median_seconds']['extract_data'] == 1.5
+
+def test_logs_are_filtered_by_level_and_stage_and_tailed(tmp_path, capsys):
+    path = write_run(tmp_path, '20240701_000000', failed=True) / 'etl.log'
+
+    errors = list(read_records(path, level='ERROR'))
+    loads = [record['message'] for record in read_records(path, stage='load', pattern='Loaded')]
+
+    assert [record['continued'] for record in errors] == [False, True, True, False]
+    assert loads == ['Loaded 10 records into fact_daily_production', 'Loaded 8 records into fact_equipment_metrics']
+    assert tail_lines(path, 2, block_size=16)[-1].endswith('ETL process failed: boom')
+
+    main(['--logs-dir', str(tmp_path), 'logs', 'latest', '--level', 'WARNING', '--tail', '1'])
+    assert capsys.readouterr().out.strip().endswith('[load] ETL process failed: boom')
+
+def test_trends_group_runs_by_day(tmp_path):
+    for run_id, failed, day in (('20240701_000000', False, '2024-07-01'), ('20240701_120000', True, '2024-07-01'),
+                                ('20240702_000000', False, '2024-07-02')):
+        write_run(tmp_path, run_id, failed, day=day)
+
+    daily = trends(load_index(tmp_path))
+
+    assert daily['runs'].tolist() == [2, 1]
+    assert daily['failed'].tolist() == [1, 0]
+    assert daily['rows_loaded'].tolist() == [36, 18]
+    assert daily['median_seconds'].tolist() == [6.75, 7.0]
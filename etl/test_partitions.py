@@ -0,0 +1,168 @@
+"""Tests for partition-replace fact loading against an in-memory stand-in for ClickHouse."""
+import logging
+import re
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from etl import rewind_watermarks, start_watermarks, truncate_facts, watermark_filter
+from partitions import partition_ids, write_facts
+from preaggregates import refresh_preaggregates
+
+logger = logging.getLogger('etl.test')
+
+TABLE = 'dwh.fact_daily_production'
+
+class PartitionClient:
+    """Month-partitioned tables held as frames, answering the statements partitions.py sends."""
+
+    def __init__(self):
+        empty = pd.DataFrame(columns=['date_id', 'mine_id', 'total_production_daily'])
+        self.tables = {TABLE: empty, 'dwh.daily_production_agg': empty, 'dwh.weather_impact_monthly': empty}
+        self.commands = []
+        self.fail_on_replace = False
+
+    def command(self, command, parameters=None):
+        self.commands.append(command)
+        if match := re.match(r'CREATE TABLE (\S+) AS (\S+)', command):
+            self.tables[match[1]] = self.tables[match[2]].iloc[:0]
+        elif match := re.match(r'INSERT INTO (\S+) SELECT \* FROM (\S+) WHERE', command):
+            source = self.tables[match[2]]
+            months = pd.to_datetime(source['date_id']).dt.strftime('%Y%m').astype(int)
+            keep = months.isin(parameters['partitions']) & ~source['date_id'].isin(parameters['days'])
+            self.insert_df(match[1], source[keep])
+        elif match := re.match(r"ALTER TABLE (\S+) REPLACE PARTITION ID '(\d+)' FROM (\S+)", command):
+            if self.fail_on_replace:
+                raise RuntimeError('connection reset')
+            table, partition, source = match.groups()
+            in_partition = lambda df: pd.to_datetime(df['date_id']).dt.strftime('%Y%m') == partition
+            self.tables[table] = pd.concat(
+                [self.tables[table][~in_partition(self.tables[table])],
+                 self.tables[source][in_partition(self.tables[source])]],
+                ignore_index=True
+            )
+        elif match := re.match(r'DROP TABLE IF EXISTS (\S+)', command):
+            self.tables.pop(match[1], None)
+
+    def insert_df(self, table, df):
+        self.tables[table] = pd.concat([self.tables[table], df], ignore_index=True)
+
+def facts(days, production=100.0, mines=('1', '2')):
+    return pd.DataFrame([
+        {'date_id': day, 'mine_id': mine, 'total_production_daily': production}
+        for day in days for mine in mines
+    ])
+
+JULY = [date(2024, 7, day) for day in range(1, 32)]
+AUGUST = [date(2024, 8, day) for day in range(1, 11)]
+
+def test_rerunning_a_load_does_not_duplicate_rows():
+    client = PartitionClient()
+    write_facts(client, TABLE, facts(JULY + AUGUST), logger)
+    write_facts(client, TABLE, facts(JULY + AUGUST), logger)
+
+    assert len(client.tables[TABLE]) == 2 * (31 + 10)
+    assert not client.tables[TABLE].duplicated(['date_id', 'mine_id']).any()
+    assert not any('__load_' in table for table in client.tables)
+
+def test_late_rows_replace_only_their_days_and_partitions():
+    client = PartitionClient()
+    write_facts(client, TABLE, facts(JULY + AUGUST), logger)
+    client.commands.clear()
+
+    replaced = write_facts(client, TABLE, facts(JULY[9:12], production=250.0), logger)
+
+    table = client.tables[TABLE].set_index(['date_id', 'mine_id'])['total_production_daily']
+    assert replaced == ['202407']
+    assert len(table) == 2 * (31 + 10)
+    assert table.loc[(date(2024, 7, 11), '1')] == 250.0
+    assert table.loc[(date(2024, 7, 9), '1')] == 100.0
+    assert not any('202408' in command for command in client.commands)
+
+def test_failed_swap_leaves_table_intact_and_cleans_up():
+    client = PartitionClient()
+    write_facts(client, TABLE, facts(JULY), logger)
+    client.fail_on_replace = True
+
+    with pytest.raises(RuntimeError):
+        write_facts(client, TABLE, facts(JULY, production=1.0), logger)
+
+    assert client.tables[TABLE]['total_production_daily'].eq(100.0).all()
+    assert not any('__load_' in table for table in client.tables)
+
+def test_append_mode_inserts_directly():
+    client = PartitionClient()
+    write_facts(client, TABLE, facts(JULY), logger, load_mode='append')
+    write_facts(client, TABLE, facts(JULY), logger, load_mode='append')
+
+    assert len(client.tables[TABLE]) == 4 * 31
+    assert client.commands == []
+
+def test_recompute_from_rewinds_watermarks():
+    watermarks = {'production_logs': date(2024, 8, 10), 'equipment_sensors': None}
+
+    assert rewind_watermarks(watermarks, date(2024, 7, 10), logger) == {
+        'production_logs': date(2024, 7, 9), 'equipment_sensors': None
+    }
+    assert partition_ids([date(2024, 7, 31), date(2024, 8, 1), date(2024, 7, 1)]) == ['202407', '202408']
+
+class WatermarkClient:
+    """Answers the watermark queries with the last loaded day of each fact table."""
+
+    def __init__(self, last_loaded):
+        self.last_loaded = last_loaded
+        self.queries = []
+
+    def query(self, query, parameters=None):
+        self.queries.append(query)
+        table = query.split()[-1]
+        return type('Result', (), {'first_row': (self.last_loaded.get(table),)})
+
+def test_incremental_runs_extract_the_last_loaded_day_again():
+    client = WatermarkClient({TABLE: date(2024, 8, 10)})
+
+    watermarks = start_watermarks(client, logger)
+
+    assert watermarks == {'production_logs': date(2024, 8, 9), 'equipment_sensors': None}
+    where, parameters = watermark_filter('production_logs', watermarks)
+    assert where == 'WHERE date > {production_logs_since:Date}'
+    assert parameters == {'production_logs_since': date(2024, 8, 9)}
+    assert start_watermarks(client, logger, lookback_days=0)['production_logs'] == date(2024, 8, 10)
+    assert start_watermarks(client, logger, recompute_from=date(2024, 7, 10))['production_logs'] == date(2024, 7, 9)
+
+def test_full_refresh_extracts_everything_without_reading_watermarks():
+    client = WatermarkClient({TABLE: date(2024, 8, 10)})
+
+    watermarks = start_watermarks(client, logger, full_refresh=True, recompute_from=date(2024, 7, 10))
+
+    assert watermarks is None and client.queries == []
+    assert watermark_filter('production_logs', watermarks) == ('', {})
+    assert watermark_filter('equipment_sensors', watermarks, until=date(2024, 8, 10))[0] == \
+        'WHERE toDate(timestamp) <= {equipment_sensors_until:Date}'
+
+def test_preaggregates_are_rebuilt_only_for_loaded_months():
+    client = PartitionClient()
+
+    refresh_preaggregates(client, ['202407'], logger)
+
+    replaced = [command for command in client.commands if 'REPLACE PARTITION' in command]
+    assert [command.split()[2] for command in replaced] == ['dwh.daily_production_agg', 'dwh.weather_impact_monthly']
+    assert all("ID '202407'" in command for command in replaced)
+
+def test_appended_months_rebuild_the_aggregates_no_materialized_view_feeds():
+    client = PartitionClient()
+
+    refresh_preaggregates(client, partition_ids(facts(JULY)['date_id']), logger, load_mode='append')
+
+    replaced = [command for command in client.commands if 'REPLACE PARTITION' in command]
+    assert [command.split()[2] for command in replaced] == ['dwh.weather_impact_monthly']
+
+def test_full_refresh_empties_the_aggregates_and_features():
+    client = PartitionClient()
+
+    truncate_facts(client, logger)
+
+    truncated = {command.split()[-1] for command in client.commands if command.startswith('TRUNCATE')}
+    assert {'dwh.fact_daily_production', 'dwh.daily_production_agg', 'dwh.weather_impact_monthly',
+            'dwh.production_features'} <= truncated
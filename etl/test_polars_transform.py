@@ -0,0 +1,67 @@
+"""Parity checks between the pandas and Polars transform engines: identical frames, not just close values."""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from aggregation import aggregate_data
+from etl import derive_daily_metrics, prepare_daily_production, transform_data
+from frames import arrow_to_frame, typed_arrow
+from locations import assign_locations, resolve_mine_locations
+from synthetic import generate_staging, generate_weather, staging_scale
+from validation import DataValidator
+
+pytest.importorskip('polars')
+from polars_transform import derive_daily_metrics as derive_daily_metrics_polars  # noqa: E402
+
+SCALE = staging_scale(mines=4, equipment=6, years=0.25, seed=3)
+
+@pytest.fixture(scope='module')
+def daily_inputs():
+    """Daily production (with locations), equipment totals and weather of a small synthetic data set."""
+    staging = {table: arrow_to_frame(typed_arrow(table, rows)) for table, rows in generate_staging(SCALE).items()}
+    aggregates = aggregate_data(staging['staging.production_logs'], staging['staging.equipment_sensors'])
+    mine_locations, locations = resolve_mine_locations(staging['staging.mines'], logging.getLogger('etl.test'))
+    aggregates['daily_production'] = assign_locations(aggregates['daily_production'], mine_locations)
+    weather = generate_weather(SCALE, [location['location_id'] for location in locations])
+    return aggregates, weather, staging['staging.mines']
+
+def test_transform_engines_return_identical_validated_frames(daily_inputs, tmp_path, monkeypatch):
+    aggregates, weather, mines = daily_inputs
+    monkeypatch.chdir(tmp_path)
+    logger = logging.getLogger('etl.test')
+
+    pandas_rows, polars_rows = (
+        transform_data(aggregates, weather, DataValidator(f'parity_{engine}'), logger, mines, engine)
+        for engine in ('pandas', 'polars')
+    )
+
+    pd.testing.assert_frame_equal(pandas_rows, polars_rows, check_exact=True)
+    pd.testing.assert_frame_equal(
+        prepare_daily_production(pandas_rows), prepare_daily_production(polars_rows), check_exact=True
+    )
+
+@pytest.mark.parametrize('case', ['no_weather', 'equipment_gaps', 'missing_weather_values', 'zero_fuel', 'no_production'])
+def test_transform_engines_agree_on_gaps_and_edge_values(daily_inputs, case):
+    aggregates, weather, _ = daily_inputs
+    daily_production = aggregates['daily_production']
+    daily_equipment = aggregates['daily_equipment']
+    if case == 'no_weather':
+        weather = pd.DataFrame()
+    elif case == 'equipment_gaps':
+        daily_equipment = daily_equipment.iloc[::3].reset_index(drop=True)
+        weather = weather.iloc[::2]
+    elif case == 'missing_weather_values':
+        weather = weather.assign(rainfall_mm=weather['rainfall_mm'].where(np.arange(len(weather)) % 5 != 0))
+    elif case == 'zero_fuel':
+        daily_equipment = daily_equipment.assign(
+            fuel_consumption=daily_equipment['fuel_consumption'].where(np.arange(len(daily_equipment)) % 4 != 0, 0.0)
+        )
+    else:
+        daily_production = daily_production.iloc[:0]
+
+    expected = derive_daily_metrics(daily_production, daily_equipment, weather, aggregates['total_equipment'])
+    result = derive_daily_metrics_polars(daily_production, daily_equipment, weather, aggregates['total_equipment'])
+
+    pd.testing.assert_frame_equal(expected, result, check_exact=True)
@@ -0,0 +1,125 @@
+"""Tests for the declarative validation rules and their DataValidator wiring.
+
+The in-database test checks that the SQL form of the staging rules counts the
+same violations as the frame form on the staging data of a running ClickHouse
+(read-only) and only runs when CLICKHOUSE_HOST is set.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from rules import RuleSet, load_rules
+from validation import DataValidator
+
+def test_rules_are_evaluated_on_input_values_and_actions_applied_once(transformed_frame, weather, mines):
+    frame = transformed_frame
+    frame.loc[1, 'mine_id'] = 7
+
+    result, masks, quarantined = load_rules()['daily_production'].evaluate(
+        frame, {'weather': weather, 'mines': mines}
+    )
+
+    assert {name: np.flatnonzero(mask).tolist() for name, mask in masks.items()} == {
+        'negative_production': [0],
+        'invalid_utilization': [1],
+        'missing_weather': [3],
+        'unknown_mine': [1],
+        'duplicate_production_row': [5],
+    }
+    # Row 1 is quarantined, row 5 dropped as a duplicate, the rest repaired in place
+    assert result.index.tolist() == [0, 2, 3, 4]
+    assert result.loc[0, 'total_production_daily'] == 0
+    assert quarantined['mine_id'].tolist() == [7]
+    assert frame.loc[0, 'total_production_daily'] == -50.0
+
+def test_referential_rules_without_reference_are_skipped(transformed_frame, weather):
+    _, masks, _ = load_rules()['daily_production'].evaluate(transformed_frame, {'weather': weather})
+
+    assert 'unknown_mine' not in masks
+    assert masks['missing_weather'].sum() == 1
+
+def test_empty_references_skip_the_rule_instead_of_dropping_every_row(transformed_frame, weather):
+    frame = transformed_frame
+    rules = load_rules()['daily_production']
+
+    result, masks, quarantined = rules.evaluate(frame, {'weather': weather, 'mines': pd.DataFrame()})
+    assert 'unknown_mine' not in masks and quarantined.empty
+
+    result, masks, quarantined = rules.evaluate(frame, {'weather': weather, 'mines': pd.DataFrame({'name': ['A']})})
+    assert 'unknown_mine' not in masks and quarantined.empty
+    assert len(result) == len(frame) - 1  # only the duplicate row is dropped
+
+def test_monotonic_and_not_null_rules():
+    readings = pd.DataFrame({
+        'equipment_id': ['A', 'B', 'A', 'A', 'B'],
+        'timestamp': [1, 1, 2, 3, 2],
+        'engine_hours': [10.0, 5.0, 9.0, np.nan, 5.0],
+    }, index=[10, 11, 12, 13, 14])
+    rules = RuleSet([
+        {'name': 'engine_hours_decrease', 'type': 'monotonic', 'column': 'engine_hours',
+         'order_by': 'timestamp', 'group_by': ['equipment_id'], 'strict': True},
+        {'name': 'missing_engine_hours', 'type': 'not_null', 'column': 'engine_hours', 'action': 'zero'},
+    ])
+
+    result, masks, _ = rules.evaluate(readings)
+
+    assert masks['engine_hours_decrease'].tolist() == [False, False, True, False, True]
+    assert masks['missing_engine_hours'].tolist() == [False, False, False, True, False]
+    assert result.loc[13, 'engine_hours'] == 0
+
+def test_invalid_rules_are_rejected():
+    with pytest.raises(ValueError):
+        RuleSet([{'name': 'bad', 'type': 'unique', 'columns': ['date_id'], 'action': 'clip'}])
+    with pytest.raises(ValueError):
+        RuleSet([{'name': 'bad', 'type': 'between', 'column': 'x'}])
+
+def test_validator_records_every_rule_in_one_pass(tmp_path, monkeypatch, transformed_frame, weather, mines):
+    monkeypatch.chdir(tmp_path)
+    validator = DataValidator('rules')
+
+    validator.validate(transformed_frame, {'weather': weather, 'mines': mines})
+    validator.write_violations()
+
+    summary = validator.get_validation_summary()
+    assert summary['total_errors'] == 4
+    assert summary['error_counts']['invalid_utilization'] == 1
+    assert summary['error_counts']['unknown_mine'] == 0
+    assert validator.get_violations()['rule'].value_counts().to_dict() == {
+        'negative_production': 1, 'invalid_utilization': 1, 'missing_weather': 1, 'duplicate_production_row': 1
+    }
+
+def test_rule_evaluation_copies_only_when_it_repairs_values():
+    frame = pd.DataFrame({'value': [1.0, -1.0, 2.0]})
+
+    untouched, _, _ = RuleSet([{'name': 'positive', 'type': 'range', 'column': 'value', 'max': 10}]).evaluate(frame)
+    repaired, _, _ = RuleSet([
+        {'name': 'positive', 'type': 'range', 'column': 'value', 'min': 0, 'action': 'clip'}
+    ]).evaluate(frame)
+
+    assert untouched is frame
+    assert repaired['value'].tolist() == [1.0, 0.0, 2.0]
+    assert frame['value'].tolist() == [1.0, -1.0, 2.0]
+
+@pytest.mark.skipif(not os.environ.get('CLICKHOUSE_HOST'), reason='CLICKHOUSE_HOST not set')
+def test_staging_rules_count_the_same_in_database_and_in_pandas():
+    clickhouse_connect = pytest.importorskip('clickhouse_connect')
+
+    client = clickhouse_connect.get_client(
+        host=os.environ['CLICKHOUSE_HOST'],
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+    try:
+        rules = load_rules()['staging.production_logs']
+        in_database = rules.check_in_database(client, 'staging.production_logs')
+        production = client.query_df('SELECT * FROM staging.production_logs')
+        mines = client.query_df('SELECT mine_id FROM staging.mines')
+    finally:
+        client.close()
+
+    _, masks, _ = rules.evaluate(production, {'mines': mines})
+    in_pandas = {name: int(mask.sum()) for name, mask in masks.items()}
+    assert in_database == in_pandas
@@ -1,83 +1,210 @@
-import pandas as pd
-import requests
-from datetime import datetime, timedelta
+"""Tests for weather extraction against a local stub of the Open-Meteo archive API.
+
+Run with `pytest etl/`. Running this file directly still performs a live
+smoke test against the real archive API using a throwaway cache.
+"""
+import json
 import logging
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
 
-# Set up basic logging for the test
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-
-def fetch_weather_data(start_date, end_date):
-    """
-    Fetches historical weather data from the Open-Meteo Archive API for a given date range.
-    """
-    logger = logging.getLogger('weather_scraper_test')
-    logger.info(f'Fetching historical weather data from {start_date.strftime("%Y-%m-%d")} to {end_date.strftime("%Y-%m-%d")}')
-    base_url = "https://archive-api.open-meteo.com/v1/archive"
-    weather_rows = []
-
-    for n in range((end_date - start_date).days + 1):
-        date_str = (start_date + timedelta(days=n)).strftime('%Y-%m-%d')
-        params = {
-            'latitude': 2.0167,
-            'longitude': 117.3000,
-            'daily': 'temperature_2m_mean,precipitation_sum',
-            'timezone': 'Asia/Jakarta',
-            'start_date': date_str,
-            'end_date': date_str
-        }
-        try:
-            resp = requests.get(base_url, params=params)
-            if resp.status_code == 200:
-                data = resp.json()
-                if 'daily' in data and data['daily']['time']:
-                    weather_rows.append({
-                        'date': pd.to_datetime(data['daily']['time'][0]),
-                        'temperature_2m_mean': data['daily']['temperature_2m_mean'][0],
-                        'precipitation_sum': data['daily']['precipitation_sum'][0]
-                    })
-                    logger.info(f"Successfully fetched weather for {date_str}")
-                else:
-                    logger.warning(f"No weather data returned for {date_str}. Response: {data}")
-            else:
-                logger.error(f"Failed to fetch weather for {date_str}: HTTP {resp.status_code} - {resp.text}")
-        except Exception as e:
-            logger.error(f"An exception occurred while fetching weather for {date_str}: {e}")
-            
-    return pd.DataFrame(weather_rows)
+import pandas as pd
+import pytest
 
-if __name__ == "__main__":
-    print("--- Running Weather API Test ---")
-    
-    # Define a small date range for the test
-    test_start_date = datetime(2024, 7, 1)
-    test_end_date = datetime(2024, 7, 3)
-    
-    # Fetch and print the full JSON response for one day
-    print("\n--- Full JSON Response for a Single Day (2024-07-01): ---")
-    import json
-    single_day_params = {
-        'latitude': 2.0167,
-        'longitude': 117.3000,
-        'daily': 'temperature_2m_mean,precipitation_sum',
-        'timezone': 'Asia/Jakarta',
-        'start_date': '2024-07-01',
-        'end_date': '2024-07-01'
+from etl import fetch_weather_data, transform_data
+from locations import assign_locations
+from validation import DataValidator
+from weather import WeatherCache, coalesce_gaps
+
+logger = logging.getLogger('weather_scraper_test')
+
+class StubArchiveHandler(BaseHTTPRequestHandler):
+    """Serves deterministic daily weather and records every request it receives."""
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlparse(self.path).query).items()}
+        with self.server.lock:
+            self.server.requests.append(params)
+            self.server.in_flight += 1
+            self.server.max_in_flight = max(self.server.max_in_flight, self.server.in_flight)
+        time.sleep(self.server.latency)
+        with self.server.lock:
+            self.server.in_flight -= 1
+        start = date.fromisoformat(params['start_date'])
+        end = date.fromisoformat(params['end_date'])
+        days = [start + timedelta(days=n) for n in range((end - start).days + 1)]
+        body = json.dumps({
+            'latitude': round(float(params['latitude']), 1),
+            'longitude': round(float(params['longitude']), 1),
+            'elevation': 44.0,
+            'timezone': params['timezone'],
+            'utc_offset_seconds': 25200,
+            'daily': {
+                'time': [day.isoformat() for day in days],
+                # Days at or after `unavailable_from` are not in the archive yet
+                # Temperature encodes the longitude so tests can tell locations apart
+                'temperature_2m_mean': [
+                    None if day >= self.server.unavailable_from else round(float(params['longitude'])) / 10 + day.day / 10
+                    for day in days
+                ],
+                'precipitation_sum': [
+                    None if day >= self.server.unavailable_from else float(day.day % 5) for day in days
+                ]
+            }
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def stub_api():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubArchiveHandler)
+    server.requests = []
+    server.unavailable_from = date.max
+    server.latency = 0
+    server.lock = threading.Lock()
+    server.in_flight = server.max_in_flight = 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f'http://127.0.0.1:{server.server_port}/v1/archive'
+    yield server
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = WeatherCache(tmp_path / 'weather.sqlite')
+    yield cache
+    cache.close()
+
+def test_cold_backfill_uses_one_request_per_coalesced_range(stub_api, cache):
+    weather_df, location_data = fetch_weather_data(
+        date(2024, 1, 1), date(2024, 3, 31), logger, cache=cache, base_url=stub_api.url
+    )
+
+    assert len(stub_api.requests) == 1
+    assert len(weather_df) == 91
+    assert weather_df.loc[0, 'date_id'] == date(2024, 1, 1)
+    assert weather_df.loc[0, 'temperature_2m_mean'] == pytest.approx(11.8)
+    assert weather_df['location_id'].eq(1).all()
+    assert location_data[1]['elevation'] == 44.0
+    assert location_data[1]['location'] == 'Berau, Kalimantan, Indonesia'
+
+def test_repeat_run_makes_no_requests(stub_api, cache):
+    fetch_weather_data(date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url)
+    weather_df, _ = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url
+    )
+
+    assert len(stub_api.requests) == 1
+    assert len(weather_df) == 31
+
+def test_only_missing_gap_is_requested(stub_api, cache):
+    fetch_weather_data(date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url)
+    weather_df, _ = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 8, 5), logger, cache=cache, base_url=stub_api.url
+    )
+
+    assert len(stub_api.requests) == 2
+    assert (stub_api.requests[1]['start_date'], stub_api.requests[1]['end_date']) == ('2024-08-01', '2024-08-05')
+    assert len(weather_df) == 36
+
+def test_works_offline_when_cache_covers_range(stub_api, cache):
+    fetch_weather_data(date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url)
+    offline_url = 'http://127.0.0.1:9/v1/archive'  # discard port, nothing listens there
+
+    weather_df, location_data = fetch_weather_data(
+        date(2024, 7, 5), date(2024, 7, 10), logger, cache=cache, base_url=offline_url
+    )
+
+    assert len(weather_df) == 6
+    assert location_data[1]['timezone'] == 'Asia/Jakarta'
+
+def test_days_missing_from_archive_are_not_cached(stub_api, cache):
+    stub_api.unavailable_from = date(2024, 7, 29)
+    weather_df, _ = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url
+    )
+    assert len(weather_df) == 28
+
+    stub_api.unavailable_from = date.max
+    weather_df, _ = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 7, 31), logger, cache=cache, base_url=stub_api.url
+    )
+    assert len(weather_df) == 31
+    assert stub_api.requests[-1]['start_date'] == '2024-07-29'
+
+SITES = [
+    {'location_id': site, 'name': f'Site {site}', 'latitude': -1.0 + site, 'longitude': 100.0 + 10 * site,
+     'timezone': 'Asia/Jakarta'}
+    for site in range(1, 5)
+]
+
+def test_locations_are_fetched_concurrently(stub_api, cache):
+    stub_api.latency = 0.3
+    started = time.perf_counter()
+    weather_df, location_data = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 7, 31), logger, SITES, cache=cache, base_url=stub_api.url
+    )
+    elapsed = time.perf_counter() - started
+
+    assert len(stub_api.requests) == len(SITES)
+    assert stub_api.max_in_flight > 1
+    assert elapsed < stub_api.latency * len(SITES)
+    assert sorted(location_data) == [1, 2, 3, 4]
+    assert weather_df.groupby('location_id').size().eq(31).all()
+
+def test_weather_joins_each_mine_to_its_own_location(stub_api, cache, tmp_path, monkeypatch):
+    weather_df, _ = fetch_weather_data(
+        date(2024, 7, 1), date(2024, 7, 2), logger, SITES[:2], cache=cache, base_url=stub_api.url
+    )
+    daily_production = pd.DataFrame({
+        'date_id': [date(2024, 7, 1), date(2024, 7, 1), date(2024, 7, 2)],
+        'mine_id': [1, 2, 2],
+        'total_production_daily': [100.0, 200.0, 300.0],
+        'average_quality_grade': [4.0, 5.0, 6.0]
+    })
+    aggregates = {
+        'daily_production': assign_locations(daily_production, pd.DataFrame({'mine_id': [1, 2], 'location_id': [1, 2]})),
+        'daily_equipment': pd.DataFrame({'date_id': [date(2024, 7, 1)], 'operational_hours': [12], 'fuel_consumption': [50.0]}),
+        'equipment_metrics': pd.DataFrame(),
+        'total_equipment': 1
     }
-    base_url = "https://archive-api.open-meteo.com/v1/archive"
-    resp = requests.get(base_url, params=single_day_params)
-    if resp.status_code == 200:
-        print(json.dumps(resp.json(), indent=2))
-    else:
-        print(f"Failed to fetch data: HTTP {resp.status_code}")
+    monkeypatch.chdir(tmp_path)
+
+    transformed = transform_data(aggregates, weather_df, DataValidator('weather'), logger)
+
+    assert transformed['location_id'].tolist() == [1, 2, 2]
+    assert transformed['temperature_2m_mean'].tolist() == pytest.approx([11.1, 12.1, 12.2])
 
-    # Fetch and print the DataFrame for the date range
-    weather_df = fetch_weather_data(test_start_date, test_end_date)
-    
-    # Print the results
+def test_coalesce_gaps_merges_short_cached_islands():
+    days = [date(2024, 1, 1) + timedelta(days=n) for n in range(30)]
+    missing = days[:10] + days[13:20] + days[29:]
+
+    assert coalesce_gaps(missing, coalesce_days=7) == [(days[0], days[19]), (days[29], days[29])]
+    assert coalesce_gaps(missing, coalesce_days=2) == [(days[0], days[9]), (days[13], days[19]), (days[29], days[29])]
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    print("--- Running live Weather API smoke test ---")
+    with tempfile.TemporaryDirectory() as cache_dir:
+        live_cache = WeatherCache(Path(cache_dir) / 'weather.sqlite')
+        weather_df, location_data = fetch_weather_data(
+            datetime(2024, 7, 1), datetime(2024, 7, 3), logger, cache=live_cache
+        )
+        live_cache.close()
     if not weather_df.empty:
-        print("\n--- Processed DataFrame for the Date Range: ---")
         print(weather_df)
+        print(location_data)
     else:
-        print("\n--- Test failed. No data was fetched. Check logs for errors. ---")
-
-    print("\n--- Test Finished ---") 
\ No newline at end of file
+        print("--- Test failed. No data was fetched. Check logs for errors. ---")
@@ -0,0 +1,43 @@
+"""Tests for the deterministic synthetic staging data generator."""
+import pyarrow as pa
+
+from aggregation import aggregate_data
+from bulk_load import STAGING_TYPES
+from synthetic import generate_staging, generate_weather, staging_scale
+
+def test_same_parameters_give_the_same_rows():
+    scale = staging_scale(mines=4, equipment=6, sensor_interval_minutes=30, years=0.1, seed=3)
+
+    first, second = generate_staging(scale), generate_staging(scale)
+    other_seed = generate_staging({**scale, 'seed': 4})
+
+    assert all(first[table].equals(second[table]) for table in first)
+    assert not first['staging.equipment_sensors'].equals(other_seed['staging.equipment_sensors'])
+
+def test_row_counts_and_types_follow_the_scale():
+    scale = staging_scale(mines=4, equipment=6, sensor_interval_minutes=30, years=0.1)
+
+    staging = generate_staging(scale)
+
+    days = 36
+    assert staging['staging.mines'].num_rows == 4
+    assert staging['staging.production_logs'].num_rows == days * 4 * 2
+    assert staging['staging.equipment_sensors'].num_rows == days * 48 * 6
+    for table, arrow_table in staging.items():
+        assert arrow_table.schema == pa.schema([(column, STAGING_TYPES[table][column])
+                                                for column in arrow_table.column_names])
+    assert len(generate_weather(scale, [1, 2])) == days * 2
+
+def test_generated_staging_data_aggregates_like_staging_reads():
+    scale = staging_scale(mines=2, equipment=3, years=0.05)
+    staging = generate_staging(scale)
+
+    aggregates = aggregate_data(
+        staging['staging.production_logs'].to_pandas(date_as_object=False),
+        staging['staging.equipment_sensors'].to_pandas()
+    )
+
+    assert len(aggregates['daily_production']) == 18 * 2
+    assert len(aggregates['equipment_metrics']) == 18 * 3
+    assert aggregates['total_equipment'] == 3
+    assert (aggregates['equipment_metrics'][['total_operational_hours', 'total_maintenance_hours']].sum(axis=1) <= 24).all()
@@ -0,0 +1,94 @@
+"""Tests comparing the vectorized DataValidator with the per-row checks it replaced, and its violation batches."""
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from validation import VIOLATION_COLUMNS, DataValidator
+
+DAYS = [date(2024, 7, 1) + timedelta(days=day) for day in range(6)]
+
+def make_daily_frame():
+    """Three mines over six days at two locations, with negative production, bad utilization and weather gaps."""
+    rng = np.random.default_rng(3)
+    frame = pd.DataFrame({
+        'date_id': np.repeat(DAYS, 3),
+        'mine_id': np.tile([1, 2, 3], len(DAYS)),
+        'location_id': np.tile([1, 2, 2], len(DAYS)),
+        'total_production_daily': rng.uniform(-100, 400, 3 * len(DAYS)),
+        'equipment_utilization': rng.uniform(-20, 130, 3 * len(DAYS)),
+    })
+    weather = pd.DataFrame([
+        {'date_id': day, 'location_id': location, 'temperature_2m_mean': 27.0}
+        for day in DAYS for location in (1, 2)
+        if (day, location) not in {(DAYS[2], 2), (DAYS[4], 1)}
+    ])
+    return frame, weather
+
+def legacy_details(df, weather_df):
+    """The violations the per-row validator recorded: one per bad row, missing weather once per (date, location)."""
+    details = []
+    for _, row in df[df['total_production_daily'] < 0].iterrows():
+        details.append({'type': 'negative_production', 'date': row['date_id'], 'mine_id': row['mine_id'],
+                        'value': row['total_production_daily']})
+    for _, row in df[(df['equipment_utilization'] < 0) | (df['equipment_utilization'] > 100)].iterrows():
+        details.append({'type': 'invalid_utilization', 'date': row['date_id'], 'mine_id': row['mine_id'],
+                        'value': row['equipment_utilization']})
+    keys = ['date_id', 'location_id']
+    produced = set(df[keys].drop_duplicates().itertuples(index=False, name=None))
+    for day, location in sorted(produced - set(weather_df[keys].itertuples(index=False, name=None))):
+        details.append({'type': 'missing_weather', 'date': day, 'location_id': location, 'value': None})
+    return pd.DataFrame(details)
+
+def test_violations_match_the_per_row_validator(tmp_path):
+    frame, weather = make_daily_frame()
+    legacy = legacy_details(frame, weather)
+    validator = DataValidator('parity', log_dir=tmp_path)
+
+    validator.validate(frame, {'weather': weather, 'mines': pd.DataFrame({'mine_id': [1, 2, 3]})})
+    violations = validator.get_violations()
+    validator.close()
+
+    for rule in ('negative_production', 'invalid_utilization'):
+        expected = legacy[legacy['type'] == rule]
+        recorded = violations[violations['rule'] == rule]
+        assert validator.validation_results[rule] == len(expected) > 0
+        assert recorded['date_id'].tolist() == expected['date'].tolist()
+        assert recorded['mine_id'].tolist() == expected['mine_id'].astype(int).astype(str).tolist()
+        np.testing.assert_array_equal(recorded['value'].to_numpy(), expected['value'].to_numpy(dtype=float))
+
+    # Missing weather is now recorded per production row; its distinct (date, location) are the legacy ones
+    expected = legacy[legacy['type'] == 'missing_weather']
+    recorded = violations[violations['rule'] == 'missing_weather']
+    assert validator.validation_results['missing_weather'] == len(recorded) == 3
+    assert sorted(set(zip(recorded['date_id'], recorded['location_id']))) == \
+        list(zip(expected['date'], expected['location_id']))
+    assert validator.validation_results['total_errors'] == len(violations)
+
+def test_violations_are_written_as_one_columnar_batch(tmp_path):
+    frame, weather = make_daily_frame()
+    frame.loc[0, 'mine_id'] = 9
+    inserted = {}
+
+    class Client:
+        def insert_df(self, table, df):
+            inserted[table] = df
+
+    validator = DataValidator('batch', log_dir=tmp_path)
+    validator.validate(frame, {'weather': weather, 'mines': pd.DataFrame({'mine_id': [1, 2, 3]})})
+    written = validator.write_violations(Client())
+    validator.close()
+
+    saved = pd.read_parquet(tmp_path / 'validation_errors.parquet')
+    assert list(saved.columns) == VIOLATION_COLUMNS
+    assert len(saved) == len(written) == validator.validation_results['total_errors']
+    assert set(saved['run_id']) == {'batch'}
+    # Rules without a value column (missing weather, unknown mine) leave it empty
+    assert saved.loc[saved['rule'] == 'missing_weather', 'value'].isna().all()
+    assert saved.loc[saved['rule'] == 'negative_production', 'value'].lt(0).all()
+
+    loaded = inserted['dwh.validation_errors']
+    assert list(loaded.columns) == VIOLATION_COLUMNS and len(loaded) == len(saved)
+    assert loaded['location_id'].dtype == 'uint64'
+    assert loaded['date_id'].map(type).eq(date).all()
+    assert pd.read_parquet(tmp_path / 'quarantine.parquet')['mine_id'].tolist() == [9]
@@ -3,114 +3,165 @@ import logging
 from datetime import datetime
 from pathlib import Path
 
+from metrics import RunMetrics
+from rules import RULES_PATH, ReferentialRule, load_rules
+
+# Number of offending rows echoed to validation.log per rule; the full set goes to validation_errors.parquet
+LOG_SAMPLE_SIZE = 5
+
+VIOLATION_COLUMNS = ['run_id', 'rule', 'date_id', 'mine_id', 'location_id', 'value']
+
+# Target in the rule file whose rules run on the transformed daily frame; `staging.*` targets are checked in-database
+TRANSFORMED_TARGET = 'daily_production'
+
 class DataValidator:
-    def __init__(self, run_id=None):
+    def __init__(self, run_id=None, rules_path=RULES_PATH, metrics=None, log_dir=None):
         # Set up logging
         self.run_id = run_id or datetime.now().strftime('%Y%m%d_%H%M%S')
-        self.log_dir = Path(f'etl/logs/run_{self.run_id}')
+        self.log_dir = Path(log_dir or f'etl/logs/run_{self.run_id}')
         self.log_dir.mkdir(parents=True, exist_ok=True)
-        
+        # Time of every validation pass, rule and in-database check (see metrics.py)
+        self.metrics = metrics or RunMetrics(self.run_id, self.log_dir)
+
         # Set up validation logger
         self.validation_logger = logging.getLogger('validation')
-        validation_handler = logging.FileHandler(self.log_dir / 'validation.log')
-        validation_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
-        self.validation_logger.addHandler(validation_handler)
+        self.validation_handler = logging.FileHandler(self.log_dir / 'validation.log')
+        self.validation_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+        self.validation_logger.addHandler(self.validation_handler)
         self.validation_logger.setLevel(logging.INFO)
-        
+
+        # Declarative rules (see rules.py): one set for the transformed frame, one per staging table
+        rule_sets = load_rules(rules_path)
+        self.rules = rule_sets[TRANSFORMED_TARGET]
+        self.staging_rules = {target: rule_set for target, rule_set in rule_sets.items() if target.startswith('staging.')}
+
         # Initialize validation results
-        self.validation_results = {
-            'total_errors': 0,
-            'negative_production': 0,
-            'invalid_utilization': 0,
-            'missing_weather': 0,
-            'details': []
-        }
+        self.validation_results = {'total_errors': 0}
+        self.validation_results.update({rule.name: 0 for rule in self.rules})
+        # Offending rows, one columnar batch per rule violation (see VIOLATION_COLUMNS)
+        self.violations = []
+        # Rows removed by quarantine rules, kept aside in quarantine.parquet
+        self.quarantined = []
+
+    def _record_violations(self, rule, rows, value_column=None):
+        """Record the rows that broke a rule as one columnar batch and log a summary with a few samples."""
+        count = len(rows)
+        self.validation_results[rule] = count
+        self.validation_results['total_errors'] += count
+
+        batch = pd.DataFrame({
+            'run_id': self.run_id,
+            'rule': rule,
+            'date_id': rows['date_id'].to_numpy() if 'date_id' in rows else None,
+            'mine_id': rows['mine_id'].astype(str).to_numpy() if 'mine_id' in rows else None,
+            'location_id': rows['location_id'].to_numpy() if 'location_id' in rows else None,
+            'value': rows[value_column].astype(float).to_numpy() if value_column else None
+        }, columns=VIOLATION_COLUMNS)
+        self.violations.append(batch)
+
+        self.validation_logger.error(f"{rule}: {count} violating rows")
+        for sample in batch.head(LOG_SAMPLE_SIZE).itertuples(index=False):
+            self.validation_logger.error(
+                f"  sample: date {sample.date_id}, mine {sample.mine_id}, location {sample.location_id}, value {sample.value}"
+            )
+
+    def validate(self, df, references=None, rules=None):
+        """Evaluate the rules in one pass over `df` and return it with their actions applied.
+
+        `references` maps reference names used by referential rules (e.g.
+        'weather', 'mines') to frames; rules whose reference is missing, empty
+        or without the key columns are skipped.
+        """
+        rules = rules or self.rules
+        timings = {}
+        with self.metrics.stage('validate', rows_in=len(df)) as stage:
+            result, masks, quarantined = rules.evaluate(df, references, timings)
+            for rule in rules:
+                broken = masks.get(rule.name)
+                if broken is None:
+                    # A reference that was given but cannot be checked against is worth a warning
+                    if isinstance(rule, ReferentialRule) and (references or {}).get(rule.reference) is not None:
+                        self.validation_logger.warning(
+                            f"{rule.name}: skipped, reference '{rule.reference}' is empty or lacks {rule.columns}"
+                        )
+                    continue
+                self.metrics.record(f'validate:{rule.name}', timings[rule.name], len(df), int(broken.sum()))
+                if not broken.any():
+                    continue
+                self._record_violations(rule.name, df[broken], rule.value_column)
+                if rule.action != 'flag':
+                    self.validation_logger.info(f"{rule.name}: applied '{rule.action}' to {int(broken.sum())} rows")
+            if not quarantined.empty:
+                self.quarantined.append(quarantined)
+            stage['rows_out'] = len(result)
+        return result
 
     def validate_production_data(self, df):
         """Validate production data for negative values."""
-        negative_prod = df[df['total_production_daily'] < 0]
-        if not negative_prod.empty:
-            self.validation_results['negative_production'] = len(negative_prod)
-            self.validation_results['total_errors'] += len(negative_prod)
-            for _, row in negative_prod.iterrows():
-                error_msg = f"Negative production found: {row['total_production_daily']} tons on date {row['date_id']} at mine {row['mine_id']}"
-                self.validation_logger.error(error_msg)
-                self.validation_results['details'].append({
-                    'type': 'negative_production',
-                    'message': error_msg,
-                    'date': row['date_id'],
-                    'mine_id': row['mine_id'],
-                    'value': row['total_production_daily']
-                })
-            # Replace negative values with 0
-            df.loc[df['total_production_daily'] < 0, 'total_production_daily'] = 0
-            self.validation_logger.info("Replaced negative production values with 0")
-
-        return df
+        return self.validate(df, rules=self.rules.select(['negative_production']))
 
     def validate_equipment_utilization(self, df):
         """Validate equipment utilization is between 0 and 100%."""
-        invalid_util = df[(df['equipment_utilization'] < 0) | (df['equipment_utilization'] > 100)]
-        if not invalid_util.empty:
-            self.validation_results['invalid_utilization'] = len(invalid_util)
-            self.validation_results['total_errors'] += len(invalid_util)
-            for _, row in invalid_util.iterrows():
-                error_msg = f"Invalid equipment utilization: {row['equipment_utilization']}% on date {row['date_id']} at mine {row['mine_id']}"
-                self.validation_logger.error(error_msg)
-                self.validation_results['details'].append({
-                    'type': 'invalid_utilization',
-                    'message': error_msg,
-                    'date': row['date_id'],
-                    'mine_id': row['mine_id'],
-                    'value': row['equipment_utilization']
-                })
-            # Clip values to valid range
-            df['equipment_utilization'] = df['equipment_utilization'].clip(0, 100)
-            self.validation_logger.info("Clipped equipment utilization values to 0-100% range")
-
-        return df
+        return self.validate(df, rules=self.rules.select(['invalid_utilization']))
 
     def validate_weather_data(self, production_df, weather_df):
         """Validate weather data completeness for production dates."""
-        # Handle empty weather data
         if weather_df.empty:
             self.validation_logger.warning("No weather data available for validation")
-            self.validation_results['missing_weather'] = len(production_df['date_id'].unique())
-            self.validation_results['total_errors'] += len(production_df['date_id'].unique())
-            for date in production_df['date_id'].unique():
-                error_msg = f"Missing weather data for production date: {date}"
-                self.validation_logger.error(error_msg)
-                self.validation_results['details'].append({
-                    'type': 'missing_weather',
-                    'message': error_msg,
-                    'date': date,
-                    'value': None
-                })
-            return False
-        
-        # Check if weather_df has the expected columns
-        if 'date_id' not in weather_df.columns:
-            self.validation_logger.error("Weather data missing 'date_id' column")
-            return False
-        
-        prod_dates = set(production_df['date_id'].unique())
-        weather_dates = set(weather_df['date_id'].unique())
-        missing_dates = prod_dates - weather_dates
-        
-        if missing_dates:
-            self.validation_results['missing_weather'] = len(missing_dates)
-            self.validation_results['total_errors'] += len(missing_dates)
-            for date in missing_dates:
-                error_msg = f"Missing weather data for production date: {date}"
-                self.validation_logger.error(error_msg)
-                self.validation_results['details'].append({
-                    'type': 'missing_weather',
-                    'message': error_msg,
-                    'date': date,
-                    'value': None
-                })
-
-        return len(missing_dates) == 0
+        missing_before = self.validation_results['missing_weather']
+        self.validate(production_df, {'weather': weather_df}, self.rules.select(['missing_weather']))
+        return self.validation_results['missing_weather'] == missing_before
+
+    def check_in_database(self, client, filters=None):
+        """Count the violations of the `staging.*` rules in ClickHouse before extraction.
+
+        `filters` maps a staging table to the (WHERE clause, parameters) bounding
+        the rows to check. Only counts are recorded; actions apply to frames.
+        """
+        filters = filters or {}
+        for table, rule_set in self.staging_rules.items():
+            where, parameters = filters.get(table, ('', {}))
+            try:
+                with self.metrics.stage(f'check_in_database:{table}') as stage:
+                    counts = rule_set.check_in_database(client, table, where, parameters)
+                    stage['rows_out'] = sum(counts.values())
+            except Exception as e:
+                self.validation_logger.warning(f"Could not check rules on {table}: {e}")
+                continue
+            for name, count in counts.items():
+                self.validation_results[f'{table}.{name}'] = count
+                self.validation_results['total_errors'] += count
+                if count:
+                    self.validation_logger.error(f"{table}.{name}: {count} violating rows in ClickHouse")
+
+    def get_violations(self):
+        """Return every recorded violation as a single columnar frame."""
+        if not self.violations:
+            return pd.DataFrame(columns=VIOLATION_COLUMNS)
+        return pd.concat(self.violations, ignore_index=True)
+
+    def write_violations(self, client=None):
+        """Persist violations to validation_errors.parquet in the run directory and, if a client is given, to dwh.validation_errors."""
+        if self.quarantined:
+            quarantined = pd.concat(self.quarantined, ignore_index=True)
+            quarantined.to_parquet(self.log_dir / 'quarantine.parquet', index=False)
+            self.validation_logger.info(f"Quarantined {len(quarantined)} rows in {self.log_dir / 'quarantine.parquet'}")
+        violations = self.get_violations()
+        if violations.empty:
+            return violations
+        violations.to_parquet(self.log_dir / 'validation_errors.parquet', index=False)
+        self.validation_logger.info(f"Wrote {len(violations)} violations to {self.log_dir / 'validation_errors.parquet'}")
+        if client is not None:
+            try:
+                client.insert_df('dwh.validation_errors', violations.assign(
+                    date_id=pd.to_datetime(violations['date_id']).dt.date,
+                    mine_id=violations['mine_id'].fillna(''),
+                    location_id=violations['location_id'].fillna(0).astype('uint64')
+                ))
+                self.validation_logger.info(f"Loaded {len(violations)} violations into dwh.validation_errors")
+            except Exception as e:
+                self.validation_logger.warning(f"Could not load violations into dwh.validation_errors: {e}")
+        return violations
 
     def get_validation_summary(self):
         """Return a summary of validation results."""
@@ -118,12 +169,15 @@ class DataValidator:
             'validation_status': 'FAILED' if self.validation_results['total_errors'] > 0 else 'PASSED',
             'total_errors': self.validation_results['total_errors'],
             'error_counts': {
-                'negative_production': self.validation_results['negative_production'],
-                'invalid_utilization': self.validation_results['invalid_utilization'],
-                'missing_weather': self.validation_results['missing_weather']
+                rule: count for rule, count in self.validation_results.items() if rule != 'total_errors'
             }
         }
 
+    def close(self):
+        """Stop writing to this run's validation.log, e.g. before the next validator in the same process."""
+        self.validation_logger.removeHandler(self.validation_handler)
+        self.validation_handler.close()
+
     def log_validation_summary(self):
         """Log the validation summary."""
         summary = self.get_validation_summary()
@@ -132,4 +186,4 @@ class DataValidator:
         self.validation_logger.info(f"Total Errors: {summary['total_errors']}")
         self.validation_logger.info("Error Counts:")
         for error_type, count in summary['error_counts'].items():
-            self.validation_logger.info(f"  - {error_type}: {count}") 
\ No newline at end of file
+            self.validation_logger.info(f"  - {error_type}: {count}")
@@ -0,0 +1,174 @@
+import os
+import sqlite3
+from datetime import timedelta
+from pathlib import Path
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+ARCHIVE_URL = os.environ.get('OPEN_METEO_ARCHIVE_URL', 'https://archive-api.open-meteo.com/v1/archive')
+DEFAULT_CACHE_PATH = Path(os.environ.get(
+    'WEATHER_CACHE_PATH', Path(__file__).resolve().parent / 'cache' / 'weather.sqlite'
+))
+REQUEST_TIMEOUT = 30
+# Cached islands shorter than this are re-fetched rather than splitting a request in two
+COALESCE_DAYS = 7
+# Upper bound on the span of a single archive request
+MAX_REQUEST_DAYS = 366
+
+DEFAULT_LATITUDE = 2.0167
+DEFAULT_LONGITUDE = 117.3000
+DEFAULT_TIMEZONE = 'Asia/Jakarta'
+# Used when no location catalogue is available (see locations.py)
+DEFAULT_LOCATION = {
+    'location_id': 1,
+    'name': 'Berau, Kalimantan, Indonesia',
+    'latitude': DEFAULT_LATITUDE,
+    'longitude': DEFAULT_LONGITUDE,
+    'timezone': DEFAULT_TIMEZONE
+}
+
+WEATHER_COLUMNS = ['date_id', 'temperature_2m_mean', 'rainfall_mm']
+
+def create_session(pool_size=10):
+    """Create a pooled HTTP session with retries for the Open-Meteo API."""
+    session = requests.Session()
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 500, 502, 503, 504))
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+def request_weather(session, latitude, longitude, start_date, end_date,
+                    timezone=DEFAULT_TIMEZONE, base_url=ARCHIVE_URL):
+    """Request daily weather for one coordinate and date range from the archive API.
+
+    Returns the daily weather frame and the location metadata from the response.
+    Raises ``requests.HTTPError`` on a non-200 response.
+    """
+    params = {
+        'latitude': latitude,
+        'longitude': longitude,
+        'daily': 'temperature_2m_mean,precipitation_sum',
+        'timezone': timezone,
+        'start_date': start_date.strftime('%Y-%m-%d'),
+        'end_date': end_date.strftime('%Y-%m-%d')
+    }
+    resp = session.get(base_url, params=params, timeout=REQUEST_TIMEOUT)
+    resp.raise_for_status()
+    weather_response = resp.json()
+    weather_df = pd.DataFrame(weather_response['daily']).rename(columns={
+        'time': 'date_id',
+        'precipitation_sum': 'rainfall_mm'  # Rename for clarity
+    })
+    weather_df['date_id'] = pd.to_datetime(weather_df['date_id']).dt.date
+    location_data = {
+        'latitude': weather_response.get('latitude', latitude),
+        'longitude': weather_response.get('longitude', longitude),
+        'elevation': weather_response.get('elevation', 44.0),
+        'timezone': weather_response.get('timezone', timezone),
+        'utc_offset_seconds': weather_response.get('utc_offset_seconds', 25200)
+    }
+    return weather_df[WEATHER_COLUMNS], location_data
+
+def coalesce_gaps(missing_dates, coalesce_days=COALESCE_DAYS, max_days=MAX_REQUEST_DAYS):
+    """Group sorted missing dates into as few (start, end) request ranges as possible."""
+    ranges = []
+    for date in missing_dates:
+        if ranges and (date - ranges[-1][1]).days <= coalesce_days and (date - ranges[-1][0]).days < max_days:
+            ranges[-1][1] = date
+        else:
+            ranges.append([date, date])
+    return [tuple(date_range) for date_range in ranges]
+
+class WeatherCache:
+    """On-disk SQLite cache of daily weather keyed by (latitude, longitude, date)."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS weather_daily (
+                latitude REAL,
+                longitude REAL,
+                date TEXT,
+                temperature_2m_mean REAL,
+                rainfall_mm REAL,
+                PRIMARY KEY (latitude, longitude, date)
+            );
+            CREATE TABLE IF NOT EXISTS weather_location (
+                latitude REAL,
+                longitude REAL,
+                grid_latitude REAL,
+                grid_longitude REAL,
+                elevation REAL,
+                timezone TEXT,
+                utc_offset_seconds INTEGER,
+                PRIMARY KEY (latitude, longitude)
+            );
+        """)
+
+    @staticmethod
+    def _key(latitude, longitude):
+        return round(float(latitude), 4), round(float(longitude), 4)
+
+    def get(self, latitude, longitude, start_date, end_date):
+        """Return the cached daily weather for a coordinate between two dates (inclusive)."""
+        weather_df = pd.read_sql_query(
+            """
+            SELECT date AS date_id, temperature_2m_mean, rainfall_mm FROM weather_daily
+            WHERE latitude = ? AND longitude = ? AND date BETWEEN ? AND ?
+            ORDER BY date
+            """,
+            self.conn,
+            params=(*self._key(latitude, longitude), str(start_date), str(end_date))
+        )
+        weather_df['date_id'] = pd.to_datetime(weather_df['date_id']).dt.date
+        return weather_df
+
+    def get_location(self, latitude, longitude):
+        """Return the cached location metadata (as reported by the API) for a coordinate, or an empty dict."""
+        row = self.conn.execute(
+            """
+            SELECT grid_latitude, grid_longitude, elevation, timezone, utc_offset_seconds
+            FROM weather_location WHERE latitude = ? AND longitude = ?
+            """,
+            self._key(latitude, longitude)
+        ).fetchone()
+        if row is None:
+            return {}
+        return dict(zip(['latitude', 'longitude', 'elevation', 'timezone', 'utc_offset_seconds'], row))
+
+    def missing_ranges(self, latitude, longitude, start_date, end_date):
+        """Return the coalesced date ranges between two dates that are not cached yet."""
+        cached = set(self.get(latitude, longitude, start_date, end_date)['date_id'])
+        wanted = (start_date + timedelta(days=n) for n in range((end_date - start_date).days + 1))
+        return coalesce_gaps([date for date in wanted if date not in cached])
+
+    def put(self, latitude, longitude, weather_df, location_data):
+        """Store fetched weather. Days the archive has no values for yet are not cached."""
+        latitude, longitude = self._key(latitude, longitude)
+        complete = weather_df.dropna(subset=['temperature_2m_mean', 'rainfall_mm'])
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO weather_daily VALUES (?, ?, ?, ?, ?)",
+                zip(
+                    [latitude] * len(complete), [longitude] * len(complete),
+                    complete['date_id'].astype(str),
+                    complete['temperature_2m_mean'].astype(float),
+                    complete['rainfall_mm'].astype(float)
+                )
+            )
+            if location_data:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO weather_location VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (latitude, longitude, location_data.get('latitude'), location_data.get('longitude'),
+                     location_data.get('elevation'), location_data.get('timezone'),
+                     location_data.get('utc_offset_seconds'))
+                )
+
+    def close(self):
+        self.conn.close()
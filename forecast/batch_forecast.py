@@ -0,0 +1,105 @@
+"""Nightly 1-30 day production forecasts of every mine, written to dwh.fact_production_forecast.
+
+The forecast runs recursively on the dense (mine x day) grid of the last
+LOOKBACK_DAYS of facts (features.py): the grid is extended by the horizon,
+and each step gathers the features of all mines for the next day in one
+matrix, predicts them with one call of the registered XGBoost model and
+writes the predictions into the grid, where the next steps' lags and
+rolling windows read them. Weather and equipment values carry the last
+observed day forward. 30 horizons of any number of mines take 30
+vectorized predictions, not 30 per mine.
+
+The ETL runs it after each load (etl.run_etl). Rows are keyed by
+(mine_id, date_id, origin_date, model), the origin being the last loaded
+day, so a rerun for the same origin replaces its rows (ReplacingMergeTree).
+
+Usage (from the repository root):
+    python forecast/batch_forecast.py --horizon 30
+"""
+import argparse
+import logging
+import time
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from features import LOOKBACK_DAYS, dense_history, feature_matrix
+from registry import read_manifest
+from serving import connect, load_history, load_models
+
+FORECAST_TABLE = 'dwh.fact_production_forecast'
+HORIZON_DAYS = 30
+
+def extend_grid(dense, days):
+    """The dense history with `days` unknown days appended: NaN production, exogenous values carried forward."""
+    production = dense['production']
+    return {
+        **dense,
+        'production': np.hstack([production, np.full((len(production), days), np.nan)]),
+        'exogenous': {
+            column: np.hstack([grid, np.repeat(grid[:, -1:], days, axis=1)])
+            for column, grid in dense['exogenous'].items()
+        },
+    }
+
+def recursive_forecast(dense, model, horizon=HORIZON_DAYS):
+    """Predict the `horizon` days after the grid for every mine; returns a (mines x horizon) array.
+
+    Each day is predicted for all mines at once from the observed and already predicted days before it.
+    """
+    width = dense['production'].shape[1]
+    grid = extend_grid(dense, horizon)
+    mines = np.arange(len(dense['mine_ids']))
+    for step in range(horizon):
+        day = np.full(len(mines), width + step)
+        grid['production'][mines, day] = model.predict(feature_matrix(grid, mines, day))
+    return grid['production'][:, width:]
+
+def forecast_rows(history, model, horizon=HORIZON_DAYS, model_name='xgboost', model_version=''):
+    """Forecast rows of every mine of `history` for the `horizon` days after its last day."""
+    dense = dense_history(history)
+    forecasts = recursive_forecast(dense, model, horizon)
+    origin = (np.datetime64(dense['first_day'] + dense['production'].shape[1] - 1, 'D')).astype(object)
+    mines, steps = np.indices(forecasts.shape)
+    return pd.DataFrame({
+        'origin_date': origin,
+        'date_id': [origin + timedelta(days=int(step) + 1) for step in steps.ravel()],
+        'mine_id': dense['mine_ids'][mines.ravel()],
+        'horizon': (steps.ravel() + 1).astype('uint8'),
+        'predicted_production': forecasts.ravel(),
+        'model': model_name,
+        'model_version': model_version,
+    })
+
+def write_forecasts(client, logger, horizon=HORIZON_DAYS, model_name='xgboost'):
+    """Forecast every mine from the last LOOKBACK_DAYS loaded days and insert the rows; returns their number."""
+    started = time.perf_counter()
+    model = load_models([model_name])[model_name]
+    version = read_manifest(model_name)['version']
+    history = load_history(client, days=LOOKBACK_DAYS)
+    if history.empty:
+        logger.info("No daily facts to forecast from")
+        return 0
+    rows = forecast_rows(history, model, horizon, model_name, version)
+    client.insert_df(FORECAST_TABLE, rows)
+    logger.info(f"Forecast {rows['mine_id'].nunique()} mines {horizon} days past {rows['origin_date'].iloc[0]} "
+                f"with {model_name} {version}: {len(rows)} rows in {time.perf_counter() - started:.2f}s")
+    return len(rows)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f'Forecast every mine and write the rows to {FORECAST_TABLE}.')
+    parser.add_argument('--horizon', type=int, default=HORIZON_DAYS, help='Days forecast past the last loaded day.')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    args = parse_args(argv)
+    client = connect()
+    try:
+        write_forecasts(client, logging.getLogger('forecast.batch_forecast'), args.horizon)
+    finally:
+        client.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Benchmark the vectorized 30-day recursive forecast against a per-series loop.
+
+Both forecast every mine of synthetic daily facts with the registered
+XGBoost model. The vectorized forecast predicts all mines in one call per
+day ahead (batch_forecast.recursive_forecast); the loop predicts one mine
+and one day per call, from the same dense grid. Their forecasts must agree
+before the timings are reported.
+
+Usage (from the repository root):
+    python forecast/benchmarks/bench_batch_forecast.py --mines 100,1000,5000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from batch_forecast import HORIZON_DAYS, extend_grid, recursive_forecast  # noqa: E402
+from bench_serving import synthetic_history  # noqa: E402
+from features import LOOKBACK_DAYS, dense_history, feature_matrix  # noqa: E402
+from registry import load_model  # noqa: E402
+
+def per_series_forecast(dense, model, horizon):
+    """One predict call per mine and day ahead."""
+    width = dense['production'].shape[1]
+    grid = extend_grid(dense, horizon)
+    for mine in range(len(dense['mine_ids'])):
+        for step in range(horizon):
+            grid['production'][mine, width + step] = model.predict(feature_matrix(grid, [mine], [width + step]))[0]
+    return grid['production'][:, width:]
+
+def timed(func, *args):
+    started = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - started, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mines', default='100,1000,5000', help='Comma-separated mine counts.')
+    parser.add_argument('--horizon', type=int, default=HORIZON_DAYS)
+    args = parser.parse_args()
+
+    model = load_model('xgboost')
+    print(f"{'mines':>7} {'vectorized (s)':>15} {'per series (s)':>15} {'speedup':>8}")
+    for mines in (int(value) for value in args.mines.split(',')):
+        dense = dense_history(synthetic_history(mines, LOOKBACK_DAYS))
+        vectorized_seconds, vectorized = timed(recursive_forecast, dense, model, args.horizon)
+        loop_seconds, looped = timed(per_series_forecast, dense, model, args.horizon)
+        np.testing.assert_allclose(vectorized, looped, rtol=1e-6)
+        print(f"{mines:>7} {vectorized_seconds:>15.3f} {loop_seconds:>15.3f} {loop_seconds / vectorized_seconds:>7.0f}x")
+
+if __name__ == '__main__':
+    main()
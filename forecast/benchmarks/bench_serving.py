@@ -0,0 +1,143 @@
+"""Load test of the forecast service: cold start and request latency percentiles, batched and unbatched.
+
+Starts `forecast/serving.py` as a subprocess on synthetic daily facts and
+measures the cold start (process launch to the first answered prediction:
+imports, model loading and feature windows). Then --clients threads send
+single (mine, next day) requests as fast as they can for --seconds, and
+the p50/p95/p99 latency, throughput and mean batch size are reported. The
+same load runs against a server with --max-batch 1 (one predict call per
+request) for comparison, and through the Python API of a service in this
+process, which leaves out HTTP.
+
+Usage (from the repository root):
+    python forecast/benchmarks/bench_serving.py --mines 200 --clients 32 --seconds 10
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from serving import open_service  # noqa: E402
+
+SERVING = Path(__file__).resolve().parent.parent / 'serving.py'
+
+def synthetic_history(mines, days, end=date(2025, 4, 20), seed=42):
+    """Daily fact rows of `mines` mines over `days` days, shaped like dwh.fact_daily_production."""
+    rng = np.random.default_rng(seed)
+    dates = [end - timedelta(days=days - 1 - day) for day in range(days)]
+    rows = mines * days
+    return pd.DataFrame({
+        'date_id': np.repeat(np.array(dates, dtype='datetime64[D]'), mines),
+        'mine_id': np.tile(np.arange(1, mines + 1), days).astype(str),
+        'total_production_daily': rng.gamma(4, 30, rows).round(2),
+        'average_quality_grade': rng.uniform(3, 6, rows),
+        'equipment_utilization': rng.uniform(50, 95, rows),
+        'fuel_efficiency': rng.uniform(1, 10, rows),
+        'temperature_2m_mean': rng.normal(27, 1.5, rows),
+        'rainfall_mm': rng.gamma(1.5, 8, rows),
+    })
+
+def call(url, body=None):
+    request = urllib.request.Request(url, data=json.dumps(body).encode() if body is not None else None,
+                                     headers={'Content-Type': 'application/json'})
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())
+
+def start_server(history_path, port, extra_args=()):
+    """Launch the service and return (process, seconds until its first prediction was answered)."""
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(SERVING), '--history', str(history_path), '--port', str(port), *extra_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    url = f'http://127.0.0.1:{port}'
+    while True:
+        if process.poll() is not None:
+            raise RuntimeError(f"The service exited with status {process.returncode}")
+        try:
+            health = call(f'{url}/health')
+            break
+        except OSError:
+            time.sleep(0.02)
+    next_day = (date.fromisoformat(health['last_date']) + timedelta(days=1)).isoformat()
+    call(f'{url}/predict', {'requests': [{'mine_id': '1', 'date': next_day}]})
+    return process, time.perf_counter() - started, next_day
+
+def load(predict, mines, next_day, clients, seconds):
+    """Call `predict(mine_id, date)` from `clients` threads for `seconds`; return the latencies in ms."""
+    latencies = [[] for _ in range(clients)]
+    deadline = time.perf_counter() + seconds
+
+    def client(index):
+        rng = np.random.default_rng(index)
+        while time.perf_counter() < deadline:
+            mine_id = str(rng.integers(1, mines + 1))
+            sent = time.perf_counter()
+            predict(mine_id, next_day)
+            latencies[index].append((time.perf_counter() - sent) * 1000)
+
+    threads = [threading.Thread(target=client, args=(index,)) for index in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.concatenate([np.array(values) for values in latencies])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mines', type=int, default=200)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--clients', type=int, default=32, help='Concurrent client threads.')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--port', type=int, default=8799)
+    args = parser.parse_args()
+
+    history_path = Path(tempfile.mkdtemp(prefix='bench_serving_')) / 'history.parquet'
+    synthetic_history(args.mines, args.days).to_parquet(history_path)
+
+    print(f"{'server':<12} {'cold start s':>13} {'requests':>9} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} "
+          f"{'p99 ms':>8} {'batch':>6}")
+
+    def report(name, cold_start, latencies, batches):
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"{name:<12} {cold_start:>13.2f} {len(latencies):>9} {len(latencies) / args.seconds:>8.0f} "
+              f"{p50:>8.2f} {p95:>8.2f} {p99:>8.2f} {batches['items'] / max(batches['batches'], 1):>6.1f}")
+
+    for name, extra_args in (('batched', ()), ('unbatched', ('--max-batch', '1'))):
+        process, cold_start, next_day = start_server(history_path, args.port, extra_args)
+        url = f'http://127.0.0.1:{args.port}'
+
+        def predict(mine_id, day):
+            call(f'{url}/predict', {'requests': [{'mine_id': mine_id, 'date': day}]})
+
+        try:
+            latencies = load(predict, args.mines, next_day, args.clients, args.seconds)
+            batches = call(f'{url}/health')['batches']['xgboost']
+        finally:
+            process.terminate()
+            process.wait()
+        report(name, cold_start, latencies, batches)
+
+    started = time.perf_counter()
+    service = open_service(['xgboost'], pd.read_parquet(history_path))
+    service.predict([('1', next_day)])
+    cold_start = time.perf_counter() - started
+    try:
+        latencies = load(lambda mine_id, day: service.predict([(mine_id, day)]), args.mines, next_day,
+                         args.clients, args.seconds)
+        report('python api', cold_start, latencies, service.health()['batches']['xgboost'])
+    finally:
+        service.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Startup time of a predict-only process: the notebook's pickles against the model registry.
+
+Each case runs in a fresh interpreter, --repeats times, and reports the
+median time to load the models (imports included) and answer a first
+prediction, and the wall time of the whole process. The pickles import
+their framework (xgboost brings in scikit-learn) to unpickle; the registry
+evaluates XGBoost from its JSON trees and the scaler from two arrays.
+
+Usage (from the repository root):
+    python forecast/registry.py convert    # once, if forecast/models/registry/ is empty
+    python forecast/benchmarks/bench_startup.py --repeats 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+FORECAST_DIR = Path(__file__).resolve().parent.parent
+
+# What each process loads and predicts, after `started = time.perf_counter()`
+LOADS = {
+    ('xgboost', 'pickle'): "import joblib; model = joblib.load('models/xgboost_production_model.pkl'); "
+                           "model.get_booster().inplace_predict(features)",
+    ('xgboost', 'registry'): "from registry import load_model; load_model('xgboost').predict(features)",
+    ('scaler', 'pickle'): "import joblib; joblib.load('models/scaler.pkl').transform(features)",
+    ('scaler', 'registry'): "from registry import load_model; load_model('scaler').transform(features)",
+    ('xgboost + scaler', 'pickle'): "import joblib; scaler = joblib.load('models/scaler.pkl'); "
+                                    "model = joblib.load('models/xgboost_production_model.pkl'); "
+                                    "scaler.transform(features); model.get_booster().inplace_predict(features)",
+    ('xgboost + scaler', 'registry'): "from registry import load_model; load_model('scaler').transform(features); "
+                                      "load_model('xgboost').predict(features)",
+    ('prophet', 'pickle'): "import joblib, pandas as pd; model = joblib.load('models/prophet_production_model.pkl'); "
+                           "model.predict(pd.DataFrame({'ds': pd.to_datetime(['2025-04-21'])}))",
+    ('prophet', 'registry'): "import pandas as pd; from registry import load_model; "
+                             "load_model('prophet').predict(pd.DataFrame({'ds': pd.to_datetime(['2025-04-21'])}))",
+}
+
+SCRIPT = """
+import time, warnings
+started = time.perf_counter()
+import numpy as np
+warnings.simplefilter('ignore')
+features = np.ones((1, 20))
+{load}
+print(time.perf_counter() - started)
+"""
+
+def run_case(load):
+    """(seconds to the first prediction, process wall seconds) of one fresh interpreter."""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, '-c', SCRIPT.format(load=load)], cwd=FORECAST_DIR,
+                            capture_output=True, text=True, check=True)
+    return float(result.stdout.strip().splitlines()[-1]), time.perf_counter() - started
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--models', default='xgboost,scaler,xgboost + scaler,prophet',
+                        help='Comma-separated cases to run.')
+    parser.add_argument('--json', action='store_true', help='Print the medians as JSON.')
+    args = parser.parse_args()
+
+    results = {}
+    for case in args.models.split(','):
+        for source in ('pickle', 'registry'):
+            runs = [run_case(LOADS[case, source]) for _ in range(args.repeats)]
+            results[f'{case} ({source})'] = {
+                'load_seconds': statistics.median(run[0] for run in runs),
+                'process_seconds': statistics.median(run[1] for run in runs),
+            }
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'case':<30} {'load + first predict (s)':>25} {'process (s)':>12}")
+    for case, timing in results.items():
+        print(f"{case:<30} {timing['load_seconds']:>25.3f} {timing['process_seconds']:>12.3f}")
+
+if __name__ == '__main__':
+    main()
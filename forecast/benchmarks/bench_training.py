@@ -0,0 +1,57 @@
+"""Benchmark the model-selection sweep of train.py across process pool sizes.
+
+Runs the same backtest and per-mine refit on synthetic daily facts with
+each --workers count and reports the wall time, the fits per second and
+the speedup over one worker. The sweep is CPU bound, so the speedup is
+capped by the cores of the host.
+
+Usage (from the repository root):
+    python forecast/benchmarks/bench_training.py --mines 20 --days 365 --workers 1,4,8
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from bench_serving import synthetic_history  # noqa: E402
+from features import build_features  # noqa: E402
+from train import MODELS, process_pool, run_training  # noqa: E402
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--mines', type=int, default=20)
+    parser.add_argument('--days', type=int, default=365)
+    parser.add_argument('--models', default=','.join(MODELS))
+    parser.add_argument('--folds', type=int, default=6)
+    parser.add_argument('--horizon', type=int, default=14)
+    parser.add_argument('--workers', default=f'1,{os.cpu_count()}', help='Comma-separated pool sizes.')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    features = build_features(synthetic_history(args.mines, args.days))
+    models = args.models.split(',')
+    fits = len(models) * args.mines * args.folds
+
+    print(f"{args.mines} mines x {args.folds} folds x {len(models)} models = {fits} backtest fits, "
+          f"{os.cpu_count()} cores")
+    print(f"{'workers':>8} {'seconds':>9} {'fits/s':>8} {'speedup':>8}")
+    baseline = None
+    for workers in (int(value) for value in args.workers.split(',')):
+        with tempfile.TemporaryDirectory() as output:
+            started = time.perf_counter()
+            run_training(features, process_pool(workers), output, logging.getLogger('bench'), models,
+                         args.folds, args.horizon)
+            seconds = time.perf_counter() - started
+            backtested = len(pd.read_csv(Path(output) / 'backtest.csv'))
+        baseline = baseline or seconds
+        print(f"{workers:>8} {seconds:>9.1f} {backtested / seconds:>8.2f} {baseline / seconds:>7.1f}x")
+
+if __name__ == '__main__':
+    main()
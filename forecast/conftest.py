@@ -0,0 +1,23 @@
+"""Synthetic daily facts shared by the forecast tests."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import EXOGENOUS_COLUMNS, TARGET
+
+def build_history(mines=3, days=60, seed=5):
+    """Daily facts per mine with a few missing days, shaped like dwh.fact_daily_production."""
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range('2025-01-01', periods=days)
+    frame = pd.DataFrame({
+        'date_id': np.repeat(dates.date, mines),
+        'mine_id': np.tile([str(mine) for mine in range(1, mines + 1)], days),
+        TARGET: rng.gamma(4, 30, mines * days),
+        **{column: rng.uniform(1, 10, mines * days) for column in EXOGENOUS_COLUMNS},
+    })
+    return frame.drop(index=rng.choice(len(frame), size=len(frame) // 20, replace=False)).reset_index(drop=True)
+
+@pytest.fixture
+def make_history():
+    """Factory for synthetic daily facts: make_history(mines, days, seed)."""
+    return build_history
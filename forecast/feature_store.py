@@ -0,0 +1,100 @@
+"""Persisted forecasting features of every (date_id, mine_id) of dwh.fact_daily_production.
+
+dwh.production_features holds the target and the FEATURE_COLUMNS of each
+daily fact row (features.py), so training and inference read feature rows
+instead of rebuilding lags and rolling windows from the whole history.
+
+After each load the ETL refreshes only the days it loaded: their features
+read LOOKBACK_DAYS of earlier facts, and the LOOKBACK_DAYS after them read
+the loaded days, so a refresh of [first, last] reads the facts of
+[first - LOOKBACK_DAYS, last + LOOKBACK_DAYS] and rewrites the rows of
+[first, last + LOOKBACK_DAYS]. A nightly run costs a few days of rows, not
+the history. The table is a ReplacingMergeTree: rewritten rows replace the
+older version on merge, and reads use FINAL.
+
+Usage (from the repository root), to build or rebuild the store:
+    python forecast/feature_store.py
+    python forecast/feature_store.py --start 2025-01-01 --end 2025-03-31
+"""
+import argparse
+import logging
+from datetime import date, timedelta
+
+import pandas as pd
+
+from features import FEATURE_COLUMNS, HISTORY_COLUMNS, LOOKBACK_DAYS, TARGET, build_features
+
+FEATURE_TABLE = 'dwh.production_features'
+FEATURE_TABLE_COLUMNS = ['date_id', 'mine_id', TARGET] + FEATURE_COLUMNS
+
+# Days rebuilt per step of a full rebuild, to bound the facts held in memory
+REBUILD_CHUNK_DAYS = 365
+
+FACTS_QUERY = f"""
+    SELECT {', '.join(HISTORY_COLUMNS)}
+    FROM dwh.fact_daily_production
+    WHERE date_id BETWEEN {{start:Date}} AND {{end:Date}}
+    ORDER BY date_id, mine_id
+"""
+
+FEATURES_QUERY = f"""
+    SELECT {', '.join(FEATURE_TABLE_COLUMNS)}
+    FROM {FEATURE_TABLE} FINAL
+    WHERE date_id BETWEEN {{start:Date}} AND {{end:Date}}
+    ORDER BY date_id, mine_id
+"""
+
+def feature_rows(facts, first_day, last_day):
+    """Feature rows of the facts of days `first_day` to `last_day`, with dates as date objects for insert_df."""
+    features = build_features(facts)
+    features = features[(features['date_id'] >= pd.Timestamp(first_day)) & (features['date_id'] <= pd.Timestamp(last_day))]
+    return features.assign(date_id=features['date_id'].dt.date).reset_index(drop=True)
+
+def update_feature_store(client, first_day, last_day, logger):
+    """Recompute the feature rows that read the facts of days `first_day` to `last_day`.
+
+    Returns the number of rows written.
+    """
+    start = first_day - timedelta(days=LOOKBACK_DAYS)
+    end = last_day + timedelta(days=LOOKBACK_DAYS)
+    facts = client.query_df(FACTS_QUERY, parameters={'start': start, 'end': end})
+    rows = feature_rows(facts, first_day, end)
+    if not rows.empty:
+        client.insert_df(FEATURE_TABLE, rows)
+    logger.info(f"Updated {len(rows)} rows of {FEATURE_TABLE} from {first_day} "
+                f"(read {len(facts)} fact rows from {start} to {end})")
+    return len(rows)
+
+def read_features(client, start, end):
+    """Feature rows of days `start` to `end`, as training and inference use them."""
+    return client.query_df(FEATURES_QUERY, parameters={'start': start, 'end': end})
+
+def rebuild_feature_store(client, logger, start=None, end=None, chunk_days=REBUILD_CHUNK_DAYS):
+    """Write the feature rows of `start` to `end`, by default of the whole fact table, `chunk_days` at a time."""
+    first, last = client.query('SELECT min(date_id), max(date_id) FROM dwh.fact_daily_production').first_row
+    start, end = start or first, end or last
+    rows = 0
+    while start <= end:
+        chunk_end = min(start + timedelta(days=chunk_days - 1), end)
+        rows += update_feature_store(client, start, chunk_end, logger)
+        start = chunk_end + timedelta(days=1)
+    return rows
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=f'Build or rebuild {FEATURE_TABLE} from the daily facts.')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day to rebuild (default: first fact day).')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day to rebuild (default: last fact day).')
+    parser.add_argument('--chunk-days', type=int, default=REBUILD_CHUNK_DAYS, help='Days rebuilt per step.')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    from serving import connect
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('forecast.feature_store')
+    args = parse_args(argv)
+    rows = rebuild_feature_store(connect(), logger, args.start, args.end, args.chunk_days)
+    logger.info(f"Wrote {rows} rows of {FEATURE_TABLE}")
+
+if __name__ == '__main__':
+    main()
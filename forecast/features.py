@@ -0,0 +1,112 @@
+"""Production forecasting features, computed the same way for training, serving and the feature store.
+
+Daily fact rows are laid out as a dense (mine x day) grid, so every lag and
+rolling window is an index offset and the features of any set of
+(mine, day) pairs are gathered in one vectorized step. Compared to the
+notebook's features, lags and windows are per mine and by calendar day, and
+the rolling windows end the day before the target (the notebook's included
+the target itself). Exogenous values of days past the last observed day
+carry the last observed value forward.
+"""
+import numpy as np
+import pandas as pd
+
+TARGET = 'total_production_daily'
+
+# Same-day measures of fact_daily_production used as features
+EXOGENOUS_COLUMNS = [
+    'average_quality_grade', 'equipment_utilization', 'fuel_efficiency',
+    'temperature_2m_mean', 'rainfall_mm'
+]
+LAGS = (1, 2, 3, 7, 14)
+WINDOWS = (3, 7, 14, 30)
+
+# In the order the models were trained with (forecast/models/feature_columns.pkl)
+FEATURE_COLUMNS = (
+    EXOGENOUS_COLUMNS
+    + [f'production_lag_{lag}' for lag in LAGS]
+    + [f'production_{stat}_{window}' for window in WINDOWS for stat in ('ma', 'std')]
+    + ['rainfall_temp_interaction', 'equipment_efficiency']
+)
+
+# Days of history before a target day that its features read
+LOOKBACK_DAYS = max(max(LAGS), max(WINDOWS))
+
+HISTORY_COLUMNS = ['date_id', 'mine_id', TARGET] + EXOGENOUS_COLUMNS
+
+def day_number(dates):
+    """Days since the epoch of dates, datetimes or ISO strings."""
+    return pd.to_datetime(pd.Series(dates)).to_numpy().astype('datetime64[D]').astype('int64')
+
+def dense_history(history):
+    """Lay daily fact rows out as (mine x day) arrays from their first to their last day.
+
+    Returns a dict with the sorted 'mine_ids', the 'first_day' as a day
+    number, the 'production' grid (NaN where a mine has no row) and one
+    forward-filled grid per exogenous column.
+    """
+    days = day_number(history['date_id'])
+    mine_ids, mine_index = np.unique(history['mine_id'].astype(str).to_numpy(), return_inverse=True)
+    first_day = int(days.min()) if len(days) else 0
+    width = int(days.max()) - first_day + 1 if len(days) else 0
+    day_index = days - first_day
+
+    def grid(values):
+        cells = np.full((len(mine_ids), width), np.nan)
+        cells[mine_index, day_index] = values
+        return cells
+
+    exogenous = {
+        column: pd.DataFrame(grid(history[column].to_numpy(dtype='float64'))).ffill(axis=1).to_numpy()
+        for column in EXOGENOUS_COLUMNS
+    }
+    return {
+        'mine_ids': mine_ids,
+        'first_day': first_day,
+        'production': grid(history[TARGET].to_numpy(dtype='float64')),
+        'exogenous': exogenous,
+    }
+
+def feature_matrix(dense, mine_index, day_index):
+    """Features of the (mine, day) pairs given as grid indices, one row per pair, in FEATURE_COLUMNS order.
+
+    `day_index` may point one or more days past the grid: lags and windows
+    then read what is known, and exogenous values come from the last day.
+    """
+    mine_index = np.asarray(mine_index, dtype='int64')
+    day_index = np.asarray(day_index, dtype='int64')
+    production = dense['production']
+    width = production.shape[1]
+
+    def lagged(offsets):
+        """Production `offsets` days before each target day, NaN outside the grid."""
+        days = day_index[:, None] - np.asarray(offsets)[None, :]
+        inside = (days >= 0) & (days < width)
+        values = production[mine_index[:, None], np.clip(days, 0, max(width - 1, 0))]
+        return np.where(inside, values, np.nan)
+
+    exogenous_day = np.minimum(day_index, width - 1)
+    exogenous = [dense['exogenous'][column][mine_index, exogenous_day] for column in EXOGENOUS_COLUMNS]
+    columns = exogenous + list(lagged(LAGS).T)
+    for window in WINDOWS:
+        values = lagged(np.arange(1, window + 1))
+        columns.append(values.mean(axis=1))
+        columns.append(values.std(axis=1, ddof=1))
+    temperature, rainfall = exogenous[3], exogenous[4]
+    utilization, fuel_efficiency = exogenous[1], exogenous[2]
+    columns += [rainfall * temperature, utilization * fuel_efficiency]
+    return np.column_stack(columns)
+
+def build_features(history):
+    """Feature rows of every observed (mine, day) of `history`, with the target.
+
+    Returns a frame of date_id, mine_id, total_production_daily and the
+    FEATURE_COLUMNS; rows whose look-back is incomplete hold NaN features.
+    """
+    dense = dense_history(history)
+    mine_index, day_index = np.nonzero(~np.isnan(dense['production']))
+    features = pd.DataFrame(feature_matrix(dense, mine_index, day_index), columns=FEATURE_COLUMNS)
+    features.insert(0, 'date_id', (dense['first_day'] + day_index).astype('datetime64[D]'))
+    features.insert(1, 'mine_id', dense['mine_ids'][mine_index])
+    features.insert(2, TARGET, dense['production'][mine_index, day_index])
+    return features
@@ -0,0 +1,264 @@
+"""Versioned model artifacts in framework-native formats, each with a JSON manifest.
+
+    models/registry/<name>/<version>/manifest.json   framework, file, feature columns, training window, metrics
+    models/registry/<name>/<version>/<artifact>      the model itself:
+        xgboost  model.json    the booster's native JSON format (Booster.save_model)
+        prophet  model.json    prophet.serialize.model_to_json
+        scaler   scaler.json   mean and scale arrays of a StandardScaler
+        sarima   model.pickle  statsmodels' own results format (it has no other)
+
+Versions are sortable timestamps and written to a temporary directory
+that is renamed into place, so readers never see a partial version; the
+latest is the default. Loading imports a framework only when it is needed:
+an XGBoost model is evaluated from its JSON trees with numpy (TreeEnsemble)
+and a scaler is two arrays, so a predict-only process never imports
+xgboost or scikit-learn. `load_model(..., native=True)` returns the
+framework's own objects instead.
+
+Usage (from the repository root):
+    python forecast/registry.py convert     # register the pickles of forecast/models/
+    python forecast/registry.py list
+"""
+import argparse
+import json
+import os
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+MODELS_DIR = Path(__file__).resolve().parent / 'models'
+REGISTRY_DIR = MODELS_DIR / 'registry'
+MANIFEST_FILE = 'manifest.json'
+ARTIFACT_FILES = {
+    'xgboost': 'model.json',
+    'prophet': 'model.json',
+    'scaler': 'scaler.json',
+    'sarima': 'model.pickle',
+}
+
+# Pickles written by the forecasting notebook, by the registry name they are converted to
+PICKLES = {
+    'xgboost': 'xgboost_production_model.pkl',
+    'prophet': 'prophet_production_model.pkl',
+    'scaler': 'scaler.pkl',
+}
+
+class TreeEnsemble:
+    """An XGBoost regression booster evaluated with numpy from its native JSON, without importing xgboost.
+
+    Predictions are identical to Booster.inplace_predict: features and
+    thresholds are float32, `value < threshold` goes left, missing values
+    follow the default direction, and leaf values add up in float32 onto
+    the base score, tree by tree.
+    """
+
+    def __init__(self, booster):
+        learner = booster['learner']
+        if learner['objective']['name'] != 'reg:squarederror':
+            raise ValueError(f"Unsupported XGBoost objective: {learner['objective']['name']}")
+        trees = learner['gradient_booster']['model']['trees']
+        if any(tree['categories_nodes'] for tree in trees):
+            raise ValueError("Categorical splits are not supported")
+        self.feature_names = learner.get('feature_names', [])
+        self.base_score = np.float32(float(learner['learner_model_param']['base_score'].strip('[]')))
+
+        # All trees' nodes in one set of arrays; leaves point to themselves
+        sizes = [len(tree['left_children']) for tree in trees]
+        offsets = np.cumsum([0] + sizes)
+        self.roots = offsets[:-1]
+
+        def stacked(key, dtype):
+            return np.concatenate([np.asarray(tree[key], dtype=dtype) for tree in trees])
+
+        left, right = stacked('left_children', 'int64'), stacked('right_children', 'int64')
+        self.leaf = left == -1
+        nodes = np.arange(len(left))
+        shift = np.repeat(self.roots, sizes)
+        self.left = np.where(self.leaf, nodes, left + shift)
+        self.right = np.where(self.leaf, nodes, right + shift)
+        self.feature = stacked('split_indices', 'int64')
+        # Split thresholds on inner nodes, leaf values on leaves
+        self.threshold = stacked('split_conditions', 'float32')
+        self.default_left = stacked('default_left', 'bool')
+
+    @classmethod
+    def load(cls, path):
+        return cls(json.loads(Path(path).read_text()))
+
+    def predict(self, features):
+        """Predictions for a (rows x features) array, NaN as missing."""
+        features = np.asarray(features, dtype='float32')
+        rows = np.arange(len(features))[:, None]
+        nodes = np.broadcast_to(self.roots, (len(features), len(self.roots))).copy()
+        while not self.leaf[nodes].all():
+            values = features[rows, self.feature[nodes]]
+            go_left = np.where(np.isnan(values), self.default_left[nodes], values < self.threshold[nodes])
+            nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+        leaf_values = self.threshold[nodes]
+        predictions = np.full(len(features), self.base_score, dtype='float32')
+        for tree in range(leaf_values.shape[1]):
+            predictions += leaf_values[:, tree]
+        return predictions
+
+class ArrayScaler:
+    """StandardScaler transform from its mean and scale arrays, without scikit-learn."""
+
+    def __init__(self, mean, scale):
+        self.mean = np.asarray(mean, dtype='float64')
+        self.scale = np.asarray(scale, dtype='float64')
+
+    def transform(self, features):
+        return (np.asarray(features, dtype='float64') - self.mean) / self.scale
+
+    def inverse_transform(self, features):
+        return np.asarray(features, dtype='float64') * self.scale + self.mean
+
+def write_artifact(model, framework, path):
+    if framework == 'xgboost':
+        booster = model.get_booster() if hasattr(model, 'get_booster') else model
+        booster.save_model(str(path))
+    elif framework == 'prophet':
+        from prophet.serialize import model_to_json
+
+        path.write_text(model_to_json(model))
+    elif framework == 'scaler':
+        path.write_text(json.dumps({'mean': model.mean_.tolist(), 'scale': model.scale_.tolist()}))
+    elif framework == 'sarima':
+        model.save(str(path))
+    else:
+        raise ValueError(f"Unknown framework: {framework}")
+
+def framework_version(framework):
+    module = {'scaler': 'sklearn', 'sarima': 'statsmodels'}.get(framework, framework)
+    return __import__(module).__version__
+
+def save_model(model, name, framework, registry_dir=REGISTRY_DIR, version=None, feature_columns=None,
+               training_window=None, metrics=None, source=None):
+    """Write `model` as a new version of `name` and return its directory.
+
+    `training_window` is a {'start', 'end'} dict of ISO dates and `metrics`
+    a dict of backtest scores; both are only recorded in the manifest.
+    """
+    version = version or datetime.now().strftime('%Y%m%d_%H%M%S')
+    target = Path(registry_dir) / name / version
+    if target.exists():
+        raise FileExistsError(f"{name} version {version} already exists")
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = Path(tempfile.mkdtemp(prefix=f'.{version}_', dir=target.parent))
+    write_artifact(model, framework, staging / ARTIFACT_FILES[framework])
+    manifest = {
+        'name': name,
+        'version': version,
+        'framework': framework,
+        'framework_version': framework_version(framework),
+        'file': ARTIFACT_FILES[framework],
+        'feature_columns': list(feature_columns) if feature_columns is not None else None,
+        'training_window': training_window,
+        'metrics': metrics or {},
+        'source': source,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+    (staging / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2))
+    os.rename(staging, target)
+    return target
+
+def versions(name, registry_dir=REGISTRY_DIR):
+    """The versions of `name`, oldest first."""
+    directory = Path(registry_dir) / name
+    if not directory.is_dir():
+        return []
+    return sorted(path.name for path in directory.iterdir() if (path / MANIFEST_FILE).exists())
+
+def read_manifest(name, version=None, registry_dir=REGISTRY_DIR):
+    """The manifest of a version of `name`, by default the latest."""
+    if version is None:
+        available = versions(name, registry_dir)
+        if not available:
+            raise FileNotFoundError(f"No versions of {name} in {registry_dir}")
+        version = available[-1]
+    return json.loads((Path(registry_dir) / name / version / MANIFEST_FILE).read_text())
+
+def load_model(name, version=None, registry_dir=REGISTRY_DIR, native=False):
+    """Load a version of `name`, by default the latest, importing only what its framework needs.
+
+    XGBoost models load as a TreeEnsemble and scalers as an ArrayScaler
+    unless `native` is set.
+    """
+    manifest = read_manifest(name, version, registry_dir)
+    path = Path(registry_dir) / name / manifest['version'] / manifest['file']
+    framework = manifest['framework']
+    if framework == 'xgboost':
+        if not native:
+            return TreeEnsemble.load(path)
+        from xgboost import Booster
+
+        return Booster(model_file=str(path))
+    if framework == 'prophet':
+        from prophet.serialize import model_from_json
+
+        return model_from_json(path.read_text())
+    if framework == 'scaler':
+        arrays = json.loads(path.read_text())
+        scaler = ArrayScaler(arrays['mean'], arrays['scale'])
+        if not native:
+            return scaler
+        from sklearn.preprocessing import StandardScaler
+
+        native_scaler = StandardScaler()
+        native_scaler.mean_, native_scaler.scale_ = scaler.mean, scaler.scale
+        native_scaler.var_, native_scaler.n_features_in_ = scaler.scale ** 2, len(scaler.mean)
+        return native_scaler
+    if framework == 'sarima':
+        from statsmodels.tsa.statespace.sarimax import SARIMAXResults
+
+        return SARIMAXResults.load(str(path))
+    raise ValueError(f"Unknown framework: {framework}")
+
+def convert_pickles(models_dir=MODELS_DIR, registry_dir=REGISTRY_DIR, version=None):
+    """Register the notebook's pickles; returns the new version directories."""
+    import pickle
+
+    import joblib
+
+    models_dir = Path(models_dir)
+    feature_columns = pickle.loads((models_dir / 'feature_columns.pkl').read_bytes())
+    written = []
+    for name, file in PICKLES.items():
+        model = joblib.load(models_dir / file)
+        window = None
+        if name == 'prophet':
+            window = {'start': str(model.history['ds'].min().date()), 'end': str(model.history['ds'].max().date())}
+        written.append(save_model(
+            model, name, name, registry_dir, version,
+            feature_columns=None if name == 'prophet' else feature_columns,
+            training_window=window, source=file,
+        ))
+    return written
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Versioned model artifacts of the forecasting models.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    convert = commands.add_parser('convert', help='Register the pickled models as new versions.')
+    convert.add_argument('--models-dir', type=Path, default=MODELS_DIR)
+    convert.add_argument('--version', help='Version to write (default: the current time).')
+    commands.add_parser('list', help='Versions of every registered model.')
+    parser.add_argument('--registry', type=Path, default=REGISTRY_DIR)
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == 'convert':
+        for path in convert_pickles(args.models_dir, args.registry, args.version):
+            print(f"Registered {path}")
+        return
+    for directory in sorted(path for path in args.registry.iterdir() if path.is_dir()):
+        for version in versions(directory.name, args.registry):
+            manifest = read_manifest(directory.name, version, args.registry)
+            window = manifest['training_window'] or {}
+            print(f"{manifest['name']:<20} {version:<16} {manifest['framework']:<8} "
+                  f"{window.get('start', '-')}..{window.get('end', '-')} {manifest['metrics']}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,415 @@
+"""Resident production forecast service: models loaded once, recent history in memory, micro-batched predictions.
+
+The service keeps the last --history-days of daily facts per mine as a
+dense grid (features.py), so a request never queries ClickHouse or
+rebuilds history. Concurrent requests for any mines and dates are
+collected for up to --max-wait-ms into one feature matrix and a single
+vectorized predict() call per model. A request may ask for any day in the
+window and the day after the last loaded day; multi-day horizons are the
+batch forecasts' job. Models are the latest registered versions
+(registry.py); XGBoost predicts without importing xgboost. Prophet was fit on
+the production of all mines together, so it only answers fleet-wide
+requests, with mine_id "all".
+
+HTTP API (JSON):
+    GET  /health                          models, loaded days and batching stats
+    POST /predict  {"model": "xgboost", "requests": [{"mine_id": "1", "date": "2025-04-21"}]}
+    POST /predict  {"model": "prophet", "requests": [{"mine_id": "all", "date": "2025-04-21"}]}
+    POST /refresh                         read the days loaded into the DWH since the last refresh
+
+Python API:
+    service = open_service(['xgboost'], load_history(connect()))
+    service.predict([('1', '2025-04-21'), ('2', '2025-04-21')])
+
+Usage (from the repository root):
+    python forecast/serving.py --port 8765 --refresh-seconds 3600
+    python forecast/serving.py --history data/daily_production.parquet
+"""
+import argparse
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, HISTORY_COLUMNS, day_number, dense_history, feature_matrix
+from registry import REGISTRY_DIR, load_model, read_manifest
+
+# Registered models the service can answer with
+SERVED_MODELS = ('xgboost', 'prophet')
+# Models fit on the total production of all mines, answering only requests for FLEET_MINE_ID
+FLEET_MODELS = ('prophet',)
+FLEET_MINE_ID = 'all'
+
+DEFAULT_PORT = 8765
+# Days of daily facts kept in memory per mine; features read LOOKBACK_DAYS of them
+HISTORY_DAYS = 120
+# Recent days re-read on refresh, since replace loads rewrite whole months
+REFRESH_OVERLAP_DAYS = 7
+MAX_BATCH = 1024
+MAX_WAIT_SECONDS = 0.002
+
+HISTORY_QUERY = f"""
+    SELECT {', '.join(HISTORY_COLUMNS)}
+    FROM dwh.fact_daily_production
+    WHERE date_id >= {{since:Date}}
+    ORDER BY date_id, mine_id
+"""
+
+logger = logging.getLogger('forecast.serving')
+
+def connect():
+    import clickhouse_connect
+    return clickhouse_connect.get_client(
+        host=os.environ.get('CLICKHOUSE_HOST', 'clickhouse'),
+        port=int(os.environ.get('CLICKHOUSE_PORT', 8123)),
+        username=os.environ.get('CLICKHOUSE_USER', 'default'),
+        password=os.environ.get('CLICKHOUSE_PASSWORD', '')
+    )
+
+def load_history(client, since=None, days=HISTORY_DAYS):
+    """Daily facts from `since`, by default the last `days` days loaded into the DWH."""
+    if since is None:
+        last = client.query('SELECT max(date_id) FROM dwh.fact_daily_production').first_row[0]
+        since = last - timedelta(days=days - 1)
+    return client.query_df(HISTORY_QUERY, parameters={'since': since})
+
+def read_history(path):
+    """Daily facts from a Parquet or CSV export of dwh.fact_daily_production."""
+    path = Path(path)
+    frame = pd.read_parquet(path) if path.suffix == '.parquet' else pd.read_csv(path)
+    return frame[HISTORY_COLUMNS]
+
+def load_models(names, registry_dir=REGISTRY_DIR):
+    """Load the latest registered version of each named model once (see registry.py).
+
+    XGBoost is evaluated from its JSON trees, so only Prophet imports its framework, and only when asked for.
+    """
+    for name in names:
+        columns = read_manifest(name, registry_dir=registry_dir)['feature_columns']
+        if columns is not None and columns != FEATURE_COLUMNS:
+            raise ValueError(f"{name} was trained on other features than features.py computes: {columns}")
+    return {name: load_model(name, registry_dir=registry_dir) for name in names}
+
+class FeatureWindows:
+    """The last `history_days` days of facts of every mine, as the dense grid features are gathered from."""
+
+    def __init__(self, history, history_days=HISTORY_DAYS):
+        self.history_days = history_days
+        self.lock = threading.Lock()
+        self._set(history)
+
+    def _set(self, history):
+        history = history[HISTORY_COLUMNS].assign(mine_id=history['mine_id'].astype(str))
+        if not history.empty:
+            days = day_number(history['date_id'])
+            history = history[days > days.max() - self.history_days]
+        self.history = history.reset_index(drop=True)
+        self.dense = dense_history(self.history)
+        self.mines = {mine_id: index for index, mine_id in enumerate(self.dense['mine_ids'])}
+        self.last_day = self.dense['first_day'] + self.dense['production'].shape[1] - 1
+
+    def update(self, rows):
+        """Merge new or reloaded daily rows; later rows replace earlier ones of the same (date, mine)."""
+        if rows.empty:
+            return
+        rows = rows[HISTORY_COLUMNS].assign(mine_id=rows['mine_id'].astype(str))
+        merged = pd.concat([self.history, rows], ignore_index=True)
+        merged['date_id'] = pd.to_datetime(merged['date_id'])
+        merged = merged.drop_duplicates(['date_id', 'mine_id'], keep='last')
+        with self.lock:
+            self._set(merged)
+
+    @property
+    def last_date(self):
+        return date(1970, 1, 1) + timedelta(days=int(self.last_day))
+
+    def locate(self, mine_id, day):
+        """Grid indices of a (mine, date) request; the date may be at most the day after the last loaded day."""
+        with self.lock:
+            return self._locate(mine_id, day)
+
+    def check_day(self, day):
+        """Day number of a requested date, which may be at most the day after the last loaded day."""
+        day = int(np.datetime64(day, 'D').astype('int64'))
+        if not self.dense['first_day'] <= day <= self.last_day + 1:
+            raise ValueError(f"Date {date(1970, 1, 1) + timedelta(days=day)} is outside the served range "
+                             f"{date(1970, 1, 1) + timedelta(days=int(self.dense['first_day']))} to "
+                             f"{self.last_date + timedelta(days=1)}")
+        return day
+
+    def _locate(self, mine_id, day):
+        mine_id = str(mine_id)
+        if mine_id not in self.mines:
+            raise KeyError(f"Unknown mine {mine_id}")
+        return self.mines[mine_id], self.check_day(day) - self.dense['first_day']
+
+    def features(self, requests):
+        """Feature rows of (mine_id, date) requests, located and gathered on the same grid.
+
+        A refresh may replace the grid between a request's validation and its
+        batch, so indices are only resolved here. Returns the matrix of the
+        requests still served and {position: error} of the others.
+        """
+        indices, errors = [], {}
+        with self.lock:
+            for position, (mine_id, day) in enumerate(requests):
+                try:
+                    indices.append(self._locate(mine_id, day))
+                except (KeyError, ValueError) as e:
+                    errors[position] = e
+            mine_index, day_index = np.array(indices, dtype='int64').reshape(-1, 2).T
+            return feature_matrix(self.dense, mine_index, day_index), errors
+
+class MicroBatcher:
+    """Collects concurrently submitted items into batches for one `predict(items) -> values` call.
+
+    A batch closes when it holds `max_batch` items or `max_wait` seconds
+    after its first item arrived.
+    """
+
+    def __init__(self, predict, max_batch=MAX_BATCH, max_wait=MAX_WAIT_SECONDS):
+        self.predict = predict
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = queue.Queue()
+        self.batches = 0
+        self.items = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, item):
+        future = Future()
+        self.queue.put((item, future))
+        return future
+
+    def _collect(self, first):
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                pending = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if pending is None:
+                self.queue.put(None)
+                break
+            batch.append(pending)
+        return batch
+
+    def _run(self):
+        while (first := self.queue.get()) is not None:
+            batch = self._collect(first)
+            try:
+                values = self.predict([item for item, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), value in zip(batch, values):
+                if isinstance(value, Exception):
+                    future.set_exception(value)
+                else:
+                    future.set_result(float(value))
+
+    def close(self):
+        self.queue.put(None)
+        self.thread.join()
+
+class ForecastService:
+    """Answers (mine, date) production forecasts from resident models and feature windows."""
+
+    def __init__(self, models, windows, max_batch=MAX_BATCH, max_wait=MAX_WAIT_SECONDS):
+        self.models = models
+        self.windows = windows
+        predictors = {'xgboost': self._predict_xgboost, 'prophet': self._predict_prophet}
+        self.batchers = {
+            name: MicroBatcher(predictors[name], max_batch, max_wait) for name in models
+        }
+
+    def _predict_xgboost(self, items):
+        features, errors = self.windows.features(items)
+        predictions = iter(self.models['xgboost'].predict(features) if len(features) else [])
+        return [errors[position] if position in errors else next(predictions) for position in range(len(items))]
+
+    def _predict_prophet(self, items):
+        # Fleet-wide requests only (see submit): one value per date
+        dates = sorted({day for _, day in items})
+        forecast = self.models['prophet'].predict(pd.DataFrame({'ds': pd.to_datetime(dates)}))
+        by_date = dict(zip(dates, forecast['yhat']))
+        return [by_date[day] for _, day in items]
+
+    def submit(self, mine_id, day, model='xgboost'):
+        """Queue one forecast and return its Future; invalid requests raise here, not in the batch.
+
+        Only the request is queued: its grid indices are resolved when the batch runs.
+        Fleet models answer the total of all mines, so they refuse per-mine requests.
+        """
+        if model not in self.batchers:
+            raise KeyError(f"Model {model} is not loaded")
+        if model in FLEET_MODELS:
+            if str(mine_id) != FLEET_MINE_ID:
+                raise ValueError(f"Model {model} forecasts the production of all mines together, "
+                                 f"request mine_id '{FLEET_MINE_ID}' instead of '{mine_id}'")
+            with self.windows.lock:
+                self.windows.check_day(day)
+        else:
+            self.windows.locate(mine_id, day)
+        return self.batchers[model].submit((str(mine_id), np.datetime64(day, 'D')))
+
+    def predict(self, requests, model='xgboost'):
+        """Forecast production for (mine_id, date) pairs, batched with any concurrent callers."""
+        futures = [self.submit(mine_id, day, model) for mine_id, day in requests]
+        return [future.result() for future in futures]
+
+    def refresh(self, client):
+        """Read the facts loaded since the last refresh (plus a short overlap) into the windows."""
+        since = self.windows.last_date - timedelta(days=REFRESH_OVERLAP_DAYS)
+        rows = load_history(client, since)
+        self.windows.update(rows)
+        return len(rows)
+
+    def health(self):
+        return {
+            'status': 'ok',
+            'models': sorted(self.models),
+            'mines': len(self.windows.mines),
+            'last_date': self.windows.last_date.isoformat(),
+            'batches': {name: {'batches': batcher.batches, 'items': batcher.items}
+                        for name, batcher in self.batchers.items()},
+        }
+
+    def close(self):
+        for batcher in self.batchers.values():
+            batcher.close()
+
+def open_service(model_names, history, history_days=HISTORY_DAYS, max_batch=MAX_BATCH, max_wait=MAX_WAIT_SECONDS,
+                 registry_dir=REGISTRY_DIR):
+    """Load the models and build the feature windows once; the returned service is ready to predict."""
+    return ForecastService(load_models(model_names, registry_dir), FeatureWindows(history, history_days),
+                           max_batch, max_wait)
+
+class ForecastHTTPServer(ThreadingHTTPServer):
+    # Room for many concurrent clients connecting at once (the default backlog is 5)
+    request_queue_size = 256
+    daemon_threads = True
+
+def make_handler(service, client_factory=None):
+    """An HTTP request handler class bound to `service`."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == '/health':
+                self._reply(200, service.health())
+            else:
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+
+        def do_POST(self):
+            if self.path == '/refresh':
+                if client_factory is None:
+                    self._reply(400, {'error': 'The service was started from a history file'})
+                    return
+                client = client_factory()
+                try:
+                    rows = service.refresh(client)
+                    self._reply(200, {'rows': rows, 'last_date': service.windows.last_date.isoformat()})
+                finally:
+                    client.close()
+                return
+            if self.path != '/predict':
+                self._reply(404, {'error': f"Unknown path {self.path}"})
+                return
+            try:
+                body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+                requests = [(request['mine_id'], request['date']) for request in body['requests']]
+                values = service.predict(requests, body.get('model', 'xgboost'))
+            except (KeyError, ValueError, TypeError) as e:
+                self._reply(400, {'error': str(e)})
+                return
+            self._reply(200, {'predictions': [
+                {'mine_id': str(mine_id), 'date': str(day), 'production': value}
+                for (mine_id, day), value in zip(requests, values)
+            ]})
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return Handler
+
+def refresh_periodically(service, client_factory, interval):
+    while True:
+        time.sleep(interval)
+        client = client_factory()
+        try:
+            logger.info(f"Refreshed {service.refresh(client)} daily rows, last date {service.windows.last_date}")
+        except Exception as e:
+            logger.error(f"Refresh failed: {e}")
+        finally:
+            client.close()
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--models', default='xgboost', help=f"Comma-separated, from {', '.join(SERVED_MODELS)}.")
+    parser.add_argument('--history', type=Path,
+                        help='Parquet or CSV daily facts to serve from instead of dwh.fact_daily_production.')
+    parser.add_argument('--history-days', type=int, default=HISTORY_DAYS, help='Days of facts kept in memory.')
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH, help='Most requests answered by one predict call.')
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT_SECONDS * 1000,
+                        help='How long a batch waits for more requests after its first one.')
+    parser.add_argument('--refresh-seconds', type=float,
+                        help='Read newly loaded days from ClickHouse at this interval.')
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    started = time.perf_counter()
+    client_factory = None if args.history else connect
+    if args.history:
+        history = read_history(args.history)
+    else:
+        client = connect()
+        try:
+            history = load_history(client, days=args.history_days)
+        finally:
+            client.close()
+    service = open_service(args.models.split(','), history, args.history_days, args.max_batch, args.max_wait_ms / 1000)
+    logger.info(f"Loaded {', '.join(service.models)} and {len(service.windows.mines)} mines up to "
+                f"{service.windows.last_date} in {time.perf_counter() - started:.2f}s")
+    if args.refresh_seconds and client_factory:
+        threading.Thread(target=refresh_periodically, args=(service, client_factory, args.refresh_seconds),
+                         daemon=True).start()
+
+    server = ForecastHTTPServer((args.host, args.port), make_handler(service, client_factory))
+    logger.info(f"Serving forecasts on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+if __name__ == '__main__':
+    main()
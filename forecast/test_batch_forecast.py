@@ -0,0 +1,72 @@
+"""Tests for the vectorized multi-horizon batch forecasts."""
+import logging
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from batch_forecast import FORECAST_TABLE, forecast_rows, write_forecasts
+from features import EXOGENOUS_COLUMNS, LOOKBACK_DAYS, TARGET, dense_history, feature_matrix
+from registry import load_model
+from serving import open_service
+
+def per_series_forecast(history, model, horizon):
+    """Reference: each mine on its own, one row predicted and appended to its history per step."""
+    forecasts = {}
+    last = pd.to_datetime(history['date_id']).max()
+    for mine_id, rows in history.groupby('mine_id'):
+        rows = rows.assign(date_id=pd.to_datetime(rows['date_id'])).sort_values('date_id')
+        exogenous = rows[EXOGENOUS_COLUMNS].ffill().iloc[-1]
+        predictions = []
+        for step in range(1, horizon + 1):
+            dense = dense_history(rows)
+            day = (last + timedelta(days=step) - rows['date_id'].min()).days
+            [prediction] = model.predict(feature_matrix(dense, [0], [day]))
+            predictions.append(prediction)
+            next_row = {'date_id': last + timedelta(days=step), 'mine_id': mine_id, TARGET: prediction, **exogenous}
+            rows = pd.concat([rows, pd.DataFrame([next_row])], ignore_index=True)
+        forecasts[mine_id] = predictions
+    return forecasts
+
+def test_vectorized_recursion_matches_a_per_series_loop_and_the_service(make_history):
+    history = make_history(mines=4, days=LOOKBACK_DAYS)
+    model = load_model('xgboost')
+
+    rows = forecast_rows(history, model, horizon=10, model_version='v1')
+
+    assert len(rows) == 4 * 10 and rows['horizon'].tolist()[:10] == list(range(1, 11))
+    last = pd.to_datetime(history['date_id']).max().date()
+    assert (rows['origin_date'] == last).all()
+    assert rows.loc[rows['horizon'] == 10, 'date_id'].tolist() == [last + timedelta(days=10)] * 4
+    expected = per_series_forecast(history, model, 10)
+    for mine_id, predictions in rows.groupby('mine_id')['predicted_production']:
+        np.testing.assert_allclose(predictions.to_numpy(), expected[mine_id], rtol=1e-6)
+
+    service = open_service(['xgboost'], history)
+    try:
+        next_day = service.predict([(mine_id, last + timedelta(days=1)) for mine_id in '1234'])
+    finally:
+        service.close()
+    np.testing.assert_array_equal(rows.loc[rows['horizon'] == 1, 'predicted_production'].to_numpy(), next_day)
+
+def test_forecasts_are_written_with_the_model_version(make_history):
+    history = make_history(mines=3, days=60)
+
+    class Client:
+        inserted = {}
+
+        def query(self, query, parameters=None):
+            return type('Result', (), {'first_row': (pd.to_datetime(history['date_id']).max().date(),)})
+
+        def query_df(self, query, parameters=None):
+            return history[pd.to_datetime(history['date_id']).dt.date >= parameters['since']]
+
+        def insert_df(self, table, df):
+            self.inserted[table] = df
+
+    client = Client()
+    assert write_forecasts(client, logging.getLogger('test'), horizon=30) == 3 * 30
+
+    rows = client.inserted[FORECAST_TABLE]
+    assert set(rows['model_version']) == {'20250723_000000'} and set(rows['model']) == {'xgboost'}
+    assert rows['predicted_production'].notna().all()
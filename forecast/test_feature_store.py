@@ -0,0 +1,66 @@
+"""Tests for the incremental feature store."""
+import logging
+from datetime import date, timedelta
+
+import pandas as pd
+
+from feature_store import FEATURE_TABLE, LOOKBACK_DAYS, rebuild_feature_store, update_feature_store
+from features import build_features
+
+logger = logging.getLogger('test_feature_store')
+
+class FactsClient:
+    """Client double: serves the facts between the query's dates and keeps the latest version of each feature row."""
+
+    def __init__(self, facts):
+        self.facts = facts
+        self.store = pd.DataFrame()
+        self.reads = []
+
+    def query(self, query, parameters=None):
+        days = pd.to_datetime(self.facts['date_id'])
+        return type('Result', (), {'first_row': (days.min().date(), days.max().date())})
+
+    def query_df(self, query, parameters=None):
+        self.reads.append((parameters['start'], parameters['end']))
+        days = pd.to_datetime(self.facts['date_id']).dt.date
+        return self.facts[(days >= parameters['start']) & (days <= parameters['end'])].reset_index(drop=True)
+
+    def insert_df(self, table, df):
+        assert table == FEATURE_TABLE
+        self.store = pd.concat([self.store, df]).drop_duplicates(['date_id', 'mine_id'], keep='last')
+
+    def features(self):
+        return self.store.sort_values(['mine_id', 'date_id']).reset_index(drop=True)
+
+def expected_features(facts):
+    expected = build_features(facts)
+    return expected.assign(date_id=expected['date_id'].dt.date).sort_values(['mine_id', 'date_id']).reset_index(drop=True)
+
+def test_incremental_updates_match_a_full_build(make_history):
+    facts = make_history(mines=3, days=90)
+    days = pd.to_datetime(facts['date_id']).dt.date
+    cutoff = date(2025, 3, 10)
+    client = FactsClient(facts[days <= cutoff])
+    rebuild_feature_store(client, logger, chunk_days=20)
+
+    # Two nightly loads of one day each, then a late reload of an earlier week
+    for day in (cutoff + timedelta(days=1), cutoff + timedelta(days=2)):
+        client.facts = facts[days <= day]
+        assert update_feature_store(client, day, day, logger) == (days == day).sum()
+    client.facts = facts[days <= cutoff + timedelta(days=2)].copy()
+    reloaded = (days >= date(2025, 2, 1)) & (days <= date(2025, 2, 7))
+    client.facts.loc[reloaded[client.facts.index], 'total_production_daily'] += 100
+    update_feature_store(client, date(2025, 2, 1), date(2025, 2, 7), logger)
+
+    pd.testing.assert_frame_equal(client.features(), expected_features(client.facts))
+
+def test_an_update_reads_only_a_bounded_window_of_facts(make_history):
+    facts = make_history(mines=2, days=200)
+    client = FactsClient(facts)
+    last = pd.to_datetime(facts['date_id']).max().date()
+    update_feature_store(client, last, last, logger)
+
+    [(start, end)] = client.reads
+    assert (start, end) == (last - timedelta(days=LOOKBACK_DAYS), last + timedelta(days=LOOKBACK_DAYS))
+    assert set(client.store['date_id']) == {last}
@@ -0,0 +1,50 @@
+"""Tests for the dense-grid production features."""
+import numpy as np
+import pandas as pd
+
+from features import (EXOGENOUS_COLUMNS, FEATURE_COLUMNS, LAGS, TARGET, WINDOWS, build_features, dense_history,
+                      feature_matrix)
+
+def reference_features(history):
+    """The features with pandas shift/rolling per mine over a complete daily index."""
+    frames = []
+    for mine_id, rows in history.groupby('mine_id'):
+        rows = rows.set_index(pd.to_datetime(rows['date_id'])).sort_index()
+        daily = rows.reindex(pd.date_range(rows.index.min(), history['date_id'].max()))
+        production = daily[TARGET]
+        features = daily[EXOGENOUS_COLUMNS].ffill()
+        for lag in LAGS:
+            features[f'production_lag_{lag}'] = production.shift(lag)
+        for window in WINDOWS:
+            features[f'production_ma_{window}'] = production.shift(1).rolling(window).mean()
+            features[f'production_std_{window}'] = production.shift(1).rolling(window).std()
+        features['rainfall_temp_interaction'] = features['rainfall_mm'] * features['temperature_2m_mean']
+        features['equipment_efficiency'] = features['equipment_utilization'] * features['fuel_efficiency']
+        features = features[production.notna()]
+        frames.append(features.assign(mine_id=mine_id).rename_axis('date_id').reset_index())
+    return pd.concat(frames).sort_values(['mine_id', 'date_id']).reset_index(drop=True)
+
+def test_features_match_per_mine_shift_and_rolling(make_history):
+    history = make_history()
+
+    features = build_features(history).sort_values(['mine_id', 'date_id']).reset_index(drop=True)
+    expected = reference_features(history)
+
+    assert list(features.columns[3:]) == FEATURE_COLUMNS
+    assert len(features) == len(history)
+    np.testing.assert_array_equal(features['date_id'].to_numpy(), expected['date_id'].to_numpy())
+    np.testing.assert_allclose(
+        features[FEATURE_COLUMNS].to_numpy(), expected[FEATURE_COLUMNS].to_numpy(), rtol=1e-9, equal_nan=True
+    )
+
+def test_next_day_features_read_history_and_carry_exogenous_values_forward(make_history):
+    history = make_history(mines=1, days=40)
+    dense = dense_history(history)
+    last = dense['production'].shape[1] - 1
+
+    next_day = pd.Series(feature_matrix(dense, [0], [last + 1])[0], index=FEATURE_COLUMNS)
+
+    assert next_day['production_lag_1'] == dense['production'][0, last] or np.isnan(dense['production'][0, last])
+    assert next_day['temperature_2m_mean'] == dense['exogenous']['temperature_2m_mean'][0, last]
+    # Two days ahead, the day before is not known yet
+    assert np.isnan(feature_matrix(dense, [0], [last + 2])[0][FEATURE_COLUMNS.index('production_lag_1')])
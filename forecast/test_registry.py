@@ -0,0 +1,60 @@
+"""Tests for the versioned model registry and its framework-free predictors."""
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from features import FEATURE_COLUMNS, build_features
+from registry import MODELS_DIR, load_model, read_manifest, save_model, versions
+
+@pytest.fixture
+def feature_rows(make_history):
+    features = build_features(make_history(mines=5, days=80))[FEATURE_COLUMNS].to_numpy().copy()
+    features[::7, 3] = np.nan  # missing weather follows the trees' default directions
+    return features
+
+def test_tree_ensemble_predicts_exactly_like_xgboost(feature_rows):
+    xgboost = pytest.importorskip('xgboost')
+    features = feature_rows
+
+    booster = load_model('xgboost', native=True)
+    assert isinstance(booster, xgboost.Booster)
+    np.testing.assert_array_equal(load_model('xgboost').predict(features), booster.inplace_predict(features))
+
+def test_registered_scaler_matches_the_pickled_one(feature_rows):
+    joblib = pytest.importorskip('joblib')
+    pytest.importorskip('sklearn')
+    features = feature_rows
+
+    pickled = joblib.load(MODELS_DIR / 'scaler.pkl')
+    np.testing.assert_array_equal(load_model('scaler').transform(features), pickled.transform(features))
+    np.testing.assert_array_equal(load_model('scaler', native=True).transform(features), pickled.transform(features))
+
+def test_versions_are_immutable_and_the_latest_is_loaded(tmp_path, make_history):
+    xgboost = pytest.importorskip('xgboost')
+    features = build_features(make_history(mines=2, days=60)).dropna()
+    for version, rounds in (('20250101_000000', 2), ('20250201_000000', 5)):
+        model = xgboost.XGBRegressor(n_estimators=rounds, max_depth=3).fit(features[FEATURE_COLUMNS],
+                                                                            features['total_production_daily'])
+        save_model(model, 'xgboost_1', 'xgboost', tmp_path, version, feature_columns=FEATURE_COLUMNS,
+                   training_window={'start': '2025-01-01', 'end': '2025-03-01'}, metrics={'mae': 1.5})
+
+    assert versions('xgboost_1', tmp_path) == ['20250101_000000', '20250201_000000']
+    manifest = read_manifest('xgboost_1', registry_dir=tmp_path)
+    assert (manifest['version'], manifest['file'], manifest['metrics']) == ('20250201_000000', 'model.json', {'mae': 1.5})
+    np.testing.assert_array_equal(load_model('xgboost_1', registry_dir=tmp_path).predict(features[FEATURE_COLUMNS]),
+                                  model.get_booster().inplace_predict(features[FEATURE_COLUMNS]))
+    with pytest.raises(FileExistsError):
+        save_model(model, 'xgboost_1', 'xgboost', tmp_path, '20250201_000000')
+
+def test_predict_only_process_imports_no_framework():
+    script = (
+        "import sys, numpy as np; from registry import load_model; "
+        "load_model('xgboost').predict(np.zeros((1, 20))); load_model('scaler').transform(np.zeros((1, 20))); "
+        "print(sorted({'xgboost', 'sklearn', 'prophet', 'joblib', 'pandas'} & set(sys.modules)))"
+    )
+    result = subprocess.run([sys.executable, '-c', script], cwd=Path(__file__).resolve().parent,
+                            capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
@@ -0,0 +1,122 @@
+"""Tests for the resident forecast service: micro-batching, feature windows and the HTTP API."""
+import json
+import threading
+import urllib.request
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import FEATURE_COLUMNS
+from serving import FeatureWindows, ForecastHTTPServer, ForecastService, MicroBatcher, make_handler, open_service
+
+class SumModel:
+    """Model double: predicts the sum of the first two lags and counts predict calls."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, features):
+        self.calls.append(len(features))
+        lags = [FEATURE_COLUMNS.index('production_lag_1'), FEATURE_COLUMNS.index('production_lag_2')]
+        return features[:, lags].sum(axis=1)
+
+def test_concurrent_submissions_are_answered_by_one_batch():
+    calls = []
+
+    def predict(items):
+        calls.append(len(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(predict, max_batch=8, max_wait=0.5)
+    try:
+        futures = [batcher.submit(item) for item in range(10)]
+        assert [future.result(5) for future in futures] == [item * 2.0 for item in range(10)]
+    finally:
+        batcher.close()
+    # Full batches close at once, the rest after the wait
+    assert calls == [8, 2]
+    assert (batcher.batches, batcher.items) == (2, 10)
+
+def test_service_predicts_from_windows_and_takes_refreshed_days(make_history):
+    history = make_history(mines=2, days=50)
+    model = SumModel()
+    windows = FeatureWindows(history, history_days=40)
+    service = ForecastService({'xgboost': model}, windows)
+    try:
+        last = windows.last_date
+        production = history.set_index(['mine_id', 'date_id'])['total_production_daily']
+        [prediction] = service.predict([('1', last + timedelta(days=1))])
+        expected = production.get(('1', last), np.nan) + production.get(('1', last - timedelta(days=1)), np.nan)
+        assert prediction == pytest.approx(expected, nan_ok=True)
+
+        with pytest.raises(KeyError):
+            service.predict([('9', last)])
+        with pytest.raises(ValueError):
+            service.predict([('1', last + timedelta(days=2))])
+
+        new_day = history[history['date_id'] == last].assign(date_id=last + timedelta(days=1))
+        windows.update(new_day)
+        assert windows.last_date == last + timedelta(days=1)
+        assert service.predict([('1', last + timedelta(days=2))])
+    finally:
+        service.close()
+
+def test_pending_requests_are_read_from_the_refreshed_grid(make_history):
+    history = make_history(mines=3, days=60)
+    day = history['date_id'].max() - timedelta(days=10)
+    windows = FeatureWindows(history[(history['date_id'] <= day) & (history['mine_id'] != '1')], history_days=40)
+    service = ForecastService({'xgboost': SumModel()}, windows, max_batch=64, max_wait=0.5)
+    try:
+        pending = service.submit('3', day)
+        # Ten more days move the window's first day, and mine 1 shifts mine 3 to another row
+        windows.update(history[history['date_id'] > day])
+        windows.update(history[history['mine_id'] == '1'])
+        [refreshed] = service.predict([('3', day)])
+        assert np.isfinite(refreshed) and pending.result(5) == refreshed
+    finally:
+        service.close()
+
+def test_fleet_model_refuses_per_mine_requests(make_history):
+    class FleetModel:
+        """Prophet double: the fleet total is the day of the month."""
+
+        def predict(self, frame):
+            return pd.DataFrame({'yhat': frame['ds'].dt.day.astype(float)})
+
+    windows = FeatureWindows(make_history(mines=2, days=40), history_days=40)
+    service = ForecastService({'prophet': FleetModel()}, windows)
+    try:
+        next_day = windows.last_date + timedelta(days=1)
+        with pytest.raises(ValueError, match="request mine_id 'all'"):
+            service.predict([('1', next_day)], model='prophet')
+        with pytest.raises(ValueError):
+            service.predict([('all', next_day + timedelta(days=1))], model='prophet')
+        assert service.predict([('all', next_day)], model='prophet') == [float(next_day.day)]
+    finally:
+        service.close()
+
+def test_http_api_serves_the_registered_model(make_history):
+    service = open_service(['xgboost'], make_history(mines=2, days=45))
+    server = ForecastHTTPServer(('127.0.0.1', 0), make_handler(service))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_address[1]}'
+    try:
+        next_day = (service.windows.last_date + timedelta(days=1)).isoformat()
+        body = json.dumps({'requests': [{'mine_id': '1', 'date': next_day}, {'mine_id': 2, 'date': next_day}]})
+        request = urllib.request.Request(
+            f'{url}/predict', data=body.encode(), headers={'Content-Type': 'application/json'}
+        )
+        with urllib.request.urlopen(request) as response:
+            predictions = json.loads(response.read())['predictions']
+        with urllib.request.urlopen(f'{url}/health') as response:
+            health = json.loads(response.read())
+    finally:
+        server.shutdown()
+        server.server_close()
+        service.close()
+
+    assert [prediction['mine_id'] for prediction in predictions] == ['1', '2']
+    assert all(np.isfinite(prediction['production']) for prediction in predictions)
+    assert health['mines'] == 2 and health['batches']['xgboost']['items'] == 2
@@ -0,0 +1,62 @@
+"""Tests for the rolling-origin backtests and per-mine model selection."""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from features import build_features
+from registry import read_manifest
+from train import open_matrices, rolling_origins, run_training, scores, select_models
+
+logger = logging.getLogger('test_train')
+
+def test_folds_tile_the_end_of_history_and_scores_skip_zero_actuals():
+    assert rolling_origins(100, folds=3, horizon=7) == [80, 87, 94]
+
+    result = scores(np.array([0.0, 10.0, 20.0]), np.array([1.0, 12.0, 17.0]))
+    assert result['mae'] == pytest.approx(2.0)
+    assert result['rmse'] == pytest.approx(np.sqrt(14 / 3))
+    assert result['mape'] == pytest.approx((20 + 15) / 2)
+
+def test_best_model_per_mine_by_mean_fold_score():
+    backtest = pd.DataFrame({
+        'model': ['xgboost', 'xgboost', 'sarima', 'sarima', 'xgboost', 'sarima'],
+        'mine_id': ['1', '1', '1', '1', '2', '2'],
+        'mae': [1.0, 5.0, 2.0, 2.0, 3.0, 3.0],
+        'rmse': [1.0, 5.0, 4.0, 4.0, 3.0, 3.0],
+        'mape': [1.0, 1.0, 1.0, 1.0, 1.0, 1.0],
+    })
+
+    assert {mine: choice['model'] for mine, choice in select_models(backtest, 'mae').items()} == {
+        '1': 'sarima', '2': 'xgboost'  # ties go to the model listed first in MODELS
+    }
+    assert select_models(backtest, 'rmse')['1'] == {'model': 'xgboost', 'folds': 2, 'mae': 3.0, 'rmse': 3.0,
+                                                    'mape': 1.0}
+
+def test_training_backtests_every_fit_and_writes_the_best_model_of_each_mine(tmp_path, make_history):
+    pytest.importorskip('xgboost')
+    pytest.importorskip('statsmodels')
+    features = build_features(make_history(mines=3, days=120))
+
+    def threads(cache_dir):
+        return ThreadPoolExecutor(2, initializer=open_matrices, initargs=(cache_dir,))
+
+    selection = run_training(features, threads, tmp_path, logger, models=('xgboost', 'sarima'), folds=2, horizon=7)
+
+    backtest = pd.read_csv(tmp_path / 'backtest.csv', dtype={'mine_id': str})
+    assert len(backtest) == 2 * 3 * 2
+    assert sorted(backtest['cutoff'].unique()) == ['2025-04-17', '2025-04-24']
+    assert backtest[['mae', 'rmse', 'mape']].notna().all().all()
+
+    written = json.loads((tmp_path / 'selection.json').read_text())
+    assert written['training_window'] == {'start': '2025-01-01', 'end': '2025-04-30'}
+    assert set(selection) == set(written['mines']) == {'1', '2', '3'}
+    for mine_id, choice in selection.items():
+        name, version = choice['artifact'].split('/')
+        assert name == f"{choice['model']}_{mine_id}"
+        manifest = read_manifest(name, version, tmp_path)
+        assert manifest['metrics']['mae'] == choice['mae']
+        assert manifest['training_window']['end'] == '2025-04-30'
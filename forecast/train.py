@@ -0,0 +1,295 @@
+"""Rolling-origin backtests and per-mine model selection.
+
+Every model is backtested on every mine over --folds consecutive test
+windows of --horizon days ending on the last day of history. Each fold
+trains on the days before its cutoff (an expanding window) and forecasts
+each test day from the facts up to the day before: XGBoost from the
+observed lags, SARIMA by filtering the test days with the fitted
+parameters, Prophet from the calendar alone. The model with the lowest
+mean --metric over the folds is then refit per mine on all of its history.
+
+The feature rows are written once to a cache of .npy files, sorted by mine
+and day, which every worker process memory-maps: a (model, mine, fold)
+task only carries its indices, and a mine's rows are one contiguous slice.
+Fits run in a process pool, the slowest models first.
+
+Outputs in --output (default forecast/models/per_mine/):
+    backtest.csv              MAE, RMSE and MAPE of every (model, mine, fold)
+    selection.json            per mine: the chosen model, its mean scores and its artifact
+    <model>_<mine>/<version>/ the refit model of each mine, a registry version (registry.py)
+                              with the training window and scores in its manifest
+
+Usage (from the repository root):
+    python forecast/train.py --folds 6 --horizon 14 --workers 8
+    python forecast/train.py --history data/daily_production.parquet --models xgboost,sarima --metric rmse
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, TARGET, build_features, day_number
+from registry import save_model
+
+MODELS = ('xgboost', 'prophet', 'sarima')
+METRICS = ('mae', 'rmse', 'mape')
+
+# Relative cost of one fit, to submit the slowest tasks first
+MODEL_COST = {'prophet': 3, 'sarima': 2, 'xgboost': 1}
+
+DEFAULT_FOLDS = 6
+DEFAULT_HORIZON = 14
+# Folds whose training days of a mine are fewer than this are skipped for that mine
+MIN_TRAIN_DAYS = 60
+TRAIN_WORKERS = os.cpu_count() or 4
+OUTPUT_DIR = Path(__file__).resolve().parent / 'models' / 'per_mine'
+
+# Model settings of the forecasting notebook
+XGBOOST_PARAMS = {'n_estimators': 100, 'learning_rate': 0.1, 'max_depth': 6, 'random_state': 42}
+PROPHET_PARAMS = {'yearly_seasonality': True, 'weekly_seasonality': True, 'daily_seasonality': False,
+                  'seasonality_mode': 'multiplicative'}
+SARIMA_ORDER = (1, 1, 1)
+SARIMA_SEASONAL_ORDER = (1, 1, 1, 7)
+
+# Feature matrices of this process, memory-mapped from the cache by open_matrices()
+_matrices = {}
+
+def write_matrices(features, cache_dir):
+    """Cache feature rows as .npy files: values (target first, then FEATURE_COLUMNS), day numbers and mine slices."""
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    features = features.assign(mine_id=features['mine_id'].astype(str), _day=day_number(features['date_id']))
+    features = features.sort_values(['mine_id', '_day'], kind='stable')
+    mine_ids, offsets = np.unique(features['mine_id'].to_numpy(), return_index=True)
+    np.save(cache_dir / 'values.npy', features[[TARGET] + FEATURE_COLUMNS].to_numpy(dtype='float64'))
+    np.save(cache_dir / 'days.npy', features['_day'].to_numpy())
+    (cache_dir / 'mines.json').write_text(json.dumps({
+        'mine_ids': mine_ids.tolist(), 'offsets': offsets.tolist() + [len(features)]
+    }))
+    return cache_dir
+
+def open_matrices(cache_dir):
+    """Pool initializer: memory-map the cached feature matrices once per process."""
+    cache_dir = Path(cache_dir)
+    mines = json.loads((cache_dir / 'mines.json').read_text())
+    _matrices.update(
+        values=np.load(cache_dir / 'values.npy', mmap_mode='r'),
+        days=np.load(cache_dir / 'days.npy', mmap_mode='r'),
+        mine_ids=mines['mine_ids'],
+        offsets=mines['offsets'],
+    )
+
+def mine_rows(mine):
+    """Day numbers and values of the mine at index `mine`."""
+    rows = slice(_matrices['offsets'][mine], _matrices['offsets'][mine + 1])
+    return np.asarray(_matrices['days'][rows]), np.asarray(_matrices['values'][rows])
+
+def rolling_origins(last_day, folds=DEFAULT_FOLDS, horizon=DEFAULT_HORIZON):
+    """Cutoff day numbers of `folds` consecutive `horizon`-day test windows ending on `last_day`."""
+    return [int(last_day) + 1 - horizon * fold for fold in range(folds, 0, -1)]
+
+def scores(actual, predicted):
+    """MAE, RMSE and MAPE (in %, over the non-zero actuals) of one set of predictions."""
+    errors = predicted - actual
+    nonzero = actual != 0
+    return {
+        'mae': float(np.mean(np.abs(errors))),
+        'rmse': float(np.sqrt(np.mean(errors ** 2))),
+        'mape': float(np.mean(np.abs(errors[nonzero] / actual[nonzero])) * 100) if nonzero.any() else np.nan,
+    }
+
+def dense_series(days, target, first_day, last_day):
+    """The target by calendar day from `first_day` to `last_day`, NaN on days without a row."""
+    series = np.full(last_day - first_day + 1, np.nan)
+    series[days - first_day] = target
+    return series
+
+def fit_model(name, days, values):
+    """Fit model `name` on the rows of one mine."""
+    if name == 'xgboost':
+        from xgboost import XGBRegressor
+
+        model = XGBRegressor(**XGBOOST_PARAMS, n_jobs=1)
+        return model.fit(values[:, 1:], values[:, 0])
+    if name == 'prophet':
+        # Quiet per fit: Stan progress (cmdstanpy sets up its logger only when it has no
+        # handler) and the short-history warning of yearly seasonality
+        stan_logger = logging.getLogger('cmdstanpy')
+        stan_logger.addHandler(logging.NullHandler())
+        stan_logger.setLevel(logging.WARNING)
+        from prophet import Prophet
+
+        logging.getLogger('prophet').setLevel(logging.ERROR)
+
+        history = pd.DataFrame({'ds': days.astype('datetime64[D]'), 'y': values[:, 0]})
+        return Prophet(**PROPHET_PARAMS).fit(history)
+    if name == 'sarima':
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            series = dense_series(days, values[:, 0], int(days[0]), int(days[-1]))
+            return SARIMAX(series, order=SARIMA_ORDER, seasonal_order=SARIMA_SEASONAL_ORDER).fit(disp=False)
+    raise ValueError(f"Unknown model: {name}")
+
+def predict_model(name, model, train_days, days, values):
+    """One-step-ahead predictions of the rows `days`/`values`, which follow `train_days`."""
+    if name == 'xgboost':
+        return model.predict(values[:, 1:])
+    if name == 'prophet':
+        return model.predict(pd.DataFrame({'ds': days.astype('datetime64[D]')}))['yhat'].to_numpy()
+    # SARIMA: the test days are filtered with the fitted parameters, each predicted from the days before it
+    first, last_train = int(train_days[0]), int(train_days[-1])
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        extended = model.append(dense_series(days, values[:, 0], last_train + 1, int(days[-1])))
+        predictions = extended.predict(start=last_train + 1 - first, end=int(days[-1]) - first)
+    return predictions[days - last_train - 1]
+
+def backtest_task(name, mine, cutoff, horizon):
+    """Scores of model `name` on mine index `mine` for the fold starting at day `cutoff`, or None when skipped."""
+    days, values = mine_rows(mine)
+    train = days < cutoff
+    test = (days >= cutoff) & (days < cutoff + horizon)
+    if train.sum() < MIN_TRAIN_DAYS or not test.any():
+        return None
+    started = time.perf_counter()
+    model = fit_model(name, days[train], values[train])
+    predicted = predict_model(name, model, days[train], days[test], values[test])
+    return {
+        'model': name,
+        'mine_id': _matrices['mine_ids'][mine],
+        'cutoff': str(np.datetime64(cutoff, 'D')),
+        'rows': int(test.sum()),
+        **scores(values[test, 0], np.asarray(predicted, dtype='float64')),
+        'seconds': time.perf_counter() - started,
+    }
+
+def fit_task(name, mine, output_dir, metrics):
+    """Refit model `name` on all rows of mine index `mine` and register it; returns its path in `output_dir`."""
+    days, values = mine_rows(mine)
+    window = {'start': str(np.datetime64(int(days[0]), 'D')), 'end': str(np.datetime64(int(days[-1]), 'D'))}
+    path = save_model(
+        fit_model(name, days, values), f"{name}_{_matrices['mine_ids'][mine]}", name, output_dir,
+        feature_columns=FEATURE_COLUMNS if name == 'xgboost' else None, training_window=window, metrics=metrics
+    )
+    return str(path.relative_to(output_dir))
+
+def select_models(backtest, metric='mae'):
+    """The model with the lowest mean `metric` over the folds of each mine, with its mean scores."""
+    means = backtest.groupby(['mine_id', 'model'], sort=False)[list(METRICS)].mean()
+    means['folds'] = backtest.groupby(['mine_id', 'model'], sort=False).size()
+    order = {name: position for position, name in enumerate(MODELS)}
+    means = means.reset_index().assign(_order=lambda frame: frame['model'].map(order))
+    best = means.sort_values([metric, '_order'], na_position='last').groupby('mine_id', sort=True).head(1)
+    return {
+        row.mine_id: {'model': row.model, 'folds': int(row.folds), **{name: getattr(row, name) for name in METRICS}}
+        for row in best.itertuples(index=False)
+    }
+
+def run_training(features, executor_factory, output_dir, logger, models=MODELS, folds=DEFAULT_FOLDS,
+                 horizon=DEFAULT_HORIZON, metric='mae'):
+    """Backtest `models` on every mine of the feature rows, refit the best per mine and write the outputs.
+
+    `executor_factory(cache_dir)` returns an executor whose workers have
+    called open_matrices(cache_dir). Returns the selection.
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix='features_') as cache_dir:
+        write_matrices(features, cache_dir)
+        open_matrices(cache_dir)
+        days = day_number(features['date_id'])
+        cutoffs = rolling_origins(days.max(), folds, horizon)
+        mine_ids = _matrices['mine_ids']
+        tasks = sorted(
+            ((name, mine, cutoff) for name in models for mine in range(len(mine_ids)) for cutoff in cutoffs),
+            key=lambda task: -MODEL_COST[task[0]]
+        )
+        logger.info(f"Backtesting {len(models)} models on {len(mine_ids)} mines over {folds} folds "
+                    f"of {horizon} days from {np.datetime64(cutoffs[0], 'D')}: {len(tasks)} fits")
+
+        started = time.perf_counter()
+        with executor_factory(cache_dir) as executor:
+            results = list(executor.map(backtest_task, *zip(*tasks), [horizon] * len(tasks)))
+            backtest = pd.DataFrame([result for result in results if result is not None])
+            if backtest.empty:
+                raise ValueError(f"No mine has {MIN_TRAIN_DAYS} training days before the first cutoff")
+            backtest.to_csv(output_dir / 'backtest.csv', index=False)
+            logger.info(f"Backtested {len(backtest)} fits in {time.perf_counter() - started:.1f}s "
+                        f"({backtest['seconds'].sum():.1f}s of fitting), {len(results) - len(backtest)} skipped")
+
+            selection = select_models(backtest, metric)
+            mines = [mine_ids.index(mine_id) for mine_id in selection]
+            choices = [selection[mine_ids[mine]] for mine in mines]
+            artifacts = executor.map(fit_task, [choice['model'] for choice in choices], mines,
+                                     [output_dir] * len(mines),
+                                     [{name: choice[name] for name in METRICS} for choice in choices])
+            for mine, artifact in zip(mines, artifacts):
+                selection[mine_ids[mine]]['artifact'] = artifact
+
+    window = {'start': str(np.datetime64(int(days.min()), 'D')), 'end': str(np.datetime64(int(days.max()), 'D'))}
+    (output_dir / 'selection.json').write_text(json.dumps({
+        'metric': metric, 'folds': folds, 'horizon': horizon, 'training_window': window,
+        'feature_columns': FEATURE_COLUMNS, 'mines': selection,
+    }, indent=2))
+    chosen = pd.Series([choice['model'] for choice in selection.values()]).value_counts()
+    logger.info(f"Selected by {metric}: {chosen.to_dict()}; outputs written to {output_dir}")
+    return selection
+
+def process_pool(workers):
+    """Executor factory of a spawned process pool whose workers memory-map the cache."""
+    return lambda cache_dir: ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+        initializer=open_matrices, initargs=(str(cache_dir),)
+    )
+
+def load_features(args):
+    """Feature rows from the feature store, or built from a history file given with --history."""
+    if args.history:
+        from serving import read_history
+
+        return build_features(read_history(args.history))
+    from feature_store import read_features
+    from serving import connect
+
+    return read_features(connect(), args.start or date(1970, 1, 1), args.end or date.today() + timedelta(days=1))
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Backtest forecasting models per mine and train the best of each.')
+    parser.add_argument('--models', default=','.join(MODELS), help=f"Comma-separated models out of {', '.join(MODELS)}.")
+    parser.add_argument('--folds', type=int, default=DEFAULT_FOLDS, help='Rolling-origin folds.')
+    parser.add_argument('--horizon', type=int, default=DEFAULT_HORIZON, help='Test days per fold.')
+    parser.add_argument('--metric', choices=METRICS, default='mae', help='Score the best model of a mine is chosen by.')
+    parser.add_argument('--workers', type=int, default=TRAIN_WORKERS, help='Fits run at once, one process each.')
+    parser.add_argument('--history', help='Parquet or CSV export of dwh.fact_daily_production instead of the feature store.')
+    parser.add_argument('--start', type=date.fromisoformat, help='First day of feature store rows to train on.')
+    parser.add_argument('--end', type=date.fromisoformat, help='Last day of feature store rows to train on.')
+    parser.add_argument('--output', default=str(OUTPUT_DIR), help='Directory of the backtest, selection and models.')
+    args = parser.parse_args(argv)
+    args.models = args.models.split(',')
+    if unknown := set(args.models) - set(MODELS):
+        parser.error(f"unknown models: {', '.join(sorted(unknown))}")
+    return args
+
+def main(argv=None):
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    logger = logging.getLogger('forecast.train')
+    args = parse_args(argv)
+    # One BLAS thread per worker process; parallelism comes from the pool
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    run_training(load_features(args), process_pool(args.workers), args.output, logger, args.models,
+                 args.folds, args.horizon, args.metric)
+
+if __name__ == '__main__':
+    main()